@@ -22,12 +22,30 @@
 ############################################################################
 
 # Imported modules
-import usb.core
-import usb.util
+try:
+    import usb.core
+    import usb.util
+except ImportError:
+    # pyusb is only required for the USB transport.  The emulator transport
+    # (see emulator.py) works without it.
+    usb = None
+try:
+    import numpy
+except ImportError:
+    # numpy is optional; without it the capture buffers are array.array
+    numpy = None
+import array
+import errno
 import struct
 import logging
+import queue
 import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque, namedtuple
 from datetime import datetime
+from .conversion import counts_to_current, convert_counts, CALIBRATION_SCALE
 import pdb
 global printheader
 printheader=""
@@ -159,90 +177,6 @@ TESTOP_SUBCMD_HCI_EM_CPU_RESET              = (HCIEM_CMD_BASE + 0x32)
 TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX     = (HCIEM_CMD_BASE + 0x33)
 TESTOP_SUBCMD_HCI_EM_PATCH_QUERY            = (HCIEM_CMD_BASE + 0x34)
 
-# Table lookup for subcmd names, starting at index 0x40 (the EM vendor-specific commands)
-# TODO: cover the full set of subcmd names.
-subcmd_names      = [
-    'unused',
-    'unused',
-    'TESTOP_SUBCMD_HCI_EM_SET_PUBLIC_ADDRESS',  # 0x02
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'TESTOP_SUBCMD_HCI_EM_SET_UART_BAUD_RATE',  # 0x07
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST',      # 0x11
-    'TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST_END',  # 0x12
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS',
-    'TESTOP_SUBCMD_HCI_EM_READ_CONTINUE',
-    'TESTOP_SUBCMD_HCI_EM_WRITE_AT_ADDRESS',
-    'TESTOP_SUBCMD_HCI_EM_WRITE_CONTINUE',
-    'TESTOP_SUBCMD_HCI_EM_SET_POWER_MODE_EX',
-    'TESTOP_SUBCMD_HCI_EM_SET_RF_ACTIVITY_SIGNAL_EX',
-    'TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL_EX',
-    'TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_START' ,
-    'TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_CONTINUE',
-    'TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_ABORT',
-    'TESTOP_SUBCMD_HCI_EM_SET_CLOCK_SOURCE',
-    'TESTOP_SUBCMD_HCI_EM_SET_MEMORY_MODE'  ,
-    'TESTOP_SUBCMD_HCI_EM_GET_MEMORY_USAGE',
-    'TESTOP_SUBCMD_HCI_EM_SET_SLEEP_OPTIONS',
-    'TESTOP_SUBCMD_HCI_EM_SVLD_MEASUREMENT',
-    'TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK',
-    'unused',
-    'unused',
-    'TESTOP_SUBCMD_HCI_EM_CPU_RESET',
-    'TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX',
-    'TESTOP_SUBCMD_HCI_EM_PATCH_QUERY',         # 0x34
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    'unused',
-    # The special test commands  (starting at 0x80)
-    'TESTOP_SUBCMD_HCI_PROTEST_SLEEP',
-    'TESTOP_SUBCMD_HCI_PROTEST_ACTIVE',
-    'TESTOP_SUBCMD_HCI_PROTEST_TXSTART',
-    'TESTOP_SUBCMD_HCI_PROTEST_TXSTOP',
-    'TESTOP_SUBCMD_HCI_PROTEST_RXSTART',
-    'TESTOP_SUBCMD_HCI_PROTEST_RXSTOP',
-    'TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_ENABLE',
-    'TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_DISABLE',
-    'TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_ENABLE',
-    'TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_DISABLE',
-    'TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD',
-    'TESTOP_SUBCMD_HCI_PROTEST_SET_GPIO',
-    'unused',
-    'unused' ]
-
-
 # For the EM vendor-specific HCI commands that are implemented as
 # PROTEST_SUB_ commands, use the same code but ORd with 0x80
 HCITEST_CMD_BASE                         = 0x80
@@ -259,6 +193,16 @@ TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_DISABLE        = (HCITEST_CMD_BASE + 9)  # HCI
 TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD               = (HCITEST_CMD_BASE +10)  # HCI2SUBCMD(PROTEST_SUB_GET_SVLD )
 TESTOP_SUBCMD_HCI_PROTEST_SET_GPIO               = (HCITEST_CMD_BASE +11)  # HCI2SUBCMD(PROTEST_SUB_SET_GPIO )
 
+# Indices to bytes in the command frame
+TESTOP_CMD_IDX_CMD               = (0)
+TESTOP_CMD_IDX_LEN               = (1)
+TESTOP_CMD_IDX_SUBCMD            = (2)
+TESTOP_CMD_IDX_SEQNUM            = (3)
+TESTOP_CMD_IDX_SLOT              = (4)
+# The command arguments start in byte 5 and must fit in one USB packet
+TESTOP_CMD_IDX_ARGS              = (5)
+TESTOP_CMD_MAX_ARGS              = (DVK_USB_EP_SIZE - TESTOP_CMD_IDX_ARGS)
+
 # Indices to bytes in the response packet
 TESTOP_RESP_IDX_CMD              = (0)
 TESTOP_RESP_IDX_LEN              = (1)
@@ -267,6 +211,7 @@ TESTOP_RESP_IDX_SEQNUM           = (3)
 TESTOP_RESP_IDX_ERRORCODE        = (4)
 # The response detail starts in byte 5
 TESTOP_RESP_IDX_DETAIL           = (5)
+TESTOP_RESP_MAX_DETAIL           = (DVK_USB_EP_SIZE - TESTOP_RESP_IDX_DETAIL)
 
 # These map to the HCI error codes define in hci.h except for
 TESTOP_ERRCODE_SUCCESS           = (0)
@@ -313,86 +258,23 @@ SI5351_R_DIV_32     = 5
 SI5351_R_DIV_64     = 6
 SI5351_R_DIV_128    = 7
 
+# Kinds of measurement passed to ProDVKSession.measurement_sink
+MEASUREMENT_CURRENT = 1     # uA
+MEASUREMENT_PER     = 2     # %
+MEASUREMENT_PPM     = 3     # ppm
+MEASUREMENT_RSSI    = 4     # dBm (average)
+
 # ==========================================================================
 # Global data
 # ==========================================================================
 # default value of the device slot
 devSlot = SLOT_DUT
-# Command sequence number bumped by one each command sent
-cmdSeqNum = 1
 # Set verbose > 0 to provide more debug output
 verbose = 0
-# Last response detail
-lastResponseDetailString = "N/R"
-
-# ==========================================================================
-#   Global data to hold return parameters (parsed from the response packets)
-# ==========================================================================
-last_upload_response=0
-triggered_current_values =[]
-last_PER_value=100
-last_ppm=100000
-# For the SVLD_MEASUREMENT response
-last_SVLD_power_mode  = 0
-last_SVLD_measurement = 0
-last_Digital_read=-1
-# For the GET_MEMORY_USAGE response
-last_memusage_memory_pool_size           = 0
-last_memusage_retention_memory_used      = 0
-last_memusage_nonretention_memory_used   = 0
-last_memusage_retention_memory_reserved  = 0
-# For the CALCULATE_CRC32_EX response
-last_calccrc_crc32                       = 0
-# For the READ_ADC1, READ_ADC2 and READ_ADC3 response
-last_adc_measurement                     = 0
-# For READ_PTB_FW_VER response
-last_board_ver_string                    = ''
-last_board_serial_num_string             = ''
-last_dev_ver_string                      = ''
-last_dut_ver_string                      = ''
-last_ref_ver_string                      = ''
-# For READ_AT_ADDR response
-last_read_mem_string                     = ''
-# For PATCH_QUERY
-last_patch_container_count  = 0
-last_patch_transfer_count   = 0
-last_patch_system_state     = 0
-last_patch_address          = 0
-last_patch_size             = 0
-last_patch_CRC32            = 0
-last_patch_build_num        = 0
-last_patch_user_build_num   = 0
-last_patch_container_flags  = 0
-last_patch_container_version= 0
-last_patch_container_type   = 0
-last_patch_container_id     = 0
-# For TESTOP_SUBCMD_HCI_TRANSMITTER_TEST_END
-last_test_number_of_packets = 0
-
-# For SET_RF_POWER_LEVEL_EX
-last_max_power_level        = 0
-# For XTAL accuracy test
-last_xtal_dut_tics          = 0
-last_xtal_ref_tics          = 0
-# For BD Address
-last_BD_address             = 0
-# For Advertising Report
-last_advertReport_totalReports  = 0
-last_advertReport_minRssi       = 0
-last_advertReport_maxRssi       = 0
-last_advertReport_aveRssi       = 0
-last_advertReport_lastRssi      = 0
-
-# Overall Test stats
-test_verification_count = 0
-test_error_count = 0
-
-last_is_busy = 0
 
 global logger
 logger = logging.getLogger("prodvktest")
 
-read_results_index = 0
 # ==========================================================================
 #   Initialize the logger
 #   Parent script should call this during initialization and provide a
@@ -411,2085 +293,3509 @@ def set_logger(log_name, log_level = logging.WARNING):
 
 
 # ==========================================================================
-#     Helper function to return the last calculated CRC32
-# ==========================================================================
-def get_last_calccrc_crc32():
-    return last_calccrc_crc32
-
-
-# ==========================================================================
-#     Helper function to return the last read mem string
-# ==========================================================================
-def get_last_read_mem_string():
-    return last_read_mem_string
-
-
-# ==========================================================================
-#     Helper function to return the last SVLD power mode
+#     Helper function to generate a standard prefix for test failure log messages
+#     Standard format:  Test Failed: Sleep Mode Current:  xxxxxxx
 # ==========================================================================
-def get_last_SVLD_power_mode():
-    return last_SVLD_power_mode
+def generate_test_failed_prefix( testTitle):
+    return ("Test Failed: " + testTitle + ": ")
 
 
 # ==========================================================================
-#     Helper function to return the last SVLD measured value
+#     Helper function to generate a standard prefix for test passed log messages
+#     Standard format:  Test Passed: Sleep Mode Current:  xxxxxxx
 # ==========================================================================
-def get_last_SVLD_measurement():
-    return last_SVLD_measurement
+def generate_test_passed_prefix( testTitle):
+    return ("Test Passed: " + testTitle + ": ")
 
 
 # ==========================================================================
-#     Helper function to return the last ADC measurement
+#   Helper function to log a string to the log file at INFO level even
+#    if current level is WARNING
 # ==========================================================================
-def get_last_adc_measurement():
-    return last_adc_measurement
+def log_string( log_message ):
+    old_level = logger.getEffectiveLevel()
+    logger.setLevel(logging.INFO)
+    logger.info(log_message)
+    logger.setLevel(level=old_level)
+    return
 
-# ==========================================================================
-#     Helper function to return the last device version string
-# ==========================================================================
-def get_last_dev_ver_string():
-    return last_dev_ver_string
 
 # ==========================================================================
-#     Helper function to return the last DUT version string
+#   Convert a string of bytes to printable ASCII string
 # ==========================================================================
-def get_last_dut_ver_string():
-    return last_dut_ver_string
+def convert_bytes_to_string(bytes):
+    # latin-1 maps every byte to the character with the same code
+    return bytearray(bytes).partition(b'\0')[0].decode('latin-1')
 
 
 # ==========================================================================
-#     Helper function to return the last REF version string
+#     Convert a two byte array into an int
 # ==========================================================================
-def get_last_ref_ver_string():
-    return last_ref_ver_string
+def convert_array_to_short(array):
+    # EM9304 uses little endian byte order
+    low_byte = array[0]
+    hi_byte  = array[1]
+    intval = (hi_byte << 8) + low_byte
+    return intval
 
 
 # ==========================================================================
-#     Helper function to return the last Board FW version string
+#     Convert a 4 byte array into a 32 bit long
 # ==========================================================================
-def get_last_board_ver_string():
-    return last_board_ver_string
+def convert_array_to_long(array):
+    # EM9304 uses little endian byte order
+    intval = (array[3] << 24) + (array[2] << 16) + (array[1] << 8) + array[0]
+    return intval
 
 
 # ==========================================================================
-#     Helper function to return the last max power level
+#     Convert a 4 byte array into a signed 32 bit long
 # ==========================================================================
-def get_last_max_power_level():
-    return last_max_power_level
-
+def convert_array_to_slong(array):
+    # EM9304 uses little endian byte order
+    intval = (array[3] << 24) + (array[2] << 16) + (array[1] << 8) + array[0]
+    if (2147483648 <= intval):
+        intval = intval - 4294967296
+    return intval
 
-# ==========================================================================
-#     Helper function to return the last Rx/Tx test number_of_packets
-# ==========================================================================
-def get_last_test_number_of_packets():
-    return last_test_number_of_packets
 
 # ==========================================================================
-#     Helper function to return the last Rx/Tx test number_of_packets
+#     Convert a 4 byte array into a signed 32 bit long
 # ==========================================================================
-def get_last_xtal_dut_tics():
-    return last_xtal_dut_tics
+def convert_array_to_int(array):
+    # EM9304 uses little endian byte order
+    intval = (array[0] << 24) + (array[1] << 16) + (array[2] << 8) + array[3]
+    if (2147483648 <= intval):
+        intval = intval - 4294967296
+    return intval
 
-# ==========================================================================
-#     Helper function to return the last Rx/Tx test number_of_packets
-# ==========================================================================
-def get_last_xtal_ref_tics():
-    return last_xtal_ref_tics
 
 # ==========================================================================
-#     Helper function to return the BLE Address
+#     Convert int array into hex string for display
 # ==========================================================================
-def get_last_BD_address():
-    return last_BD_address
+def convert_array_to_hex(array, num):
+    if num <= 0:
+        return ''
+    return bytearray(array[:num]).hex(' ') + ' '
 
-# ==========================================================================
-#     Helper function to return the BLE Address
-# ==========================================================================
-def get_last_AdvRpt_totalCount():
-    return last_advertReport_totalReports
 
 # ==========================================================================
-#     Helper function to return the BLE Address
+#     Convert int array into hex string for display
 # ==========================================================================
-def get_last_AdvRpt_minRssi():
-    return last_advertReport_minRssi
+def convert_array_to_hex_no_spaces(array, num):
+    return bytearray(array[:num]).hex()
 
-# ==========================================================================
-#     Helper function to return the BLE Address
-# ==========================================================================
-def get_last_AdvRpt_maxRssi():
-    return last_advertReport_maxRssi
 
 # ==========================================================================
-#     Helper function to return all Triggered Current Measurements
+#   Log message that is only formatted when a handler emits it
+#   message is a %-style format for args, or a function returning the
+#   text when called with args.  The parse_* functions return these, so
+#   nothing is formatted when the logger is above INFO.
 # ==========================================================================
-def get_Triggered_Current_Values():
-    return triggered_current_values
-
-def get_Last_Upload_Response():
-    return last_upload_response
+class LazyLogMessage(object):
+    __slots__ = ('message', 'args')
 
-# ==========================================================================
-#     Helper function to return the last PER Value
-# ==========================================================================
-def get_last_PER_Value():
-    return last_PER_value
+    def __init__(self, message, *args):
+        self.message = message
+        self.args    = args
 
-def get_last_ppm():
-    return last_ppm
+    def __str__(self):
+        if callable(self.message):
+            return self.message(*self.args)
+        return self.message % self.args
 
-def get_last_digital_read():
-    return last_Digital_read
-# ==========================================================================
-# ==========================================================================
-def clear_Triggered_Current_Values():
-    global triggered_current_values
-    triggered_current_values=[]
-    return
 
-# For PATCH_QUERY
 # ==========================================================================
-#     Helper functions to return the last values for the em_patch_query command
+#   Result records
+#   The parse_* functions return one of these immutable records (a
+#   namedtuple with no instance dict).  str() of a record is the text that
+#   is logged for the response; it is only built when the record is
+#   logged or printed.
+#
+#   define_result() makes a record type: message is a %-style format for
+#   the fields, or a function of the record returning the text.
 # ==========================================================================
-def get_last_patch_container_count():   return last_patch_container_count
-def get_last_patch_transfer_count():    return last_patch_transfer_count
-def get_last_patch_system_state():      return last_patch_system_state
-def get_last_patch_address():           return last_patch_address
-def get_last_patch_size():              return last_patch_size
-def get_last_patch_CRC32():             return last_patch_CRC32
-def get_last_patch_build_num():         return last_patch_build_num
-def get_last_patch_user_build_num():    return last_patch_user_build_num
-def get_last_patch_container_flags():   return last_patch_container_flags
-def get_last_patch_container_version(): return last_patch_container_version
-def get_last_patch_container_type():    return last_patch_container_type
-def get_last_patch_container_id():      return last_patch_container_id
+class ResultRecord(object):
+    __slots__ = ()
 
-def get_test_error_count():
-    global test_error_count
-    return test_error_count
 
+def define_result(typename, field_names, message):
+    if callable(message):
+        render = message
+    else:
+        render = lambda record: message % tuple(record)
+    return type(typename, (namedtuple(typename, field_names), ResultRecord),
+                {'__slots__': (), '__str__': render})
+
+
+StatusResult          = define_result('StatusResult', 'dut_state ref_state dut_cmd_count ref_cmd_count',
+                                      'dut_state: %s  ref_state: %s    dut_cmd_cnt:%s    ref_cmd_cnt:%s')
+MemoryUsageResult     = define_result('MemoryUsageResult',
+                                      'memory_pool_size retention_memory_used nonretention_memory_used retention_memory_reserved',
+                                      'MemoryPoolSize=%s  RetentionMemoryUsed=%s  NonRetentionMemoryUsed=%s  RetentionMemoryReserved=%s')
+PatchQueryResult      = define_result('PatchQueryResult',
+                                      'container_count transfer_count system_state address size crc32 '
+                                      'build_num user_build_num container_flags container_version container_type container_id',
+                                      'Containers=%s TransferCount=%s State=%#x Addr=%#x Size=%s CRC32=%#x '
+                                      'BuildNum=%s UserBuildNum=%s Flags=%02x  Ver=%02x  Type=%02x  ID=%02x ')
+SVLDResult            = define_result('SVLDResult', 'power_mode measurement', 'PowerMode=%s  SVLDMeasurement=%s')
+ProtestSVLDResult     = define_result('ProtestSVLDResult', 'measurement', 'SVLDMeasurement=%s')
+CRC32Result           = define_result('CRC32Result', 'crc32', 'CRC32=%#x')
+EndTestResult         = define_result('EndTestResult', 'number_of_packets', 'NumberOfPackets=%s')
+CurrentResult         = define_result('CurrentResult', 'channel current', 'ADCMeasurement CH=%s, Current=%s')
+VersionResult         = define_result('VersionResult', 'version', 'Version=%s')
+SerialNumberResult    = define_result('SerialNumberResult', 'serial_number', 'BoardSerialNumber=%s')
+MemoryReadResult      = define_result('MemoryReadResult', 'data',
+                                      lambda record: 'ReadMemory=' + convert_array_to_hex(record.data, len(record.data)))
+PowerLevelResult      = define_result('PowerLevelResult', 'max_power_level', 'MaxPowerLevel=%s')
+XtalValidationResult  = define_result('XtalValidationResult', 'ref_tics dut_tics',
+                                      lambda record: '    Difference in XTAL tics:%s' % (record.ref_tics - record.dut_tics))
+BDAddressResult       = define_result('BDAddressResult', 'address', '    BD Address:%s')
+AdvertisingReportResult = define_result('AdvertisingReportResult', 'total_reports min_rssi max_rssi ave_rssi last_rssi',
+                                      lambda record: '    Ave RSSI:%s, Total Events:%s' % (record.ave_rssi, record.total_reports))
+CalibrationResult     = define_result('CalibrationResult', 'current_5mA current_100uA current_1uA',
+                                      '    5ma:%s, 100uA:%s, 1uA:%s')
+BusyResult            = define_result('BusyResult', 'is_busy', 'IsBusy = %s')
+ReadResultsStatus     = define_result('ReadResultsStatus', 'is_busy', 'ReadResults = %s')
+PERResult             = define_result('PERResult', 'packet_error_rate', 'Packet error rate =%s')
+PpmResult             = define_result('PpmResult', 'ppm', 'ppm = %.2f')
+TriggeredCurrentResult = define_result('TriggeredCurrentResult', 'measurements',
+                                      lambda record: ''.join('\n' + str(measurement) for measurement in record.measurements))
+GpioReadResult        = define_result('GpioReadResult', 'kind value', 'GPIO %s Read = %s')
+# verified: None if the transfer was not verified
+MemoryTransferResult  = define_result('MemoryTransferResult', 'address length seconds bytes_per_second data verified',
+                                      lambda record: 'Address=%#x  Length=%s  Time=%.3f s  Rate=%.0f bytes/s' % record[:4] +
+                                                     ('' if record.verified is None else '  Verified=%s' % record.verified))
+MemorySyncResult      = define_result('MemorySyncResult',
+                                      'address length bytes_compared bytes_written crc_commands ranges seconds verified',
+                                      lambda record: 'Address=%#x  Length=%s  Compared=%s  Written=%s  CRCs=%s  Ranges=%s  Time=%.3f s'
+                                                     % (record.address, record.length, record.bytes_compared, record.bytes_written,
+                                                        record.crc_commands, len(record.ranges), record.seconds) +
+                                                     ('' if record.verified is None else '  Verified=%s' % record.verified))
+AdcVoltageResult      = define_result('AdcVoltageResult', 'channel millivolts', 'Channel %s = %s millivolts')
+# Free form text responses; raw holds the detail bytes
+TextResult            = define_result('TextResult', 'raw', lambda record: convert_bytes_to_string(record.raw))
 
-# ==========================================================================
-#     Helper function to return the BLE Address
-# ==========================================================================
-def get_last_AdvRpt_aveRssi():
-    return last_advertReport_aveRssi
 
 # ==========================================================================
-#     Helper function to return the BLE Address
+#     Convert error code to string
+#
 # ==========================================================================
-def get_last_AdvRpt_lastRssi():
-    return last_advertReport_lastRssi
+TESTOP_ERRCODE_NAMES = {
+    TESTOP_ERRCODE_SUCCESS:                  "Success",
+    TESTOP_ERRCODE_UNK_CMD:                  "Unknown command",
+    TESTOP_ERRCODE_HW_FAIL:                  "HW Failure",
+    TESTOP_ERRCODE_NOT_ALLOWED:              "Command not allowed",
+    TESTOP_ERRCODE_BAD_PARAMS:               "Invalid parameters",
+    TESTOP_ERRCODE_CMD_TIMEOUT:              "Command timeout",
+    TESTOP_ERRCODE_RESPONSE_PARSE_ERR:       "Response could not be parsed",
+    TESTOP_ERRCODE_DEVICE_HARD_FAIL:         "Device missing or failed",
+    TESTOP_ERRCODE_TX_BUSY:                  "Command Tx failed because device is busy",
+    TESTOP_ERRCODE_TX_ERR:                   "Command Tx failed because invalid command",
+    TESTOP_ERRCODE_CMD_COMPLETE_NOT_RECEIVED:"Command complete not received",
+}
 
-# ==========================================================================
-#     Helper function to return the IsBusy status
-# ==========================================================================
-def get_last_IsBusy():
-    return last_is_busy
+def convert_errcode_to_string(errcode):
+    return TESTOP_ERRCODE_NAMES.get(errcode, "unknown error code")
 
-# ==========================================================================
-#     Helper function to return the IsBusy status
-# ==========================================================================
-def get_read_results():
-    return last_read_results
 
 # ==========================================================================
-#     Helper function to generate a standard prefix for test failure log messages
-#     Standard format:  Test Failed: Sleep Mode Current:  xxxxxxx
+#     Convert a subcmd index to a name string (see COMMAND_SPECS)
 # ==========================================================================
-def generate_test_failed_prefix( testTitle):
-    return ("Test Failed: " + testTitle + ": ")
+def convert_subcmd_to_string(subcmd_index):
+    spec = COMMAND_SPECS[subcmd_index & 0xff]
+    if spec is None:
+        return 'unknown'
+    return spec.name
 
 
 # ==========================================================================
-#     Helper function to generate a standard prefix for test passed log messages
-#     Standard format:  Test Passed: Sleep Mode Current:  xxxxxxx
+#     Build the TESTOP command frame for a command
+#     The number of arg bytes indicated by argcnt are copied from argvect.
+#     The frame is written into frame_buf (a memoryview of a bytearray of
+#     DVK_USB_EP_SIZE bytes, allocated if not given) and the slice of it
+#     holding the bytes to send is returned.  With argvect None the args
+#     are expected to be in frame_buf already (packed by the caller).
+#     Returns None if argcnt is invalid
 # ==========================================================================
-def generate_test_passed_prefix( testTitle):
-    return ("Test Passed: " + testTitle + ": ")
+TESTOP_CMD_HEADER = struct.Struct('BBBBB')
 
+def encode_command_frame(subcmd, devSlot, seqNum, argcnt, argvect, frame_buf = None):
+    if argcnt < 0 or argcnt > TESTOP_CMD_MAX_ARGS:
+        return None
 
-# ==========================================================================
-#     Helper function to generate a standard test header
-# ==========================================================================
-def generate_test_header( test_title_arg):
-    global test_title
+    if frame_buf is None:
+        frame_buf = memoryview(bytearray(DVK_USB_EP_SIZE))
 
-    # Save the test title for later use in the test summary/footer
-    test_title = test_title_arg
+    # The number of bytes after the command and length bytes
+    # For simplicity, always use at least 3 param bytes even though we don't always use 3
+    paramLength = 3 + argcnt
 
-    dt = datetime.now()
-    dtString  = f'{dt:%Y-%m-%d  %H:%M:%S}'
-    logging.basicConfig(level=logging.INFO)
-    old_level = logger.getEffectiveLevel()
-    logger.setLevel(logging.INFO)
-    logger.info("==============> Start Test: " + test_title + ":        " + dtString)
-    logger.setLevel(level=old_level)
+    # Pack the header, including the devSlot (which is technically the first arg byte)
+    TESTOP_CMD_HEADER.pack_into(frame_buf, 0, COMMAND_TESTOP, paramLength, subcmd, seqNum, devSlot)
 
-    return
+    if argvect is not None and argcnt > 0:
+        if argcnt == 1:
+            frame_buf[TESTOP_CMD_IDX_ARGS] = argvect[0] & 0xff
+        else:
+            args = argvect if len(argvect) == argcnt else argvect[:argcnt]
+            if len(args) != argcnt:
+                return None
+            if not isinstance(args, (bytes, bytearray, memoryview)):
+                args = bytes(args)
+            frame_buf[TESTOP_CMD_IDX_ARGS:TESTOP_CMD_IDX_ARGS + argcnt] = args
 
+    return frame_buf[:TESTOP_CMD_IDX_ARGS + argcnt]
 
 
 # ==========================================================================
-#     Helper function to generate a test summary
+#     Precompiled argument layouts of the send_command_* helpers
+#     (all multi-byte values are little endian)
 # ==========================================================================
-def generate_test_summary():
-    global test_error_count
-    global test_verification_count
-    global test_title
-
-    dt = datetime.now()
-    dtString  = f'{dt:%Y-%m-%d  %H:%M:%S}'
-    logging.basicConfig(level=logging.INFO)
-    old_level = logger.getEffectiveLevel()
-    # Force the log level to INFO so we get the "TEST PASSED" even if it is set to just the WARN level
-    logger.setLevel(logging.INFO)
-
-    if test_error_count > 0:
-        logger.warning('TEST FAILED: ' + test_title + ':  Total Verifications=' + str(test_verification_count) +
-                       ' Total Errors= ' + str(test_error_count) + '      ' + dtString + '\n\n')
-    else:
-        logger.info(   'TEST PASSED: ' + test_title + ':  Total Verifications=' + str(test_verification_count) +
-                       '      ' + dtString + '\n\n')
-
-    # Restore the logger level to what it was
-    logger.setLevel(level=old_level)
-    return
+_ARGS_NONE       = struct.Struct('')
+_ARGS_BYTE       = struct.Struct('B')
+_ARGS_2BYTES     = struct.Struct('BB')
+_ARGS_3BYTES     = struct.Struct('BBB')
+_ARGS_4BYTES     = struct.Struct('BBBB')
+_ARGS_5BYTES     = struct.Struct('BBBBB')
+_ARGS_6BYTES     = struct.Struct('BBBBBB')
+_ARGS_7BYTES     = struct.Struct('BBBBBBB')
+_ARGS_SHORT      = struct.Struct('<H')
+_ARGS_WORD       = struct.Struct('<L')
+_ARGS_2WORDS     = struct.Struct('<LL')
+_ARGS_WORD_BYTE  = struct.Struct('<LB')
 
 
 # ==========================================================================
-#     Helper function to generate FW version strings for DUT, REF and DVK Board FW
+#   Command schema
+#   One entry per TESTOP subcommand with the layout of its argument bytes
+#   (the ones after devSlot) and of the detail bytes of its response, as
+#   precompiled structs.  Every layout states its byte order; the EM9304
+#   is little endian.
+#
+#   request  None if the arguments are not described here (use the
+#            generic send_command_* helpers).  A command that ends with
+#            variable length data has the fixed part here and the data
+#            is passed as the payload of send_command_values().
+#   response None if the detail is free form (text, memory dumps) or
+#            depends on the result (FUNCTEST_READ_RESULTS)
+#   parser   function(session, response_detail) called by parse_response()
+#            for a successful response; returns what is logged (anything
+#            with a __str__, e.g. a LazyLogMessage)
+#   result_type  type of what the parser returns
+#
+#   COMMAND_SPECS has one slot per subcmd value (None if not defined), so
+#   finding the name and parser of a response is a single index.
+# ==========================================================================
+CommandSpec = namedtuple('CommandSpec', 'subcmd name request response parser result_type')
+
+COMMAND_SPECS = [None] * 256
+
+def define_command(subcmd, name, request = None, response = None):
+    spec = CommandSpec(subcmd, name,
+                       None if request  is None else struct.Struct(request),
+                       None if response is None else struct.Struct(response),
+                       None, None)
+    COMMAND_SPECS[subcmd] = spec
+    return spec
+
+
+# ==========================================================================
+#   Register the parser of the responses to a subcmd
+#   Works for subcmds not in the table (e.g. added by newer board firmware);
+#   name is then used for logging.  Returns the updated CommandSpec.
+# ==========================================================================
+def register_response_parser(subcmd, parser, result_type = str, name = None):
+    spec = COMMAND_SPECS[subcmd]
+    if spec is None:
+        spec = CommandSpec(subcmd, name or 'TESTOP_SUBCMD_0x%02X' % subcmd, None, None, None, None)
+    elif name is not None:
+        spec = spec._replace(name=name)
+    spec = spec._replace(parser=parser, result_type=result_type)
+    COMMAND_SPECS[subcmd] = spec
+    return spec
+
+
+# ==========================================================================
+#   Unpack the response detail of a command as given by COMMAND_SPECS
+# ==========================================================================
+def decode_response(subcmd, response_detail):
+    return COMMAND_SPECS[subcmd].response.unpack_from(response_detail)
+
+
+#              subcmd                                          name                                              request                    response
+define_command(TESTOP_SUBCMD_READ_PRODVK_FW_VER,              'TESTOP_SUBCMD_READ_PRODVK_FW_VER',               '',                        None)
+define_command(TESTOP_SUBCMD_READ_PRODVK_SN,                  'TESTOP_SUBCMD_READ_PRODVK_SN',                   '',                        None)
+define_command(TESTOP_SUBCMD_READ_DUT_VER,                    'TESTOP_SUBCMD_READ_DUT_VER',                     '',                        '<8s')
+define_command(TESTOP_SUBCMD_READ_REF_VER,                    'TESTOP_SUBCMD_READ_REF_VER',                     '',                        '<8s')
+define_command(TESTOP_SUBCMD_READ_CURRENT,                    'TESTOP_SUBCMD_READ_CURRENT',                     '',                        '<Bxxxl')
+define_command(TESTOP_SUBCMD_READ_ADC,                        'TESTOP_SUBCMD_READ_ADC',                         '<B',                      '<Bxxxl')
+define_command(TESTOP_SUBCMD_UNUSED,                          'TESTOP_SUBCMD_UNUSED',                           None,                      None)
+define_command(TESTOP_SUBCMD_MODESWITCH_TO_TESTOP,            'TESTOP_SUBCMD_MODESWITCH_TO_TESTOP',             '',                        None)
+define_command(TESTOP_SUBCMD_MODESWITCH_TO_BRIDGE,            'TESTOP_SUBCMD_MODESWITCH_TO_BRIDGE',             '',                        None)
+define_command(TESTOP_SUBCMD_READ_STATUS,                     'TESTOP_SUBCMD_READ_STATUS',                      '',                        '<BBHH')
+define_command(TESTOP_SUBCMD_SET_CURRENT_RANGE_1,             'TESTOP_SUBCMD_SET_CURRENT_RANGE_1',              '',                        None)
+define_command(TESTOP_SUBCMD_SET_CURRENT_RANGE_2,             'TESTOP_SUBCMD_SET_CURRENT_RANGE_2',              '',                        None)
+define_command(TESTOP_SUBCMD_SET_CURRENT_RANGE_3,             'TESTOP_SUBCMD_SET_CURRENT_RANGE_3',              '',                        None)
+define_command(TESTOP_SUBCMD_RESET_9304,                      'TESTOP_SUBCMD_RESET_9304',                       '',                        None)
+define_command(TESTOP_SUBCMD_SET_REF_CLOCK,                   'TESTOP_SUBCMD_SET_REF_CLOCK',                    '<BIIBIIBHIIBBHIIBBHIIB',  None)
+define_command(TESTOP_SUBCMD_EXEC_XTALVALIDATION,             'TESTOP_SUBCMD_EXEC_XTALVALIDATION',              '<L',                      '<LL')
+define_command(TESTOP_SUBCMD_SET_MUX_STATE,                   'TESTOP_SUBCMD_SET_MUX_STATE',                    '<B',                      None)
+define_command(TESTOP_SUBCMD_EXEC_CALIBRATION,                'TESTOP_SUBCMD_EXEC_CALIBRATION',                 '<B',                      '<lll')
+
+define_command(TESTOP_SUBCMD_HCI_READ_9304_VER,               'TESTOP_SUBCMD_HCI_READ_9304_VER',                '',                        '<8s')
+define_command(TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST,            'TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST',             '<B',                      None)
+define_command(TESTOP_SUBCMD_HCI_LE_TRANSMITTER_TEST,         'TESTOP_SUBCMD_HCI_LE_TRANSMITTER_TEST',          '<BBB',                    None)
+define_command(TESTOP_SUBCMD_HCI_LE_TEST_END,                 'TESTOP_SUBCMD_HCI_LE_TEST_END',                  '',                        '<H')
+define_command(TESTOP_SUBCMD_HCI_RESET,                       'TESTOP_SUBCMD_HCI_RESET',                        '',                        None)
+define_command(TESTOP_SUBCMD_HCI_READ_BD_ADDR,                'TESTOP_SUBCMD_HCI_READ_BD_ADDR',                 '',                        '<6s')
+define_command(TESTOP_SUBCMD_HCI_SET_ADVERTISING_DATA,        'TESTOP_SUBCMD_HCI_SET_ADVERTISING_DATA',         '<B',                      None)
+define_command(TESTOP_SUBCMD_HCI_SET_ADVERTISING_PARAMETERS,  'TESTOP_SUBCMD_HCI_SET_ADVERTISING_PARAMETERS',   '<BBBB',                   None)
+define_command(TESTOP_SUBCMD_HCI_LE_SET_ADVERTISE_ENABLE,     'TESTOP_SUBCMD_HCI_LE_SET_ADVERTISE_ENABLE',      '<B',                      None)
+define_command(TESTOP_SUBCMD_HCI_LE_CLEAR_WHITE_LIST,         'TESTOP_SUBCMD_HCI_LE_CLEAR_WHITE_LIST',          '',                        None)
+define_command(TESTOP_SUBCMD_HCI_LE_ADD_DEVICE_TO_WHITE_LIST, 'TESTOP_SUBCMD_HCI_LE_ADD_DEVICE_TO_WHITE_LIST',  '',                        None)
+define_command(TESTOP_SUBCMD_HCI_LE_SET_SCAN_PARAMETERS,      'TESTOP_SUBCMD_HCI_LE_SET_SCAN_PARAMETERS',       '',                        None)
+define_command(TESTOP_SUBCMD_HCI_LE_SET_SCAN_ENABLE,          'TESTOP_SUBCMD_HCI_LE_SET_SCAN_ENABLE',           '<BB',                     None)
+define_command(TESTOP_SUBCMD_HCI_LE_GET_ADVERTISING_REPORT,   'TESTOP_SUBCMD_HCI_LE_GET_ADVERTISING_REPORT',    '',                        '<Lllll')
+
+define_command(TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP,          'TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP',           None,                      None)
+define_command(TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE,         'TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE',          None,                      None)
+define_command(TESTOP_SUBCMD_FUNCTEST_CURRENT_RX,             'TESTOP_SUBCMD_FUNCTEST_CURRENT_RX',              None,                      None)
+define_command(TESTOP_SUBCMD_FUNCTEST_CURRENT_TX,             'TESTOP_SUBCMD_FUNCTEST_CURRENT_TX',              None,                      None)
+define_command(TESTOP_SUBCMD_FUNCTEST_PER_TX,                 'TESTOP_SUBCMD_FUNCTEST_PER_TX',                  None,                      None)
+define_command(TESTOP_SUBCMD_FUNCTEST_PER_RX,                 'TESTOP_SUBCMD_FUNCTEST_PER_RX',                  None,                      None)
+define_command(TESTOP_SUBCMD_FUNCTEST_ADVERTISE,              'TESTOP_SUBCMD_FUNCTEST_ADVERTISE',               None,                      None)
+define_command(TESTOP_SUBCMD_FUNCTEST_RSSI,                   'TESTOP_SUBCMD_FUNCTEST_RSSI',                    None,                      None)
+define_command(TESTOP_SUBCMD_FUNCTEST_XTAL,                   'TESTOP_SUBCMD_FUNCTEST_XTAL',                    None,                      None)
+define_command(TESTOP_SUBCMD_FUNCTEST_PWR_MODE,               'TESTOP_SUBCMD_FUNCTEST_PWR_MODE',                None,                      None)
+define_command(TESTOP_SUBCMD_FUNCTEST_SVLD,                   'TESTOP_SUBCMD_FUNCTEST_SVLD',                    None,                      None)
+define_command(TESTOP_SUBCMD_FUNCTEST_READ_RESULTS,           'TESTOP_SUBCMD_FUNCTEST_READ_RESULTS',            '',                        None)
+
+define_command(TESTOP_SUBCMD_GPIO_CONFIGURE_IO,               'TESTOP_SUBCMD_GPIO_CONFIGURE_IO',                None,                      None)
+define_command(TESTOP_SUBCMD_GPIO_SET_IO,                     'TESTOP_SUBCMD_GPIO_SET_IO',                      None,                      None)
+define_command(TESTOP_SUBCMD_GPIO_READ_DIGITAL_IO,            'TESTOP_SUBCMD_GPIO_READ_DIGITAL_IO',             None,                      None)
+define_command(TESTOP_SUBCMD_GPIO_READ_ANALOG_IO,             'TESTOP_SUBCMD_GPIO_READ_ANALOG_IO',              None,                      None)
+define_command(TESTOP_SUBCMD_GPIO_DISABLE_IO_SET,             'TESTOP_SUBCMD_GPIO_DISABLE_IO_SET',              None,                      None)
+define_command(TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT,       'TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT',        None,                      None)
+define_command(TESTOP_SUBCMD_WRITE_DAC_LTC2633,               'TESTOP_SUBCMD_WRITE_DAC_LTC2633',                None,                      None)
+# The MAX11614EEE reading is big endian, as it comes from the ADC
+define_command(TESTOP_SUBCMD_READ_ADC_MAX11614EEE,            'TESTOP_SUBCMD_READ_ADC_MAX11614EEE',             None,                      '>BH')
+define_command(TESTOP_SUBCMD_RESET_ADC_MAX11614EEE,           'TESTOP_SUBCMD_RESET_ADC_MAX11614EEE',            None,                      None)
+define_command(TESTOP_SUBCMD_UPLOAD_TO_9304,                  'TESTOP_SUBCMD_UPLOAD_TO_9304',                   None,                      None)
+define_command(TESTOP_SUBCMD_RESET_PRODVK,                    'TESTOP_SUBCMD_RESET_PRODVK',                     None,                      None)
+define_command(TESTOP_SUBCMD_READ_CRC,                        'TESTOP_SUBCMD_READ_CRC',                         None,                      None)
+
+define_command(TESTOP_SUBCMD_HCI_EM_SET_PUBLIC_ADDRESS,       'TESTOP_SUBCMD_HCI_EM_SET_PUBLIC_ADDRESS',        '<6B',                     None)
+define_command(TESTOP_SUBCMD_HCI_EM_SET_UART_BAUD_RATE,       'TESTOP_SUBCMD_HCI_EM_SET_UART_BAUD_RATE',        '<B',                      None)
+define_command(TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST,         'TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST',          '<BBBB',                   None)
+define_command(TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST_END,     'TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST_END',      '',                        '<H')
+define_command(TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS,          'TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS',           '<LB',                     None)
+define_command(TESTOP_SUBCMD_HCI_EM_READ_CONTINUE,            'TESTOP_SUBCMD_HCI_EM_READ_CONTINUE',             '<B',                      None)
+define_command(TESTOP_SUBCMD_HCI_EM_WRITE_AT_ADDRESS,         'TESTOP_SUBCMD_HCI_EM_WRITE_AT_ADDRESS',          '<L',                      None)
+define_command(TESTOP_SUBCMD_HCI_EM_WRITE_CONTINUE,           'TESTOP_SUBCMD_HCI_EM_WRITE_CONTINUE',            '',                        None)
+define_command(TESTOP_SUBCMD_HCI_EM_SET_POWER_MODE_EX,        'TESTOP_SUBCMD_HCI_EM_SET_POWER_MODE_EX',         '<B',                      None)
+define_command(TESTOP_SUBCMD_HCI_EM_SET_RF_ACTIVITY_SIGNAL_EX,'TESTOP_SUBCMD_HCI_EM_SET_RF_ACTIVITY_SIGNAL_EX', '<BB',                     None)
+define_command(TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL_EX,    'TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL_EX',     '<B',                      '<B')
+define_command(TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_START,        'TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_START',         '',                        None)
+define_command(TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_CONTINUE,     'TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_CONTINUE',      '',                        None)
+define_command(TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_ABORT,        'TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_ABORT',         '',                        None)
+define_command(TESTOP_SUBCMD_HCI_EM_SET_CLOCK_SOURCE,         'TESTOP_SUBCMD_HCI_EM_SET_CLOCK_SOURCE',          '<B',                      None)
+define_command(TESTOP_SUBCMD_HCI_EM_SET_MEMORY_MODE,          'TESTOP_SUBCMD_HCI_EM_SET_MEMORY_MODE',           '<B',                      None)
+define_command(TESTOP_SUBCMD_HCI_EM_GET_MEMORY_USAGE,         'TESTOP_SUBCMD_HCI_EM_GET_MEMORY_USAGE',          '',                        '<LLLL')
+define_command(TESTOP_SUBCMD_HCI_EM_SET_SLEEP_OPTIONS,        'TESTOP_SUBCMD_HCI_EM_SET_SLEEP_OPTIONS',         '<B',                      None)
+define_command(TESTOP_SUBCMD_HCI_EM_SVLD_MEASUREMENT,         'TESTOP_SUBCMD_HCI_EM_SVLD_MEASUREMENT',          '',                        '<BB')
+define_command(TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK,           'TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK',            '<L',                      None)
+define_command(TESTOP_SUBCMD_HCI_EM_CPU_RESET,                'TESTOP_SUBCMD_HCI_EM_CPU_RESET',                 '',                        None)
+define_command(TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX,       'TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX',        '<LL',                     '<L')
+define_command(TESTOP_SUBCMD_HCI_EM_PATCH_QUERY,              'TESTOP_SUBCMD_HCI_EM_PATCH_QUERY',               '<H',                      '<HHLLLLHHBBBB')
+
+define_command(TESTOP_SUBCMD_HCI_PROTEST_SLEEP,               'TESTOP_SUBCMD_HCI_PROTEST_SLEEP',                '',                        None)
+define_command(TESTOP_SUBCMD_HCI_PROTEST_ACTIVE,              'TESTOP_SUBCMD_HCI_PROTEST_ACTIVE',               '',                        None)
+define_command(TESTOP_SUBCMD_HCI_PROTEST_TXSTART,             'TESTOP_SUBCMD_HCI_PROTEST_TXSTART',              '',                        None)
+define_command(TESTOP_SUBCMD_HCI_PROTEST_TXSTOP,              'TESTOP_SUBCMD_HCI_PROTEST_TXSTOP',               '',                        None)
+define_command(TESTOP_SUBCMD_HCI_PROTEST_RXSTART,             'TESTOP_SUBCMD_HCI_PROTEST_RXSTART',              '',                        None)
+define_command(TESTOP_SUBCMD_HCI_PROTEST_RXSTOP,              'TESTOP_SUBCMD_HCI_PROTEST_RXSTOP',               '',                        None)
+define_command(TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_ENABLE,      'TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_ENABLE',       '<B',                      None)
+define_command(TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_DISABLE,     'TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_DISABLE',      '',                        None)
+define_command(TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_ENABLE,      'TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_ENABLE',       '',                        None)
+define_command(TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_DISABLE,     'TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_DISABLE',      '',                        None)
+define_command(TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD,            'TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD',             '',                        '<B')
+define_command(TESTOP_SUBCMD_HCI_PROTEST_SET_GPIO,            'TESTOP_SUBCMD_HCI_PROTEST_SET_GPIO',             '<LLLL',                   None)
+
+
+# ==========================================================================
+#   Query cache (see ProDVKSession.query_cache)
+#
+#   CACHED_COMMANDS are the read commands whose answer only changes when
+#   one of CACHE_INVALIDATING_COMMANDS is sent: a successful response to
+#   them is kept and replayed for the same command and arguments.
+#   CACHE_INVALIDATING_COMMANDS reset or reload the devices or the board,
+#   or change what the cached commands report.
+#
+#   The board cannot tell when a fixture swaps the DUT: the cache is also
+#   emptied by generate_test_header() (the start of the test of a DUT),
+#   and scripts that change the DUT otherwise must call
+#   invalidate_query_cache().
+# ==========================================================================
+CACHED_COMMANDS = set([
+    TESTOP_SUBCMD_READ_PRODVK_FW_VER,
+    TESTOP_SUBCMD_READ_PRODVK_SN,
+    TESTOP_SUBCMD_READ_DUT_VER,
+    TESTOP_SUBCMD_READ_REF_VER,
+    TESTOP_SUBCMD_HCI_READ_9304_VER,
+    TESTOP_SUBCMD_HCI_READ_BD_ADDR,
+    TESTOP_SUBCMD_HCI_EM_GET_MEMORY_USAGE,
+    TESTOP_SUBCMD_HCI_EM_PATCH_QUERY,
+])
+
+CACHE_INVALIDATING_COMMANDS = set([
+    TESTOP_SUBCMD_MODESWITCH_TO_BRIDGE,
+    TESTOP_SUBCMD_RESET_9304,
+    TESTOP_SUBCMD_HCI_RESET,
+    TESTOP_SUBCMD_UPLOAD_TO_9304,
+    TESTOP_SUBCMD_RESET_PRODVK,
+    TESTOP_SUBCMD_HCI_EM_SET_PUBLIC_ADDRESS,
+    TESTOP_SUBCMD_HCI_EM_WRITE_AT_ADDRESS,
+    TESTOP_SUBCMD_HCI_EM_WRITE_CONTINUE,
+    TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_START,
+    TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_CONTINUE,
+    TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_ABORT,
+    TESTOP_SUBCMD_HCI_EM_SET_MEMORY_MODE,
+    TESTOP_SUBCMD_HCI_EM_CPU_RESET,
+])
+
+
+# ==========================================================================
+#   Shadow configuration (see ProDVKSession.shadow_config)
+#
+#   SHADOWED_COMMANDS maps the setters to the setting they configure, per
+#   slot.  A setter is not sent again while the setting is known to hold
+#   the same command and arguments.  Setters that act on the same state
+#   share a setting (the three current range commands, the GPIO commands,
+#   the sleep/active commands and the power mode), so any one of them
+#   replaces what is known.
+#
+#   SHADOW_INVALIDATING_COMMANDS leave the configuration unknown: resets,
+#   mode switches, firmware upload, and the tests and measurements the
+#   board firmware runs with its own settings.  So does any failed
+#   command, and generate_test_header() (a new test may run on another
+#   DUT).  Scripts that swap or power cycle the DUT otherwise must call
+#   invalidate_shadow_config().
+# ==========================================================================
+SHADOWED_COMMANDS = {
+    TESTOP_SUBCMD_SET_CURRENT_RANGE_1:              'current_range',
+    TESTOP_SUBCMD_SET_CURRENT_RANGE_2:              'current_range',
+    TESTOP_SUBCMD_SET_CURRENT_RANGE_3:              'current_range',
+    TESTOP_SUBCMD_SET_REF_CLOCK:                    'ref_clock',
+    TESTOP_SUBCMD_SET_MUX_STATE:                    'mux_state',
+    TESTOP_SUBCMD_GPIO_CONFIGURE_IO:                'gpio',
+    TESTOP_SUBCMD_GPIO_SET_IO:                      'gpio',
+    TESTOP_SUBCMD_GPIO_DISABLE_IO_SET:              'gpio',
+    TESTOP_SUBCMD_WRITE_DAC_LTC2633:                'dac',
+    TESTOP_SUBCMD_HCI_EM_SET_PUBLIC_ADDRESS:        'public_address',
+    TESTOP_SUBCMD_HCI_EM_SET_POWER_MODE_EX:         'power_mode',
+    TESTOP_SUBCMD_HCI_PROTEST_SLEEP:                'power_mode',
+    TESTOP_SUBCMD_HCI_PROTEST_ACTIVE:               'power_mode',
+    TESTOP_SUBCMD_HCI_EM_SET_RF_ACTIVITY_SIGNAL_EX: 'rf_activity_signal',
+    TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL_EX:     'rf_power_level',
+    TESTOP_SUBCMD_HCI_EM_SET_CLOCK_SOURCE:          'clock_source',
+    TESTOP_SUBCMD_HCI_EM_SET_MEMORY_MODE:           'memory_mode',
+    TESTOP_SUBCMD_HCI_EM_SET_SLEEP_OPTIONS:         'sleep_options',
+    TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK:            'event_mask',
+    TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_ENABLE:       'hf_xtal',
+    TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_DISABLE:      'hf_xtal',
+    TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_ENABLE:       'lf_xtal',
+    TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_DISABLE:      'lf_xtal',
+    TESTOP_SUBCMD_HCI_PROTEST_SET_GPIO:             'protest_gpio',
+}
+
+SHADOW_INVALIDATING_COMMANDS = set([
+    TESTOP_SUBCMD_READ_CURRENT,
+    TESTOP_SUBCMD_MODESWITCH_TO_TESTOP,
+    TESTOP_SUBCMD_MODESWITCH_TO_BRIDGE,
+    TESTOP_SUBCMD_RESET_9304,
+    TESTOP_SUBCMD_EXEC_XTALVALIDATION,
+    TESTOP_SUBCMD_EXEC_CALIBRATION,
+    TESTOP_SUBCMD_HCI_RESET,
+    TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP,
+    TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE,
+    TESTOP_SUBCMD_FUNCTEST_CURRENT_RX,
+    TESTOP_SUBCMD_FUNCTEST_CURRENT_TX,
+    TESTOP_SUBCMD_FUNCTEST_PER_TX,
+    TESTOP_SUBCMD_FUNCTEST_PER_RX,
+    TESTOP_SUBCMD_FUNCTEST_ADVERTISE,
+    TESTOP_SUBCMD_FUNCTEST_RSSI,
+    TESTOP_SUBCMD_FUNCTEST_XTAL,
+    TESTOP_SUBCMD_FUNCTEST_PWR_MODE,
+    TESTOP_SUBCMD_FUNCTEST_SVLD,
+    TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT,
+    TESTOP_SUBCMD_RESET_ADC_MAX11614EEE,
+    TESTOP_SUBCMD_UPLOAD_TO_9304,
+    TESTOP_SUBCMD_RESET_PRODVK,
+    TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_START,
+    TESTOP_SUBCMD_HCI_EM_CPU_RESET,
+])
+
+
+# ==========================================================================
+#   Layouts of the FUNCTEST_READ_RESULTS detail, by the test in byte 0
+#   The PER packet counts are big endian.
+#   The triggered current layout depends on the number of measurements
+#   (byte 1), so there is one struct per count.
+# ==========================================================================
+FUNCTEST_RESULT_CURRENT  = struct.Struct('<4xB3xl')
+FUNCTEST_RESULT_PER      = struct.Struct('>xLL')
+FUNCTEST_RESULT_RSSI     = struct.Struct('<Lllll')
+FUNCTEST_RESULT_XTAL     = struct.Struct('<4xLL')
+FUNCTEST_RESULT_PWR_MODE = struct.Struct('<xB8s')
+FUNCTEST_RESULT_TRIGGERED_CURRENT = [struct.Struct('<xB%dB%dx%dl' % (count, 10 - count, count)) for count in range(11)]
+
+# Set in byte 0 of the READ_RESULTS detail while the test is running
+FUNCTEST_BUSY = 0x80
+
+# Expected run time (seconds) of each functional test.  run_functest()
+# waits this long before the first READ_RESULTS; after that every
+# session uses the time the test actually took.
+FUNCTEST_EXPECTED_DURATION = {
+    TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP:    0.1,
+    TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE:   0.1,
+    TESTOP_SUBCMD_FUNCTEST_CURRENT_RX:       0.1,
+    TESTOP_SUBCMD_FUNCTEST_CURRENT_TX:       0.1,
+    TESTOP_SUBCMD_FUNCTEST_PER_TX:           1.0,
+    TESTOP_SUBCMD_FUNCTEST_PER_RX:           1.0,
+    TESTOP_SUBCMD_FUNCTEST_ADVERTISE:        1.0,
+    TESTOP_SUBCMD_FUNCTEST_RSSI:             1.0,
+    TESTOP_SUBCMD_FUNCTEST_XTAL:             0.2,
+    TESTOP_SUBCMD_FUNCTEST_PWR_MODE:         0.05,
+    TESTOP_SUBCMD_FUNCTEST_SVLD:             0.05,
+    TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT: 0.1,
+}
+# Longest wait between two READ_RESULTS polls (seconds)
+FUNCTEST_MAX_POLL_INTERVAL = 0.25
+
+
+
+# ==========================================================================
+#   A command submitted through a CommandPipeline
+#   result() blocks until the response for this command has been received
+#   and returns the error code, just like send_command_with_args().
+# ==========================================================================
+class PipelinedCommand(object):
+
+    def __init__(self, pipeline, subcmd, seqNum):
+        self.pipeline = pipeline
+        self.subcmd   = subcmd
+        self.seqNum   = seqNum
+        self.errcode  = None
+        self.response = None
+        # Result record parsed from the response (None if none)
+        self.record   = None
+
+    def done(self):
+        return self.errcode is not None
+
+    def result(self):
+        if self.errcode is None:
+            self.pipeline.wait(self)
+        return self.errcode
+
+
+# ==========================================================================
+#   Pipelined command submission
+#   Keeps up to 'depth' commands in flight and matches the responses to
+#   their commands by the sequence number byte of the response.  Because
+#   at most 255 commands are ever in flight, a one byte sequence number that
+#   wraps around from 255 to 0 is always unique among them.
+#
+#   Used as a context manager, every send_command_* helper issued inside the
+#   block is queued on the pipeline and returns a PipelinedCommand:
+#
+#       with CommandPipeline(depth = 8) as pipeline:
+#           adv  = send_command_le_set_Advertising_parameters(SLOT_DUT)
+#           scan = send_command_le_set_Scan_Parameters(SLOT_REF)
+#       if adv.result() or scan.result():
+#           ...
+#
+#   All outstanding responses are collected when the block exits.
+#   The pipeline applies to the default session unless another
+#   ProDVKSession is given.
+# ==========================================================================
+class CommandPipeline(object):
+
+    def __init__(self, depth = 8, session = None):
+        if depth < 1 or depth > 255:
+            raise ValueError('Pipeline depth must be between 1 and 255')
+        self.depth = depth
+        self.session = session if session is not None else _default_session
+        # Outstanding commands, keyed by sequence number (in send order)
+        self.in_flight = {}
+        self._previous = None
+        self._lock = self.session._lock
+
+    def __enter__(self):
+        self._previous = self.session.command_pipeline
+        self.session.command_pipeline = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.session.command_pipeline = self._previous
+        self.flush()
+        return False
+
+    # Send a command without waiting for its response
+    def submit(self, subcmd, devSlot, argcnt, argvect):
+        session = self.session
+
+        with self._lock:
+            # Make room in the window first
+            while len(self.in_flight) >= self.depth:
+                self._receive_one()
+
+            session.forget_state(subcmd, devSlot)
+            seqNum = session.next_seq_num()
+            command = PipelinedCommand(self, subcmd, seqNum)
+
+            command_buf = encode_command_frame(subcmd, devSlot, seqNum, argcnt, argvect, session._frame)
+            if command_buf is None:
+                logger.warning('Command failed.  Invalid number of arguments= ' + str(argcnt))
+                session.test_error_count = session.test_error_count + 1
+                command.errcode = TESTOP_ERRCODE_BAD_PARAMS
+                return command
+
+            if session.transport.write(command_buf) <= 0:
+                command.errcode = TESTOP_ERRCODE_BAD_PARAMS
+                return command
+
+            self.in_flight[seqNum] = command
+            return command
+
+    # Block until the response to 'command' has been received
+    def wait(self, command):
+        with self._lock:
+            while command.errcode is None:
+                self._receive_one()
+        return command.errcode
+
+    # Block until every outstanding command has completed
+    def flush(self):
+        with self._lock:
+            while self.in_flight:
+                self._receive_one()
+        return
+
+    def _receive_one(self):
+        response = self.session.read_response()
+        if response[TESTOP_RESP_IDX_CMD] != COMMAND_TESTOP:
+            # Spontaneous packet, already logged by read_response()
+            return
+
+        seqNum = response[TESTOP_RESP_IDX_SEQNUM]
+        command = self.in_flight.pop(seqNum, None)
+        if command is None:
+            logger.warning("Response does not match any command in flight.  SeqNum=" + str(seqNum))
+            logger.warning("Response=" + convert_array_to_hex(response, len(response)))
+            return
+
+        command.response = response
+        command.errcode  = self.session.parse_response_checked(command.subcmd, response, seqNum)
+        command.record   = self.session.last_result
+        return
+
+
+# ==========================================================================
+#   Records the commands issued by the send_command_* helpers instead of
+#   sending them.  Used to reuse the helpers' argument packing for other
+#   ways of issuing commands (see aio.AsyncProDVK).
+#
+#       with CommandRecorder() as recorder:
+#           send_command_le_receiver_test(SLOT_DUT, 19)
+#       recorder.commands  ->  [(subcmd, devSlot, argcnt, argvect)]
 # ==========================================================================
-def generate_test_fw_version_log():
-    # Query the FW Versions for all the main components
-    send_command(TESTOP_SUBCMD_READ_DUT_VER, SLOT_NA)
-    dut_fw_version = get_last_dut_ver_string()
-    send_command(TESTOP_SUBCMD_READ_REF_VER, SLOT_NA)
-    ref_fw_version = get_last_ref_ver_string()
-    send_command_read_board_ver()
-    board_fw_version = get_last_board_ver_string()
-
-    logging.basicConfig(level=logging.INFO)
-    old_level = logger.getEffectiveLevel()
-    # Force the log level to INFO so we get this logged even if level is set to just the WARNING level
-    logger.setLevel(logging.INFO)
+class CommandRecorder(object):
 
-    logger.info('Board FW Version=' + board_fw_version + '  DUT FW Version=' + dut_fw_version + '  REF FW Version=' + ref_fw_version)
+    def __init__(self, session = None):
+        self.session = session if session is not None else _default_session
+        self.commands = []
+        self._previous = None
 
-    logger.setLevel(old_level)
-    return
+    def __enter__(self):
+        self._previous = self.session.command_pipeline
+        self.session.command_pipeline = self
+        return self
 
+    def __exit__(self, exc_type, exc_value, tb):
+        self.session.command_pipeline = self._previous
+        return False
 
-# ==========================================================================
-#   Helper function to log a string to the log file at INFO level even
-#    if current level is WARNING
-# ==========================================================================
-def log_string( log_message ):
-    old_level = logger.getEffectiveLevel()
-    logger.setLevel(logging.INFO)
-    logger.info(log_message)
-    logger.setLevel(level=old_level)
-    return
+    def submit(self, subcmd, devSlot, argcnt, argvect):
+        # Keep a copy, the helpers may reuse their argument buffers
+        if argcnt > 0:
+            argvect = argvect[:argcnt]
+        self.commands.append((subcmd, devSlot, argcnt, argvect))
+        return TESTOP_ERRCODE_SUCCESS
 
 
 # ==========================================================================
-#   Perform hard reset on the EM9304 devices (DUT and REF)
+#  Parse the response from TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP
+#  Return Parameters:
+#    Formatted string suitable for logging
+#  Return global:
+#    int
 # ==========================================================================
-def reset_em_devices_hard():
-    send_command_hard_reset(  SLOT_DUT )
-    send_command_hard_reset(  SLOT_REF )
-    return
-
+def parse_func_test_response(response):
 
-# ==========================================================================
-#   Perform soft reset on the EM9304 devices (DUT and REF)
-# ==========================================================================
-def reset_em_devices():
-    send_command_soft_reset( SLOT_DUT )
-    send_command_soft_reset( SLOT_REF )
-    return
+    return TextResult(response)
 
 
 # ==========================================================================
-#     Switch To TestOp Mode
+#   Parse the status packet into formated string
+#   See structure definition TESTOP_Status_Packet_s in command_if.h
 # ==========================================================================
-def switch_to_testop_mode():
-    logger.info("Switch to TestOp Mode")
-    send_command(TESTOP_SUBCMD_MODESWITCH_TO_TESTOP, devSlot)
-    return
+def parse_status(statusDetail):
 
+    # Extract the device states and the command counts for the DUT and REF
+    dut_busy, ref_busy, dut_cmd_cnt, ref_cmd_cnt = decode_response(TESTOP_SUBCMD_READ_STATUS, statusDetail)
 
-# ==========================================================================
-#   Switch Bridge Mode
-# ==========================================================================
-def switch_to_bridge_mode():
-    logger.info("Switch to Bridge Mode")
-    send_command(TESTOP_SUBCMD_MODESWITCH_TO_BRIDGE, devSlot)
-    return
+    # Format the device state info
+    if dut_busy == 0:
+        dut_state = "IDLE"
+    else:
+        dut_state = "BUSY"
 
+    if ref_busy == 0:
+        ref_state = "IDLE"
+    else:
+        ref_state = "BUSY"
 
-# ==========================================================================
-#   Convert a string of bytes to printable ASCII string
-# ==========================================================================
-def convert_bytes_to_string(bytes):
-    string1 = "".join([chr(c) for c in bytes])
-    string2 = string1.partition('\0')[0]
-    return string2
+    return StatusResult(dut_state, ref_state, dut_cmd_cnt, ref_cmd_cnt)
 
 
 # ==========================================================================
-#   Send command to the DVK board and fetch the result
-#     Version with no args (other than devSlot)
+#   Parse the read_results result
+#
 # ==========================================================================
-def send_command(subcmd, devSlot):
-    return send_command_with_args(subcmd, devSlot, 0, 0)
+def parse_gpio_read_analog_response(response):
+    return GpioReadResult('Analog', convert_bytes_to_string(response))
 
 
 # ==========================================================================
-#   Send command to the DVK board and fetch the result
-#     Version with 1 arg (other than devSlot)
+#   Parse the read_adc_max11614eee result
+#
 # ==========================================================================
-def send_command_1argbyte(subcmd, devSlot, argval):
-    argvect = [argval]
-    return send_command_with_args(subcmd, devSlot, 1, argvect)
+def parse_read_adc_max11614eee_response(response):
 
+    channel, intval = decode_response(TESTOP_SUBCMD_READ_ADC_MAX11614EEE, response)
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Version with 1 short-word arg (int16) (other than devSlot)
-# ==========================================================================
-def send_command_1argshort(subcmd, devSlot, argval1):
-    # Use the '<' modifier to force little endian packing
-    argvect = struct.pack('<H', argval1)
-    return send_command_with_args(subcmd, devSlot, 2, argvect)
+    return AdcVoltageResult(channel, intval)
 
 
 # ==========================================================================
-#   Send command to the DVK board and fetch the result
-#     Version with 1 long-word arg (other than devSlot)
+#   Transport layer
+#   All traffic to and from the board goes through a transport object with
+#   write()/read()/close().  UsbTransport talks to a real board via pyusb;
+#   emulator.ProDVKEmulator is an in-process loopback board.
 # ==========================================================================
-def send_command_1argword(subcmd, devSlot, argval1):
-    # Use the '<' modifier to force little endian packing
-    argvect = struct.pack('<L', argval1)
-    return send_command_with_args(subcmd, devSlot, 4, argvect)
-
+class ProDVKTransportError(IOError):
+    pass
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#     Version with 2 long-word args (other than devSlot)
-# ==========================================================================
-def send_command_2argwords(subcmd, devSlot, argval1, argval2):
-    # Use the '<' modifier to force little endian packing
-    argvect = struct.pack('<LL', argval1, argval2)
-    return send_command_with_args(subcmd, devSlot, 8, argvect)
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#     Version with 2 byte-wide args (other than devSlot)
-# ==========================================================================
-def send_command_2argbytes(subcmd, devSlot, argval1, argval2):
-    argvect = struct.pack('BB', argval1, argval2)
-    return send_command_with_args(subcmd, devSlot, 2, argvect)
+# Raised when no packet (or no response to a command) arrives in time.
+# subcmd and timeout (ms) are set when it is about a command.
+class ProDVKTimeoutError(ProDVKTransportError):
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#     Version with 3 byte-wide args (other than devSlot)
-# ==========================================================================
-def send_command_3argbytes(subcmd, devSlot, argval1, argval2, argval3):
-    argvect = struct.pack('BBB', argval1, argval2, argval3)
-    return send_command_with_args(subcmd, devSlot, 3, argvect)
+    def __init__(self, message, subcmd = None, timeout = None):
+        ProDVKTransportError.__init__(self, message)
+        self.subcmd  = subcmd
+        self.timeout = timeout
 
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#     Version with 4 byte-wide args (other than devSlot)
-# ==========================================================================
-def send_command_4argbytes(subcmd, devSlot, argval1, argval2, argval3, argval4):
-    argvect = struct.pack('BBBB', argval1, argval2, argval3, argval4)
-    return send_command_with_args(subcmd, devSlot, 4, argvect)
+# Raised by ProDVKSession.query() when the board answers with an error code
+class ProDVKCommandError(Exception):
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#     Version with 5 byte-wide args (other than devSlot)
-# ==========================================================================
-def send_command_5argbytes(subcmd, devSlot, argval1, argval2, argval3, argval4, argval5):
-    argvect = struct.pack('BBBBB', argval1, argval2, argval3, argval4, argval5)
-    return send_command_with_args(subcmd, devSlot, 5, argvect)
+    def __init__(self, subcmd, errcode):
+        Exception.__init__(self, 'Command ' + convert_subcmd_to_string(subcmd) + ' failed.  ErrorCode = ' +
+                           str(errcode) + '  ' + convert_errcode_to_string(errcode))
+        self.subcmd  = subcmd
+        self.errcode = errcode
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#     Version with 6 byte-wide args (other than devSlot)
-# ==========================================================================
-def send_command_6argbytes(subcmd, devSlot, argval1, argval2, argval3, argval4, argval5, argval6):
-    argvect = struct.pack('BBBBBB', argval1, argval2, argval3, argval4, argval5, argval6)
-    return send_command_with_args(subcmd, devSlot, 6, argvect)
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#     Version with 7 byte-wide args (other than devSlot)
-# ==========================================================================
-def send_command_7argbytes(subcmd, devSlot, argval1, argval2, argval3, argval4, argval5, argval6, argval7):
-    argvect = struct.pack('BBBBBBB', argval1, argval2, argval3, argval4, argval5, argval6, argval7)
-    return send_command_with_args(subcmd, devSlot, 7, argvect)
+# Raised by ProDVKSession.run_functest() when the test is still busy
+# after the timeout
+class ProDVKFunctestTimeout(Exception):
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#     Version with 2 long-word args (other than devSlot)
-# ==========================================================================
-def send_command_2argwordbyte(subcmd, devSlot, argval1, argval2):
-    argvect = struct.pack('LB', argval1, argval2)
-    return send_command_with_args(subcmd, devSlot, 5, argvect)
+    def __init__(self, subcmd, timeout):
+        Exception.__init__(self, 'Functional test ' + convert_subcmd_to_string(subcmd) +
+                           ' still busy after ' + str(timeout) + ' s')
+        self.subcmd  = subcmd
+        self.timeout = timeout
 
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX
-# ==========================================================================
-def send_command_em_calculate_crc32(dev_slot = SLOT_DUT, start_address = 0x2000, end_address=0x3000):
-    return send_command_2argwords(TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX, dev_slot, start_address, end_address)
+class ProDVKTransport(object):
+    # Descriptor strings reported by connect_to_device()
+    product_name  = ''
+    serial_number = ''
 
+    # Write one command frame.  Returns the number of bytes written.
+    def write(self, data):
+        raise NotImplementedError
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_CPU_RESET
-# ==========================================================================
-def send_command_em_cpu_reset(dev_slot = SLOT_DUT):
-    return send_command( TESTOP_SUBCMD_HCI_EM_CPU_RESET, dev_slot)
+    # Read one packet of up to 'size' bytes, waiting at most 'timeout' ms.
+    # Raises ProDVKTransportError if no packet arrives in time.
+    def read(self, size = DVK_USB_EP_SIZE, timeout = DVK_USB_TIMEOUT):
+        raise NotImplementedError
 
+    def close(self):
+        return
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_END_LE_TEST
-# ==========================================================================
-def send_command_end_le_test(dev_slot = SLOT_DUT):
-    return send_command( TESTOP_SUBCMD_HCI_LE_TEST_END, dev_slot)
 
 # ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_LE_TEST_END
-#     Alias for send_command_end_le_test() with more symmetry to the name
-#          send_command_em_transmitter_test_end
-#          send_command_le_test_end
+#   USB/HID transport for a physical Production Test Board
 # ==========================================================================
-def send_command_le_test_end(dev_slot = SLOT_DUT):
-    return send_command( TESTOP_SUBCMD_HCI_LE_TEST_END, dev_slot)
+class UsbTransport(ProDVKTransport):
 
+    def __init__(self, device):
+        self.device = device
+        self.product_name  = usb.util.get_string(device, DVK_USB_PRODUCT_NAME_STRING_DESCRIPTOR_INDEX)
+        self.serial_number = usb.util.get_string(device, DVK_USB_SERIAL_NUM_STRING_DESCRIPTOR_INDEX)
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_GET_MEMORY_USAGE
-# ==========================================================================
-def send_command_em_get_memory_usage(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_HCI_EM_GET_MEMORY_USAGE, dev_slot)
+    # Find a board by serial number (any board if serial_num is None or "")
+    # Returns None if no matching board is attached.
+    @classmethod
+    def find(cls, serial_num = None):
+        if usb is None:
+            raise ProDVKTransportError('pyusb is not installed')
 
+        if serial_num is None or serial_num == "":
+            # Don't bother with the serial number match
+            device = usb.core.find(idVendor=DVK_USB_VID, idProduct=DVK_USB_PID)
+        else:
+            device = usb.core.find(idVendor=DVK_USB_VID, idProduct=DVK_USB_PID,
+                custom_match=lambda d: d.serial_number == serial_num)
+
+        if device is None:
+            return None
+        return cls(device)
+
+    # Enumerate every attached board in one pass of the bus.
+    # Returns the pyusb devices; UsbTransport(device) reads the descriptors.
+    @classmethod
+    def find_all_devices(cls):
+        if usb is None:
+            raise ProDVKTransportError('pyusb is not installed')
+        return list(usb.core.find(find_all=True, idVendor=DVK_USB_VID, idProduct=DVK_USB_PID))
+
+    def write(self, data):
+        try:
+            return self.device.write(DVK_USB_WRITE_EP, data)
+        except usb.core.USBError as ex:
+            raise ProDVKTransportError(str(ex))
+
+    def read(self, size = DVK_USB_EP_SIZE, timeout = DVK_USB_TIMEOUT):
+        try:
+            return self.device.read(DVK_USB_READ_EP, size, timeout)
+        except usb.core.USBError as ex:
+            # USBTimeoutError only exists from pyusb 1.1 on
+            if isinstance(ex, getattr(usb.core, 'USBTimeoutError', ())) or ex.errno == errno.ETIMEDOUT:
+                raise ProDVKTimeoutError(str(ex))
+            raise ProDVKTransportError(str(ex))
+
+    def close(self):
+        usb.util.dispose_resources(self.device)
+        return
+
+
+# ==========================================================================
+#   Response timeouts and retries
+#
+#   The time to wait for the response to a command is learned per subcmd:
+#   once TIMEOUT_MIN_SAMPLES responses were timed it is TIMEOUT_MARGIN
+#   times the TIMEOUT_PERCENTILE of the last TIMEOUT_HISTORY latencies,
+#   kept between TIMEOUT_FLOOR and DVK_USB_TIMEOUT (ms).  Until then it is
+#   DVK_USB_TIMEOUT.
+#
+#   When the learned timeout expires, a RETRYABLE_COMMANDS command is sent
+#   again (up to 'retries' times) after the stale packets were drained.
+#   Any other command keeps waiting up to DVK_USB_TIMEOUT, as it would
+#   not be safe to run it twice.
+# ==========================================================================
+TIMEOUT_HISTORY     = 64
+TIMEOUT_MIN_SAMPLES = 16
+TIMEOUT_PERCENTILE  = 0.99
+TIMEOUT_MARGIN      = 3.0
+TIMEOUT_FLOOR       = 20
+# Time to wait for more stale packets when resynchronizing (ms)
+RESYNC_DRAIN_TIMEOUT = 2
+
+# Commands that do the same when run twice: reads and setters
+RETRYABLE_COMMANDS = CACHED_COMMANDS | set(SHADOWED_COMMANDS) | set([
+    TESTOP_SUBCMD_READ_STATUS,
+    TESTOP_SUBCMD_READ_CURRENT,
+    TESTOP_SUBCMD_READ_ADC,
+    TESTOP_SUBCMD_READ_CRC,
+    TESTOP_SUBCMD_GPIO_READ_DIGITAL_IO,
+    TESTOP_SUBCMD_GPIO_READ_ANALOG_IO,
+    TESTOP_SUBCMD_READ_ADC_MAX11614EEE,
+    TESTOP_SUBCMD_HCI_EM_SVLD_MEASUREMENT,
+    TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX,
+    TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD,
+])
+
+
+class TimeoutPolicy(object):
+
+    def __init__(self, retries = 2):
+        self.retries = retries
+        # subcmd -> recent latencies (s)
+        self.latencies = {}
+        # subcmd -> learned timeout (ms)
+        self.timeouts  = {}
+        # subcmd -> latencies observed since the timeout was last learned
+        self._pending  = {}
+
+    def timeout(self, subcmd):
+        return self.timeouts.get(subcmd, DVK_USB_TIMEOUT)
+
+    def observe(self, subcmd, seconds):
+        latencies = self.latencies.get(subcmd)
+        if latencies is None:
+            latencies = self.latencies[subcmd] = deque(maxlen=TIMEOUT_HISTORY)
+        latencies.append(seconds)
+        # Sort only every few samples
+        pending = self._pending.get(subcmd, 0) + 1
+        self._pending[subcmd] = pending
+        if pending >= 8 and len(latencies) >= TIMEOUT_MIN_SAMPLES:
+            self._pending[subcmd] = 0
+            ordered = sorted(latencies)
+            percentile = ordered[min(len(ordered) - 1, int(len(ordered) * TIMEOUT_PERCENTILE))]
+            self.timeouts[subcmd] = int(min(DVK_USB_TIMEOUT, max(TIMEOUT_FLOOR, TIMEOUT_MARGIN * percentile * 1000)))
+        return
+
+    def reset(self):
+        self.latencies.clear()
+        self.timeouts.clear()
+        self._pending.clear()
+        return
+
+
+# ==========================================================================
+#   Background reader
+#   A thread that reads every packet from the board as soon as it arrives.
+#   TESTOP responses are handed to the command waiting for their sequence
+#   number; any other packet (an HCI event enabled with
+#   send_command_em_set_event_mask, ...) is put on the queue of every
+#   subscriber, and never delays a response:
+#
+#       with BackgroundReader(session) as reader:
+#           events = reader.subscribe()
+#           session.send_command_em_set_event_mask(SLOT_DUT, 1)
+#           ...
+#           packet = events.get(timeout = 1.0)
+#
+#   While it runs the session waits for its responses on the reader
+#   (read_response(), the stop-and-wait commands and CommandPipeline).
+#   Do not combine it with aio.AsyncProDVK, which reads the board itself.
+#   The reader applies to the default session unless another
+#   ProDVKSession is given.
+# ==========================================================================
+# How long the reader waits for a packet before checking whether it has
+# to stop (ms)
+READER_POLL_TIMEOUT = 50
+# Responses kept for commands not waiting yet (older ones are dropped)
+READER_MAX_RESPONSES = 256
+
+
+class BackgroundReader(object):
+
+    def __init__(self, session = None, poll_timeout = READER_POLL_TIMEOUT):
+        self.session = session if session is not None else _default_session
+        self.poll_timeout = poll_timeout
+        # Responses not yet claimed, by sequence number, in arrival order
+        self.responses = OrderedDict()
+        # (queue, packet_type) of every subscriber
+        self.subscribers = []
+        self.events_received = 0
+        # Events not queued because the subscriber's queue was full
+        self.events_dropped  = 0
+        # Transport error that stopped the reader
+        self.error = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
+        return False
+
+    def start(self):
+        if self.session.reader is not None:
+            raise RuntimeError('The session already has a BackgroundReader')
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='prodvk-reader')
+        self._thread.daemon = True
+        self.session.reader = self
+        self._thread.start()
+        return
+
+    def stop(self):
+        self._stopping = True
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.session.reader is self:
+            self.session.reader = None
+        return
+
+    # Queue receiving the packets that are not TESTOP responses, or only
+    # those whose first byte is 'packet_type'.  Packets that do not fit in
+    # a full queue are dropped (and counted in events_dropped).
+    def subscribe(self, packet_type = None, maxsize = 1024):
+        events = queue.Queue(maxsize)
+        with self._cond:
+            self.subscribers = self.subscribers + [(events, packet_type)]
+        return events
+
+    def unsubscribe(self, events):
+        with self._cond:
+            self.subscribers = [subscriber for subscriber in self.subscribers if subscriber[0] is not events]
+        return
+
+    def _run(self):
+        transport = self.session.transport
+        while not self._stopping:
+            try:
+                packet = transport.read(DVK_USB_EP_SIZE, self.poll_timeout)
+            except ProDVKTimeoutError:
+                continue
+            except ProDVKTransportError as ex:
+                with self._cond:
+                    self.error = ex
+                    self._cond.notify_all()
+                return
+
+            if packet[TESTOP_RESP_IDX_CMD] == COMMAND_TESTOP:
+                with self._cond:
+                    seqNum = packet[TESTOP_RESP_IDX_SEQNUM]
+                    self.responses.pop(seqNum, None)
+                    self.responses[seqNum] = packet
+                    if len(self.responses) > READER_MAX_RESPONSES:
+                        self.responses.popitem(last=False)
+                    self._cond.notify_all()
+                continue
+
+            self.events_received += 1
+            for events, packet_type in self.subscribers:
+                if packet_type is None or packet[0] == packet_type:
+                    try:
+                        events.put_nowait(packet)
+                    except queue.Full:
+                        self.events_dropped += 1
+        return
+
+    def _wait(self, seqNum, deadline):
+        with self._cond:
+            while True:
+                if seqNum is None and self.responses:
+                    return self.responses.popitem(last=False)[1]
+                if seqNum is not None and seqNum in self.responses:
+                    return self.responses.pop(seqNum)
+                if self.error is not None:
+                    raise ProDVKTransportError(str(self.error))
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise ProDVKTimeoutError('Operation timed out')
+                self._cond.wait(remaining)
+
+    # The response with sequence number 'seqNum' to a stop-and-wait
+    # command, waiting until time.perf_counter() 'deadline'.  Raises
+    # ProDVKTimeoutError if it does not arrive in time.
+    # The responses still unclaimed then are late ones, to commands that
+    # were given up or sent again: they are dropped.
+    def wait_response(self, seqNum, deadline):
+        response = self._wait(seqNum, deadline)
+        with self._cond:
+            stale = len(self.responses)
+            self.responses.clear()
+        self.session.stale_responses += stale
+        return response
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Version specifically for TESTOP_SUBCMD_HCI_EM_PATCH_QUERY
-# ==========================================================================
-def send_command_em_patch_query(dev_slot = SLOT_DUT, patch_index = 0):
-    return send_command_1argshort(TESTOP_SUBCMD_HCI_EM_PATCH_QUERY, dev_slot, patch_index)
-
+    # The oldest response not claimed yet, waiting at most 'timeout' ms
+    def next_response(self, timeout = DVK_USB_TIMEOUT):
+        return self._wait(None, time.perf_counter() + timeout / 1000.0)
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_PROTEST_SLEEP
-# ==========================================================================
-def send_command_protest_sleep(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_HCI_PROTEST_SLEEP, dev_slot)
+    # Drop the responses not claimed.  Returns how many were dropped.
+    def drain(self):
+        with self._cond:
+            dropped = len(self.responses)
+            self.responses.clear()
+        return dropped
 
 
 # ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_PROTEST_ACTIVE
-# ==========================================================================
-def send_command_protest_active(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_HCI_PROTEST_ACTIVE, dev_slot)
+#   Fixed capacity ring of triggered current samples
+#
+#   Columns: value (double), channel (uint8) and the sample index, counted
+#   from the last clear().  When the ring is full the oldest samples are
+#   overwritten (and counted in overwritten()).
+#
+#   The columns are numpy arrays if numpy is available (and use_numpy is
+#   not False), array.array otherwise.  They are allocated on the first
+#   append.  segments() returns zero-copy views of the columns in the
+#   order the samples were taken; the views are only valid until the
+#   samples are overwritten.
+# ==========================================================================
+TRIGGERED_CURRENT_CAPACITY = 16384
+
+
+class TriggeredCurrentRing(object):
+
+    def __init__(self, capacity = TRIGGERED_CURRENT_CAPACITY, use_numpy = None):
+        if capacity < 1:
+            raise ValueError('Capacity must be at least 1')
+        self.capacity  = capacity
+        self.use_numpy = numpy is not None and use_numpy is not False
+        self.values    = None
+        self.channels  = None
+        self.indices   = None
+        self.written   = 0
+
+    def _allocate(self):
+        if self.use_numpy:
+            self.values   = numpy.zeros(self.capacity, numpy.float64)
+            self.channels = numpy.zeros(self.capacity, numpy.uint8)
+            self.indices  = numpy.zeros(self.capacity, numpy.uint64)
+        else:
+            self.values   = array.array('d', [0.0]) * self.capacity
+            self.channels = array.array('B', [0]) * self.capacity
+            self.indices  = array.array('Q', [0]) * self.capacity
+        return
+
+    def append(self, channel, value):
+        if self.values is None:
+            self._allocate()
+        slot = self.written % self.capacity
+        self.values[slot]   = value
+        self.channels[slot] = channel
+        self.indices[slot]  = self.written
+        self.written += 1
+        return
+
+    def clear(self):
+        self.written = 0
+        return
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def overwritten(self):
+        return max(0, self.written - self.capacity)
+
+    # Up to two (values, channels, indices) views, oldest samples first
+    def segments(self):
+        count = len(self)
+        if count == 0:
+            return []
+        first = (self.written - count) % self.capacity
+        if self.use_numpy:
+            columns = (self.values, self.channels, self.indices)
+        else:
+            columns = (memoryview(self.values), memoryview(self.channels), memoryview(self.indices))
+        if first + count <= self.capacity:
+            return [tuple(column[first:first + count] for column in columns)]
+        return [tuple(column[first:] for column in columns),
+                tuple(column[:first + count - self.capacity] for column in columns)]
+
+    # The values, oldest first
+    def __iter__(self):
+        for values, channels, indices in self.segments():
+            for value in values:
+                yield float(value)
+
+    def to_list(self):
+        return list(self)
+
+    # The values as one contiguous array (a copy)
+    def to_array(self):
+        segments = [values for values, channels, indices in self.segments()]
+        if self.use_numpy:
+            return numpy.concatenate(segments) if segments else numpy.zeros(0, numpy.float64)
+        result = array.array('d')
+        for values in segments:
+            result.frombytes(values.cast('B'))
+        return result
+
+
+# ==========================================================================
+#   Per-board session
+#   A ProDVKSession owns everything that belongs to one connected board:
+#   the transport, the command sequence number, the test counters and the
+#   results parsed from the responses.  Drive several boards from one
+#   process with one session each:
+#
+#       dut_board = ProDVKSession()
+#       dut_board.connect_to_device(serial_num)
+#       dut_board.send_command_read_current(SLOT_DUT)
+#       current = dut_board.get_last_adc_measurement()
+#
+#   The module level functions of the same names operate on a default
+#   session, so existing test scripts keep working unchanged.
+# ==========================================================================
+class ProDVKSession(object):
+
+    def __init__(self, board_transport = None):
+        # Command sequence number bumped by one each command sent
+        self.cmdSeqNum = 1
+        # Transport used to talk to the board (set by connect_to_device)
+        self.transport = board_transport
+        # The raw pyusb device when connected over USB (None for other transports)
+        self.dev = getattr(board_transport, 'device', None)
+        # Active CommandPipeline or CommandRecorder, None for stop-and-wait operation
+        self.command_pipeline = None
+        # Active BackgroundReader, None if the session reads the transport itself
+        self.reader = None
+        # Last response detail
+        self.lastResponseDetailString = "N/R"
+
+        # Results parsed from the response packets
+        self.last_upload_response=0
+        # Samples of MEASURE_TRIGGERED_CURRENT (see TriggeredCurrentRing)
+        self.triggered_current_values = TriggeredCurrentRing()
+        self.last_PER_value=100
+        self.last_ppm=100000
+        # For the SVLD_MEASUREMENT response
+        self.last_SVLD_power_mode  = 0
+        self.last_SVLD_measurement = 0
+        self.last_Digital_read=-1
+        # For the GET_MEMORY_USAGE response
+        self.last_memusage_memory_pool_size           = 0
+        self.last_memusage_retention_memory_used      = 0
+        self.last_memusage_nonretention_memory_used   = 0
+        self.last_memusage_retention_memory_reserved  = 0
+        # For the CALCULATE_CRC32_EX response
+        self.last_calccrc_crc32                       = 0
+        # For the READ_ADC1, READ_ADC2 and READ_ADC3 response
+        self.last_adc_measurement                     = 0
+        # For READ_PTB_FW_VER response
+        self.last_board_ver_string                    = ''
+        self.last_board_serial_num_string             = ''
+        self.last_dev_ver_string                      = ''
+        self.last_dut_ver_string                      = ''
+        self.last_ref_ver_string                      = ''
+        # For READ_AT_ADDR response
+        self.last_read_mem_string                     = ''
+        # For PATCH_QUERY
+        self.last_patch_container_count  = 0
+        self.last_patch_transfer_count   = 0
+        self.last_patch_system_state     = 0
+        self.last_patch_address          = 0
+        self.last_patch_size             = 0
+        self.last_patch_CRC32            = 0
+        self.last_patch_build_num        = 0
+        self.last_patch_user_build_num   = 0
+        self.last_patch_container_flags  = 0
+        self.last_patch_container_version= 0
+        self.last_patch_container_type   = 0
+        self.last_patch_container_id     = 0
+        # For TESTOP_SUBCMD_HCI_TRANSMITTER_TEST_END
+        self.last_test_number_of_packets = 0
+
+        # For SET_RF_POWER_LEVEL_EX
+        self.last_max_power_level        = 0
+        # For XTAL accuracy test
+        self.last_xtal_dut_tics          = 0
+        self.last_xtal_ref_tics          = 0
+        # For BD Address
+        self.last_BD_address             = 0
+        # For Advertising Report
+        self.last_advertReport_totalReports  = 0
+        self.last_advertReport_minRssi       = 0
+        self.last_advertReport_maxRssi       = 0
+        self.last_advertReport_aveRssi       = 0
+        self.last_advertReport_lastRssi      = 0
+
+        # Overall Test stats
+        self.test_verification_count = 0
+        self.test_error_count = 0
+
+        self.last_is_busy = 0
+        self.read_results_index = 0
+
+        # For the current calibration response
+        self.last_5mA_calibration   = 0
+        self.last_100uA_calibration = 0
+        self.last_1uA_calibration   = 0
+        # For READ_RESULTS
+        self.last_read_results = None
+        # Time the latest run of each functional test took (see run_functest())
+        self.functest_durations = {}
+        # Response timeouts learned per subcmd, and how often commands were
+        # sent again or stale responses dropped (see TimeoutPolicy)
+        self.timeout_policy   = TimeoutPolicy()
+        self.command_retries  = 0
+        self.stale_responses  = 0
+        # Successful responses to CACHED_COMMANDS by (subcmd, frame from
+        # devSlot on), replayed instead of asking the board again.  Emptied
+        # by CACHE_INVALIDATING_COMMANDS, when a board is connected, by
+        # generate_test_header() and by invalidate_query_cache().
+        self.query_cache_enabled = True
+        self.query_cache         = {}
+        self.query_cache_hits    = 0
+        self.query_cache_misses  = 0
+        # Last known configuration: (setting, devSlot) -> (subcmd, frame
+        # from devSlot on, response) of the latest successful setter (see
+        # SHADOWED_COMMANDS).  Setters that would not change it are not sent.
+        self.shadow_config_enabled = True
+        self.shadow_config         = {}
+        self.shadow_skipped        = 0
+        # Setters not sent, by subcmd
+        self.shadow_skipped_commands = {}
+        # Subcmd and result record of the latest response with a parser
+        # (see query())
+        self.last_subcmd = None
+        self.last_result = None
+        # Title of the running test (set by generate_test_header)
+        self.test_title = ''
+        # Called as measurement_sink(kind, value) for every current, PER,
+        # ppm and RSSI value parsed (kind is one of MEASUREMENT_*)
+        self.measurement_sink = None
+
+        # Serializes the command/response exchanges issued from several threads
+        self._lock = threading.RLock()
+        # Every command frame is built in this buffer (under _lock)
+        self._frame = memoryview(bytearray(DVK_USB_EP_SIZE))
+
+    # Forget the cached responses (see CACHED_COMMANDS), e.g. after the
+    # DUT was swapped without a generate_test_header() or a reset
+    def invalidate_query_cache(self):
+        self.query_cache.clear()
+        return
+
+    # Forget the last known configuration (see SHADOWED_COMMANDS), e.g.
+    # after the devices were power cycled
+    def invalidate_shadow_config(self):
+        self.shadow_config.clear()
+        return
+
+    # Forget what 'subcmd' sent to 'devSlot' may change: the cached
+    # responses and the shadow configuration.  Called for every command
+    # sent, whichever way it is sent.
+    def forget_state(self, subcmd, devSlot):
+        if subcmd in CACHE_INVALIDATING_COMMANDS:
+            self.query_cache.clear()
+        if subcmd in SHADOW_INVALIDATING_COMMANDS:
+            self.shadow_config.clear()
+        elif subcmd in SHADOWED_COMMANDS:
+            self.shadow_config.pop((SHADOWED_COMMANDS[subcmd], devSlot), None)
+        return
+
+    # Allocate the sequence number for the next command
+    def next_seq_num(self):
+        with self._lock:
+            self.cmdSeqNum = (self.cmdSeqNum + 1) % 256
+            return self.cmdSeqNum
+
+    # ==========================================================================
+    #     Helper function to return the last calculated CRC32
+    # ==========================================================================
+    def get_last_calccrc_crc32(self):
+        return self.last_calccrc_crc32
+
+    # ==========================================================================
+    #     Helper function to return the last read mem string
+    # ==========================================================================
+    def get_last_read_mem_string(self):
+        return self.last_read_mem_string
+
+    # ==========================================================================
+    #     Helper function to return the last SVLD power mode
+    # ==========================================================================
+    def get_last_SVLD_power_mode(self):
+        return self.last_SVLD_power_mode
+
+    # ==========================================================================
+    #     Helper function to return the last SVLD measured value
+    # ==========================================================================
+    def get_last_SVLD_measurement(self):
+        return self.last_SVLD_measurement
+
+    # ==========================================================================
+    #     Helper function to return the last ADC measurement
+    # ==========================================================================
+    def get_last_adc_measurement(self):
+        return self.last_adc_measurement
+
+    # ==========================================================================
+    #     Helper function to return the last device version string
+    # ==========================================================================
+    def get_last_dev_ver_string(self):
+        return self.last_dev_ver_string
+
+    # ==========================================================================
+    #     Helper function to return the last DUT version string
+    # ==========================================================================
+    def get_last_dut_ver_string(self):
+        return self.last_dut_ver_string
+
+    # ==========================================================================
+    #     Helper function to return the last REF version string
+    # ==========================================================================
+    def get_last_ref_ver_string(self):
+        return self.last_ref_ver_string
+
+    # ==========================================================================
+    #     Helper function to return the last Board FW version string
+    # ==========================================================================
+    def get_last_board_ver_string(self):
+        return self.last_board_ver_string
+
+    # ==========================================================================
+    #     Helper function to return the last max power level
+    # ==========================================================================
+    def get_last_max_power_level(self):
+        return self.last_max_power_level
+
+    # ==========================================================================
+    #     Helper function to return the last Rx/Tx test number_of_packets
+    # ==========================================================================
+    def get_last_test_number_of_packets(self):
+        return self.last_test_number_of_packets
+
+    # ==========================================================================
+    #     Helper function to return the last Rx/Tx test number_of_packets
+    # ==========================================================================
+    def get_last_xtal_dut_tics(self):
+        return self.last_xtal_dut_tics
+
+    # ==========================================================================
+    #     Helper function to return the last Rx/Tx test number_of_packets
+    # ==========================================================================
+    def get_last_xtal_ref_tics(self):
+        return self.last_xtal_ref_tics
+
+    # ==========================================================================
+    #     Helper function to return the BLE Address
+    # ==========================================================================
+    def get_last_BD_address(self):
+        return self.last_BD_address
+
+    # ==========================================================================
+    #     Helper function to return the BLE Address
+    # ==========================================================================
+    def get_last_AdvRpt_totalCount(self):
+        return self.last_advertReport_totalReports
+
+    # ==========================================================================
+    #     Helper function to return the BLE Address
+    # ==========================================================================
+    def get_last_AdvRpt_minRssi(self):
+        return self.last_advertReport_minRssi
+
+    # ==========================================================================
+    #     Helper function to return the BLE Address
+    # ==========================================================================
+    def get_last_AdvRpt_maxRssi(self):
+        return self.last_advertReport_maxRssi
+
+    # ==========================================================================
+    #     Helper function to return all Triggered Current Measurements
+    #     (a list copy of the ring, oldest first)
+    # ==========================================================================
+    def get_Triggered_Current_Values(self):
+        return self.triggered_current_values.to_list()
+
+    def get_Last_Upload_Response(self):
+        return self.last_upload_response
+
+    # ==========================================================================
+    #     Helper function to return the last PER Value
+    # ==========================================================================
+    def get_last_PER_Value(self):
+        return self.last_PER_value
+
+    def get_last_ppm(self):
+        return self.last_ppm
+
+    def get_last_digital_read(self):
+        return self.last_Digital_read
+
+    # ==========================================================================
+    # ==========================================================================
+    def clear_Triggered_Current_Values(self):
+        self.triggered_current_values.clear()
+        return
+
+    # For PATCH_QUERY
+    # ==========================================================================
+    #     Helper functions to return the last values for the em_patch_query command
+    # ==========================================================================
+    def get_last_patch_container_count(self):   return self.last_patch_container_count
+    def get_last_patch_transfer_count(self):    return self.last_patch_transfer_count
+    def get_last_patch_system_state(self):      return self.last_patch_system_state
+    def get_last_patch_address(self):           return self.last_patch_address
+    def get_last_patch_size(self):              return self.last_patch_size
+    def get_last_patch_CRC32(self):             return self.last_patch_CRC32
+    def get_last_patch_build_num(self):         return self.last_patch_build_num
+    def get_last_patch_user_build_num(self):    return self.last_patch_user_build_num
+    def get_last_patch_container_flags(self):   return self.last_patch_container_flags
+    def get_last_patch_container_version(self): return self.last_patch_container_version
+    def get_last_patch_container_type(self):    return self.last_patch_container_type
+    def get_last_patch_container_id(self):      return self.last_patch_container_id
+
+    def get_test_error_count(self):
+        return self.test_error_count
+
+    # ==========================================================================
+    #     Helper function to return the BLE Address
+    # ==========================================================================
+    def get_last_AdvRpt_aveRssi(self):
+        return self.last_advertReport_aveRssi
+
+    # ==========================================================================
+    #     Helper function to return the BLE Address
+    # ==========================================================================
+    def get_last_AdvRpt_lastRssi(self):
+        return self.last_advertReport_lastRssi
+
+    # ==========================================================================
+    #     Helper function to return the IsBusy status
+    # ==========================================================================
+    def get_last_IsBusy(self):
+        return self.last_is_busy
+
+    # ==========================================================================
+    #     Helper function to return the IsBusy status
+    # ==========================================================================
+    def get_read_results(self):
+        return self.last_read_results
+
+    # ==========================================================================
+    #     Helper function to generate a standard test header
+    # ==========================================================================
+    def generate_test_header(self, test_title_arg):
+        # Save the test title for later use in the test summary/footer
+        self.test_title = test_title_arg
+        # A new test may run on another DUT: don't answer its queries with
+        # what the previous one reported, nor skip its setters
+        self.invalidate_query_cache()
+        self.invalidate_shadow_config()
+
+        dt = datetime.now()
+        dtString  = f'{dt:%Y-%m-%d  %H:%M:%S}'
+        logging.basicConfig(level=logging.INFO)
+        old_level = logger.getEffectiveLevel()
+        logger.setLevel(logging.INFO)
+        logger.info("==============> Start Test: " + self.test_title + ":        " + dtString)
+        logger.setLevel(level=old_level)
+
+        return
+
+    # ==========================================================================
+    #     Helper function to generate a test summary
+    # ==========================================================================
+    def generate_test_summary(self):
+        dt = datetime.now()
+        dtString  = f'{dt:%Y-%m-%d  %H:%M:%S}'
+        logging.basicConfig(level=logging.INFO)
+        old_level = logger.getEffectiveLevel()
+        # Force the log level to INFO so we get the "TEST PASSED" even if it is set to just the WARN level
+        logger.setLevel(logging.INFO)
+
+        if self.test_error_count > 0:
+            logger.warning('TEST FAILED: ' + self.test_title + ':  Total Verifications=' + str(self.test_verification_count) +
+                           ' Total Errors= ' + str(self.test_error_count) + '      ' + dtString + '\n\n')
+        else:
+            logger.info(   'TEST PASSED: ' + self.test_title + ':  Total Verifications=' + str(self.test_verification_count) +
+                           '      ' + dtString + '\n\n')
+
+        # Restore the logger level to what it was
+        logger.setLevel(level=old_level)
+        return
+
+    # ==========================================================================
+    #     Helper function to generate FW version strings for DUT, REF and DVK Board FW
+    # ==========================================================================
+    def generate_test_fw_version_log(self):
+        # Query the FW Versions for all the main components
+        self.send_command(TESTOP_SUBCMD_READ_DUT_VER, SLOT_NA)
+        dut_fw_version = self.get_last_dut_ver_string()
+        self.send_command(TESTOP_SUBCMD_READ_REF_VER, SLOT_NA)
+        ref_fw_version = self.get_last_ref_ver_string()
+        self.send_command_read_board_ver()
+        board_fw_version = self.get_last_board_ver_string()
+
+        logging.basicConfig(level=logging.INFO)
+        old_level = logger.getEffectiveLevel()
+        # Force the log level to INFO so we get this logged even if level is set to just the WARNING level
+        logger.setLevel(logging.INFO)
+
+        logger.info('Board FW Version=' + board_fw_version + '  DUT FW Version=' + dut_fw_version + '  REF FW Version=' + ref_fw_version)
+
+        logger.setLevel(old_level)
+        return
+
+    # ==========================================================================
+    #   Perform hard reset on the EM9304 devices (DUT and REF)
+    # ==========================================================================
+    def reset_em_devices_hard(self):
+        self.send_command_hard_reset(  SLOT_DUT )
+        self.send_command_hard_reset(  SLOT_REF )
+        return
+
+    # ==========================================================================
+    #   Perform soft reset on the EM9304 devices (DUT and REF)
+    # ==========================================================================
+    def reset_em_devices(self):
+        self.send_command_soft_reset( SLOT_DUT )
+        self.send_command_soft_reset( SLOT_REF )
+        return
+
+    # ==========================================================================
+    #     Switch To TestOp Mode
+    # ==========================================================================
+    def switch_to_testop_mode(self):
+        logger.info("Switch to TestOp Mode")
+        self.send_command(TESTOP_SUBCMD_MODESWITCH_TO_TESTOP, devSlot)
+        return
+
+    # ==========================================================================
+    #   Switch Bridge Mode
+    # ==========================================================================
+    def switch_to_bridge_mode(self):
+        logger.info("Switch to Bridge Mode")
+        self.send_command(TESTOP_SUBCMD_MODESWITCH_TO_BRIDGE, devSlot)
+        return
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #     Version with no args (other than devSlot)
+    # ==========================================================================
+    def send_command(self, subcmd, devSlot):
+        return self.send_command_with_args(subcmd, devSlot, 0, 0)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #     Version with 1 arg (other than devSlot)
+    # ==========================================================================
+    def send_command_1argbyte(self, subcmd, devSlot, argval):
+        return self.send_command_packed(subcmd, devSlot, _ARGS_BYTE, argval & 0xff)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Version with 1 short-word arg (int16) (other than devSlot)
+    # ==========================================================================
+    def send_command_1argshort(self, subcmd, devSlot, argval1):
+        # Use the '<' modifier to force little endian packing
+        return self.send_command_packed(subcmd, devSlot, _ARGS_SHORT, argval1)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #     Version with 1 long-word arg (other than devSlot)
+    # ==========================================================================
+    def send_command_1argword(self, subcmd, devSlot, argval1):
+        # Use the '<' modifier to force little endian packing
+        return self.send_command_packed(subcmd, devSlot, _ARGS_WORD, argval1)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #     Version with 2 long-word args (other than devSlot)
+    # ==========================================================================
+    def send_command_2argwords(self, subcmd, devSlot, argval1, argval2):
+        # Use the '<' modifier to force little endian packing
+        return self.send_command_packed(subcmd, devSlot, _ARGS_2WORDS, argval1, argval2)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #     Version with 2 byte-wide args (other than devSlot)
+    # ==========================================================================
+    def send_command_2argbytes(self, subcmd, devSlot, argval1, argval2):
+        return self.send_command_packed(subcmd, devSlot, _ARGS_2BYTES, argval1, argval2)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #     Version with 3 byte-wide args (other than devSlot)
+    # ==========================================================================
+    def send_command_3argbytes(self, subcmd, devSlot, argval1, argval2, argval3):
+        return self.send_command_packed(subcmd, devSlot, _ARGS_3BYTES, argval1, argval2, argval3)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #     Version with 4 byte-wide args (other than devSlot)
+    # ==========================================================================
+    def send_command_4argbytes(self, subcmd, devSlot, argval1, argval2, argval3, argval4):
+        return self.send_command_packed(subcmd, devSlot, _ARGS_4BYTES, argval1, argval2, argval3, argval4)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #     Version with 5 byte-wide args (other than devSlot)
+    # ==========================================================================
+    def send_command_5argbytes(self, subcmd, devSlot, argval1, argval2, argval3, argval4, argval5):
+        return self.send_command_packed(subcmd, devSlot, _ARGS_5BYTES, argval1, argval2, argval3, argval4, argval5)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #     Version with 6 byte-wide args (other than devSlot)
+    # ==========================================================================
+    def send_command_6argbytes(self, subcmd, devSlot, argval1, argval2, argval3, argval4, argval5, argval6):
+        return self.send_command_packed(subcmd, devSlot, _ARGS_6BYTES, argval1, argval2, argval3, argval4, argval5, argval6)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #     Version with 7 byte-wide args (other than devSlot)
+    # ==========================================================================
+    def send_command_7argbytes(self, subcmd, devSlot, argval1, argval2, argval3, argval4, argval5, argval6, argval7):
+        return self.send_command_packed(subcmd, devSlot, _ARGS_7BYTES, argval1, argval2, argval3, argval4, argval5, argval6, argval7)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #     Version with 2 long-word args (other than devSlot)
+    # ==========================================================================
+    def send_command_2argwordbyte(self, subcmd, devSlot, argval1, argval2):
+        return self.send_command_packed(subcmd, devSlot, _ARGS_WORD_BYTE, argval1, argval2)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX
+    # ==========================================================================
+    def send_command_em_calculate_crc32(self, dev_slot = SLOT_DUT, start_address = 0x2000, end_address=0x3000):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX, dev_slot, start_address, end_address)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_CPU_RESET
+    # ==========================================================================
+    def send_command_em_cpu_reset(self, dev_slot = SLOT_DUT):
+        return self.send_command( TESTOP_SUBCMD_HCI_EM_CPU_RESET, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_END_LE_TEST
+    # ==========================================================================
+    def send_command_end_le_test(self, dev_slot = SLOT_DUT):
+        return self.send_command( TESTOP_SUBCMD_HCI_LE_TEST_END, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_LE_TEST_END
+    #     Alias for send_command_end_le_test() with more symmetry to the name
+    #          send_command_em_transmitter_test_end
+    #          send_command_le_test_end
+    # ==========================================================================
+    def send_command_le_test_end(self, dev_slot = SLOT_DUT):
+        return self.send_command( TESTOP_SUBCMD_HCI_LE_TEST_END, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_GET_MEMORY_USAGE
+    # ==========================================================================
+    def send_command_em_get_memory_usage(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_EM_GET_MEMORY_USAGE, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Version specifically for TESTOP_SUBCMD_HCI_EM_PATCH_QUERY
+    # ==========================================================================
+    def send_command_em_patch_query(self, dev_slot = SLOT_DUT, patch_index = 0):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_PATCH_QUERY, dev_slot, patch_index)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_START
+    #   The first bytes of a patch container, header included
+    #   (see patch.upload_patch)
+    # ==========================================================================
+    def send_command_em_write_patch_start(self, dev_slot = SLOT_DUT, data_buf = [0], bytes_to_write = 1):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_START, dev_slot, payload = data_buf[:bytes_to_write])
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_CONTINUE
+    # ==========================================================================
+    def send_command_em_write_patch_continue(self, dev_slot = SLOT_DUT, data_buf = [0], bytes_to_write = 1):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_CONTINUE, dev_slot, payload = data_buf[:bytes_to_write])
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_ABORT
+    # ==========================================================================
+    def send_command_em_write_patch_abort(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_ABORT, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_PROTEST_SLEEP
+    # ==========================================================================
+    def send_command_protest_sleep(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_PROTEST_SLEEP, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_PROTEST_ACTIVE
+    # ==========================================================================
+    def send_command_protest_active(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_PROTEST_ACTIVE, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_PROTEST_TXSTART
+    # ==========================================================================
+    def send_command_protest_txstart(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_PROTEST_TXSTART, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_PROTEST_TXSTOP
+    # ==========================================================================
+    def send_command_protest_txstop(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_PROTEST_TXSTOP, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_PROTEST_RXSTART
+    # ==========================================================================
+    def send_command_protest_rxstart(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_PROTEST_RXSTART, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_PROTEST_RXSTOP
+    # ==========================================================================
+    def send_command_protest_rxstop(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_PROTEST_RXSTOP, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_DISABLE
+    # ==========================================================================
+    def send_command_protest_hf_xtal_disable(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_DISABLE, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_ENABLE
+    # ==========================================================================
+    def send_command_protest_hf_xtal_enable(self, dev_slot = SLOT_DUT, clock_divider = 1):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_ENABLE, dev_slot, clock_divider)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_DISABLE
+    # ==========================================================================
+    def send_command_protest_lf_xtal_disable(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_DISABLE, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_DISABLE
+    # ==========================================================================
+    def send_command_protest_lf_xtal_enable(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_ENABLE, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD
+    # ==========================================================================
+    def send_command_protest_get_svld(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_PROTEST_SET_GPIO
+    # ==========================================================================
+    def send_command_protest_set_gpio(self, dev_slot = SLOT_DUT, gpio_input_reg=0, gpio_output_reg=0,
+                                  gpio_pullup_reg=1, gpio_pulldown_reg=0):
+        # Pack 4 long words (little endian)
+        return self.send_command_values(TESTOP_SUBCMD_HCI_PROTEST_SET_GPIO, dev_slot,
+                                        gpio_input_reg, gpio_output_reg, gpio_pullup_reg, gpio_pulldown_reg)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_SET_CLOCK_SOURCE
+    # ==========================================================================
+    def send_command_em_set_clock_source(self, dev_slot = SLOT_DUT, clock_source = 0):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_SET_CLOCK_SOURCE, dev_slot, clock_source)
+
+    # ==========================================================================
+    #     Send command to the DVK board and fetch the result
+    #     Command: TESTOP_SUBCMD_SET_CURRENT_RANGE_1/2/3
+    # ==========================================================================
+    def send_command_set_current_range(self, adc_range = 0):
+        subcmd = TESTOP_SUBCMD_SET_CURRENT_RANGE_1
 
+        if adc_range == 0:
+            subcmd = TESTOP_SUBCMD_SET_CURRENT_RANGE_1
+        elif adc_range == 1:
+            subcmd = TESTOP_SUBCMD_SET_CURRENT_RANGE_2
+        elif adc_range == 2:
+            subcmd = TESTOP_SUBCMD_SET_CURRENT_RANGE_3
+
+        return self.send_command(subcmd, SLOT_NA)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK
+    # ==========================================================================
+    def send_command_em_set_event_mask(self, dev_slot = SLOT_DUT, event_mask = 1):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK, dev_slot, event_mask)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_SET_MEMORY_MODE
+    # ==========================================================================
+    def send_command_em_set_memory_mode(self, dev_slot = SLOT_DUT, memory_mode = 0):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_SET_MEMORY_MODE, dev_slot, memory_mode)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_READ_PTB_FW_VER
+    # ==========================================================================
+    def send_command_read_board_ver(self):
+        return self.send_command( TESTOP_SUBCMD_READ_PRODVK_FW_VER, SLOT_NA )
+
+    # ==========================================================================
+    #     Send command to DVK board and fetch the result
+    #     Command: TESTOP_SUBCMD_HCI_EM_SET_POWER_MODE_EX
+    # ==========================================================================
+    def send_command_em_set_power_mode(self, dev_slot = SLOT_DUT, power_mode = 0):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_SET_POWER_MODE_EX, dev_slot, power_mode)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_SET_PUBLIC_ADDRESS
+    # ==========================================================================
+    def send_command_em_set_public_address(self, dev_slot = SLOT_DUT, public_address = 0):
+        # Pack the 6 bytes of the address
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_SET_PUBLIC_ADDRESS, dev_slot,
+                                        public_address[0],
+                                        public_address[1],
+                                        public_address[2],
+                                        public_address[3],
+                                        public_address[4],
+                                        public_address[5])
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_SET_RF_ACTIVITY_SIGNAL
+    # ==========================================================================
+    def send_command_em_set_rf_activity_signal(self, dev_slot = SLOT_DUT, rf_signal_enable = 0, rf_signal_gpio_output = 0):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_SET_RF_ACTIVITY_SIGNAL_EX, dev_slot, rf_signal_enable, rf_signal_gpio_output)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL
+    # ==========================================================================
+    def send_command_em_set_rf_power_level(self, dev_slot = SLOT_DUT, transmit_power_level = 0):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL_EX, dev_slot, transmit_power_level)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_SET_SLEEP_OPTIONS
+    # ==========================================================================
+    def send_command_em_set_sleep_options(self, dev_slot = SLOT_DUT, sleep_options = 0):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_SET_SLEEP_OPTIONS, dev_slot, sleep_options)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_SET_REF_CLOCK
+    # ==========================================================================
+    def send_command_set_ref_clock(self, 
+            pllA_mult = 24, pllA_num = 0, pllA_denom = 1,
+            pllB_mult = 24, pllB_num = 0, pllB_denom = 1,
+            out0_source = SI5351_PLL_A, out0_div = 1326, out0_num = 0, out0_denom = 1, out0_rdiv = SI5351_R_DIV_16,
+            out1_source = SI5351_PLL_A, out1_div = 1326, out1_num = 0, out1_denom = 1, out1_rdiv = SI5351_R_DIV_16,
+            out2_source = SI5351_PLL_A, out2_div = 1326, out2_num = 0, out2_denom = 1, out2_rdiv = SI5351_R_DIV_16):
+
+        return self.send_command_values(TESTOP_SUBCMD_SET_REF_CLOCK, SLOT_NA,
+            pllA_mult, pllA_num, pllA_denom,                        # PLL A Config (BII)
+            pllB_mult, pllB_num, pllB_denom,                        # PLL B Config (BII)
+            out0_source, out0_div, out0_num, out0_denom, out0_rdiv, # Output 0 Config (BHIIB)
+            out1_source, out1_div, out1_num, out1_denom, out1_rdiv, # Output 1 Config (BHIIB)
+            out2_source, out2_div, out2_num, out2_denom, out2_rdiv) # Output 2 Config (BHIIB)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_SET_UART_BAUD_RATE
+    #       Default baud_rate = 5 -> 19200 bps
+    # ==========================================================================
+    def send_command_em_set_uart_baud_rate(self, dev_slot = SLOT_DUT, baud_rate = 5):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_SET_UART_BAUD_RATE, dev_slot, baud_rate)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_RESET
+    # ==========================================================================
+    def send_command_soft_reset(self, dev_slot = SLOT_DUT):
+        return self.send_command( TESTOP_SUBCMD_HCI_RESET, dev_slot )
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Version specifically for TESTOP_SUBCMD_RESET_9304
+
+    # ==========================================================================
+    def send_command_hard_reset(self, dev_slot = SLOT_DUT):
+        return self.send_command( TESTOP_SUBCMD_RESET_9304, dev_slot )
+
+    # ==========================================================================
+    #     Send command to PTB and fetch the result
+    #     Version specifically for TESTOP_SUBCMD_HCI_READ_BD_ADDR
+    # ==========================================================================
+    def send_command_read_BLE_address(self, dev_slot = SLOT_DUT):
+        return self.send_command( TESTOP_SUBCMD_HCI_READ_BD_ADDR, dev_slot )
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_LE_SET_ADVERTISING_DATA
+    # ==========================================================================
+    def send_command_le_set_Advertising_data(self, dev_slot = SLOT_DUT, advertising_data_length = 1, advertising_data = [0]):
+        # First byte must be the number of advertising_data bytes (0-31),
+        # followed by all the advertising_data bytes
+        return self.send_command_values(TESTOP_SUBCMD_HCI_SET_ADVERTISING_DATA, dev_slot, advertising_data_length,
+                                        payload = advertising_data[:advertising_data_length])
+
+    # ==========================================================================
+    #     Send command to the DVK board and fetch the result
+    #     Version specifically for TESTOP_SUBCMD_HCI_SET_ADVERTISING_PARAMETERS
+    #   Note: the min and max values are mapped to the upper byte of a U16 and
+    #       the chip uses that U16 value * 0.625ms for the time.  Example: the
+    #       default value (0x01) => 0x0100 * 0.625ms = 160ms delta time.
+    # ==========================================================================
+    def send_command_le_set_Advertising_parameters(self, dev_slot = SLOT_DUT, min=0x01, max=0x01, AdType=0x00, AdChMap=0x07):
+        return self.send_command_values( TESTOP_SUBCMD_HCI_SET_ADVERTISING_PARAMETERS, dev_slot, min, max, AdType, AdChMap )
+
+    # ==========================================================================
+    #     Send command to PTB and fetch the result
+    #     Version specifically for TESTOP_SUBCMD_HCI_LE_SET_ADVERTISE_ENABLE
+    #     0 = OFF / 1 = ON
+    # ==========================================================================
+    def send_command_le_set_Advertising_enable(self, dev_slot = SLOT_DUT, enableState=1):
+        return self.send_command_values( TESTOP_SUBCMD_HCI_LE_SET_ADVERTISE_ENABLE, dev_slot, enableState )
+
+    # ==========================================================================
+    #     Send command to PTB and fetch the result
+    #     Version specifically for TESTOP_SUBCMD_HCI_LE_CLEAR_WHITE_LIST (no params)
+    # ==========================================================================
+    def send_command_le_clear_White_List(self, dev_slot = SLOT_REF):
+        return self.send_command( TESTOP_SUBCMD_HCI_LE_CLEAR_WHITE_LIST, dev_slot )
+
+    # ==========================================================================
+    #     Send command to PTB and fetch the result
+    #     Version specifically for TESTOP_SUBCMD_HCI_LE_ADD_DEVICE_TO_WHITE_LIST
+    # ==========================================================================
+    def send_command_le_add_device_to_White_List(self, dev_slot = SLOT_REF, addressType = '00', bleAddress = '00'):
+        msg = addressType.encode()+bleAddress.encode()
+        return self.send_command_values( TESTOP_SUBCMD_HCI_LE_ADD_DEVICE_TO_WHITE_LIST, dev_slot, payload=msg)
+
+    # ==========================================================================
+    #     Send command to PTB and fetch the result
+    #     Version specifically for TESTOP_SUBCMD_HCI_LE_SET_SCAN_PARAMETERS
+    # ==========================================================================
+    def send_command_le_set_Scan_Parameters(self, dev_slot = SLOT_REF, scanType='00', scanIntvl='0004', scanWindow='0004', addrType='00', filterPolicy='00' ):
+        msg = scanType.encode()+scanIntvl.encode()+scanWindow.encode()+addrType.encode()+filterPolicy.encode()
+        return self.send_command_values( TESTOP_SUBCMD_HCI_LE_SET_SCAN_PARAMETERS, dev_slot, payload=msg )
+
+    # ==========================================================================
+    #     Send command to PTB and fetch the result
+    #     Version specifically for TESTOP_SUBCMD_HCI_LE_SET_SCAN_ENABLE
+    # ==========================================================================
+    def send_command_le_set_Scan_Enable(self, dev_slot = SLOT_REF, enableState=1, filterDups=0):
+        return self.send_command_values( TESTOP_SUBCMD_HCI_LE_SET_SCAN_ENABLE, dev_slot, enableState, filterDups)
+
+    # ==========================================================================
+    #     Send command to PTB and fetch the result
+    #     Version specifically for TESTOP_SUBCMD_HCI_LE_GET_ADVERTISING_REPORT
+    # ==========================================================================
+    def send_command_get_advertising_report_data(self, dev_slot = SLOT_REF):
+        return self.send_command( TESTOP_SUBCMD_HCI_LE_GET_ADVERTISING_REPORT, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_LE_TRANSMITTER_TEST
+    # ==========================================================================
+    def send_command_le_transmitter_test(self, dev_slot = SLOT_DUT, channel = 1, payload_len = 10, payload_type = 1):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_LE_TRANSMITTER_TEST, dev_slot, channel, payload_len, payload_type)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST
+    # ==========================================================================
+    def send_command_le_receiver_test(self, dev_slot = SLOT_DUT, channel = 1):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST, dev_slot, channel)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_SVLD_MEASUREMENT
+    # ==========================================================================
+    def send_command_em_svld_measurement(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_EM_SVLD_MEASUREMENT, dev_slot)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS
+    # ==========================================================================
+    def send_command_em_read_at_address(self, dev_slot = SLOT_DUT, start_address = 0x1000, bytes_to_read = 4):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS, dev_slot, start_address,   bytes_to_read)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_WRITE_AT_ADDRESS
+    # ==========================================================================
+    def send_command_em_write_at_address(self, dev_slot = SLOT_DUT, start_address = 0x1000, data_buf = [0], bytes_to_write = 1):
+        # The start address (little endian) followed by the data bytes
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_WRITE_AT_ADDRESS, dev_slot, start_address,
+                                        payload = data_buf[:bytes_to_write])
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_READ_CONTINUE
+    #   Reads the bytes following the last READ_AT_ADDRESS/READ_CONTINUE
+    # ==========================================================================
+    def send_command_em_read_continue(self, dev_slot = SLOT_DUT, bytes_to_read = 4):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_READ_CONTINUE, dev_slot, bytes_to_read)
+
+    # ==========================================================================
+    #   Read 'length' bytes of device memory starting at 'start_address'
+    #   with one READ_AT_ADDRESS followed by READ_CONTINUEs, each filling a
+    #   whole response.  The bytes are copied into 'buffer' (any writable
+    #   buffer of at least 'length' bytes) or into a new bytearray.
+    #
+    #   Returns a MemoryTransferResult whose data is the buffer.  Raises
+    #   ProDVKCommandError if a read fails.
+    # ==========================================================================
+    def read_memory(self, dev_slot, start_address, length, buffer = None):
+        if self.command_pipeline is not None:
+            raise RuntimeError('read_memory() cannot be used while commands are pipelined or recorded')
+        if buffer is None:
+            buffer = bytearray(length)
+        view = memoryview(buffer).cast('B')
+        if len(view) < length:
+            raise ValueError('Buffer too small: ' + str(len(view)) + ' < ' + str(length))
+
+        with self._lock:
+            start = time.perf_counter()
+            offset = 0
+            while offset < length:
+                chunk = min(length - offset, TESTOP_RESP_MAX_DETAIL)
+                if offset == 0:
+                    subcmd  = TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS
+                    errcode = self.send_command_values(subcmd, dev_slot, start_address, chunk)
+                else:
+                    subcmd  = TESTOP_SUBCMD_HCI_EM_READ_CONTINUE
+                    errcode = self.send_command_values(subcmd, dev_slot, chunk)
+                if errcode != TESTOP_ERRCODE_SUCCESS:
+                    raise ProDVKCommandError(subcmd, errcode)
+
+                data = self.last_result.data
+                if len(data) != chunk:
+                    raise ProDVKCommandError(subcmd, TESTOP_ERRCODE_BAD_PARAMS)
+                view[offset:offset + chunk] = data
+                offset = offset + chunk
+            seconds = time.perf_counter() - start
+
+        result = MemoryTransferResult(start_address, length, seconds, length / seconds if seconds else 0.0, buffer, None)
+        logger.info('Read memory:              %s', result)
+        return result
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_WRITE_CONTINUE
+    #   Writes the bytes following the last WRITE_AT_ADDRESS/WRITE_CONTINUE
+    # ==========================================================================
+    def send_command_em_write_continue(self, dev_slot = SLOT_DUT, data_buf = [0], bytes_to_write = 1):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_WRITE_CONTINUE, dev_slot, payload = data_buf[:bytes_to_write])
+
+    # ==========================================================================
+    #   Write 'data' (bytes, bytearray, array, memoryview or any other
+    #   buffer) to device memory at 'start_address' with one WRITE_AT_ADDRESS
+    #   followed by WRITE_CONTINUEs, each filling a whole command frame.
+    #
+    #   With 'verify' the device computes the CRC32 of the written range
+    #   once, which is compared with the CRC32 of 'data'.  A mismatch is
+    #   logged and counted as a test error.  The end address given to
+    #   CALCULATE_CRC32_EX is assumed exclusive (start + length).
+    #
+    #   Returns a MemoryTransferResult.  Raises ProDVKCommandError if a
+    #   write fails.
+    # ==========================================================================
+    def write_memory(self, dev_slot, start_address, data, verify = True):
+        if self.command_pipeline is not None:
+            raise RuntimeError('write_memory() cannot be used while commands are pipelined or recorded')
+        view = memoryview(data).cast('B')
+        length = len(view)
+
+        with self._lock:
+            start = time.perf_counter()
+            offset = 0
+            while offset < length:
+                if offset == 0:
+                    subcmd = TESTOP_SUBCMD_HCI_EM_WRITE_AT_ADDRESS
+                    chunk  = min(length, TESTOP_CMD_MAX_ARGS - COMMAND_SPECS[subcmd].request.size)
+                    errcode = self.send_command_values(subcmd, dev_slot, start_address, payload = view[:chunk])
+                else:
+                    subcmd = TESTOP_SUBCMD_HCI_EM_WRITE_CONTINUE
+                    chunk  = min(length - offset, TESTOP_CMD_MAX_ARGS)
+                    errcode = self.send_command_values(subcmd, dev_slot, payload = view[offset:offset + chunk])
+                if errcode != TESTOP_ERRCODE_SUCCESS:
+                    raise ProDVKCommandError(subcmd, errcode)
+                offset = offset + chunk
+
+            verified = None
+            if verify and length > 0:
+                subcmd = TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX
+                errcode = self.send_command_em_calculate_crc32(dev_slot, start_address, start_address + length)
+                if errcode != TESTOP_ERRCODE_SUCCESS:
+                    raise ProDVKCommandError(subcmd, errcode)
+                expected = zlib.crc32(view) & 0xFFFFFFFF
+                verified = self.last_result.crc32 == expected
+                if not verified:
+                    logger.warning('Write memory verify failed.  Address=' + hex(start_address) + '  Length=' + str(length) +
+                                   '  CRC32=' + hex(self.last_result.crc32) + '  Expected=' + hex(expected))
+                    self.test_error_count = self.test_error_count + 1
+            seconds = time.perf_counter() - start
+
+        result = MemoryTransferResult(start_address, length, seconds, length / seconds if seconds else 0.0, data, verified)
+        logger.info('Write memory:             %s', result)
+        return result
+
+    # ==========================================================================
+    #   Make device memory at 'start_address' equal to 'data', writing only
+    #   the parts that differ.
+    #
+    #   The region is split into blocks of 'block_size' bytes whose device
+    #   CRC32s (CALCULATE_CRC32_EX) are compared with the CRC32s of 'data'.
+    #   Mismatching blocks are halved and compared again until they are no
+    #   larger than 'min_block_size'; the CRC commands of each round are
+    #   pipelined 'depth' deep.  The differing blocks left are merged where
+    #   adjacent and written with write_memory().  With 'verify' the CRC32
+    #   of the whole region is checked once at the end.  As in
+    #   write_memory(), every CALCULATE_CRC32_EX end address is exclusive.
+    #
+    #   Returns a MemorySyncResult: the bytes compared on the device, the
+    #   bytes written and the (offset, length) ranges rewritten.
+    # ==========================================================================
+    def sync_memory(self, dev_slot, start_address, data, block_size = 4096, min_block_size = 256,
+                    depth = 8, verify = True):
+        if self.command_pipeline is not None:
+            raise RuntimeError('sync_memory() cannot be used while commands are pipelined or recorded')
+        view = memoryview(data).cast('B')
+        length = len(view)
+        min_block_size = max(1, min(min_block_size, block_size))
+
+        with self._lock:
+            start = time.perf_counter()
+            bytes_compared = 0
+            crc_commands   = 0
+            differing      = []
+            blocks = [(offset, min(block_size, length - offset)) for offset in range(0, length, block_size)]
+            while blocks:
+                with CommandPipeline(depth, self):
+                    commands = [self.send_command_em_calculate_crc32(dev_slot, start_address + offset,
+                                                                     start_address + offset + size)
+                                for offset, size in blocks]
+                crc_commands = crc_commands + len(blocks)
+
+                next_blocks = []
+                for (offset, size), command in zip(blocks, commands):
+                    if command.result() != TESTOP_ERRCODE_SUCCESS:
+                        raise ProDVKCommandError(command.subcmd, command.errcode)
+                    bytes_compared = bytes_compared + size
+                    if command.record.crc32 == zlib.crc32(view[offset:offset + size]) & 0xFFFFFFFF:
+                        continue
+                    if size <= min_block_size:
+                        differing.append((offset, size))
+                    else:
+                        half = size // 2
+                        next_blocks.append((offset, half))
+                        next_blocks.append((offset + half, size - half))
+                blocks = next_blocks
+
+            # Merge the adjacent ranges and write them
+            ranges = []
+            for offset, size in sorted(differing):
+                if ranges and ranges[-1][0] + ranges[-1][1] == offset:
+                    ranges[-1] = (ranges[-1][0], ranges[-1][1] + size)
+                else:
+                    ranges.append((offset, size))
+            bytes_written = 0
+            for offset, size in ranges:
+                self.write_memory(dev_slot, start_address + offset, view[offset:offset + size], verify = False)
+                bytes_written = bytes_written + size
+
+            verified = None
+            if verify and length > 0:
+                crc32 = self.query('send_command_em_calculate_crc32', dev_slot, start_address, start_address + length).crc32
+                expected = zlib.crc32(view) & 0xFFFFFFFF
+                verified = crc32 == expected
+                if not verified:
+                    logger.warning('Sync memory verify failed.  Address=' + hex(start_address) + '  Length=' + str(length) +
+                                   '  CRC32=' + hex(crc32) + '  Expected=' + hex(expected))
+                    self.test_error_count = self.test_error_count + 1
+            seconds = time.perf_counter() - start
+
+        result = MemorySyncResult(start_address, length, bytes_compared, bytes_written, crc_commands,
+                                  tuple(ranges), seconds, verified)
+        logger.info('Sync memory:              %s', result)
+        return result
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST
+    # ==========================================================================
+    def send_command_em_transmitter_test(self, dev_slot = SLOT_DUT, test_mode = 0, channel = 0x13, packet_len = 37, payload_type = 0):
+        return self.send_command_values(TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST, dev_slot, test_mode, channel, packet_len, payload_type)
+
+    # ==========================================================================
+    #   Send command to the DVK board and fetch the result
+    #   Command: TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST_END
+    # ==========================================================================
+    def send_command_em_transmitter_test_end(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST_END, dev_slot)
+
+    # ==========================================================================
+    #     Run test to get the clock tics from XTAL and Ref Clock.  The input is
+    #       the maximum number of clock to get from the DUT.  This test will
+    #       then shut down both clocks and report the counts.
+    #
+    # ==========================================================================
+    def execute_xtal_validation(self, maxDutClocks):
+        return self.send_command_values(TESTOP_SUBCMD_EXEC_XTALVALIDATION, SLOT_NA, maxDutClocks)
+
+    # ==========================================================================
+    #     TEMPORARY!  Allows you to set the MUXes to any state in any combination!!
+    #
+    # ==========================================================================
+    def send_command_set_mux_state(self, source = 0, state = 0):
+        return self.send_command_values(TESTOP_SUBCMD_SET_MUX_STATE, source, state)
+
+    # ==========================================================================
+    #     Run calibration test
+    #
+    # ==========================================================================
+    def execute_current_calibration(self, code=0):
+        dev_slot = SLOT_DUT     # REF current cannot be calibrated
+        return self.send_command_values(TESTOP_SUBCMD_EXEC_CALIBRATION, dev_slot, code)
+
+    # ==========================================================================
+    #     Get the current (DUT is in ACTIVE mode and auto adjusts the current calculation)
+    #
+    # ==========================================================================
+    def send_command_read_current(self, dev_slot = SLOT_DUT):
+        return self.send_command(TESTOP_SUBCMD_READ_CURRENT, dev_slot)
+
+    # ==========================================================================
+    #     Get the current (DUT is in ACTIVE mode and auto adjusts the current calculation)
+    #
+    # ==========================================================================
+    def send_command_read_ADC(self, dev_slot = SLOT_DUT, adcIndex=0):
+        return self.send_command_values(TESTOP_SUBCMD_READ_ADC, dev_slot, adcIndex)
+
+    # ==========================================================================
+    #     Send command to Production Test Board and fetch the result
+    #     This version supports additional args as per argcnt (in bytes)
+    #     The number of bytes indicated are extracted from argvect (a byte array)
+    #
+    #     While a CommandPipeline is active the command is queued on it instead
+    #     and a PipelinedCommand is returned rather than the error code (a
+    #     CommandRecorder just records it).
+    #     The exchange holds the session lock, so several threads may share
+    #     one board.
+    # ==========================================================================
+    def send_command_with_args(self, subcmd, devSlot, argcnt, argvect):
+        if self.command_pipeline is not None:
+            return self.command_pipeline.submit(subcmd, devSlot, argcnt, argvect)
+
+        with self._lock:
+            #logger.info('Send Command:   %s %d  %d %s'%(convert_subcmd_to_string(subcmd), devSlot, argcnt,convert_array_to_hex(argvect, argcnt)))
+            # Increment the sequence number each invocation
+            # Limit it to one byte
+            self.cmdSeqNum = (self.cmdSeqNum + 1) % 256
+
+            command_buf = encode_command_frame(subcmd, devSlot, self.cmdSeqNum, argcnt, argvect, self._frame)
+            return self._exchange(subcmd, argcnt, command_buf)
+
+    # ==========================================================================
+    #     Issue a command through one of the send_command_* helpers (a method
+    #     of this session or its name) and return the result record parsed
+    #     from its response, or None for commands without one:
+    #
+    #         usage = session.query('send_command_em_get_memory_usage', SLOT_DUT)
+    #         usage.memory_pool_size
+    #
+    #     Raises ProDVKCommandError if the board answers with an error code.
+    #     Not available while a CommandPipeline or CommandRecorder is active.
+    # ==========================================================================
+    def query(self, helper, *args, **kwargs):
+        if self.command_pipeline is not None:
+            raise RuntimeError('query() cannot be used while commands are pipelined or recorded')
+        if not callable(helper):
+            helper = getattr(self, helper)
+
+        with self._lock:
+            self.last_result = None
+            errcode = helper(*args, **kwargs)
+            record = self.last_result
+            subcmd = self.last_subcmd
+        if errcode != TESTOP_ERRCODE_SUCCESS:
+            raise ProDVKCommandError(subcmd, errcode)
+        return record
+
+    # ==========================================================================
+    #     Run one of the functional tests (FUNCTEST_* or
+    #     MEASURE_TRIGGERED_CURRENT) with the argument bytes 'args' and wait
+    #     for it to complete.  Returns the result record of the READ_RESULTS
+    #     that found the test done (e.g. CurrentResult, PERResult).
+    #
+    #     The first READ_RESULTS is sent once the expected duration of the
+    #     test has passed, then the interval between polls starts at a tenth
+    #     of it and doubles up to FUNCTEST_MAX_POLL_INTERVAL.  The expected
+    #     duration is the one observed the last time the test ran on this
+    #     session, FUNCTEST_EXPECTED_DURATION the first time.  The session
+    #     lock is not held while waiting.
+    #
+    #     Raises ProDVKCommandError if a command fails and
+    #     ProDVKFunctestTimeout after 'timeout' seconds (None: no limit).
+    # ==========================================================================
+    def run_functest(self, subcmd, args = b'', dev_slot = SLOT_DUT, timeout = 30.0):
+        if self.command_pipeline is not None:
+            raise RuntimeError('run_functest() cannot be used while commands are pipelined or recorded')
+        args = bytes(args)
+
+        start = time.monotonic()
+        errcode = self.send_command_with_args(subcmd, dev_slot, len(args), args)
+        if errcode != TESTOP_ERRCODE_SUCCESS:
+            raise ProDVKCommandError(subcmd, errcode)
+
+        expected = self.functest_durations.get(subcmd, FUNCTEST_EXPECTED_DURATION.get(subcmd, 0.05))
+        interval = max(expected / 10, 0.001)
+        delay = expected
+        polls = 0
+        while True:
+            if timeout is not None:
+                delay = min(delay, start + timeout - time.monotonic())
+            if delay > 0:
+                time.sleep(delay)
+
+            record = self.query('send_command', TESTOP_SUBCMD_FUNCTEST_READ_RESULTS, dev_slot)
+            polls = polls + 1
+            if not self.last_is_busy:
+                break
+            if timeout is not None and time.monotonic() - start >= timeout:
+                raise ProDVKFunctestTimeout(subcmd, timeout)
+            delay = interval
+            interval = min(interval * 2, FUNCTEST_MAX_POLL_INTERVAL)
+
+        if polls == 1:
+            # Done when first polled: it may have been done earlier
+            self.functest_durations[subcmd] = expected * 0.75
+        else:
+            self.functest_durations[subcmd] = time.monotonic() - start
+        return record
+
+    # ==========================================================================
+    #     Send command to Production Test Board and fetch the result
+    #     The args are packed with the request layout of the command in
+    #     COMMAND_SPECS, followed by the bytes of 'payload' if given.
+    # ==========================================================================
+    def send_command_values(self, subcmd, devSlot, *values, payload = None):
+        packer = COMMAND_SPECS[subcmd].request
+        # A single byte argument is masked to 8 bits, as send_command_1argbyte()
+        # does (e.g. a power level of -4 dBm is sent as 0xfc)
+        if packer.size == 1 and len(values) == 1:
+            values = (values[0] & 0xff,)
+        return self.send_command_packed(subcmd, devSlot, packer, *values, payload=payload)
+
+    # ==========================================================================
+    #     Send command to Production Test Board and fetch the result
+    #     The args are packed by 'packer' (a struct.Struct) straight into the
+    #     frame buffer, followed by the bytes of 'payload' if given.
+    # ==========================================================================
+    def send_command_packed(self, subcmd, devSlot, packer, *values, payload = None):
+        if self.command_pipeline is not None:
+            argvect = packer.pack(*values)
+            if payload is not None:
+                argvect = argvect + bytes(payload)
+            return self.command_pipeline.submit(subcmd, devSlot, len(argvect), argvect)
+
+        argcnt = packer.size
+        if payload is not None:
+            argcnt = argcnt + len(payload)
+
+        with self._lock:
+            # Pack first: values that don't fit raise before a sequence
+            # number is used
+            if argcnt <= TESTOP_CMD_MAX_ARGS:
+                packer.pack_into(self._frame, TESTOP_CMD_IDX_ARGS, *values)
+                if payload is not None:
+                    if not isinstance(payload, (bytes, bytearray, memoryview)):
+                        payload = bytes(payload)
+                    self._frame[TESTOP_CMD_IDX_ARGS + packer.size:TESTOP_CMD_IDX_ARGS + argcnt] = payload
+
+            self.cmdSeqNum = (self.cmdSeqNum + 1) % 256
+
+            command_buf = None
+            if argcnt <= TESTOP_CMD_MAX_ARGS:
+                command_buf = encode_command_frame(subcmd, devSlot, self.cmdSeqNum, argcnt, None, self._frame)
+            return self._exchange(subcmd, argcnt, command_buf)
+
+    # Write an encoded command frame and parse the response to it
+    # (or the cached response, for CACHED_COMMANDS, or the response to the
+    # same setter, for SHADOWED_COMMANDS that would not change anything)
+    def _exchange(self, subcmd, argcnt, command_buf):
+        self.last_subcmd = subcmd
+        cache_key = None
+        shadow_key = None
+        if subcmd in SHADOWED_COMMANDS and self.shadow_config_enabled and command_buf is not None:
+            shadow_key = (SHADOWED_COMMANDS[subcmd], command_buf[TESTOP_CMD_IDX_SLOT])
+            frame = bytes(command_buf[TESTOP_CMD_IDX_SLOT:])
+            shadow = self.shadow_config.get(shadow_key)
+            if shadow is not None and shadow[0] == subcmd and shadow[1] == frame:
+                self.shadow_skipped += 1
+                self.shadow_skipped_commands[subcmd] = self.shadow_skipped_commands.get(subcmd, 0) + 1
+                logger.debug('Setting unchanged:        %s', LazyLogMessage(convert_subcmd_to_string, subcmd))
+                return self.parse_response_checked(subcmd, shadow[2], shadow[2][TESTOP_RESP_IDX_SEQNUM])
+
+        if command_buf is not None:
+            self.forget_state(subcmd, command_buf[TESTOP_CMD_IDX_SLOT])
+        if subcmd in CACHED_COMMANDS and self.query_cache_enabled and command_buf is not None:
+            cache_key = (subcmd, bytes(command_buf[TESTOP_CMD_IDX_SLOT:]))
+            response = self.query_cache.get(cache_key)
+            if response is not None:
+                self.query_cache_hits += 1
+                logger.debug('Cached response:          %s', LazyLogMessage(convert_subcmd_to_string, subcmd))
+                return self.parse_response_checked(subcmd, response, response[TESTOP_RESP_IDX_SEQNUM])
+            self.query_cache_misses += 1
+
+        if command_buf is not None:
+            # Write the command to the USB/HID interface
+            ret = self.transport.write(command_buf)
+        else:
+            ret = 0
+            logger.warning('Command failed.  Invalid number of arguments= ' + str(argcnt))
+            self.test_error_count = self.test_error_count + 1
+
+        # Abort if the command was not successfully sent
+        if ret <= 0:
+            return TESTOP_ERRCODE_BAD_PARAMS
+
+        # Every command should provide a response
+        # If the operation takes longer than the timeout interval, it should still
+        # respond indicating the operation is in-progress
+        response = self._receive_response(subcmd, command_buf)
+
+        errcode = self.parse_response_checked(subcmd, response)
+        if errcode == TESTOP_ERRCODE_SUCCESS:
+            if cache_key is not None:
+                self.query_cache[cache_key] = response
+            elif shadow_key is not None:
+                self.shadow_config[shadow_key] = (subcmd, frame, response)
+        return errcode
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_PROTEST_TXSTART
-# ==========================================================================
-def send_command_protest_txstart(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_HCI_PROTEST_TXSTART, dev_slot)
+    # ==========================================================================
+    #     Parse the response buffer.
+    #     A badly formed response might result in a variety of exceptions, so catch
+    #     exceptions and try to continue
+    # ==========================================================================
+    def parse_response_checked(self, subcmd, response, seqNum = None):
+        try:
+            errcode = self.parse_response(subcmd, response, seqNum)
+        except Exception as ex:
+            errcode = TESTOP_ERRCODE_RESPONSE_PARSE_ERR
+            # Log both the raw buffer and the message from the exception
+            logger.warning('Response parse error.  Raw Response buffer: ' + convert_array_to_hex(response, len(response)))
+            logger.warning('Response parse error.  Exception message:   ' + str(getattr(ex, 'message', ex)))
+
+        # After a failure the configuration of the devices is not known
+        if errcode != TESTOP_ERRCODE_SUCCESS:
+            self.shadow_config.clear()
+        return errcode
 
+    def send_command_message(self, subcmd, devSlot, msgLen, message):
+        with self._lock:
+            logger.info('Send Command:             %s', LazyLogMessage(convert_subcmd_to_string, subcmd))
+            # Increment the sequence number each invocation
+            # Limit it to one byte
+            self.cmdSeqNum = (self.cmdSeqNum + 1) % 256
+
+            # The number of bytes after the command and length bytes
+            # For simplicity, always use at least 3 param bytes even though we don't always use 3
+            paramLength = 3 + int(msgLen)
+
+            # Pack the header, including the devSlot (which is technically the first arg byte)
+            header = struct.pack('BBBBBB',   COMMAND_TESTOP, paramLength, subcmd, self.cmdSeqNum, devSlot, msgLen )
+            self.forget_state(subcmd, devSlot)
+
+            command_buf = header
+            ret = self.transport.write(command_buf)
+
+            # Abort if the command was not successfully sent
+            if ret <= 0:
+                return TESTOP_ERRCODE_BAD_PARAMS
+
+            # Every command should provide a response
+            # If the operation takes longer than the timeout interval, it should still
+            # respond indicating the operation is in-progress
+            response = self._receive_response(subcmd, command_buf)
+
+            return self.parse_response_checked(subcmd, response)
+
+    # ==========================================================================
+    #   Wait for the response to the command just written ('command_buf'),
+    #   with the timeout learned for 'subcmd', sending a RETRYABLE_COMMANDS
+    #   command again if it expires (see TimeoutPolicy).  Packets that are
+    #   not the response (spontaneous packets, late responses to earlier
+    #   commands) are dropped.
+    #
+    #   Raises ProDVKTimeoutError if no response arrives and
+    #   ProDVKTransportError if the transport fails.
+    # ==========================================================================
+    def _receive_response(self, subcmd, command_buf):
+        policy  = self.timeout_policy
+        seqNum  = command_buf[TESTOP_CMD_IDX_SEQNUM]
+        retries = policy.retries if subcmd in RETRYABLE_COMMANDS else 0
+        sent    = time.perf_counter()
+        wait_until = sent + policy.timeout(subcmd) / 1000.0
+        give_up    = sent + DVK_USB_TIMEOUT / 1000.0
+
+        while True:
+            try:
+                response = self._read_matching(seqNum, wait_until)
+                policy.observe(subcmd, time.perf_counter() - sent)
+                return response
+            except ProDVKTransportError as ex:
+                if retries > 0:
+                    retries -= 1
+                    self.command_retries += 1
+                    logger.warning('No response to ' + convert_subcmd_to_string(subcmd) + ' (' + str(ex) +
+                                   ').  Sending it again')
+                    self.resync()
+                    self.transport.write(command_buf)
+                    sent = time.perf_counter()
+                    wait_until = sent + policy.timeout(subcmd) / 1000.0
+                    give_up    = sent + DVK_USB_TIMEOUT / 1000.0
+                elif isinstance(ex, ProDVKTimeoutError) and wait_until < give_up:
+                    wait_until = give_up
+                elif isinstance(ex, ProDVKTimeoutError):
+                    raise ProDVKTimeoutError('No response to ' + convert_subcmd_to_string(subcmd) + ' within ' +
+                                             str(DVK_USB_TIMEOUT) + ' ms', subcmd, DVK_USB_TIMEOUT)
+                else:
+                    raise
+
+    # Read until the response with sequence number 'seqNum' arrives, by
+    # time.perf_counter() 'deadline'
+    def _read_matching(self, seqNum, deadline):
+        if self.reader is not None:
+            return self.reader.wait_response(seqNum, deadline)
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise ProDVKTimeoutError('Operation timed out')
+            # A timeout of 0 would wait forever
+            response = self.read_response(int(remaining * 1000) + 1)
+            if response[TESTOP_RESP_IDX_CMD] != COMMAND_TESTOP:
+                # Spontaneous packet, already logged by read_response()
+                continue
+            if response[TESTOP_RESP_IDX_SEQNUM] != seqNum:
+                self.stale_responses += 1
+                logger.warning("Dropping response with sequence number " + str(response[TESTOP_RESP_IDX_SEQNUM]) +
+                               " (expected " + str(seqNum) + ").  Response=" + convert_array_to_hex(response, len(response)))
+                continue
+            return response
+
+    # ==========================================================================
+    #   Drop the packets waiting to be read (e.g. late responses to a command
+    #   that timed out).  Returns how many were dropped.
+    # ==========================================================================
+    def resync(self):
+        if self.reader is not None:
+            dropped = self.reader.drain()
+            self.stale_responses += dropped
+            return dropped
+        dropped = 0
+        with self._lock:
+            while True:
+                try:
+                    self.transport.read(DVK_USB_EP_SIZE, RESYNC_DRAIN_TIMEOUT)
+                except ProDVKTimeoutError:
+                    break
+                dropped += 1
+        self.stale_responses += dropped
+        return dropped
+
+    # ==========================================================================
+    #   Read a response packet, waiting at most 'timeout' ms
+    #   (the next TESTOP response while a BackgroundReader runs)
+    #   Raises ProDVKTimeoutError if none arrives in time and
+    #   ProDVKTransportError if the transport fails.
+    # ==========================================================================
+    def read_response(self, timeout = DVK_USB_TIMEOUT):
+        if self.reader is not None:
+            return self.reader.next_response(timeout)
+        response = self.transport.read(DVK_USB_EP_SIZE, timeout)
+        if response[0] != COMMAND_TESTOP:
+            # Not a valid testop response.  Probably a spontaneous event from the device
+            logger.warning("Spontaneous Response.  Response Header=" + convert_array_to_hex(response, len(response)))
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_PROTEST_TXSTOP
-# ==========================================================================
-def send_command_protest_txstop(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_HCI_PROTEST_TXSTOP, dev_slot)
+        return response
 
+    # ==========================================================================
+    #   Parse the response to the latest command
+    #
+    # ==========================================================================
+    def parse_response(self, subcmd, response, seqNum = None):
+        global printheader
+
+        # Since we perform verifications on the response, treat each command/response as a verification
+        self.test_verification_count = self.test_verification_count + 1
+
+        # Extract the response detail (if there are some detail bytes)
+        response_len           = response[TESTOP_RESP_IDX_LEN]
+        # If the response length is greater than 3 then we have some 'detail' bytes
+        if response_len > 3:
+            response_detail_len = response_len - 3
+            response_detail = response[TESTOP_RESP_IDX_DETAIL:(TESTOP_RESP_IDX_DETAIL + response_detail_len)]
+        else:
+            response_detail = response[TESTOP_RESP_IDX_DETAIL]
+            response_detail_len = 0
+
+        errcode = response[TESTOP_RESP_IDX_ERRORCODE]
+        self.last_subcmd = subcmd
+        self.last_result = None
+
+    #    logger.warning("Response Header(%s) %s="%(printheader,errcode) + convert_array_to_hex(response, response_len+2))
+        # Pipelined commands pass in the sequence number they were sent with
+        if seqNum is None:
+            seqNum = self.cmdSeqNum
+        thisResponseSeqNum = response[TESTOP_RESP_IDX_SEQNUM]
+        if seqNum != thisResponseSeqNum:
+            logger.warning("Response sequence number does not match command sequence number.  Expected=" + str(seqNum) +
+                           "  Actual=" + str(thisResponseSeqNum))
+            logger.warning("Response=" + convert_array_to_hex(response, len(response) ))
+
+        if errcode != TESTOP_ERRCODE_SUCCESS :
+            logger.warning('Command failed.  Command = ' + convert_subcmd_to_string(subcmd) +
+                           '  ErrorCode = ' + str(errcode) + "  " + convert_errcode_to_string(errcode))
+            self.test_error_count = self.test_error_count + 1
+            # In general, we can't parse the rest of the response if we have an error, so just return
+            return errcode
+
+
+        # Now perform the command-specific parsing
+        spec = COMMAND_SPECS[subcmd]
+        if spec is not None and spec.parser is not None:
+            self.last_result = spec.parser(self, response_detail)
+            logger.info("Command Response:         %s", self.last_result)
+        else:
+            # If command-specific parsing was not identified but we have detail information
+            # format the response in hex
+            if response_detail_len > 0:
+                logger.info("Command Response:         %s", LazyLogMessage(convert_array_to_hex, response_detail, response_detail_len))
+            else:
+                logger.info("Command Response:         OK")
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_PROTEST_RXSTART
-# ==========================================================================
-def send_command_protest_rxstart(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_HCI_PROTEST_RXSTART, dev_slot)
+        return errcode
 
+    # ==========================================================================
+
+
+    # ==========================================================================
+    #   Parse the GET_MEMORY_USAGE response
+    #  Return Parameters:
+    #    Bytes 0-3:   Memory Pool Size
+    #    Bytes 4-7:   Retention Memory Used
+    #    Bytes 8-11:  Non-retention Memory Used
+    #    Bytes 12-15: Retention Memory Reserved
+    # ==========================================================================
+    def parse_memory_usage_response(self, response):
+        # Parse the response into these attributes:
+        (self.last_memusage_memory_pool_size,
+         self.last_memusage_retention_memory_used,
+         self.last_memusage_nonretention_memory_used,
+         self.last_memusage_retention_memory_reserved) = decode_response(TESTOP_SUBCMD_HCI_EM_GET_MEMORY_USAGE, response)
+
+        return MemoryUsageResult(self.last_memusage_memory_pool_size,
+                                 self.last_memusage_retention_memory_used,
+                                 self.last_memusage_nonretention_memory_used,
+                                 self.last_memusage_retention_memory_reserved)
+
+    # ==========================================================================
+    #   Parse the SVLD_MEASUREMENT response
+    #
+    # Response:
+    #   Power Mode (byte 0):
+    #     0x00 = DCDC Step-Down Configuration.
+    #     0x01 = DCDC Off Configuration.
+    #     0x02 = DCDC Step-Up Configuration.
+    #     0x03 = External DCDC Configuration.
+    #     0x04 – 0xFF reserved
+    #   Measured SVLD (byte 1)
+    # ==========================================================================
+    def parse_SVLD_response(self, response):
+        # Parse the response into these attributes:
+        # Extract the return parameters from the response packet
+        self.last_SVLD_power_mode, self.last_SVLD_measurement = decode_response(TESTOP_SUBCMD_HCI_EM_SVLD_MEASUREMENT, response)
+
+
+        if   self.last_SVLD_power_mode == 0:
+            power_mode_string = "DCDC Step-Down Configuration"
+        elif self.last_SVLD_power_mode == 1:
+            power_mode_string = "DCDC Off Configuration"
+        elif self.last_SVLD_power_mode == 2:
+            power_mode_string = "DCDC Step-Up Configuration"
+        elif self.last_SVLD_power_mode == 3:
+            power_mode_string = "External DCDC Configuration"
+        else:
+            power_mode_string = "Invalid"
+        self.last_SVLD_power_mode=power_mode_string
+        self.last_SVLD_measurement=str(self.last_SVLD_measurement)
+
+
+        return SVLDResult(power_mode_string, self.last_SVLD_measurement)
+
+    # ==========================================================================
+    #   Parse the ProTest version of the SVLD_MEASUREMENT response
+    #   Same as the EM version, but no Power Mode
+    #
+    # Response:
+    #   Measured SVLD (byte 1)
+    # ==========================================================================
+    def parse_protest_SVLD_response(self, response):
+        # Parse the response into these attributes:
+        # Extract the return parameters from the response packet
+        self.last_SVLD_measurement, = decode_response(TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD, response)
+
+
+        return ProtestSVLDResult(self.last_SVLD_measurement)
+
+    # ==========================================================================
+    #   Parse the CALCULATE_CRC32 response
+    #  Return Parameters:
+    #    Bytes 0-3:   CRC32 over the memory range
+    # ==========================================================================
+    def parse_calculate_crc32_response(self, response):
+        # Parse the response into these attributes:
+        self.last_calccrc_crc32, = decode_response(TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX, response)
+        return CRC32Result(self.last_calccrc_crc32)
+
+    # ==========================================================================
+    #  Parse the PATCH_QUERY Response
+    #  Return Parameters:
+    #    Bytes 0-1:   short int container count
+    #    Bytes 2-3:   short int transfer count
+    #    Bytes 4-7:   long  int patch system state
+    #
+    #    TODO: parse the rest of the parameters
+    # ==========================================================================
+    def parse_patch_query(self, response):
+        # Parse the response into these attributes:
+        (self.last_patch_container_count,
+         self.last_patch_transfer_count,
+         self.last_patch_system_state,
+         self.last_patch_address,
+         self.last_patch_size,
+         self.last_patch_CRC32,
+         self.last_patch_build_num,
+         self.last_patch_user_build_num,
+         flags, version, container_type, container_id) = result = \
+            PatchQueryResult._make(decode_response(TESTOP_SUBCMD_HCI_EM_PATCH_QUERY, response))
+        self.last_patch_container_flags  = '{:02x} '.format(flags)
+        self.last_patch_container_version= '{:02x} '.format(version)
+        self.last_patch_container_type   = '{:02x} '.format(container_type)
+        self.last_patch_container_id     = '{:02x} '.format(container_id)
+        return result
+
+    # ==========================================================================
+    #   Parse the END_LE_TEST Response and the TRANSMITTER_TEST_END response
+    #  Return Parameters:
+    #    Bytes 0-1:   short int count of packets sent/received
+    # ==========================================================================
+    def parse_end_test_response(self, response):
+        # Parse the response into these attributes:
+        self.last_test_number_of_packets, = decode_response(TESTOP_SUBCMD_HCI_LE_TEST_END, response)
+        return EndTestResult(self.last_test_number_of_packets)
+
+    # ==========================================================================
+    #  Parse the response from READ_CURRENT
+    #  Return Parameters:
+    #    Formatted string suitable for logging
+    #  Return attribute:
+    #    int last_adc_measurement
+    # ==========================================================================
+    def parse_read_current_response(self, response):
+        # Parse the response into these attributes:
+        # The response contains two 32 bit words.
+        # The first is the channel; the second word is the measurement
+        channel, tmp_last_adc_measurement = decode_response(TESTOP_SUBCMD_READ_CURRENT, response)
+        self.last_adc_measurement = counts_to_current(channel, tmp_last_adc_measurement)
+
+        if self.measurement_sink is not None:
+            self.measurement_sink(MEASUREMENT_CURRENT, self.last_adc_measurement)
+
+        return CurrentResult(channel, self.last_adc_measurement)
+
+    # ==========================================================================
+    #  Parse the READ_9304_VER  response
+    #  Return Parameters:
+    #    Bytes 0-7:   Version array
+    #
+    #  This is the general case of the READ_DUT_VER and READ_REF_VER
+    #  TODO: deprecate the others
+    # ==========================================================================
+    def parse_read_dev_ver_response(self, response):
+        # Parse the response into the attribute:
+        self.last_dev_ver_string = decode_response(TESTOP_SUBCMD_HCI_READ_9304_VER, response)[0].hex()
+        return VersionResult(self.last_dev_ver_string)
+
+    # ==========================================================================
+    #  Parse the response from READ_ADC
+    #  Return Parameters:
+    #    Formatted string suitable for logging
+    #  Return attribute:
+    #    int last_adc_measurement
+    # ==========================================================================
+    def parse_read_ADC_response(self, response):
+        # The response contains two 32 bit words.
+        # The first is the channel; the second word is the measurement
+        channel, tmp_last_adc_measurement = decode_response(TESTOP_SUBCMD_READ_ADC, response)
+        self.last_adc_measurement = counts_to_current(channel, tmp_last_adc_measurement)
+
+        if self.measurement_sink is not None:
+            self.measurement_sink(MEASUREMENT_CURRENT, self.last_adc_measurement)
+
+        return CurrentResult(channel, self.last_adc_measurement)
+
+    # ==========================================================================
+    #  Parse the READ_DUT_VER  response
+    #  Return Parameters:
+    #    Bytes 0-7:   Version array
+    #
+    # ==========================================================================
+    def parse_read_dut_ver_response(self, response):
+        # Parse the response into the attribute:
+        self.last_dut_ver_string = decode_response(TESTOP_SUBCMD_READ_DUT_VER, response)[0].hex()
+        return VersionResult(self.last_dut_ver_string)
+
+    # ==========================================================================
+    #  Parse the READ_REF_VER response
+    #  Return Parameters:
+    #    Bytes 0-7:   Version array
+    #
+    # ==========================================================================
+    def parse_read_ref_ver_response(self, response):
+        # Parse the response into the attribute:
+        self.last_ref_ver_string = decode_response(TESTOP_SUBCMD_READ_REF_VER, response)[0].hex()
+        return VersionResult(self.last_ref_ver_string)
+
+    # ==========================================================================
+    #  Parse the READ_PTB_FW_VER response
+    #  Return Parameters:
+    #    Bytes 0-7:   Version text string
+    # ==========================================================================
+    def parse_board_ver_response(self, response):
+        # Parse the response into the attribute:
+        self.last_board_ver_string = convert_bytes_to_string(response[0:8])
+        return VersionResult(self.last_board_ver_string)
+
+    # ==========================================================================
+    #  Parse the READ_PTB_SN response
+    #  Return Parameters:
+    #    Bytes 0-31:   Board Serial Number text string
+    # ==========================================================================
+    def parse_board_serial_num_response(self, response):
+        # Parse the response into the attribute:
+        self.last_board_serial_num_string = convert_bytes_to_string(response[0:32])
+        return SerialNumberResult(self.last_board_serial_num_string)
+
+    # ==========================================================================
+    #  Parse the READ_AT_ADDR
+    #  Return Parameters:
+    #    Bytes 0-7:   Version array
+    # ==========================================================================
+    def parse_read_mem_response(self, response):
+        # Parse the response into the attribute:
+        self.last_read_mem_string = convert_array_to_hex(response, len(response))
+        return MemoryReadResult(bytes(response))
+
+    # ==========================================================================
+    #   Parse the SET_POWER_LEVEL_EX Response
+    #  Return Parameters:
+    #    Bytes 0:   max power level
+    # ==========================================================================
+    def parse_set_power_level_response(self, response):
+        # Parse the response into these attributes:
+        # A single byte is returned with the max power level index
+        self.last_max_power_level, = decode_response(TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL_EX, response)
+        return PowerLevelResult(self.last_max_power_level)
+
+    # ==========================================================================
+    #   Parse the 'tic count difference' packet into formated string
+    #   See structure definition TESTOP_Status_Packet_s in command_if.h
+    # ==========================================================================
+    def parse_xtalvalidation_response(self, statusDetail):
+        # Extract the tic counts for the REF and the DUT
+        self.last_xtal_ref_tics, self.last_xtal_dut_tics = decode_response(TESTOP_SUBCMD_EXEC_XTALVALIDATION, statusDetail)
+
+        return XtalValidationResult(self.last_xtal_ref_tics, self.last_xtal_dut_tics)
+
+    # ==========================================================================
+    #   Parse the 'tic count difference' packet into formated string
+    #   See structure definition TESTOP_Status_Packet_s in command_if.h
+    # ==========================================================================
+    def parse_BD_address_response(self, statusDetail):
+        # Extract the BD address [6 bytes]
+        self.last_BD_address = convert_array_to_hex(decode_response(TESTOP_SUBCMD_HCI_READ_BD_ADDR, statusDetail)[0], 6)
+
+        return BDAddressResult(self.last_BD_address)
+
+    # ==========================================================================
+    #   Parse the 'tic count difference' packet into formated string
+    #   See structure definition TESTOP_Status_Packet_s in command_if.h
+    # ==========================================================================
+    def parse_advertising_report_response(self, statusDetail):
+        (self.last_advertReport_totalReports,
+         self.last_advertReport_minRssi,
+         self.last_advertReport_maxRssi,
+         self.last_advertReport_aveRssi,
+         self.last_advertReport_lastRssi) = decode_response(TESTOP_SUBCMD_HCI_LE_GET_ADVERTISING_REPORT, statusDetail)
+
+        if self.measurement_sink is not None:
+            self.measurement_sink(MEASUREMENT_RSSI, self.last_advertReport_aveRssi)
+
+        return AdvertisingReportResult(self.last_advertReport_totalReports,
+                                       self.last_advertReport_minRssi,
+                                       self.last_advertReport_maxRssi,
+                                       self.last_advertReport_aveRssi,
+                                       self.last_advertReport_lastRssi)
+
+    # ==========================================================================
+    #   Parse the calibration values
+    #   3 ints are returned  5ma/100uA/1uA
+    # ==========================================================================
+    def parse_calibration_response(self, statusDetail):
+        tmp_5ma_cal, tmp_100ua_cal, tmp_1ua_cal = decode_response(TESTOP_SUBCMD_EXEC_CALIBRATION, statusDetail)
+        self.last_5mA_calibration = tmp_5ma_cal * CALIBRATION_SCALE[0]
+        self.last_100uA_calibration = tmp_100ua_cal * CALIBRATION_SCALE[1]
+        self.last_1uA_calibration = tmp_1ua_cal * CALIBRATION_SCALE[2]
+
+        return CalibrationResult(self.last_5mA_calibration, self.last_100uA_calibration, self.last_1uA_calibration)
+
+    # ==========================================================================
+    #   Parse the isBusy result
+    #
+    # ==========================================================================
+    def parse_is_busy_response(self, response):
+        if response[0] == 0:
+            self.last_is_busy = 0
+        elif response[0] == 1:
+            self.last_is_busy = 1
+
+        return BusyResult(self.last_is_busy)
+
+    # ==========================================================================
+    #   Parse the read_results result
+    #
+    # ==========================================================================
+    def parse_read_results_response(self, response):
+        if response[0] & FUNCTEST_BUSY == 0:
+            self.last_is_busy = 0
+        else:
+            self.last_is_busy = 1
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_PROTEST_RXSTOP
-# ==========================================================================
-def send_command_protest_rxstop(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_HCI_PROTEST_RXSTOP, dev_slot)
+        if self.last_is_busy == 0:
+            if (response[0] == TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP or response[0] == TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE or
+                    response[0] == TESTOP_SUBCMD_FUNCTEST_CURRENT_RX or response[0] == TESTOP_SUBCMD_FUNCTEST_CURRENT_TX):
+                # The response contains two 32 bit words.
+                # The first is the channel; the second word is the measurement
+                channel, tmp_last_adc_measurement = FUNCTEST_RESULT_CURRENT.unpack_from(response)
+                self.last_adc_measurement = counts_to_current(channel, tmp_last_adc_measurement)
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_DISABLE
-# ==========================================================================
-def send_command_protest_hf_xtal_disable(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_DISABLE, dev_slot)
+                if self.measurement_sink is not None:
+                    self.measurement_sink(MEASUREMENT_CURRENT, self.last_adc_measurement)
 
+                self.last_read_results = CurrentResult(channel, self.last_adc_measurement)
+                return self.last_read_results
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_ENABLE
-# ==========================================================================
-def send_command_protest_hf_xtal_enable(dev_slot = SLOT_DUT, clock_divider = 1):
-    return send_command_1argbyte(TESTOP_SUBCMD_HCI_PROTEST_HF_XTAL_ENABLE, dev_slot, clock_divider)
+            elif (response[0] == TESTOP_SUBCMD_FUNCTEST_PER_TX or response[0] == TESTOP_SUBCMD_FUNCTEST_PER_RX):
 
+                sent_packets, received_packets = FUNCTEST_RESULT_PER.unpack_from(response)
 
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_DISABLE
-# ==========================================================================
-def send_command_protest_lf_xtal_disable(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_DISABLE, dev_slot)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_DISABLE
-# ==========================================================================
-def send_command_protest_lf_xtal_enable(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_HCI_PROTEST_LF_XTAL_ENABLE, dev_slot)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD
-# ==========================================================================
-def send_command_protest_get_svld(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD, dev_slot)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_PROTEST_SET_GPIO
-# ==========================================================================
-def send_command_protest_set_gpio(dev_slot = SLOT_DUT, gpio_input_reg=0, gpio_output_reg=0,
-                              gpio_pullup_reg=1, gpio_pulldown_reg=0):
-    param_length = 16  # 4 32-bit words
-    # Pack 4 long words (little endian)
-    argvect = struct.pack('<LLLL', gpio_input_reg, gpio_output_reg, gpio_pullup_reg, gpio_pulldown_reg);
-
-    return send_command_with_args(TESTOP_SUBCMD_HCI_PROTEST_SET_GPIO, dev_slot, param_length, argvect)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_SET_CLOCK_SOURCE
-# ==========================================================================
-def send_command_em_set_clock_source(dev_slot = SLOT_DUT, clock_source = 0):
-    return send_command_1argbyte(TESTOP_SUBCMD_HCI_EM_SET_CLOCK_SOURCE, dev_slot, clock_source)
-
-
-# ==========================================================================
-#     Send command to the DVK board and fetch the result
-#     Command: TESTOP_SUBCMD_SET_CURRENT_RANGE_1/2/3
-# ==========================================================================
-def send_command_set_current_range(adc_range = 0):
-    subcmd = TESTOP_SUBCMD_SET_CURRENT_RANGE_1
-
-    if adc_range == 0:
-        subcmd = TESTOP_SUBCMD_SET_CURRENT_RANGE_1
-    elif adc_range == 1:
-        subcmd = TESTOP_SUBCMD_SET_CURRENT_RANGE_2
-    elif adc_range == 2:
-        subcmd = TESTOP_SUBCMD_SET_CURRENT_RANGE_3
-
-    return send_command(subcmd, SLOT_NA)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK
-# ==========================================================================
-def send_command_em_set_event_mask(dev_slot = SLOT_DUT, event_mask = 1):
-    return send_command_1argword(TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK, dev_slot, event_mask)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_SET_MEMORY_MODE
-# ==========================================================================
-def send_command_em_set_memory_mode(dev_slot = SLOT_DUT, memory_mode = 0):
-    return send_command_1argbyte(TESTOP_SUBCMD_HCI_EM_SET_MEMORY_MODE, dev_slot, memory_mode)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_READ_PTB_FW_VER
-# ==========================================================================
-def send_command_read_board_ver():
-    return send_command( TESTOP_SUBCMD_READ_PRODVK_FW_VER, SLOT_NA )
-
-
-# ==========================================================================
-#     Send command to DVK board and fetch the result
-#     Command: TESTOP_SUBCMD_HCI_EM_SET_POWER_MODE_EX
-# ==========================================================================
-def send_command_em_set_power_mode(dev_slot = SLOT_DUT, power_mode = 0):
-    return send_command_1argbyte(TESTOP_SUBCMD_HCI_EM_SET_POWER_MODE_EX, dev_slot, power_mode)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_SET_PUBLIC_ADDRESS
-# ==========================================================================
-def send_command_em_set_public_address(dev_slot = SLOT_DUT, public_address = 0):
-
-    paramLength = 6
-    # Pack the 6 bytes of the address
-    argvect = struct.pack('BBBBBB',
-                          public_address[0],
-                          public_address[1],
-                          public_address[2],
-                          public_address[3],
-                          public_address[4],
-                          public_address[5]);
-
-    return send_command_with_args(TESTOP_SUBCMD_HCI_EM_SET_PUBLIC_ADDRESS, dev_slot, paramLength, argvect)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_SET_RF_ACTIVITY_SIGNAL
-# ==========================================================================
-def send_command_em_set_rf_activity_signal(dev_slot = SLOT_DUT, rf_signal_enable = 0, rf_signal_gpio_output = 0):
-    return send_command_2argbytes(TESTOP_SUBCMD_HCI_EM_SET_RF_ACTIVITY_SIGNAL_EX, dev_slot, rf_signal_enable, rf_signal_gpio_output)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL
-# ==========================================================================
-def send_command_em_set_rf_power_level(dev_slot = SLOT_DUT, transmit_power_level = 0):
-    return send_command_1argbyte(TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL_EX, dev_slot, transmit_power_level)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_SET_SLEEP_OPTIONS
-# ==========================================================================
-def send_command_em_set_sleep_options(dev_slot = SLOT_DUT, sleep_options = 0):
-    return send_command_1argbyte(TESTOP_SUBCMD_HCI_EM_SET_SLEEP_OPTIONS, dev_slot, sleep_options)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_SET_REF_CLOCK
-# ==========================================================================
-def send_command_set_ref_clock(
-        pllA_mult = 24, pllA_num = 0, pllA_denom = 1,
-        pllB_mult = 24, pllB_num = 0, pllB_denom = 1,
-        out0_source = SI5351_PLL_A, out0_div = 1326, out0_num = 0, out0_denom = 1, out0_rdiv = SI5351_R_DIV_16,
-        out1_source = SI5351_PLL_A, out1_div = 1326, out1_num = 0, out1_denom = 1, out1_rdiv = SI5351_R_DIV_16,
-        out2_source = SI5351_PLL_A, out2_div = 1326, out2_num = 0, out2_denom = 1, out2_rdiv = SI5351_R_DIV_16):
-
-    paramLength = 54
-    argvect = struct.pack(
-        '<BIIBIIBHIIBBHIIBBHIIB',
-        pllA_mult, pllA_num, pllA_denom,                        # PLL A Config (BII)
-        pllB_mult, pllB_num, pllB_denom,                        # PLL B Config (BII)
-        out0_source, out0_div, out0_num, out0_denom, out0_rdiv, # Output 0 Config (BHIIB)
-        out1_source, out1_div, out1_num, out1_denom, out1_rdiv, # Output 1 Config (BHIIB)
-        out2_source, out2_div, out2_num, out2_denom, out2_rdiv) # Output 2 Config (BHIIB)
-
-    return send_command_with_args(TESTOP_SUBCMD_SET_REF_CLOCK, SLOT_NA, paramLength, argvect)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_SET_UART_BAUD_RATE
-#       Default baud_rate = 5 -> 19200 bps
-# ==========================================================================
-def send_command_em_set_uart_baud_rate(dev_slot = SLOT_DUT, baud_rate = 5):
-    return send_command_1argbyte(TESTOP_SUBCMD_HCI_EM_SET_UART_BAUD_RATE, dev_slot, baud_rate)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_RESET
-# ==========================================================================
-def send_command_soft_reset(dev_slot = SLOT_DUT):
-    return send_command( TESTOP_SUBCMD_HCI_RESET, dev_slot )
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Version specifically for TESTOP_SUBCMD_RESET_9304
-
-# ==========================================================================
-def send_command_hard_reset(dev_slot = SLOT_DUT):
-    return send_command( TESTOP_SUBCMD_RESET_9304, dev_slot )
-
-
-# ==========================================================================
-#     Send command to PTB and fetch the result
-#     Version specifically for TESTOP_SUBCMD_HCI_READ_BD_ADDR
-# ==========================================================================
-def send_command_read_BLE_address(dev_slot = SLOT_DUT):
-    return send_command( TESTOP_SUBCMD_HCI_READ_BD_ADDR, dev_slot )
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_LE_SET_ADVERTISING_DATA
-# ==========================================================================
-def send_command_le_set_Advertising_data(dev_slot = SLOT_DUT, advertising_data_length = 1, advertising_data = [0]):
-    paramLength = advertising_data_length + 1
-    # First byte must be the number of advertising_data bytes (0-31)
-    argvect = struct.pack('B', advertising_data_length)
-
-    # Now add to the vector all the advertising_data bytes
-    i = 0
-    while i < advertising_data_length:
-        argvect = argvect + struct.pack('B', advertising_data[i])
-        i = i + 1
-
-    return send_command_with_args(TESTOP_SUBCMD_HCI_SET_ADVERTISING_DATA, dev_slot, paramLength, argvect)
-
-# ==========================================================================
-#     Send command to the DVK board and fetch the result
-#     Version specifically for TESTOP_SUBCMD_HCI_SET_ADVERTISING_PARAMETERS
-#   Note: the min and max values are mapped to the upper byte of a U16 and
-#       the chip uses that U16 value * 0.625ms for the time.  Example: the
-#       default value (0x01) => 0x0100 * 0.625ms = 160ms delta time.
-# ==========================================================================
-def send_command_le_set_Advertising_parameters(dev_slot = SLOT_DUT, min=0x01, max=0x01, AdType=0x00, AdChMap=0x07):
-    return send_command_4argbytes( TESTOP_SUBCMD_HCI_SET_ADVERTISING_PARAMETERS, dev_slot, min, max, AdType, AdChMap )
-
-# ==========================================================================
-#     Send command to PTB and fetch the result
-#     Version specifically for TESTOP_SUBCMD_HCI_LE_SET_ADVERTISE_ENABLE
-#     0 = OFF / 1 = ON
-# ==========================================================================
-def send_command_le_set_Advertising_enable(dev_slot = SLOT_DUT, enableState=1):
-    return send_command_1argbyte( TESTOP_SUBCMD_HCI_LE_SET_ADVERTISE_ENABLE, dev_slot, enableState )
-
-# ==========================================================================
-#     Send command to PTB and fetch the result
-#     Version specifically for TESTOP_SUBCMD_HCI_LE_CLEAR_WHITE_LIST (no params)
-# ==========================================================================
-def send_command_le_clear_White_List(dev_slot = SLOT_REF):
-    return send_command( TESTOP_SUBCMD_HCI_LE_CLEAR_WHITE_LIST, dev_slot )
-
-# ==========================================================================
-#     Send command to PTB and fetch the result
-#     Version specifically for TESTOP_SUBCMD_HCI_LE_ADD_DEVICE_TO_WHITE_LIST
-# ==========================================================================
-def send_command_le_add_device_to_White_List(dev_slot = SLOT_REF, addressType = '00', bleAddress = '00'):
-    msg = bytearray(addressType.encode()+bleAddress.encode())
-    return send_command_with_args( TESTOP_SUBCMD_HCI_LE_ADD_DEVICE_TO_WHITE_LIST, dev_slot, len(msg), msg)
-
-# ==========================================================================
-#     Send command to PTB and fetch the result
-#     Version specifically for TESTOP_SUBCMD_HCI_LE_SET_SCAN_PARAMETERS
-# ==========================================================================
-def send_command_le_set_Scan_Parameters(dev_slot = SLOT_REF, scanType='00', scanIntvl='0004', scanWindow='0004', addrType='00', filterPolicy='00' ):
-    msg = bytearray(scanType.encode()+scanIntvl.encode()+scanWindow.encode()+addrType.encode()+filterPolicy.encode())
-    return send_command_with_args( TESTOP_SUBCMD_HCI_LE_SET_SCAN_PARAMETERS, dev_slot, len(msg), msg )
-
-# ==========================================================================
-#     Send command to PTB and fetch the result
-#     Version specifically for TESTOP_SUBCMD_HCI_LE_SET_SCAN_ENABLE
-# ==========================================================================
-def send_command_le_set_Scan_Enable(dev_slot = SLOT_REF, enableState=1, filterDups=0):
-    return send_command_2argbytes( TESTOP_SUBCMD_HCI_LE_SET_SCAN_ENABLE, dev_slot, enableState, filterDups)
-
-# ==========================================================================
-#     Send command to PTB and fetch the result
-#     Version specifically for TESTOP_SUBCMD_HCI_LE_GET_ADVERTISING_REPORT
-# ==========================================================================
-def send_command_get_advertising_report_data(dev_slot = SLOT_REF):
-    return send_command( TESTOP_SUBCMD_HCI_LE_GET_ADVERTISING_REPORT, dev_slot)
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_LE_TRANSMITTER_TEST
-# ==========================================================================
-def send_command_le_transmitter_test(dev_slot = SLOT_DUT, channel = 1, payload_len = 10, payload_type = 1):
-    return send_command_3argbytes(TESTOP_SUBCMD_HCI_LE_TRANSMITTER_TEST, dev_slot, channel, payload_len, payload_type)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST
-# ==========================================================================
-def send_command_le_receiver_test(dev_slot = SLOT_DUT, channel = 1):
-    return send_command_1argbyte(TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST, dev_slot, channel)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_SVLD_MEASUREMENT
-# ==========================================================================
-def send_command_em_svld_measurement(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_HCI_EM_SVLD_MEASUREMENT, dev_slot)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS
-# ==========================================================================
-def send_command_em_read_at_address(dev_slot = SLOT_DUT, start_address = 0x1000, bytes_to_read = 4):
-    return send_command_2argwordbyte(TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS, dev_slot, start_address,   bytes_to_read)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_WRITE_AT_ADDRESS
-# ==========================================================================
-def send_command_em_write_at_address(dev_slot = SLOT_DUT, start_address = 0x1000, data_buf = [0], bytes_to_write = 1):
-    paramLength = 4 + 4
-    # Pack the start address
-    argvect = struct.pack('L', start_address)
-
-    i = 0
-    while i < bytes_to_write:
-        argvect = argvect + struct.pack('B', data_buf[i])
-        i = i + 1
-
-    return send_command_with_args(TESTOP_SUBCMD_HCI_EM_WRITE_AT_ADDRESS, dev_slot, paramLength, argvect)
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST
-# ==========================================================================
-def send_command_em_transmitter_test(dev_slot = SLOT_DUT, test_mode = 0, channel = 0x13, packet_len = 37, payload_type = 0):
-    return send_command_4argbytes(TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST, dev_slot, test_mode, channel, packet_len, payload_type)
-
-
-
-# ==========================================================================
-#   Send command to the DVK board and fetch the result
-#   Command: TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST_END
-# ==========================================================================
-def send_command_em_transmitter_test_end(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST_END, dev_slot)
-
-
-# ==========================================================================
-#     Run test to get the clock tics from XTAL and Ref Clock.  The input is
-#       the maximum number of clock to get from the DUT.  This test will
-#       then shut down both clocks and report the counts.
-#
-# ==========================================================================
-def execute_xtal_validation(maxDutClocks):
-    return send_command_1argword(TESTOP_SUBCMD_EXEC_XTALVALIDATION, SLOT_NA, maxDutClocks)
-
-
-# ==========================================================================
-#     TEMPORARY!  Allows you to set the MUXes to any state in any combination!!
-#
-# ==========================================================================
-def send_command_set_mux_state(source = 0, state = 0):
-    return send_command_1argbyte(TESTOP_SUBCMD_SET_MUX_STATE, source, state)
-
-
-# ==========================================================================
-#     Run calibration test
-#
-# ==========================================================================
-def execute_current_calibration(code=0):
-    dev_slot = SLOT_DUT     # REF current cannot be calibrated
-    return send_command_1argbyte(TESTOP_SUBCMD_EXEC_CALIBRATION, dev_slot, code)
-
-# ==========================================================================
-#     Get the current (DUT is in ACTIVE mode and auto adjusts the current calculation)
-#
-# ==========================================================================
-def send_command_read_current(dev_slot = SLOT_DUT):
-    return send_command(TESTOP_SUBCMD_READ_CURRENT, dev_slot)
-
-# ==========================================================================
-#     Get the current (DUT is in ACTIVE mode and auto adjusts the current calculation)
-#
-# ==========================================================================
-def send_command_read_ADC(dev_slot = SLOT_DUT, adcIndex=0):
-    return send_command_1argbyte(TESTOP_SUBCMD_READ_ADC, dev_slot, adcIndex)
-
-# ==========================================================================
-#     Convert a two byte array into an int
-# ==========================================================================
-def convert_array_to_short(array):
-    # EM9304 uses little endian byte order
-    low_byte = array[0]
-    hi_byte  = array[1]
-    intval = (hi_byte << 8) + low_byte
-    return intval
-
-
-# ==========================================================================
-#     Convert a 4 byte array into a 32 bit long
-# ==========================================================================
-def convert_array_to_long(array):
-    # EM9304 uses little endian byte order
-    intval = (array[3] << 24) + (array[2] << 16) + (array[1] << 8) + array[0]
-    return intval
-
-
-# ==========================================================================
-#     Convert a 4 byte array into a signed 32 bit long
-# ==========================================================================
-def convert_array_to_slong(array):
-    # EM9304 uses little endian byte order
-    intval = (array[3] << 24) + (array[2] << 16) + (array[1] << 8) + array[0]
-    if (2147483648 <= intval):
-        intval = intval - 4294967296
-    return intval
-
-# ==========================================================================
-#     Convert a 4 byte array into a signed 32 bit long
-# ==========================================================================
-def convert_array_to_int(array):
-    # EM9304 uses little endian byte order
-    intval = (array[0] << 24) + (array[1] << 16) + (array[2] << 8) + array[3]
-    if (2147483648 <= intval):
-        intval = intval - 4294967296
-    return intval
-
-
-# ==========================================================================
-#     Convert int array into hex string for display
-# ==========================================================================
-def convert_array_to_hex(array, num):
-    hexstring = ''
-    i = 0
-    while i < num:
-        #hexstring = hexstring + hex(array[i]) + ' '
-        hexstring = hexstring + '{:02x}'.format(array[i]) + ' '
-        i = i + 1
-
-    return hexstring
-
-
-# ==========================================================================
-#     Convert int array into hex string for display
-# ==========================================================================
-def convert_array_to_hex_no_spaces(array, num):
-    hexstring = ''
-    i = 0
-    while i < num:
-        hexstring = hexstring + '{:02x}'.format(array[i])
-        i = i + 1
-    return hexstring
-
-# ==========================================================================
-#     Convert error code to string
-#
-# ==========================================================================
-def convert_errcode_to_string(errcode):
-    if errcode == TESTOP_ERRCODE_SUCCESS:
-        return "Success"
-    elif errcode == TESTOP_ERRCODE_UNK_CMD:
-        return "Unknown command"
-    elif errcode == TESTOP_ERRCODE_HW_FAIL:
-        return "HW Failure"
-    elif errcode == TESTOP_ERRCODE_NOT_ALLOWED:
-        return "Command not allowed"
-    elif errcode == TESTOP_ERRCODE_BAD_PARAMS:
-        return "Invalid parameters"
-    elif errcode == TESTOP_ERRCODE_CMD_TIMEOUT:
-        return "Command timeout"
-    elif errcode == TESTOP_ERRCODE_TX_BUSY:
-        return "Command Tx failed because device is busy"
-    elif errcode == TESTOP_ERRCODE_TX_ERR:
-        return "Command Tx failed because invalid command"
-    elif errcode == TESTOP_ERRCODE_CMD_COMPLETE_NOT_RECEIVED:
-        return "Command complete not received"
-    else:
-        return "unknown error code"
-
-
-# ==========================================================================
-#     Convert a subcmd index to a name string
-# ==========================================================================
-def convert_subcmd_to_string(subcmd_index):
-
-        if   subcmd_index == TESTOP_SUBCMD_READ_PRODVK_FW_VER:
-            return          'TESTOP_SUBCMD_READ_PRODVK_FW_VER'
-        elif subcmd_index == TESTOP_SUBCMD_READ_PRODVK_SN:
-            return          'TESTOP_SUBCMD_READ_PRODVK_SN'
-        elif subcmd_index == TESTOP_SUBCMD_MODESWITCH_TO_TESTOP:
-            return          'TESTOP_SUBCMD_MODESWITCH_TO_TESTOP'
-        elif subcmd_index == TESTOP_SUBCMD_MODESWITCH_TO_BRIDGE:
-            return          'TESTOP_SUBCMD_MODESWITCH_TO_BRIDGE'
-        elif subcmd_index == TESTOP_SUBCMD_READ_DUT_VER:
-            return          'TESTOP_SUBCMD_READ_DUT_VER'
-        elif subcmd_index == TESTOP_SUBCMD_READ_REF_VER:
-            return          'TESTOP_SUBCMD_READ_REF_VER'
-        elif subcmd_index == TESTOP_SUBCMD_READ_CURRENT:
-            return          'TESTOP_SUBCMD_READ_CURRENT'
-        elif subcmd_index == TESTOP_SUBCMD_READ_ADC:
-            return          'TESTOP_SUBCMD_READ_ADC'
-        elif subcmd_index == TESTOP_SUBCMD_UNUSED:
-            return          'TESTOP_SUBCMD_UNUSED'
-        elif subcmd_index == TESTOP_SUBCMD_READ_STATUS:
-            return          'TESTOP_SUBCMD_READ_STATUS'
-        elif subcmd_index == TESTOP_SUBCMD_SET_CURRENT_RANGE_1:
-            return          'TESTOP_SUBCMD_SET_CURRENT_RANGE_1'
-        elif subcmd_index == TESTOP_SUBCMD_SET_CURRENT_RANGE_2:
-            return          'TESTOP_SUBCMD_SET_CURRENT_RANGE_2'
-        elif subcmd_index == TESTOP_SUBCMD_SET_CURRENT_RANGE_3:
-            return          'TESTOP_SUBCMD_SET_CURRENT_RANGE_3'
-        elif subcmd_index == TESTOP_SUBCMD_RESET_9304:
-            return          'TESTOP_SUBCMD_RESET_9304'
-        elif subcmd_index == TESTOP_SUBCMD_SET_REF_CLOCK:
-            return          'TESTOP_SUBCMD_SET_REF_CLOCK'
-        elif subcmd_index == TESTOP_SUBCMD_EXEC_XTALVALIDATION:
-            return          'TESTOP_SUBCMD_EXEC_XTALVALIDATION'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_READ_9304_VER:
-            return          'TESTOP_SUBCMD_HCI_READ_9304_VER'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST:
-            return          'TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_LE_TRANSMITTER_TEST:
-            return          'TESTOP_SUBCMD_HCI_LE_TRANSMITTER_TEST'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_LE_TEST_END:
-            return          'TESTOP_SUBCMD_HCI_LE_TEST_END'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_RESET:
-            return          'TESTOP_SUBCMD_HCI_RESET'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_READ_BD_ADDR:
-            return          'TESTOP_SUBCMD_HCI_READ_BD_ADDR'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_SET_ADVERTISING_DATA:
-            return          'TESTOP_SUBCMD_HCI_SET_ADVERTISING_DATA'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_SET_ADVERTISING_PARAMETERS:
-            return          'TESTOP_SUBCMD_HCI_SET_ADVERTISING_PARAMETERS'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_LE_SET_ADVERTISE_ENABLE:
-            return          'TESTOP_SUBCMD_HCI_LE_SET_ADVERTISE_ENABLE'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_LE_CLEAR_WHITE_LIST:
-            return          'TESTOP_SUBCMD_HCI_LE_CLEAR_WHITE_LIST'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_LE_ADD_DEVICE_TO_WHITE_LIST:
-            return          'TESTOP_SUBCMD_HCI_LE_ADD_DEVICE_TO_WHITE_LIST'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_LE_SET_SCAN_PARAMETERS:
-            return          'TESTOP_SUBCMD_HCI_LE_SET_SCAN_PARAMETERS'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_LE_SET_SCAN_ENABLE:
-            return          'TESTOP_SUBCMD_HCI_LE_SET_SCAN_ENABLE'
-        elif subcmd_index == TESTOP_SUBCMD_HCI_LE_GET_ADVERTISING_REPORT:
-            return          'TESTOP_SUBCMD_HCI_LE_GET_ADVERTISING_REPORT'
-        elif subcmd_index == TESTOP_SUBCMD_EXEC_CALIBRATION:
-            return          'TESTOP_SUBCMD_EXEC_CALIBRATION'
-        elif subcmd_index == TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP:
-            return          'TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP'
-        elif subcmd_index == TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE:
-            return          'TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE'
-        elif subcmd_index == TESTOP_SUBCMD_FUNCTEST_CURRENT_RX:
-            return          'TESTOP_SUBCMD_FUNCTEST_CURRENT_RX'
-        elif subcmd_index == TESTOP_SUBCMD_FUNCTEST_CURRENT_TX:
-            return          'TESTOP_SUBCMD_FUNCTEST_CURRENT_TX'
-        elif subcmd_index == TESTOP_SUBCMD_FUNCTEST_PER_TX:
-            return          'TESTOP_SUBCMD_FUNCTEST_PER_TX'
-        elif subcmd_index == TESTOP_SUBCMD_FUNCTEST_PER_RX:
-            return          'TESTOP_SUBCMD_FUNCTEST_PER_RX'
-        elif subcmd_index == TESTOP_SUBCMD_FUNCTEST_ADVERTISE:
-            return 'TESTOP_SUBCMD_FUNCTEST_ADVERTISE'
-        elif subcmd_index == TESTOP_SUBCMD_FUNCTEST_RSSI:
-            return          'TESTOP_SUBCMD_FUNCTEST_RSSI'
-        elif subcmd_index == TESTOP_SUBCMD_FUNCTEST_XTAL:
-            return          'TESTOP_SUBCMD_FUNCTEST_XTAL'
-        elif subcmd_index == TESTOP_SUBCMD_FUNCTEST_PWR_MODE:
-            return          'TESTOP_SUBCMD_FUNCTEST_PWR_MODE'
-        elif subcmd_index == TESTOP_SUBCMD_FUNCTEST_SVLD:
-            return          'TESTOP_SUBCMD_FUNCTEST_SVLD'
-        elif subcmd_index == TESTOP_SUBCMD_FUNCTEST_READ_RESULTS:
-            return 'TESTOP_SUBCMD_FUNCTEST_READ_RESULTS'
-        elif subcmd_index == TESTOP_SUBCMD_GPIO_CONFIGURE_IO:
-            return 'TESTOP_SUBCMD_GPIO_CONFIGURE_IO'
-        elif subcmd_index == TESTOP_SUBCMD_GPIO_SET_IO:
-            return 'TESTOP_SUBCMD_GPIO_SET_IO'
-        elif subcmd_index == TESTOP_SUBCMD_GPIO_READ_DIGITAL_IO:
-            return 'TESTOP_SUBCMD_GPIO_READ_DIGITAL_IO'
-        elif subcmd_index == TESTOP_SUBCMD_GPIO_READ_ANALOG_IO:
-            return 'TESTOP_SUBCMD_GPIO_READ_ANALOG_IO'
-        elif subcmd_index == TESTOP_SUBCMD_GPIO_DISABLE_IO_SET:
-            return 'TESTOP_SUBCMD_GPIO_DISABLE_IO_SET'
-        elif subcmd_index == TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT:
-            return 'TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT'
-        elif subcmd_index == TESTOP_SUBCMD_WRITE_DAC_LTC2633:
-            return 'TESTOP_SUBCMD_WRITE_DAC_LTC2633'
-        elif subcmd_index == TESTOP_SUBCMD_READ_ADC_MAX11614EEE:
-            return 'TESTOP_SUBCMD_READ_ADC_MAX11614EEE'
-        elif subcmd_index == TESTOP_SUBCMD_UPLOAD_TO_9304:
-            return 'TESTOP_SUBCMD_UPLOAD_TO_9304'
-        elif subcmd_index == TESTOP_SUBCMD_READ_CRC:
-            return 'TESTOP_SUBCMD_READ_CRC'
-        elif subcmd_index > 0x40:
-            # Use table lookup for the EM Vendor specific commands (which start at 0x40)
-            return subcmd_names[subcmd_index - 0x40]
-        else:
-            return 'unknown'
-
-
-# ==========================================================================
-#     Send command to Production Test Board and fetch the result
-#     This version supports additional args as per argcnt (in bytes)
-#     The number of bytes indicated are extracted from argvect (a byte array)
-# ==========================================================================
-def send_command_with_args(subcmd, devSlot, argcnt, argvect):
-    global dev
-    global cmdSeqNum
-    global lastResponseDetailString
-    global testErrorCount
-
-    #logger.info('Send Command:   %s %d  %d %s'%(convert_subcmd_to_string(subcmd), devSlot, argcnt,convert_array_to_hex(argvect, argcnt)))
-    # Increment the sequence number each invocation
-    # Limit it to one byte
-    cmdSeqNum = (cmdSeqNum + 1) % 256
-
-    # The number of bytes after the command and length bytes
-    # For simplicity, always use at least 3 param bytes even though we don't always use 3
-    paramLength = 3 + argcnt
-
-    # Pack the header, including the devSlot (which is technically the first arg byte)
-    header = struct.pack('BBBBB',   COMMAND_TESTOP, paramLength, subcmd, cmdSeqNum, devSlot)
-
-    if argcnt == 0:
-        ret = dev.write(DVK_USB_WRITE_EP, struct.pack('BBBBB',    COMMAND_TESTOP, paramLength, subcmd, cmdSeqNum, devSlot))
-    elif argcnt == 1:
-        argbyte0 = argvect[0] & 0xff
-        ret = dev.write(DVK_USB_WRITE_EP, struct.pack('BBBBBB',   COMMAND_TESTOP, paramLength, subcmd, cmdSeqNum, devSlot, argbyte0))
-    elif argcnt == 2:
-        ret = dev.write(DVK_USB_WRITE_EP, struct.pack('BBBBBBB',  COMMAND_TESTOP, paramLength, subcmd, cmdSeqNum, devSlot, argvect[0], argvect[1]))
-    elif argcnt == 3:
-        ret = dev.write(DVK_USB_WRITE_EP, struct.pack('BBBBBBBB', COMMAND_TESTOP, paramLength, subcmd, cmdSeqNum, devSlot,
-                                    argvect[0],argvect[1],argvect[2]))
-    elif argcnt == 4:
-        ret = dev.write(DVK_USB_WRITE_EP, struct.pack('BBBBBBBBB', COMMAND_TESTOP, paramLength, subcmd, cmdSeqNum, devSlot,
-                                    argvect[0], argvect[1], argvect[2], argvect[3]))
-
-    # for larger argcnts, use a loop to construct the argvect
-    elif argcnt > 4:
-        # Load the command buf with the header and then concatenate all the arg bytes from argvect
-        command_buf = header
-        i = 0
-        while i < argcnt:
-            command_buf = command_buf + struct.pack('B', argvect[i])
-            i = i + 1
-
-        # Write the command to the USB/HID interface
-        ret = dev.write(DVK_USB_WRITE_EP, command_buf)
-
-    else:
-        ret = 0
-        logger.warning('Command failed.  Invalid number of arguments= ' + str(argcnt))
-        testErrorCount = testErrorCount + 1
-
-
-    # Abort if the command was not successfully sent
-    if ret <= 0:
-        return TESTOP_ERRCODE_BAD_PARAMS
-
-    # Every command should provide a response
-    # If the operation takes longer than the timeout interval, it should still
-    # respond indicating the operation is in-progress
-    #response = dev.read(DVK_USB_READ_EP, DVK_USB_EP_SIZE, DVK_USB_TIMEOUT)
-    response = read_response()
-
-    # Parse the response buffer.
-    # A badly formed response might result in a variety of exceptions, so catch
-    # exceptions and try to continue
-    try:
-        errcode = parse_response(subcmd, response)
-    except Exception as ex:
-        errcode = TESTOP_ERRCODE_RESPONSE_PARSE_ERR
-        # Log both the raw buffer and the message from the exception
-        logger.warning('Response parse error.  Raw Response buffer: ' + convert_array_to_hex(response, 64))
-        logger.warning('Response parse error.  Exception message:   ' + str(getattr(ex, 'message', ex)))
-
-
-    return errcode
-
-def send_command_message(subcmd, devSlot, msgLen, message):
-    global dev
-    global cmdSeqNum
-    global lastResponseDetailString
-    global testErrorCount
-
-    logger.info('Send Command:             ' + convert_subcmd_to_string(subcmd))
-    # Increment the sequence number each invocation
-    # Limit it to one byte
-    cmdSeqNum = (cmdSeqNum + 1) % 256
-
-    # The number of bytes after the command and length bytes
-    # For simplicity, always use at least 3 param bytes even though we don't always use 3
-    paramLength = 3 + int(msgLen)
-
-    # Pack the header, including the devSlot (which is technically the first arg byte)
-    header = struct.pack('BBBBBB',   COMMAND_TESTOP, paramLength, subcmd, cmdSeqNum, devSlot, msgLen )
-
-
-
-    command_buf = header
-    ret = dev.write(DVK_USB_WRITE_EP, command_buf)
-
-
-
-    # for larger argcnts, use a loop to construct the argvect
-#     if msgLen > 0:
-#         # Load the command buf with the header and then concatenate all the arg bytes from argvect
-#         command_buf = header
-#         i = 0
-#         while i < msgLen:
-#             command_buf = command_buf + struct.pack('B', message[i] )
-#             i = i + 1
-#
-#         # Write the command to the USB/HID interface
-#         ret = dev.write(DVK_USB_WRITE_EP, command_buf)
-#
-#     else:
-#         ret = 0
-#         logger.warning('Command failed.  Invalid length= ' + str(msgLen))
-#         #testErrorCount = testErrorCount + 1
-#
-#     # Abort if the command was not successfully sent
-    if ret <= 0:
-        return TESTOP_ERRCODE_BAD_PARAMS
-
-    # Every command should provide a response
-    # If the operation takes longer than the timeout interval, it should still
-    # respond indicating the operation is in-progress
-    #response = dev.read(DVK_USB_READ_EP, DVK_USB_EP_SIZE, DVK_USB_TIMEOUT)
-    response = read_response()
-
-    # Parse the response buffer.
-    # A badly formed response might result in a variety of exceptions, so catch
-    # exceptions and try to continue
-    try:
-        errcode = parse_response(subcmd, response)
-    except Exception as ex:
-        errcode = TESTOP_ERRCODE_RESPONSE_PARSE_ERR
-        # Log both the raw buffer and the message from the exception
-        logger.warning('Response parse error.  Raw Response buffer: ' + convert_array_to_hex(response, len(response)))
-        logger.warning('Response parse error.  Exception message:   ' + str(getattr(ex, 'message', ex)))
-
-
-    return errcode
-
-# ==========================================================================
-#   Read a response packet
-#
-# ==========================================================================
-def read_response():
-    try:
-        response = dev.read(DVK_USB_READ_EP, DVK_USB_EP_SIZE, DVK_USB_TIMEOUT)
-        if response[0] != COMMAND_TESTOP:
-            # Not a valid testop response.  Probably a spontaneous event from the device
-            # Discard and read another packet
-            #response = dev.read(DVK_USB_READ_EP, DVK_USB_EP_SIZE, DVK_USB_TIMEOUT)
-            logger.warning("Spontaneous Response.  Response Header=" + convert_array_to_hex(response, len(response)))
-
-        return response
-
-    except usb.core.USBError:
-        logger.error('No response received on USB port! Program exiting.')
-
-        sys.exit(1)
-
-# ==========================================================================
-#   Parse the response to the latest command
-#
-# ==========================================================================
-def parse_response(subcmd, response):
-    global test_error_count
-    global test_verification_count
-    global printheader
-
-    # Since we perform verifications on the response, treat each command/response as a verification
-    test_verification_count = test_verification_count + 1
-
-    # Convert the response detail to a printable string (if there is some detail bytes)
-    response_len           = response[TESTOP_RESP_IDX_LEN]
-    # If the response length is greater than 3 then we have some 'detail' bytes
-    if response_len > 3:
-        response_detail_len = response_len - 3
-        response_detail = response[TESTOP_RESP_IDX_DETAIL:(TESTOP_RESP_IDX_DETAIL + response_detail_len)]
-        response_detail_string = convert_array_to_hex(response_detail, response_detail_len)
-    else:
-        response_detail = response[TESTOP_RESP_IDX_DETAIL]
-        response_detail_string = ''
-        response_detail_len = 0
-
-    errcode = response[TESTOP_RESP_IDX_ERRORCODE]
-
-#    logger.warning("Response Header(%s) %s="%(printheader,errcode) + convert_array_to_hex(response, response_len+2))
-    thisResponseSeqNum = response[TESTOP_RESP_IDX_SEQNUM]
-    if cmdSeqNum != thisResponseSeqNum:
-        logger.warning("Response sequence number does not match command sequence number.  Expected=" + str(cmdSeqNum) +
-                       "  Actual=" + str(thisResponseSeqNum))
-        logger.warning("Response=" + convert_array_to_hex(response, len(response) ))
-
-    if errcode != TESTOP_ERRCODE_SUCCESS :
-        logger.warning('Command failed.  Command = ' + convert_subcmd_to_string(subcmd) +
-                       '  ErrorCode = ' + str(errcode) + "  " + convert_errcode_to_string(errcode))
-        test_error_count = test_error_count + 1
-        # In general, we can't parse the rest of the response if we have an error, so just return
-        return errcode
-
-
-    # Now perform the command-specific parsing
-    if subcmd == TESTOP_SUBCMD_READ_STATUS:
-        logger.info("Command Response:         " + parse_status(response_detail))
-    elif subcmd == TESTOP_SUBCMD_HCI_EM_GET_MEMORY_USAGE:
-        logger.info("Command Response:         " + parse_memory_usage_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_HCI_EM_PATCH_QUERY:
-        logger.info("Command Response:         " + parse_patch_query(response_detail))
-    elif subcmd == TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS:
-        logger.info("Command Response:         " + parse_read_mem_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_HCI_EM_SVLD_MEASUREMENT:
-        logger.info("Command Response:         " + parse_SVLD_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD:
-        logger.info("Command Response:         " + parse_protest_SVLD_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX:
-        logger.info("Command Response:         " + parse_calculate_crc32_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_READ_CURRENT:
-        logger.info("Command Response:         " + parse_read_current_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_READ_ADC:
-        logger.info("Command Response:         " + parse_read_ADC_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_UNUSED:
-        logger.info("Command Response:  Unused command")
-    elif subcmd == TESTOP_SUBCMD_READ_DUT_VER:
-        logger.info("Command Response:         " + parse_read_dut_ver_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_READ_REF_VER:
-        logger.info("Command Response:         " + parse_read_ref_ver_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_HCI_READ_9304_VER:
-        logger.info("Command Response:         " + parse_read_dev_ver_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_HCI_LE_TEST_END:
-        logger.info("Command Response:         " + parse_end_test_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST_END:
-        logger.info("Command Response:         " + parse_end_test_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_READ_PRODVK_FW_VER:
-        logger.info("Command Response:         " + parse_board_ver_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_READ_PRODVK_SN:
-        logger.info("Command Response:         " + parse_board_serial_num_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL_EX:
-        logger.info("Command Response:         " + parse_set_power_level_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_EXEC_XTALVALIDATION:
-        logger.info("Command Response:         " + parse_xtalvalidation_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_HCI_READ_BD_ADDR:
-        logger.info("Command Response:         " + parse_BD_address_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_HCI_LE_GET_ADVERTISING_REPORT:
-        logger.info("Command Response:         " + parse_advertising_report_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_EXEC_CALIBRATION:
-        logger.info("Command Response:         " + parse_calibration_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP:
-        logger.info("Command Response:         " + parse_func_test_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE:
-        logger.info("Command Response:         " + parse_func_test_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_FUNCTEST_CURRENT_RX:
-        logger.info("Command Response:         " + parse_func_test_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_FUNCTEST_CURRENT_TX:
-        logger.info("Command Response:         " + parse_func_test_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_FUNCTEST_PER_TX:
-        logger.info("Command Response:         " + parse_func_test_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_FUNCTEST_PER_RX:
-        logger.info("Command Response:         " + parse_func_test_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_FUNCTEST_ADVERTISE:
-        logger.info("Command Response:         " + parse_func_test_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_FUNCTEST_RSSI:
-        logger.info("Command Response:         " + parse_func_test_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_FUNCTEST_XTAL:
-        logger.info("Command Response:         " + parse_func_test_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_FUNCTEST_PWR_MODE:
-        logger.info("Command Response:         " + parse_func_test_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_FUNCTEST_SVLD:
-        logger.info("Command Response:         " + parse_read_results_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_FUNCTEST_READ_RESULTS:
-        logger.info("Command Response:         " + parse_read_results_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_GPIO_READ_DIGITAL_IO:
-        logger.info("Command Response:         " + parse_gpio_read_digital_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_GPIO_READ_ANALOG_IO:
-        logger.info("Command Response:         " + parse_gpio_read_analog_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_WRITE_DAC_LTC2633:
-        logger.info("Command Response:         " + parse_func_test_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_READ_ADC_MAX11614EEE:
-        logger.info("Command Response:         " + parse_read_adc_max11614eee_response(response_detail))
-    elif subcmd == TESTOP_SUBCMD_UPLOAD_TO_9304:
-        global last_upload_response
-        last_upload_response=parse_func_test_response(response_detail)
-        logger.info("Command Response:         " + last_upload_response)
-    elif subcmd == TESTOP_SUBCMD_READ_CRC:
-        logger.info("Command Response:         " + parse_func_test_response(response_detail))
-    else:
-        # If command-specific parsing was not identified but we have detail information
-        # format the response in hex
-        if response_detail_len > 0:
-            logger.info("Command Response:         " + response_detail_string)
-        else:
-            logger.info("Command Response:         OK")
-
-    return errcode
-# ==========================================================================
-
-
-# ==========================================================================
-#   Parse the GET_MEMORY_USAGE response
-#  Return Parameters:
-#    Bytes 0-3:   Memory Pool Size
-#    Bytes 4-7:   Retention Memory Used
-#    Bytes 8-11:  Non-retention Memory Used
-#    Bytes 12-15: Retention Memory Reserved
-# ==========================================================================
-def parse_memory_usage_response(response):
-    # Parse the response into these globals:
-    global last_memusage_memory_pool_size
-    global last_memusage_retention_memory_used
-    global last_memusage_nonretention_memory_used
-    global last_memusage_retention_memory_reserved
-
-    last_memusage_memory_pool_size          = convert_array_to_long(response[0:4])
-    last_memusage_retention_memory_used     = convert_array_to_long(response[4:8])
-    last_memusage_nonretention_memory_used  = convert_array_to_long(response[8:12])
-    last_memusage_retention_memory_reserved = convert_array_to_long(response[12:16])
-
-    return 'MemoryPoolSize='         + str(last_memusage_memory_pool_size)         + '  ' + \
-           'RetentionMemoryUsed='    + str(last_memusage_retention_memory_used)    + '  ' + \
-           'NonRetentionMemoryUsed=' + str(last_memusage_nonretention_memory_used) + '  ' + \
-           'RetentionMemoryReserved='+ str(last_memusage_retention_memory_reserved)
-
-# ==========================================================================
-#   Parse the SVLD_MEASUREMENT response
-#
-# Response:
-#   Power Mode (byte 0):
-#     0x00 = DCDC Step-Down Configuration.
-#     0x01 = DCDC Off Configuration.
-#     0x02 = DCDC Step-Up Configuration.
-#     0x03 = External DCDC Configuration.
-#     0x04 – 0xFF reserved
-#   Measured SVLD (byte 1)
-# ==========================================================================
-def parse_SVLD_response(response):
-    # Parse the response into these globals:
-    global last_SVLD_power_mode
-    global last_SVLD_measurement
-
-    # Extract the return parameters from the response packet
-    last_SVLD_power_mode  = response[0]
-    last_SVLD_measurement = response[1]
-
-
-    if   last_SVLD_power_mode == 0:
-        power_mode_string = "DCDC Step-Down Configuration"
-    elif last_SVLD_power_mode == 1:
-        power_mode_string = "DCDC Off Configuration"
-    elif last_SVLD_power_mode == 2:
-        power_mode_string = "DCDC Step-Up Configuration"
-    elif last_SVLD_power_mode == 3:
-        power_mode_string = "External DCDC Configuration"
-    else:
-        power_mode_string = "Invalid"
-    last_SVLD_power_mode=power_mode_string
-    last_SVLD_measurement=str(last_SVLD_measurement)
-
-
-    return 'PowerMode=' + power_mode_string + '  SVLDMeasurement=' + str(last_SVLD_measurement)
-
-
-
-# ==========================================================================
-#   Parse the ProTest version of the SVLD_MEASUREMENT response
-#   Same as the EM version, but no Power Mode
-#
-# Response:
-#   Measured SVLD (byte 1)
-# ==========================================================================
-def parse_protest_SVLD_response(response):
-    # Parse the response into these globals:
-    global last_SVLD_measurement
-
-    # Extract the return parameters from the response packet
-    last_SVLD_measurement = response[0]
-
-
-    return 'SVLDMeasurement=' + str(last_SVLD_measurement)
-
-
-# ==========================================================================
-#   Parse the CALCULATE_CRC32 response
-#  Return Parameters:
-#    Bytes 0-3:   CRC32 over the memory range
-# ==========================================================================
-def parse_calculate_crc32_response(response):
-    # Parse the response into these globals:
-    global last_calccrc_crc32
-
-    last_calccrc_crc32 = convert_array_to_long(response[0:4])
-    return 'CRC32=' + hex(last_calccrc_crc32)
-
-# ==========================================================================
-#  Parse the PATCH_QUERY Response
-#  Return Parameters:
-#    Bytes 0-1:   short int container count
-#    Bytes 2-3:   short int transfer count
-#    Bytes 4-7:   long  int patch system state
-#
-#    TODO: parse the rest of the parameters
-# ==========================================================================
-def parse_patch_query(response):
-    # Parse the response into these globals:
-    global last_patch_container_count
-    global last_patch_transfer_count
-    global last_patch_system_state
-    global last_patch_address
-    global last_patch_size
-    global last_patch_CRC32
-    global last_patch_build_num
-    global last_patch_user_build_num
-    global last_patch_container_flags
-    global last_patch_container_version
-    global last_patch_container_type
-    global last_patch_container_id
-
-    last_patch_container_count = convert_array_to_short(response[0:2])
-    last_patch_transfer_count  = convert_array_to_short(response[2:4])
-    last_patch_system_state     = convert_array_to_long( response[4:8])
-    last_patch_address          = convert_array_to_long(response[8:12])
-    last_patch_size             = convert_array_to_long(response[12:16])
-    last_patch_CRC32            = convert_array_to_long(response[16:20])
-    last_patch_build_num        = convert_array_to_short(response[20:22])
-    last_patch_user_build_num   = convert_array_to_short(response[22:24])
-    last_patch_container_flags  = convert_array_to_hex(response[24:25], 1)
-    last_patch_container_version= convert_array_to_hex(response[25:26], 1)
-    last_patch_container_type   = convert_array_to_hex(response[26:27], 1)
-    last_patch_container_id     = convert_array_to_hex(response[27:28], 1)
-    return 'Containers='      + str(last_patch_container_count) +  \
-           ' TransferCount=' + str(last_patch_transfer_count)  +  \
-           ' State='         + hex(last_patch_system_state)    +  \
-           ' Addr='          + hex(last_patch_address)         +  \
-           ' Size='          + str(last_patch_size)            +  \
-           ' CRC32='         + hex(last_patch_CRC32)           +  \
-           ' BuildNum='      + str(last_patch_build_num)       +  \
-           ' UserBuildNum='  + str(last_patch_user_build_num) +  \
-           ' Flags='         + str(last_patch_container_flags) +  \
-           ' Ver='           + str(last_patch_container_version)+ \
-           ' Type='          + str(last_patch_container_type)  +  \
-           ' ID='            + str(last_patch_container_id)
-
-
-
-# ==========================================================================
-#   Parse the END_LE_TEST Response and the TRANSMITTER_TEST_END response
-#  Return Parameters:
-#    Bytes 0-1:   short int count of packets sent/received
-# ==========================================================================
-def parse_end_test_response(response):
-    # Parse the response into these globals:
-    global last_test_number_of_packets
-
-    last_test_number_of_packets = convert_array_to_short(response[0:2])
-    return 'NumberOfPackets=' + str(last_test_number_of_packets)
-
-
-# ==========================================================================
-#  Parse the response from READ_CURRENT
-#  Return Parameters:
-#    Formatted string suitable for logging
-#  Return global:
-#    int last_adc_measurement
-# ==========================================================================
-def parse_read_current_response(response):
-    # Parse the response into these globals:
-    global last_adc_measurement
-
-    # The response contains two 32 bit words.
-    # The first is the channel; the second word is the measurement
-    tmp_last_adc_measurement = convert_array_to_slong(response[4:8])
-    if response[0] == 0:
-        last_adc_measurement = tmp_last_adc_measurement * 0.00012681845361088004
-    elif response[0] == 1:
-        last_adc_measurement = tmp_last_adc_measurement * 0.0012681845361088002
-    else:
-        last_adc_measurement = tmp_last_adc_measurement * 0.012681845361088
-
-    return 'ADCMeasurement CH=' + str(response[0]) + ', Current='+ str(last_adc_measurement)
-
-# ==========================================================================
-#  Parse the response from TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP
-#  Return Parameters:
-#    Formatted string suitable for logging
-#  Return global:
-#    int
-# ==========================================================================
-def parse_func_test_response(response):
-
-    return convert_bytes_to_string(response)
-
-# ==========================================================================
-#  Parse the READ_9304_VER  response
-#  Return Parameters:
-#    Bytes 0-7:   Version array
-#
-#  This is the general case of the READ_DUT_VER and READ_REF_VER
-#  TODO: deprecate the others
-# ==========================================================================
-def parse_read_dev_ver_response(response):
-    # Parse the response into the global:
-    global last_dev_ver_string
-    last_dev_ver_string = convert_array_to_hex_no_spaces(response, 8)
-    return 'Version=' + last_dev_ver_string
-
-
-# ==========================================================================
-#  Parse the response from READ_ADC
-#  Return Parameters:
-#    Formatted string suitable for logging
-#  Return global:
-#    int last_adc_measurement
-# ==========================================================================
-def parse_read_ADC_response(response):
-    global last_adc_measurement
-
-    # The response contains two 32 bit words.
-    # The first is the channel; the second word is the measurement
-    tmp_last_adc_measurement = convert_array_to_slong(response[4:8])
-    if response[0] == 0:
-        last_adc_measurement = tmp_last_adc_measurement * 0.00012681845361088004
-    elif response[0] == 1:
-        last_adc_measurement = tmp_last_adc_measurement * 0.0012681845361088002
-    else:
-        last_adc_measurement = tmp_last_adc_measurement * 0.012681845361088
-
-    return 'ADCMeasurement CH=' + str(response[0]) + ', Current='+ str(last_adc_measurement)
-
-# ==========================================================================
-#  Parse the READ_DUT_VER  response
-#  Return Parameters:
-#    Bytes 0-7:   Version array
-#
-# ==========================================================================
-def parse_read_dut_ver_response(response):
-    # Parse the response into the global:
-    global last_dut_ver_string
-    last_dut_ver_string = convert_array_to_hex_no_spaces(response, 8)
-    return 'Version=' + last_dut_ver_string
-
-
-# ==========================================================================
-#  Parse the READ_REF_VER response
-#  Return Parameters:
-#    Bytes 0-7:   Version array
-#
-# ==========================================================================
-def parse_read_ref_ver_response(response):
-    # Parse the response into the global:
-    global last_ref_ver_string
-    last_ref_ver_string = convert_array_to_hex_no_spaces(response, 8)
-    return 'Version=' + last_ref_ver_string
-
-
-# ==========================================================================
-#  Parse the READ_PTB_FW_VER response
-#  Return Parameters:
-#    Bytes 0-7:   Version text string
-# ==========================================================================
-def parse_board_ver_response(response):
-    # Parse the response into the global:
-    global last_board_ver_string
-    last_board_ver_string = convert_bytes_to_string(response[0:8])
-    return 'Version=' + last_board_ver_string
-
-
-# ==========================================================================
-#  Parse the READ_PTB_SN response
-#  Return Parameters:
-#    Bytes 0-31:   Board Serial Number text string
-# ==========================================================================
-def parse_board_serial_num_response(response):
-    # Parse the response into the global:
-    global last_board_serial_num_string
-    last_board_serial_num_string = convert_bytes_to_string(response[0:32])
-    return 'BoardSerialNumber=' + last_board_serial_num_string
-
-# ==========================================================================
-#  Parse the READ_AT_ADDR
-#  Return Parameters:
-#    Bytes 0-7:   Version array
-# ==========================================================================
-def parse_read_mem_response(response):
-    # Parse the response into the global:
-    global last_read_mem_string
-    last_read_mem_string = convert_array_to_hex(response, len(response))
-    return 'ReadMemory=' + last_read_mem_string
-
-
-# ==========================================================================
-#   Parse the SET_POWER_LEVEL_EX Response
-#  Return Parameters:
-#    Bytes 0:   max power level
-# ==========================================================================
-def parse_set_power_level_response(response):
-    # Parse the response into these globals:
-    global last_max_power_level
-
-    # A single byte is returned with the max power level index
-    last_max_power_level = response[0]
-    return 'MaxPowerLevel=' + str(last_max_power_level)
-
-
-# ==========================================================================
-#   Parse the status packet into formated string
-#   See structure definition TESTOP_Status_Packet_s in command_if.h
-# ==========================================================================
-def parse_status(statusDetail):
-
-    # Format the device state info
-    if statusDetail[0] == 0:
-        dut_state = "IDLE"
-    else:
-        dut_state = "BUSY"
-
-    if statusDetail[1] == 0:
-        ref_state = "IDLE"
-    else:
-        ref_state = "BUSY"
-
-    # Extract the command counts for the DUT and REF
-    dut_cmd_cnt  = convert_array_to_short(statusDetail[2:4])
-    ref_cmd_cnt  = convert_array_to_short(statusDetail[4:6])
-
-    # Format the string
-    statusString = "dut_state: " + dut_state + "  ref_state: " + ref_state + \
-                   "    dut_cmd_cnt:"   + str(dut_cmd_cnt) + \
-                   "    ref_cmd_cnt:"   + str(ref_cmd_cnt)
-
-    return statusString
-
-# ==========================================================================
-#   Parse the 'tic count difference' packet into formated string
-#   See structure definition TESTOP_Status_Packet_s in command_if.h
-# ==========================================================================
-def parse_xtalvalidation_response(statusDetail):
-    global last_xtal_ref_tics
-    global last_xtal_dut_tics
-
-    # Extract the command counts for the REF
-    xtal_cnt = convert_array_to_long(statusDetail[0:4])
-    last_xtal_ref_tics = xtal_cnt
-
-    # Extract the command counts for the DUT
-    xtal_cnt = convert_array_to_long(statusDetail[4:8])
-    last_xtal_dut_tics = xtal_cnt
-
-    # Format the string
-    statusString = "    Difference in XTAL tics:"   + str(last_xtal_ref_tics - last_xtal_dut_tics)
-
-    return statusString
-
-# ==========================================================================
-#   Parse the 'tic count difference' packet into formated string
-#   See structure definition TESTOP_Status_Packet_s in command_if.h
-# ==========================================================================
-def parse_BD_address_response(statusDetail):
-    global last_BD_address
-
-    # Extract the BD address [6 bytes]
-    last_BD_address = convert_array_to_hex(statusDetail[0:6], 6)
-
-    # Format the string
-    statusString = "    BD Address:"   + str(last_BD_address)
-
-    return statusString
-
-# ==========================================================================
-#   Parse the 'tic count difference' packet into formated string
-#   See structure definition TESTOP_Status_Packet_s in command_if.h
-# ==========================================================================
-def parse_advertising_report_response(statusDetail):
-    global last_advertReport_totalReports
-    global last_advertReport_minRssi
-    global last_advertReport_maxRssi
-    global last_advertReport_aveRssi
-    global last_advertReport_lastRssi
-
-    last_advertReport_totalReports = convert_array_to_long(statusDetail[0:4])
-    last_advertReport_minRssi = convert_array_to_slong(statusDetail[4:8])
-    last_advertReport_maxRssi = convert_array_to_slong(statusDetail[8:12])
-    last_advertReport_aveRssi = convert_array_to_slong(statusDetail[12:16])
-    last_advertReport_lastRssi = convert_array_to_slong(statusDetail[16:20])
-
-    # Format the string
-    statusString = "    Ave RSSI:" + str(last_advertReport_aveRssi) + ", Total Events:" + str(last_advertReport_totalReports)
-
-    return statusString
-
-# ==========================================================================
-#   Parse the calibration values
-#   3 ints are returned  5ma/100uA/1uA
-# ==========================================================================
-def parse_calibration_response(statusDetail):
-    global last_5mA_calibration
-    global last_100uA_calibration
-    global last_1uA_calibration
-
-    COUNT_MIN_HIGH=10000
-    COUNT_MIN_MID=100
-    COUNT_MIN_LOW=1
-    COUNT_MAX_HIGH=1000000
-    COUNT_MAX_MID=10000
-    COUNT_MAX_LOW=100
-    ADC_COUNT_DIV=float((2 ** 21) - 1)
-    VREF=1.25
-    GAIN_HIGH=100
-    GAIN_MID=1000
-    GAIN_LOW=1000
-    RSHUNT_HIGH=47
-    RSHUNT_MID=4.7
-    RSHUNT_LOW=0.47
-
-    CURRENT_CONVERSION=[(VREF/ADC_COUNT_DIV)/(RSHUNT_HIGH * GAIN_HIGH) * 1000000.0,
-                          (VREF / ADC_COUNT_DIV) / (RSHUNT_MID * GAIN_MID) * 1000000.0,
-                          (VREF / ADC_COUNT_DIV) / (RSHUNT_LOW * GAIN_LOW) * 1000000.0]
-
-    tmp_5ma_cal = convert_array_to_slong(statusDetail[0:4])
-    last_5mA_calibration = tmp_5ma_cal * CURRENT_CONVERSION[0]
-    tmp_100ua_cal = convert_array_to_slong(statusDetail[4:8])
-    last_100uA_calibration = tmp_100ua_cal * CURRENT_CONVERSION[1]
-    tmp_1ua_cal = convert_array_to_slong(statusDetail[8:12])
-    last_1uA_calibration = tmp_1ua_cal * CURRENT_CONVERSION[2]
-
-    # Format the string
-    statusString = "    5ma:" + str(last_5mA_calibration) + ", 100uA:" + str(last_100uA_calibration) + ", 1uA:" + str(last_1uA_calibration)
-
-    return statusString
-
-# ==========================================================================
-#   Parse the isBusy result
-#
-# ==========================================================================
-def parse_is_busy_response(response):
-    global last_is_busy
-
-    if response[0] == 0:
-        last_is_busy = 0
-    elif response[0] == 1:
-        last_is_busy = 1
-
-    return "IsBusy = " + str(last_is_busy)
-
-# ==========================================================================
-#   Parse the read_results result
-#
-# ==========================================================================
-def parse_read_results_response(response):
-    global last_is_busy
-    global last_adc_measurement
-    global read_results_index
-    global last_SVLD_power_mode
-    global last_SVLD_measurement
-    global triggered_current_values
-    global last_PER_value
-    global last_ppm
-
-    if response[0] & 0x80 == 0:
-        last_is_busy = 0
-    else:
-        last_is_busy = 1
-
-    if last_is_busy == 0:
-        if (response[0] == TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP or response[0] == TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE or
-                response[0] == TESTOP_SUBCMD_FUNCTEST_CURRENT_RX or response[0] == TESTOP_SUBCMD_FUNCTEST_CURRENT_TX):
-            # The response contains two 32 bit words.
-            # The first is the channel; the second word is the measurement
-            tmp_last_adc_measurement = convert_array_to_slong(response[8:12])
-            if response[4] == 0:
-                last_adc_measurement = tmp_last_adc_measurement * 0.00012681845361088004
-            elif response[4] == 1:
-                last_adc_measurement = tmp_last_adc_measurement * 0.0012681845361088002
-            else:
-                last_adc_measurement = tmp_last_adc_measurement * 0.012681845361088
-
-            return 'ADCMeasurement CH=' + str(response[4]) + ', Current=' + str(last_adc_measurement)
-
-        elif (response[0] == TESTOP_SUBCMD_FUNCTEST_PER_TX or response[0] == TESTOP_SUBCMD_FUNCTEST_PER_RX):
-
-            sent_packets = convert_array_to_long(response[4:0:-1])
-            received_packets = convert_array_to_long(response[8:4:-1])
-
-            if (sent_packets != 0):
-                packet_error_rate = ((sent_packets - received_packets) / sent_packets) * 100
-            else:
-                packet_error_rate = 100
-
-            # Output and Log Test
-            #printData("%.2f" % (packet_error_rate), "%", "PER_Test", [0, numOfPackets, channel, powerLevel])
-            last_PER_value=packet_error_rate
-            return 'Packet error rate =' + str(packet_error_rate)
-
-        elif (response[0] == TESTOP_SUBCMD_FUNCTEST_ADVERTISE or response[0] == TESTOP_SUBCMD_FUNCTEST_RSSI):
-            totalReports = convert_array_to_long(response[0:4])
-            minRssi = convert_array_to_slong(response[4:8])
-            maxRssi = convert_array_to_slong(response[8:12])
-            aveRssi = convert_array_to_slong(response[12:16])
-            lastRssi = convert_array_to_slong(response[16:20])
-
-            # Format the string
-            statusString = "    Ave RSSI:" + str(aveRssi) + ", Total Events:" + str(totalReports)
-            return statusString
-
-        elif response[0] == TESTOP_SUBCMD_FUNCTEST_XTAL:
-            ref_count = convert_array_to_long(response[4:8])
-
-            # Extract the command counts for the DUT
-            dut_count = convert_array_to_long(response[8:12])
-
-            try:
-                # ppm=10**6-((dut_count/dut_freq)/(ref_count/ref_freq))*10**6
-                ppm = 10 ** 6 - (dut_count / ref_count) * 10 ** 6
-                if ppm < 0:
-                    ppm = ppm * -1
-            except:
-                ppm = -1
-
-            statusString = "ppm = %.2f"%ppm
-            last_ppm=ppm
-            return statusString
-
-        elif (response[0] == TESTOP_SUBCMD_FUNCTEST_PWR_MODE or response[0] == TESTOP_SUBCMD_FUNCTEST_SVLD):
-
-            # Extract the return parameters from the response packet
-            last_SVLD_power_mode = response[1]
-            last_SVLD_measurement = ''.join(chr(i) for i in response[2:10])
-
-            if last_SVLD_power_mode == 0:
-                power_mode_string = "DCDC Step-Down Configuration"
-            elif last_SVLD_power_mode == 1:
-                power_mode_string = "DCDC Off Configuration"
-            elif last_SVLD_power_mode == 2:
-                power_mode_string = "DCDC Step-Up Configuration"
-            elif last_SVLD_power_mode == 3:
-                power_mode_string = "External DCDC Configuration"
-            else:
-                power_mode_string = "Invalid"
-
-            last_SVLD_power_mode=power_mode_string
-
-            if response[0] == TESTOP_SUBCMD_FUNCTEST_PWR_MODE:
-                return 'PowerMode=' + power_mode_string + '  SVLDMeasurement=' + str(last_SVLD_measurement)
-            elif response[0] == TESTOP_SUBCMD_FUNCTEST_SVLD:
-                return 'PowerMode=' + power_mode_string + '  SVLDMeasurement=' + str(last_SVLD_measurement)
-
-        elif response[0] == TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT:
-            # The response contains a variable number of two 32 bit word pairs.
-            # The first is the channel; the second word is the measurement
-            responseString = ''
-
-            for x in range(response[1]):
-                responseString += '\nADCMeasurement CH=' + str(response[2 + x]) + ', Current='
-
-                tmp_last_adc_measurement = convert_array_to_slong(response[(12 + (x * 4)):(16 + (x * 4))])
-                if response[2 + x] == 0:
-                    last_adc_measurement = tmp_last_adc_measurement * 0.00012681845361088004
-                elif response[2 + x] == 1:
-                    last_adc_measurement = tmp_last_adc_measurement * 0.0012681845361088002
+                if (sent_packets != 0):
+                    packet_error_rate = ((sent_packets - received_packets) / sent_packets) * 100
                 else:
-                    last_adc_measurement = tmp_last_adc_measurement * 0.012681845361088
-
-                responseString += str(last_adc_measurement)
-                triggered_current_values.append(last_adc_measurement)
-
-            return responseString #'ADCMeasurement CH=' + str(response[4]) + ', Current=' + str(last_adc_measurement)
-
-    return "ReadResults = " + str(last_is_busy)
-
-
-# ==========================================================================
-#   Parse the read_results result
-#
-# ==========================================================================
-def parse_gpio_read_digital_response(response):
-    global last_Digital_read
-    last_Digital_read=convert_bytes_to_string(response)
-    return "GPIO Digital Read = " + convert_bytes_to_string(response)
-
-# ==========================================================================
-#   Parse the read_results result
-#
-# ==========================================================================
-def parse_gpio_read_analog_response(response):
-    return "GPIO Analog Read = " + convert_bytes_to_string(response)
-
-# ==========================================================================
-#   Parse the read_adc_max11614eee result
-#
-# ==========================================================================
-def parse_read_adc_max11614eee_response(response):
-
-    responseString = 'Channel '
-    responseString += str(response[0])
-    responseString += ' = '
-
-    low_byte = response[2]
-    hi_byte = response[1]
-    intval = (hi_byte << 8) + low_byte
-
-    responseString += str(intval)
-    responseString += ' millivolts'
-
-    return responseString
-
-# ==========================================================================
-#     Connect to the PTB Device
-#
-# ==========================================================================
-def connect_to_device(serial_num):
-    global dev
-
-    # Find the production test DVK device.
-    # If a serial number was provided then use it
-    if serial_num is None :
-        # Don't bother with the serial number match
-        dev = usb.core.find(idVendor=DVK_USB_VID, idProduct=DVK_USB_PID)
-    elif serial_num == "" :
-        # Don't bother with the serial number match
-        dev = usb.core.find(idVendor=DVK_USB_VID, idProduct=DVK_USB_PID)
-    else:
-        dev = usb.core.find(idVendor=DVK_USB_VID, idProduct=DVK_USB_PID,
-            custom_match=lambda d: d.serial_number == serial_num)
-
-
-    if dev is None:
-        logger.error(    'Device not found with VID/PID/SeriaNum attributes')
-        raise ValueError('Device not found with VID/PID/SeriaNum attributes')
-
-    last_ptb_product_name_string = usb.util.get_string(dev, DVK_USB_PRODUCT_NAME_STRING_DESCRIPTOR_INDEX)
-    last_ptb_serial_num_string = usb.util.get_string(dev, DVK_USB_SERIAL_NUM_STRING_DESCRIPTOR_INDEX)
-    logger.info('Board Name: ' + last_ptb_product_name_string + '  Board Serial Number:' + last_ptb_serial_num_string)
-
-    # Start in the default TestOp mode
-    switch_to_testop_mode()
-
-    return last_ptb_serial_num_string
-
-def disconnect_proDVK():
-    global dev
-    usb.util.dispose_resources(dev)
-    return
-
-# ==========================================================================
-#   Exit the current test script
-#     exit code = 0 if no errors occured, otherwise exit code = 1
-# ==========================================================================
-def exit_test():
-    if get_test_error_count() > 0:
-        sys.exit(1)
-    else:
-        sys.exit(0)
+                    packet_error_rate = 100
+
+                # Output and Log Test
+                #printData("%.2f" % (packet_error_rate), "%", "PER_Test", [0, numOfPackets, channel, powerLevel])
+                self.last_PER_value=packet_error_rate
+                if self.measurement_sink is not None:
+                    self.measurement_sink(MEASUREMENT_PER, packet_error_rate)
+                self.last_read_results = PERResult(packet_error_rate)
+                return self.last_read_results
+
+            elif (response[0] == TESTOP_SUBCMD_FUNCTEST_ADVERTISE or response[0] == TESTOP_SUBCMD_FUNCTEST_RSSI):
+                totalReports, minRssi, maxRssi, aveRssi, lastRssi = FUNCTEST_RESULT_RSSI.unpack_from(response)
+
+                if self.measurement_sink is not None:
+                    self.measurement_sink(MEASUREMENT_RSSI, aveRssi)
+
+                self.last_read_results = AdvertisingReportResult(totalReports, minRssi, maxRssi, aveRssi, lastRssi)
+                return self.last_read_results
+
+            elif response[0] == TESTOP_SUBCMD_FUNCTEST_XTAL:
+                # Extract the tic counts for the REF and the DUT
+                ref_count, dut_count = FUNCTEST_RESULT_XTAL.unpack_from(response)
+
+                try:
+                    # ppm=10**6-((dut_count/dut_freq)/(ref_count/ref_freq))*10**6
+                    ppm = 10 ** 6 - (dut_count / ref_count) * 10 ** 6
+                    if ppm < 0:
+                        ppm = ppm * -1
+                except:
+                    ppm = -1
+
+                self.last_ppm=ppm
+                if self.measurement_sink is not None:
+                    self.measurement_sink(MEASUREMENT_PPM, ppm)
+                self.last_read_results = PpmResult(ppm)
+                return self.last_read_results
+
+            elif (response[0] == TESTOP_SUBCMD_FUNCTEST_PWR_MODE or response[0] == TESTOP_SUBCMD_FUNCTEST_SVLD):
+
+                # Extract the return parameters from the response packet
+                self.last_SVLD_power_mode, measurement = FUNCTEST_RESULT_PWR_MODE.unpack_from(response)
+                self.last_SVLD_measurement = measurement.decode('latin-1')
+
+                if self.last_SVLD_power_mode == 0:
+                    power_mode_string = "DCDC Step-Down Configuration"
+                elif self.last_SVLD_power_mode == 1:
+                    power_mode_string = "DCDC Off Configuration"
+                elif self.last_SVLD_power_mode == 2:
+                    power_mode_string = "DCDC Step-Up Configuration"
+                elif self.last_SVLD_power_mode == 3:
+                    power_mode_string = "External DCDC Configuration"
+                else:
+                    power_mode_string = "Invalid"
+
+                self.last_SVLD_power_mode=power_mode_string
+
+                self.last_read_results = SVLDResult(power_mode_string, self.last_SVLD_measurement)
+                return self.last_read_results
+
+            elif response[0] == TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT:
+                # The response contains a variable number of two 32 bit word pairs.
+                # The first is the channel; the second word is the measurement
+                measurements = []
+
+                count = response[1]
+                fields = FUNCTEST_RESULT_TRIGGERED_CURRENT[count].unpack_from(response)
+                channels = fields[1:1 + count]
+                currents = convert_counts(fields[1 + count:], channels)
+                for channel, current in zip(channels, currents):
+                    self.last_adc_measurement = float(current)
+
+                    measurements.append(CurrentResult(channel, self.last_adc_measurement))
+                    self.triggered_current_values.append(channel, self.last_adc_measurement)
+                    if self.measurement_sink is not None:
+                        self.measurement_sink(MEASUREMENT_CURRENT, self.last_adc_measurement)
+
+                self.last_read_results = TriggeredCurrentResult(tuple(measurements))
+                return self.last_read_results
+
+        self.last_read_results = ReadResultsStatus(self.last_is_busy)
+        return self.last_read_results
+
+    # ==========================================================================
+    #   Parse the UPLOAD_TO_9304 response
+    #
+    # ==========================================================================
+    def parse_upload_response(self, response):
+        self.last_upload_response = convert_bytes_to_string(response)
+        return TextResult(response)
+
+    # ==========================================================================
+    #   Parse the read_results result
+    #
+    # ==========================================================================
+    def parse_gpio_read_digital_response(self, response):
+        self.last_Digital_read=convert_bytes_to_string(response)
+        return GpioReadResult('Digital', self.last_Digital_read)
+
+    # ==========================================================================
+    #     Connect to the PTB Device
+    #     If board_transport is given it is used instead of searching the USB
+    #     bus (e.g. an emulator.ProDVKEmulator instance).
+    # ==========================================================================
+    def connect_to_device(self, serial_num, board_transport = None):
+        # Find the production test DVK device.
+        # If a serial number was provided then use it
+        if board_transport is None:
+            board_transport = UsbTransport.find(serial_num)
+
+        if board_transport is None:
+            logger.error(    'Device not found with VID/PID/SeriaNum attributes')
+            raise ValueError('Device not found with VID/PID/SeriaNum attributes')
+
+        self.transport = board_transport
+        self.dev = getattr(board_transport, 'device', None)
+        self.query_cache.clear()
+        self.shadow_config.clear()
+
+        last_ptb_product_name_string = self.transport.product_name
+        last_ptb_serial_num_string = self.transport.serial_number
+        logger.info('Board Name: ' + last_ptb_product_name_string + '  Board Serial Number:' + last_ptb_serial_num_string)
+
+        # Start in the default TestOp mode
+        self.switch_to_testop_mode()
+
+        return last_ptb_serial_num_string
+
+    def disconnect_proDVK(self):
+        if self.reader is not None:
+            self.reader.stop()
+        self.transport.close()
+        self.transport = None
+        self.dev = None
+        self.query_cache.clear()
+        self.shadow_config.clear()
+        return
+
+    # ==========================================================================
+    #   Exit the current test script
+    #     exit code = 0 if no errors occured, otherwise exit code = 1
+    # ==========================================================================
+    def exit_test(self):
+        if self.get_test_error_count() > 0:
+            sys.exit(1)
+        else:
+            sys.exit(0)
+
+
+# ==========================================================================
+#   Response parsers of the commands in COMMAND_SPECS
+# ==========================================================================
+def _stateless_parser(parse):
+    return lambda session, response_detail: parse(response_detail)
+
+for _subcmd, _parser, _result_type in (
+        (TESTOP_SUBCMD_READ_STATUS,                   _stateless_parser(parse_status),                      StatusResult),
+        (TESTOP_SUBCMD_HCI_EM_GET_MEMORY_USAGE,       ProDVKSession.parse_memory_usage_response,            MemoryUsageResult),
+        (TESTOP_SUBCMD_HCI_EM_PATCH_QUERY,            ProDVKSession.parse_patch_query,                      PatchQueryResult),
+        (TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS,        ProDVKSession.parse_read_mem_response,                MemoryReadResult),
+        (TESTOP_SUBCMD_HCI_EM_READ_CONTINUE,          ProDVKSession.parse_read_mem_response,                MemoryReadResult),
+        (TESTOP_SUBCMD_HCI_EM_SVLD_MEASUREMENT,       ProDVKSession.parse_SVLD_response,                    SVLDResult),
+        (TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD,          ProDVKSession.parse_protest_SVLD_response,            ProtestSVLDResult),
+        (TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX,     ProDVKSession.parse_calculate_crc32_response,         CRC32Result),
+        (TESTOP_SUBCMD_READ_CURRENT,                  ProDVKSession.parse_read_current_response,            CurrentResult),
+        (TESTOP_SUBCMD_READ_ADC,                      ProDVKSession.parse_read_ADC_response,                CurrentResult),
+        (TESTOP_SUBCMD_UNUSED,                        lambda session, response_detail: LazyLogMessage('Unused command'), LazyLogMessage),
+        (TESTOP_SUBCMD_READ_DUT_VER,                  ProDVKSession.parse_read_dut_ver_response,            VersionResult),
+        (TESTOP_SUBCMD_READ_REF_VER,                  ProDVKSession.parse_read_ref_ver_response,            VersionResult),
+        (TESTOP_SUBCMD_HCI_READ_9304_VER,             ProDVKSession.parse_read_dev_ver_response,            VersionResult),
+        (TESTOP_SUBCMD_HCI_LE_TEST_END,               ProDVKSession.parse_end_test_response,                EndTestResult),
+        (TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST_END,   ProDVKSession.parse_end_test_response,                EndTestResult),
+        (TESTOP_SUBCMD_READ_PRODVK_FW_VER,            ProDVKSession.parse_board_ver_response,               VersionResult),
+        (TESTOP_SUBCMD_READ_PRODVK_SN,                ProDVKSession.parse_board_serial_num_response,        SerialNumberResult),
+        (TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL_EX,  ProDVKSession.parse_set_power_level_response,         PowerLevelResult),
+        (TESTOP_SUBCMD_EXEC_XTALVALIDATION,           ProDVKSession.parse_xtalvalidation_response,          XtalValidationResult),
+        (TESTOP_SUBCMD_HCI_READ_BD_ADDR,              ProDVKSession.parse_BD_address_response,              BDAddressResult),
+        (TESTOP_SUBCMD_HCI_LE_GET_ADVERTISING_REPORT, ProDVKSession.parse_advertising_report_response,      AdvertisingReportResult),
+        (TESTOP_SUBCMD_EXEC_CALIBRATION,              ProDVKSession.parse_calibration_response,             CalibrationResult),
+        (TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP,        _stateless_parser(parse_func_test_response),          TextResult),
+        (TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE,       _stateless_parser(parse_func_test_response),          TextResult),
+        (TESTOP_SUBCMD_FUNCTEST_CURRENT_RX,           _stateless_parser(parse_func_test_response),          TextResult),
+        (TESTOP_SUBCMD_FUNCTEST_CURRENT_TX,           _stateless_parser(parse_func_test_response),          TextResult),
+        (TESTOP_SUBCMD_FUNCTEST_PER_TX,               _stateless_parser(parse_func_test_response),          TextResult),
+        (TESTOP_SUBCMD_FUNCTEST_PER_RX,               _stateless_parser(parse_func_test_response),          TextResult),
+        (TESTOP_SUBCMD_FUNCTEST_ADVERTISE,            _stateless_parser(parse_func_test_response),          TextResult),
+        (TESTOP_SUBCMD_FUNCTEST_RSSI,                 _stateless_parser(parse_func_test_response),          TextResult),
+        (TESTOP_SUBCMD_FUNCTEST_XTAL,                 _stateless_parser(parse_func_test_response),          TextResult),
+        (TESTOP_SUBCMD_FUNCTEST_PWR_MODE,             _stateless_parser(parse_func_test_response),          TextResult),
+        (TESTOP_SUBCMD_FUNCTEST_SVLD,                 ProDVKSession.parse_read_results_response,            ResultRecord),
+        (TESTOP_SUBCMD_FUNCTEST_READ_RESULTS,         ProDVKSession.parse_read_results_response,            ResultRecord),
+        (TESTOP_SUBCMD_GPIO_READ_DIGITAL_IO,          ProDVKSession.parse_gpio_read_digital_response,       GpioReadResult),
+        (TESTOP_SUBCMD_GPIO_READ_ANALOG_IO,           _stateless_parser(parse_gpio_read_analog_response),   GpioReadResult),
+        (TESTOP_SUBCMD_WRITE_DAC_LTC2633,             _stateless_parser(parse_func_test_response),          TextResult),
+        (TESTOP_SUBCMD_READ_ADC_MAX11614EEE,          _stateless_parser(parse_read_adc_max11614eee_response), AdcVoltageResult),
+        (TESTOP_SUBCMD_UPLOAD_TO_9304,                ProDVKSession.parse_upload_response,                  TextResult),
+        (TESTOP_SUBCMD_READ_CRC,                      _stateless_parser(parse_func_test_response),          TextResult)):
+    register_response_parser(_subcmd, _parser, _result_type)
+del _subcmd, _parser, _result_type
+
+
+# ==========================================================================
+#   Default session used by the module level functions
+# ==========================================================================
+_default_session = ProDVKSession()
+
+get_last_calccrc_crc32 = _default_session.get_last_calccrc_crc32
+get_last_read_mem_string = _default_session.get_last_read_mem_string
+get_last_SVLD_power_mode = _default_session.get_last_SVLD_power_mode
+get_last_SVLD_measurement = _default_session.get_last_SVLD_measurement
+get_last_adc_measurement = _default_session.get_last_adc_measurement
+get_last_dev_ver_string = _default_session.get_last_dev_ver_string
+get_last_dut_ver_string = _default_session.get_last_dut_ver_string
+get_last_ref_ver_string = _default_session.get_last_ref_ver_string
+get_last_board_ver_string = _default_session.get_last_board_ver_string
+get_last_max_power_level = _default_session.get_last_max_power_level
+get_last_test_number_of_packets = _default_session.get_last_test_number_of_packets
+get_last_xtal_dut_tics = _default_session.get_last_xtal_dut_tics
+get_last_xtal_ref_tics = _default_session.get_last_xtal_ref_tics
+get_last_BD_address = _default_session.get_last_BD_address
+get_last_AdvRpt_totalCount = _default_session.get_last_AdvRpt_totalCount
+get_last_AdvRpt_minRssi = _default_session.get_last_AdvRpt_minRssi
+get_last_AdvRpt_maxRssi = _default_session.get_last_AdvRpt_maxRssi
+get_Triggered_Current_Values = _default_session.get_Triggered_Current_Values
+get_Last_Upload_Response = _default_session.get_Last_Upload_Response
+get_last_PER_Value = _default_session.get_last_PER_Value
+get_last_ppm = _default_session.get_last_ppm
+get_last_digital_read = _default_session.get_last_digital_read
+clear_Triggered_Current_Values = _default_session.clear_Triggered_Current_Values
+get_last_patch_container_count = _default_session.get_last_patch_container_count
+get_last_patch_transfer_count = _default_session.get_last_patch_transfer_count
+get_last_patch_system_state = _default_session.get_last_patch_system_state
+get_last_patch_address = _default_session.get_last_patch_address
+get_last_patch_size = _default_session.get_last_patch_size
+get_last_patch_CRC32 = _default_session.get_last_patch_CRC32
+get_last_patch_build_num = _default_session.get_last_patch_build_num
+get_last_patch_user_build_num = _default_session.get_last_patch_user_build_num
+get_last_patch_container_flags = _default_session.get_last_patch_container_flags
+get_last_patch_container_version = _default_session.get_last_patch_container_version
+get_last_patch_container_type = _default_session.get_last_patch_container_type
+get_last_patch_container_id = _default_session.get_last_patch_container_id
+get_test_error_count = _default_session.get_test_error_count
+get_last_AdvRpt_aveRssi = _default_session.get_last_AdvRpt_aveRssi
+get_last_AdvRpt_lastRssi = _default_session.get_last_AdvRpt_lastRssi
+get_last_IsBusy = _default_session.get_last_IsBusy
+get_read_results = _default_session.get_read_results
+generate_test_header = _default_session.generate_test_header
+generate_test_summary = _default_session.generate_test_summary
+generate_test_fw_version_log = _default_session.generate_test_fw_version_log
+reset_em_devices_hard = _default_session.reset_em_devices_hard
+reset_em_devices = _default_session.reset_em_devices
+switch_to_testop_mode = _default_session.switch_to_testop_mode
+switch_to_bridge_mode = _default_session.switch_to_bridge_mode
+send_command = _default_session.send_command
+send_command_1argbyte = _default_session.send_command_1argbyte
+send_command_1argshort = _default_session.send_command_1argshort
+send_command_1argword = _default_session.send_command_1argword
+send_command_2argwords = _default_session.send_command_2argwords
+send_command_2argbytes = _default_session.send_command_2argbytes
+send_command_3argbytes = _default_session.send_command_3argbytes
+send_command_4argbytes = _default_session.send_command_4argbytes
+send_command_5argbytes = _default_session.send_command_5argbytes
+send_command_6argbytes = _default_session.send_command_6argbytes
+send_command_7argbytes = _default_session.send_command_7argbytes
+send_command_2argwordbyte = _default_session.send_command_2argwordbyte
+send_command_em_calculate_crc32 = _default_session.send_command_em_calculate_crc32
+send_command_em_cpu_reset = _default_session.send_command_em_cpu_reset
+send_command_end_le_test = _default_session.send_command_end_le_test
+send_command_le_test_end = _default_session.send_command_le_test_end
+send_command_em_get_memory_usage = _default_session.send_command_em_get_memory_usage
+send_command_em_patch_query = _default_session.send_command_em_patch_query
+send_command_em_write_patch_start = _default_session.send_command_em_write_patch_start
+send_command_em_write_patch_continue = _default_session.send_command_em_write_patch_continue
+send_command_em_write_patch_abort = _default_session.send_command_em_write_patch_abort
+send_command_protest_sleep = _default_session.send_command_protest_sleep
+send_command_protest_active = _default_session.send_command_protest_active
+send_command_protest_txstart = _default_session.send_command_protest_txstart
+send_command_protest_txstop = _default_session.send_command_protest_txstop
+send_command_protest_rxstart = _default_session.send_command_protest_rxstart
+send_command_protest_rxstop = _default_session.send_command_protest_rxstop
+send_command_protest_hf_xtal_disable = _default_session.send_command_protest_hf_xtal_disable
+send_command_protest_hf_xtal_enable = _default_session.send_command_protest_hf_xtal_enable
+send_command_protest_lf_xtal_disable = _default_session.send_command_protest_lf_xtal_disable
+send_command_protest_lf_xtal_enable = _default_session.send_command_protest_lf_xtal_enable
+send_command_protest_get_svld = _default_session.send_command_protest_get_svld
+send_command_protest_set_gpio = _default_session.send_command_protest_set_gpio
+send_command_em_set_clock_source = _default_session.send_command_em_set_clock_source
+send_command_set_current_range = _default_session.send_command_set_current_range
+send_command_em_set_event_mask = _default_session.send_command_em_set_event_mask
+send_command_em_set_memory_mode = _default_session.send_command_em_set_memory_mode
+send_command_read_board_ver = _default_session.send_command_read_board_ver
+send_command_em_set_power_mode = _default_session.send_command_em_set_power_mode
+send_command_em_set_public_address = _default_session.send_command_em_set_public_address
+send_command_em_set_rf_activity_signal = _default_session.send_command_em_set_rf_activity_signal
+send_command_em_set_rf_power_level = _default_session.send_command_em_set_rf_power_level
+send_command_em_set_sleep_options = _default_session.send_command_em_set_sleep_options
+send_command_set_ref_clock = _default_session.send_command_set_ref_clock
+send_command_em_set_uart_baud_rate = _default_session.send_command_em_set_uart_baud_rate
+send_command_soft_reset = _default_session.send_command_soft_reset
+send_command_hard_reset = _default_session.send_command_hard_reset
+send_command_read_BLE_address = _default_session.send_command_read_BLE_address
+send_command_le_set_Advertising_data = _default_session.send_command_le_set_Advertising_data
+send_command_le_set_Advertising_parameters = _default_session.send_command_le_set_Advertising_parameters
+send_command_le_set_Advertising_enable = _default_session.send_command_le_set_Advertising_enable
+send_command_le_clear_White_List = _default_session.send_command_le_clear_White_List
+send_command_le_add_device_to_White_List = _default_session.send_command_le_add_device_to_White_List
+send_command_le_set_Scan_Parameters = _default_session.send_command_le_set_Scan_Parameters
+send_command_le_set_Scan_Enable = _default_session.send_command_le_set_Scan_Enable
+send_command_get_advertising_report_data = _default_session.send_command_get_advertising_report_data
+send_command_le_transmitter_test = _default_session.send_command_le_transmitter_test
+send_command_le_receiver_test = _default_session.send_command_le_receiver_test
+send_command_em_svld_measurement = _default_session.send_command_em_svld_measurement
+send_command_em_read_at_address = _default_session.send_command_em_read_at_address
+send_command_em_write_at_address = _default_session.send_command_em_write_at_address
+send_command_em_read_continue = _default_session.send_command_em_read_continue
+read_memory = _default_session.read_memory
+send_command_em_write_continue = _default_session.send_command_em_write_continue
+write_memory = _default_session.write_memory
+sync_memory = _default_session.sync_memory
+send_command_em_transmitter_test = _default_session.send_command_em_transmitter_test
+send_command_em_transmitter_test_end = _default_session.send_command_em_transmitter_test_end
+execute_xtal_validation = _default_session.execute_xtal_validation
+send_command_set_mux_state = _default_session.send_command_set_mux_state
+execute_current_calibration = _default_session.execute_current_calibration
+send_command_read_current = _default_session.send_command_read_current
+send_command_read_ADC = _default_session.send_command_read_ADC
+send_command_with_args = _default_session.send_command_with_args
+send_command_packed = _default_session.send_command_packed
+send_command_values = _default_session.send_command_values
+query = _default_session.query
+resync = _default_session.resync
+invalidate_query_cache = _default_session.invalidate_query_cache
+invalidate_shadow_config = _default_session.invalidate_shadow_config
+run_functest = _default_session.run_functest
+parse_response_checked = _default_session.parse_response_checked
+send_command_message = _default_session.send_command_message
+read_response = _default_session.read_response
+parse_response = _default_session.parse_response
+parse_memory_usage_response = _default_session.parse_memory_usage_response
+parse_SVLD_response = _default_session.parse_SVLD_response
+parse_protest_SVLD_response = _default_session.parse_protest_SVLD_response
+parse_calculate_crc32_response = _default_session.parse_calculate_crc32_response
+parse_patch_query = _default_session.parse_patch_query
+parse_end_test_response = _default_session.parse_end_test_response
+parse_read_current_response = _default_session.parse_read_current_response
+parse_read_dev_ver_response = _default_session.parse_read_dev_ver_response
+parse_read_ADC_response = _default_session.parse_read_ADC_response
+parse_read_dut_ver_response = _default_session.parse_read_dut_ver_response
+parse_read_ref_ver_response = _default_session.parse_read_ref_ver_response
+parse_board_ver_response = _default_session.parse_board_ver_response
+parse_board_serial_num_response = _default_session.parse_board_serial_num_response
+parse_read_mem_response = _default_session.parse_read_mem_response
+parse_set_power_level_response = _default_session.parse_set_power_level_response
+parse_xtalvalidation_response = _default_session.parse_xtalvalidation_response
+parse_BD_address_response = _default_session.parse_BD_address_response
+parse_advertising_report_response = _default_session.parse_advertising_report_response
+parse_calibration_response = _default_session.parse_calibration_response
+parse_is_busy_response = _default_session.parse_is_busy_response
+parse_read_results_response = _default_session.parse_read_results_response
+parse_gpio_read_digital_response = _default_session.parse_gpio_read_digital_response
+parse_upload_response = _default_session.parse_upload_response
+connect_to_device = _default_session.connect_to_device
+disconnect_proDVK = _default_session.disconnect_proDVK
+exit_test = _default_session.exit_test
+
+
+# ==========================================================================
+#   The per-board state used to be module globals (proDVKlib.test_error_count,
+#   proDVKlib.dev, proDVKlib.last_ppm, ...).  Reading them still works and
+#   returns the value of the default session.
+# ==========================================================================
+def __getattr__(name):
+    if not name.startswith('_') and name in _default_session.__dict__:
+        return getattr(_default_session, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 
 # ==========================================================================
@@ -0,0 +1,359 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    aio.py
+# @brief   asyncio client for the Production Test DVK Board
+#
+# AsyncProDVK provides awaitable versions of send_command_with_args(),
+# read_response() and every send_command_* / execute_* helper:
+#
+#     client = AsyncProDVK(board_transport)
+#     errcode = await client.send_command_le_receiver_test(SLOT_DUT, 19)
+#     errcode = await client.send_command_read_current(SLOT_DUT, timeout=0.5)
+#     current = client.session.get_last_adc_measurement()
+#
+# The writes, the routing of the responses and the timeouts of all clients
+# are handled by one shared ProDVKIOThread, so a single event loop can
+# drive many boards.  Each board with outstanding requests has a reader
+# thread blocked on its transport, so a response is routed as soon as it
+# arrives whatever the number of boards.  Commands issued concurrently on
+# one client are pipelined and matched to their responses by sequence
+# number.
+#
+############################################################################
+
+import asyncio
+import sys
+import threading
+import time
+from collections import deque
+
+from . import (ProDVKTransportError, ProDVKTimeoutError, ProDVKSession, CommandRecorder,
+               COMMAND_TESTOP, DVK_USB_EP_SIZE, DVK_USB_TIMEOUT,
+               TESTOP_RESP_IDX_CMD, TESTOP_RESP_IDX_SEQNUM,
+               TESTOP_ERRCODE_SUCCESS, TESTOP_ERRCODE_BAD_PARAMS,
+               encode_command_frame, convert_array_to_hex)
+
+_lib = sys.modules[__package__]
+
+
+# ==========================================================================
+#   One outstanding transport operation
+#   frame is None for a plain read (AsyncProDVK.read_response)
+# ==========================================================================
+class _IORequest(object):
+
+    def __init__(self, transport, frame, seqNum, deadline, loop, future):
+        self.transport = transport
+        self.frame     = frame
+        self.seqNum    = seqNum
+        self.deadline  = deadline
+        self.loop      = loop
+        self.future    = future
+        self.cancelled = False
+
+    def complete(self, response):
+        self.loop.call_soon_threadsafe(_set_future_result, self.future, response)
+
+    def fail(self, ex):
+        self.loop.call_soon_threadsafe(_set_future_exception, self.future, ex)
+
+
+def _set_future_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_future_exception(future, ex):
+    if not future.done():
+        future.set_exception(ex)
+
+
+# ==========================================================================
+#   Dedicated I/O thread shared by any number of boards
+#   Frames are written as soon as they are submitted.  Every board with
+#   outstanding requests has a reader thread blocked on its transport
+#   (for up to poll_interval ms at a time) that hands each packet to the
+#   I/O thread, which routes it to its request.  The reader of a board
+#   stops within poll_interval once nothing is outstanding on it.
+# ==========================================================================
+class ProDVKIOThread(object):
+
+    def __init__(self, poll_interval = 10):
+        self.poll_interval = max(1, int(poll_interval))
+        # Requests, and (transport, packet, error) from the readers
+        self._submitted = deque()
+        self._wakeup    = threading.Condition()
+        # transport -> (commands in flight keyed by seqNum, pending plain reads)
+        self._boards    = {}
+        # transport -> its reader thread
+        self._readers   = {}
+        self._stopped   = False
+        self._thread    = threading.Thread(target=self._run, name='prodvk-io', daemon=True)
+        self._thread.start()
+
+    def submit(self, request):
+        with self._wakeup:
+            self._submitted.append(request)
+            self._wakeup.notify()
+        return
+
+    def stop(self):
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify()
+        self._thread.join()
+        return
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._submitted and not self._stopped:
+                    timeout = self._next_deadline()
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self._wakeup.wait(timeout)
+                if self._stopped:
+                    break
+                submitted = list(self._submitted)
+                self._submitted.clear()
+
+            for item in submitted:
+                if isinstance(item, _IORequest):
+                    self._start(item)
+                else:
+                    self._route(*item)
+
+            self._expire(time.monotonic())
+
+        # Fail whatever is left so no caller waits forever
+        for commands, reads in self._boards.values():
+            for request in list(commands.values()) + list(reads):
+                request.fail(ProDVKTransportError('I/O thread stopped'))
+        with self._wakeup:
+            self._boards.clear()
+        return
+
+    # Seconds until the first deadline of a request, None if none has one
+    def _next_deadline(self):
+        deadlines = [request.deadline
+                     for commands, reads in self._boards.values()
+                     for request in list(commands.values()) + list(reads)
+                     if request.deadline is not None]
+        if not deadlines:
+            return None
+        return min(deadlines) - time.monotonic()
+
+    def _start(self, request):
+        if request.cancelled:
+            return
+        with self._wakeup:
+            commands, reads = self._boards.setdefault(request.transport, ({}, deque()))
+            if request.transport not in self._readers:
+                reader = threading.Thread(target=self._read_board, args=(request.transport,),
+                                          name='prodvk-io-reader', daemon=True)
+                self._readers[request.transport] = reader
+                reader.start()
+        if request.frame is None:
+            reads.append(request)
+            return
+        try:
+            request.transport.write(request.frame)
+        except ProDVKTransportError as ex:
+            request.fail(ex)
+            self._forget(request.transport)
+            return
+        commands[request.seqNum] = request
+        return
+
+    # Reader thread of one board
+    def _read_board(self, transport):
+        while True:
+            with self._wakeup:
+                if self._stopped or transport not in self._boards:
+                    del self._readers[transport]
+                    return
+            try:
+                response = transport.read(DVK_USB_EP_SIZE, self.poll_interval)
+                error = None
+            except ProDVKTimeoutError:
+                # Nothing arrived within the poll interval
+                continue
+            except ProDVKTransportError as ex:
+                response = None
+                error = ex
+            with self._wakeup:
+                self._submitted.append((transport, response, error))
+                self._wakeup.notify()
+                if error is not None:
+                    del self._readers[transport]
+                    return
+
+    def _route(self, transport, response, error):
+        commands, reads = self._boards.get(transport, (None, None))
+        if error is not None:
+            # The board is gone: fail everything outstanding on it
+            if commands is not None:
+                for request in list(commands.values()) + list(reads):
+                    request.fail(error)
+                commands.clear()
+                reads.clear()
+                self._forget(transport)
+            return
+
+        request = None
+        if commands is not None:
+            if response[TESTOP_RESP_IDX_CMD] == COMMAND_TESTOP:
+                request = commands.pop(response[TESTOP_RESP_IDX_SEQNUM], None)
+            if request is None and reads:
+                request = reads.popleft()
+
+        if request is None:
+            _lib.logger.warning("Discarding packet with no waiting request.  Response=" + convert_array_to_hex(response, len(response)))
+        elif not request.cancelled:
+            request.complete(response)
+        self._forget(transport)
+        return
+
+    def _expire(self, now):
+        for transport, (commands, reads) in list(self._boards.items()):
+            for seqNum, request in list(commands.items()):
+                if request.cancelled:
+                    del commands[seqNum]
+                elif request.deadline is not None and now >= request.deadline:
+                    del commands[seqNum]
+                    request.fail(asyncio.TimeoutError())
+            for request in list(reads):
+                if request.cancelled:
+                    reads.remove(request)
+                elif request.deadline is not None and now >= request.deadline:
+                    reads.remove(request)
+                    request.fail(asyncio.TimeoutError())
+            self._forget(transport)
+        return
+
+    # Stop reading a board once nothing is outstanding on it
+    def _forget(self, transport):
+        commands, reads = self._boards.get(transport, (None, None))
+        if commands is not None and not commands and not reads:
+            with self._wakeup:
+                del self._boards[transport]
+        return
+
+
+_default_io_thread = None
+_default_io_thread_lock = threading.Lock()
+
+
+# ==========================================================================
+#   The I/O thread shared by all clients that don't provide their own
+# ==========================================================================
+def default_io_thread():
+    global _default_io_thread
+    with _default_io_thread_lock:
+        if _default_io_thread is None:
+            _default_io_thread = ProDVKIOThread()
+        return _default_io_thread
+
+
+# ==========================================================================
+#   asyncio client for one board
+#
+#   Sequence numbers, counters and parsed results are kept in a
+#   ProDVKSession: the one given, the default session if board_transport
+#   is not given or is the board the default session is connected to, a
+#   new one for board_transport otherwise.  Sync helpers and client calls
+#   on one board thus share its sequence numbers; they should not be
+#   issued at the same time, as both read the board's responses.
+#
+#   timeout is the default per-call timeout in seconds.  Every call also
+#   accepts timeout= to override it; None waits forever.  Cancelling the
+#   awaiting task abandons the command (its response is discarded).
+# ==========================================================================
+class AsyncProDVK(object):
+
+    def __init__(self, board_transport = None, io_thread = None, timeout = DVK_USB_TIMEOUT / 1000.0, session = None):
+        if session is None:
+            if board_transport is None or board_transport is _lib._default_session.transport:
+                session = _lib._default_session
+                board_transport = session.transport
+            else:
+                session = ProDVKSession(board_transport)
+        elif board_transport is None:
+            board_transport = session.transport
+        if board_transport is None:
+            raise ValueError('No transport given and no board connected')
+        self.session   = session
+        self.transport = board_transport
+        self.io_thread = io_thread if io_thread is not None else default_io_thread()
+        self.timeout   = timeout
+
+    # Awaitable version of send_command_with_args().  Returns the error code.
+    async def send_command_with_args(self, subcmd, devSlot, argcnt, argvect, timeout = Ellipsis):
+        seqNum = self.session.next_seq_num()
+
+        command_buf = encode_command_frame(subcmd, devSlot, seqNum, argcnt, argvect)
+        if command_buf is None:
+            _lib.logger.warning('Command failed.  Invalid number of arguments= ' + str(argcnt))
+            return TESTOP_ERRCODE_BAD_PARAMS
+
+        self.session.forget_state(subcmd, devSlot)
+        response = await self._request(bytes(command_buf), seqNum, timeout)
+        return self.session.parse_response_checked(subcmd, response, seqNum)
+
+    async def send_command(self, subcmd, devSlot, timeout = Ellipsis):
+        return await self.send_command_with_args(subcmd, devSlot, 0, 0, timeout)
+
+    # Awaitable version of read_response(): the next packet from the board
+    async def read_response(self, timeout = Ellipsis):
+        return await self._request(None, None, timeout)
+
+    # Run any synchronous send_command_* helper asynchronously.
+    # The helper's commands are recorded and then sent in order, up to the
+    # first that fails; the error code of that one or of the last one is
+    # returned (like the helpers themselves do).
+    async def call(self, helper, *args, timeout = Ellipsis, **kwargs):
+        # Record on the session the helper belongs to (the default session
+        # for the module level functions)
+        session = getattr(helper, '__self__', self.session)
+        if not isinstance(session, ProDVKSession):
+            session = self.session
+        with CommandRecorder(session) as recorder:
+            helper(*args, **kwargs)
+
+        errcode = TESTOP_ERRCODE_SUCCESS
+        for subcmd, devSlot, argcnt, argvect in recorder.commands:
+            errcode = await self.send_command_with_args(subcmd, devSlot, argcnt, argvect, timeout)
+            if errcode != TESTOP_ERRCODE_SUCCESS:
+                break
+        return errcode
+
+    # client.send_command_xxx(...) / client.execute_xxx(...) run the
+    # session helper of the same name through call()
+    def __getattr__(self, name):
+        if name.startswith('_') or name == 'session':
+            raise AttributeError(name)
+        helper = getattr(self.session, name, None)
+        if not name.startswith(('send_command', 'execute_')) or not callable(helper):
+            raise AttributeError(name)
+
+        async def method(*args, timeout = Ellipsis, **kwargs):
+            return await self.call(helper, *args, timeout = timeout, **kwargs)
+        method.__name__ = name
+        return method
+
+    async def _request(self, frame, seqNum, timeout):
+        if timeout is Ellipsis:
+            timeout = self.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        request = _IORequest(self.transport, frame, seqNum, deadline, loop, future)
+        self.io_thread.submit(request)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            request.cancelled = True
+            raise
@@ -0,0 +1,638 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    benchmarks.py
+# @brief   Microbenchmarks for the host side of the proDVK library
+#
+# Run with:
+#
+#     python -m proDVKlib.benchmarks
+#
+# No board is needed; commands go to a loopback transport or to the
+# emulator, both answering every frame immediately, so only the time spent
+# on the host is measured.
+#
+############################################################################
+
+import gc
+import logging
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from . import (ProDVKSession, ProDVKTransport, BackgroundReader,
+               COMMAND_TESTOP, DVK_USB_EP_SIZE,
+               TESTOP_CMD_IDX_SUBCMD, TESTOP_CMD_IDX_SEQNUM,
+               TESTOP_RESP_IDX_SUBCMD, TESTOP_RESP_IDX_SEQNUM, TESTOP_RESP_IDX_DETAIL,
+               TESTOP_RESP_MAX_DETAIL, TESTOP_CMD_MAX_ARGS,
+               TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST, TESTOP_SUBCMD_READ_STATUS,
+               TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP, TESTOP_SUBCMD_READ_CRC,
+               TESTOP_SUBCMD_HCI_EM_SET_CLOCK_SOURCE, TESTOP_SUBCMD_READ_DUT_VER,
+               TESTOP_SUBCMD_READ_REF_VER, TESTOP_SUBCMD_READ_ADC, SLOT_DUT, SLOT_REF, SLOT_NA,
+               convert_subcmd_to_string, encode_command_frame)
+from .conversion import convert_counts
+from .emulator import ProDVKEmulator
+from .patch import build_patch_container, upload_patch, provision_patches
+from .plan import compile_plan, plan_step
+
+_lib = sys.modules[__package__]
+
+
+# ==========================================================================
+#   Transport answering every command with a bare SUCCESS response
+# ==========================================================================
+class LoopbackTransport(ProDVKTransport):
+
+    product_name  = 'Loopback'
+    serial_number = 'LOOPBACK'
+
+    def __init__(self):
+        self.response = bytearray(DVK_USB_EP_SIZE)
+        self.response[0] = COMMAND_TESTOP
+        self.response[1] = 3
+
+    def write(self, data):
+        self.response[TESTOP_RESP_IDX_SUBCMD] = data[TESTOP_CMD_IDX_SUBCMD]
+        self.response[TESTOP_RESP_IDX_SEQNUM] = data[TESTOP_CMD_IDX_SEQNUM]
+        return len(data)
+
+    def read(self, size = DVK_USB_EP_SIZE, timeout = 0):
+        return self.response
+
+
+# ==========================================================================
+#   The frame encoder as it was before frames were built in place:
+#   a struct.pack per argument count and byte-wise concatenation above 4
+# ==========================================================================
+def legacy_encode_command_frame(subcmd, devSlot, seqNum, argcnt, argvect):
+    paramLength = 3 + argcnt
+    header = struct.pack('BBBBB', COMMAND_TESTOP, paramLength, subcmd, seqNum, devSlot)
+
+    if argcnt == 0:
+        command_buf = header
+    elif argcnt == 1:
+        command_buf = struct.pack('BBBBBB', COMMAND_TESTOP, paramLength, subcmd, seqNum, devSlot, argvect[0] & 0xff)
+    elif argcnt == 2:
+        command_buf = struct.pack('BBBBBBB', COMMAND_TESTOP, paramLength, subcmd, seqNum, devSlot, argvect[0], argvect[1])
+    elif argcnt == 3:
+        command_buf = struct.pack('BBBBBBBB', COMMAND_TESTOP, paramLength, subcmd, seqNum, devSlot,
+                                  argvect[0], argvect[1], argvect[2])
+    elif argcnt == 4:
+        command_buf = struct.pack('BBBBBBBBB', COMMAND_TESTOP, paramLength, subcmd, seqNum, devSlot,
+                                  argvect[0], argvect[1], argvect[2], argvect[3])
+    else:
+        command_buf = header
+        i = 0
+        while i < argcnt:
+            command_buf = command_buf + struct.pack('B', argvect[i])
+            i = i + 1
+    return command_buf
+
+
+# Best time per call in microseconds
+def _time_per_call(func, iterations, repeat = 5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / iterations * 1e6
+
+
+# Peak memory (bytes) allocated while making one call
+def _peak_bytes_per_call(func):
+    func()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+    return peak - before
+
+
+# ==========================================================================
+#   Encode time and transient allocation per frame, old and new encoder,
+#   for a range of argument counts.
+#   Returns (argcnt, legacy_us, legacy_bytes, inplace_us, inplace_bytes)
+# ==========================================================================
+def bench_frame_encode(iterations = 20000, argcnts = (0, 1, 4, 8, 16, 54)):
+    rows = []
+    frame_buf = memoryview(bytearray(DVK_USB_EP_SIZE))
+    for argcnt in argcnts:
+        argvect = bytes(range(argcnt))
+
+        def legacy():
+            return legacy_encode_command_frame(TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST, SLOT_DUT, 1, argcnt, argvect)
+
+        def inplace():
+            return encode_command_frame(TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST, SLOT_DUT, 1, argcnt, argvect, frame_buf)
+
+        assert bytes(legacy()) == bytes(inplace())
+        rows.append((argcnt,
+                     _time_per_call(legacy, iterations), _peak_bytes_per_call(legacy),
+                     _time_per_call(inplace, iterations), _peak_bytes_per_call(inplace)))
+    return rows
+
+
+# ==========================================================================
+#   Host time per command for a few send_command_* helpers through the
+#   loopback transport.  Returns (helper name, us per command).
+# ==========================================================================
+def bench_command_helpers(iterations = 20000):
+    session = ProDVKSession(LoopbackTransport())
+    helpers = [
+        ('send_command',            lambda: session.send_command(TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST, SLOT_DUT)),
+        ('send_command_1argbyte',   lambda: session.send_command_1argbyte(TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST, SLOT_DUT, 1)),
+        ('send_command_2argwords',  lambda: session.send_command_2argwords(TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST, SLOT_DUT, 1, 2)),
+        ('send_command_set_ref_clock', session.send_command_set_ref_clock),
+        ('send_command_em_write_at_address (48 bytes)',
+            lambda: session.send_command_em_write_at_address(SLOT_DUT, 0x1000, bytes(48), 48)),
+    ]
+    return [(name, _time_per_call(helper, iterations)) for name, helper in helpers]
+
+
+# ==========================================================================
+#   Host time per response in parse_response() for subcmds that used to
+#   be near the start, in the middle and at the end of its elif chain,
+#   and for one without a parser.  Returns (subcmd name, us per response).
+# ==========================================================================
+def bench_response_dispatch(iterations = 20000):
+    session = ProDVKSession(LoopbackTransport())
+    rows = []
+    for subcmd, detail in ((TESTOP_SUBCMD_READ_STATUS,             bytes(6)),
+                           (TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP,  b'Started'),
+                           (TESTOP_SUBCMD_READ_CRC,                b'Started'),
+                           (TESTOP_SUBCMD_HCI_EM_SET_CLOCK_SOURCE, b'')):
+        response = bytearray(DVK_USB_EP_SIZE)
+        response[0] = COMMAND_TESTOP
+        response[1] = 3 + len(detail)
+        response[TESTOP_RESP_IDX_SUBCMD] = subcmd
+        response[TESTOP_RESP_IDX_SEQNUM] = session.cmdSeqNum
+        response[TESTOP_RESP_IDX_DETAIL:TESTOP_RESP_IDX_DETAIL + len(detail)] = detail
+
+        def parse():
+            return session.parse_response(subcmd, response)
+
+        rows.append((convert_subcmd_to_string(subcmd), _time_per_call(parse, iterations)))
+    return rows
+
+
+# Formats every record it is given, like a real handler, and counts them
+class CountingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.formatted = 0
+
+    def emit(self, record):
+        self.format(record)
+        self.formatted += 1
+
+
+# ==========================================================================
+#   Host time per command through the emulator with the logger at WARNING
+#   (the production level) and at INFO, and how many log messages were
+#   formatted for one pass over the commands.
+#   Returns (level name, us per command, messages formatted per pass)
+# ==========================================================================
+def bench_emulator_logging(iterations = 2000):
+    session = ProDVKSession(ProDVKEmulator())
+    commands = (session.send_command_read_current,
+                session.send_command_em_get_memory_usage,
+                session.send_command_em_patch_query,
+                session.send_command_em_calculate_crc32,
+                session.send_command_read_board_ver)
+
+    def run_commands():
+        for command in commands:
+            command()
+
+    logger    = _lib.logger
+    handler   = CountingHandler()
+    old_level = logger.level
+    old_propagate = logger.propagate
+    logger.addHandler(handler)
+    logger.propagate = False
+    rows = []
+    try:
+        for level in (logging.WARNING, logging.INFO):
+            logger.setLevel(level)
+            us = _time_per_call(run_commands, iterations) / len(commands)
+            handler.formatted = 0
+            run_commands()
+            rows.append((logging.getLevelName(level), us, handler.formatted))
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = old_propagate
+        logger.setLevel(old_level)
+    return rows
+
+
+# ==========================================================================
+#   Bytes per second dumping device memory from the emulator, one
+#   READ_AT_ADDRESS per chunk with the bytes recovered from the hex
+#   string as before, and with read_memory() into a preallocated buffer.
+#   Then bytes per second loading the same region with one
+#   WRITE_AT_ADDRESS per chunk, and with write_memory() with and without
+#   the CRC verify.
+#   Returns (method, bytes/s)
+# ==========================================================================
+def bench_memory_transfer(length = 0x8000, repeat = 3):
+    session = ProDVKSession(ProDVKEmulator())
+    buffer  = bytearray(length)
+    data    = bytes(range(256)) * (length // 256)
+
+    def hex_string_dump():
+        data = bytearray()
+        for address in range(0, length, TESTOP_RESP_MAX_DETAIL):
+            session.send_command_em_read_at_address(SLOT_DUT, address, min(TESTOP_RESP_MAX_DETAIL, length - address))
+            data += bytes.fromhex(session.get_last_read_mem_string())
+        return data
+
+    def read_memory():
+        return session.read_memory(SLOT_DUT, 0, length, buffer)
+
+    # At most 55 data bytes follow the address of a WRITE_AT_ADDRESS
+    write_chunk = TESTOP_CMD_MAX_ARGS - 4
+
+    def write_at_address_load():
+        for address in range(0, length, write_chunk):
+            chunk = data[address:address + write_chunk]
+            session.send_command_em_write_at_address(SLOT_DUT, address, chunk, len(chunk))
+
+    def write_memory():
+        return session.write_memory(SLOT_DUT, 0, data, verify=False)
+
+    def write_memory_verified():
+        return session.write_memory(SLOT_DUT, 0, data)
+
+    rows = []
+    for name, transfer in (('READ_AT_ADDRESS + hex string', hex_string_dump),
+                           ('read_memory', read_memory),
+                           ('WRITE_AT_ADDRESS per chunk', write_at_address_load),
+                           ('write_memory', write_memory),
+                           ('write_memory + CRC verify', write_memory_verified)):
+        seconds = _time_per_call(transfer, 1, repeat) / 1e6
+        rows.append((name, length / seconds))
+    return rows
+
+
+# ==========================================================================
+#   Patch upload from a container file through an emulator answering
+#   after 'latency' seconds, one frame at a time and pipelined.
+#   Returns (pipeline depth, kB/s)
+# ==========================================================================
+def bench_patch_upload(size = 16 * 1024, latency = 0.0005, depths = (1, 4, 8, 16)):
+    container = build_patch_container(bytes(range(256)) * (size // 256), 0x4000)
+    with tempfile.NamedTemporaryFile(suffix='.emp', delete=False) as f:
+        f.write(container)
+    try:
+        rows = []
+        for depth in depths:
+            session = ProDVKSession(ProDVKEmulator(latency=latency))
+            result = upload_patch(f.name, SLOT_DUT, depth, session=session)
+            assert result.verified
+            rows.append((depth, result.bytes_per_second / 1000))
+    finally:
+        os.unlink(f.name)
+    return rows
+
+
+# ==========================================================================
+#   Seconds to provision a DUT with two 16 kB containers, when it has
+#   none of them and when it already carries both (inventory and CRC
+#   cache only).  Returns (case, seconds)
+# ==========================================================================
+def bench_patch_provisioning(size = 16 * 1024, latency = 0.0005):
+    directory = tempfile.mkdtemp()
+    paths = []
+    for index, address in enumerate((0x4000, 0x10000)):
+        paths.append(os.path.join(directory, 'patch%d.emp' % index))
+        with open(paths[-1], 'wb') as f:
+            f.write(build_patch_container(bytes([index]) * size, address))
+
+    session = ProDVKSession(ProDVKEmulator(latency=latency))
+    rows = []
+    try:
+        for case in ('empty DUT', 'provisioned DUT'):
+            start = time.perf_counter()
+            provision_patches(paths, SLOT_DUT, session=session)
+            rows.append((case, time.perf_counter() - start))
+    finally:
+        for name in os.listdir(directory):
+            os.unlink(os.path.join(directory, name))
+        os.rmdir(directory)
+    return rows
+
+
+# ==========================================================================
+#   Updating a 64 kB region in which a few bytes changed, by rewriting
+#   all of it and with sync_memory(), through an emulator answering after
+#   'latency' seconds.  Returns (method, seconds, bytes written, commands)
+# ==========================================================================
+def bench_memory_sync(length = 0x10000, latency = 0.0005):
+    board = ProDVKEmulator(latency=latency)
+    session = ProDVKSession(board)
+    image = bytearray(bytes(range(256)) * (length // 256))
+    session.write_memory(SLOT_DUT, 0, image, verify=False)
+    for offset in (0x100, 0x5432, length - 8):
+        image[offset] ^= 0xFF
+
+    rows = []
+    for name, update in (('write_memory', lambda: session.write_memory(SLOT_DUT, 0, image)),
+                         ('sync_memory', lambda: session.sync_memory(SLOT_DUT, 0, image))):
+        commands = board.commands_received
+        start = time.perf_counter()
+        result = update()
+        seconds = time.perf_counter() - start
+        written = result.length if name == 'write_memory' else result.bytes_written
+        rows.append((name, seconds, written, board.commands_received - commands))
+        # Undo the update for the next method
+        for offset in (0x100, 0x5432, length - 8):
+            board.devices[SLOT_DUT].memory[offset] ^= 0xFF
+    return rows
+
+
+# ==========================================================================
+#   ns per sample converting a block of raw counts (signed 32 bit words)
+#   to currents: one sample at a time as the parsers used to, and with
+#   convert_counts() for one channel and for a channel per sample.
+#   Returns (method, ns per sample)
+# ==========================================================================
+def bench_current_conversion(samples = 200000):
+    raw = struct.pack('<%dl' % samples, *range(-samples // 2, samples - samples // 2))
+    channels = bytes(index % 3 for index in range(samples))
+
+    def per_sample():
+        currents = []
+        for (counts,), channel in zip(struct.iter_unpack('<l', raw), channels):
+            if channel == 0:
+                currents.append(counts * 0.00012681845361088004)
+            elif channel == 1:
+                currents.append(counts * 0.0012681845361088002)
+            else:
+                currents.append(counts * 0.012681845361088)
+        return currents
+
+    rows = []
+    for name, convert in (('one sample at a time', per_sample),
+                          ('convert_counts, one channel', lambda: convert_counts(raw, 1)),
+                          ('convert_counts, channel per sample', lambda: convert_counts(raw, channels))):
+        rows.append((name, _time_per_call(convert, 1, 3) * 1000 / samples))
+    return rows
+
+
+# ==========================================================================
+#   A DUT's identification queries (the FW versions, the BD address,
+#   the memory usage and the patch inventory) issued 'repeat' times, as
+#   test flows do, with and without the query cache, through an emulator
+#   answering after 'latency' seconds.  Returns (case, seconds, commands)
+# ==========================================================================
+def bench_query_cache(repeat = 10, latency = 0.0005):
+    rows = []
+    for case, enabled in (('without cache', False), ('with cache', True)):
+        board = ProDVKEmulator(latency=latency)
+        session = ProDVKSession(board)
+        session.query_cache_enabled = enabled
+        start = time.perf_counter()
+        for _ in range(repeat):
+            # What generate_test_fw_version_log() sends (it forces INFO logging)
+            session.send_command(TESTOP_SUBCMD_READ_DUT_VER, SLOT_NA)
+            session.send_command(TESTOP_SUBCMD_READ_REF_VER, SLOT_NA)
+            session.send_command_read_board_ver()
+            session.send_command_read_BLE_address(SLOT_DUT)
+            session.send_command_em_get_memory_usage(SLOT_DUT)
+            session.send_command_em_patch_query(SLOT_DUT, 0)
+        rows.append((case, time.perf_counter() - start, board.commands_received))
+    return rows
+
+
+# ==========================================================================
+#   A measurement preceded by the setup scripts reissue before each one
+#   (power level, clock source, event mask, power mode, current range),
+#   'repeat' times, with and without the shadow configuration, through an
+#   emulator answering after 'latency' seconds.
+#   Returns (case, seconds, commands)
+# ==========================================================================
+def bench_shadow_config(repeat = 10, latency = 0.0005):
+    rows = []
+    for case, enabled in (('without shadow', False), ('with shadow', True)):
+        board = ProDVKEmulator(latency=latency)
+        session = ProDVKSession(board)
+        session.shadow_config_enabled = enabled
+        start = time.perf_counter()
+        for _ in range(repeat):
+            session.send_command_em_set_rf_power_level(SLOT_DUT, 4)
+            session.send_command_em_set_clock_source(SLOT_DUT, 1)
+            session.send_command_em_set_event_mask(SLOT_DUT, 1)
+            session.send_command_em_set_power_mode(SLOT_DUT, 0)
+            session.send_command_set_current_range(1)
+            session.send_command_read_ADC(SLOT_DUT, 1)
+        rows.append((case, time.perf_counter() - start, board.commands_received))
+    return rows
+
+
+# ==========================================================================
+#   Time to get past one lost response to READ_ADC once its timeout was
+#   learned, through an emulator answering after 'latency' seconds.
+#   Returns (seconds, learned timeout in ms, retries)
+# ==========================================================================
+def bench_lost_response(latency = 0.0005):
+    board = ProDVKEmulator(latency=latency)
+    session = ProDVKSession(board)
+    for _ in range(64):
+        session.send_command_read_ADC(SLOT_DUT, 1)
+    board.drop_responses = 1
+    level = _lib.logger.level
+    # The retry is logged as a warning
+    _lib.logger.setLevel('ERROR')
+    try:
+        start = time.perf_counter()
+        session.send_command_read_ADC(SLOT_DUT, 1)
+        seconds = time.perf_counter() - start
+    finally:
+        _lib.logger.setLevel(level)
+    return seconds, session.timeout_policy.timeout(TESTOP_SUBCMD_READ_ADC), session.command_retries
+
+
+# ==========================================================================
+#   ms per READ_ADC of a script that works 'work' seconds between
+#   commands while the board sends an HCI event every 'interval' seconds,
+#   one packet per 'report_interval' reaching the host (as on the HID
+#   interrupt endpoint), with the session reading the board itself and
+#   with a BackgroundReader.  Returns (case, ms per command, events routed)
+# ==========================================================================
+def bench_event_flood(commands = 50, work = 0.003, interval = 0.002, report_interval = 0.001):
+    event = b'\x04\x0e\x04\x01\x03\x0c\x00'
+    # Without a reader every event is logged as a spontaneous response:
+    # keep the default WARNING level but send the messages nowhere
+    level, propagate, handlers = _lib.logger.level, _lib.logger.propagate, _lib.logger.handlers
+    _lib.logger.setLevel('WARNING')
+    _lib.logger.propagate = False
+    _lib.logger.handlers = [logging.NullHandler()]
+    rows = []
+    try:
+        for case in ('no events', 'events, no reader', 'events, BackgroundReader'):
+            board = ProDVKEmulator()
+            board.report_interval = report_interval
+            session = ProDVKSession(board)
+            reader = BackgroundReader(session) if case.endswith('BackgroundReader') else None
+            stop = threading.Event()
+
+            def flood():
+                while not stop.wait(interval):
+                    board.inject_event(event)
+
+            flooder = threading.Thread(target=flood)
+            if case != 'no events':
+                flooder.start()
+            if reader is not None:
+                reader.start()
+            try:
+                elapsed = 0.0
+                for _ in range(commands):
+                    time.sleep(work)
+                    start = time.perf_counter()
+                    session.send_command_read_ADC(SLOT_DUT, 1)
+                    elapsed += time.perf_counter() - start
+            finally:
+                stop.set()
+                if case != 'no events':
+                    flooder.join()
+                if reader is not None:
+                    reader.stop()
+            rows.append((case, elapsed * 1000 / commands, reader.events_received if reader is not None else None))
+    finally:
+        _lib.logger.setLevel(level)
+        _lib.logger.propagate = propagate
+        _lib.logger.handlers = handlers
+    return rows
+
+# ==========================================================================
+#   A radio test setup sent by the helpers and as a compiled plan (with
+#   every response parsed, then with parse_all=False), host time per
+#   command through a loopback transport and time per pass through an
+#   emulator answering after 'latency' seconds, with the estimate of the
+#   plan's dry run for the latter.
+#   Returns (case, loopback us per command, emulator ms per pass,
+#   estimated ms per pass or None)
+# ==========================================================================
+def bench_compiled_plan(iterations = 2000, repeat = 10, latency = 0.0005):
+    steps = [
+        plan_step('send_command_le_set_Advertising_parameters', SLOT_DUT, 0x20, 0x40),
+        plan_step('send_command_le_set_Scan_Parameters', SLOT_REF),
+        plan_step('send_command_le_receiver_test', SLOT_DUT, 19),
+        plan_step('send_command_em_transmitter_test', SLOT_REF, 0, 19, 37, 0),
+        plan_step('send_command_le_set_Advertising_enable', SLOT_DUT, 0),
+        plan_step('send_command_em_write_at_address', SLOT_DUT, 0x1000, bytes(48), 48),
+    ]
+
+    def helpers(session):
+        for step in steps:
+            getattr(session, step.helper)(*step.args, **step.kwargs)
+
+    rows = []
+    for case in ('helpers', 'compiled plan', 'lean plan'):
+        parse_all = case != 'lean plan'
+        session = ProDVKSession(LoopbackTransport())
+        if case == 'helpers':
+            per_call = _time_per_call(lambda: helpers(session), iterations)
+        else:
+            test_plan = compile_plan(steps, session)
+            per_call = _time_per_call(lambda: test_plan.run(session, parse_all=parse_all), iterations)
+
+        board = ProDVKEmulator(latency=latency)
+        session = ProDVKSession(board)
+        estimate = None
+        start = time.perf_counter()
+        for _ in range(repeat):
+            if case == 'helpers':
+                helpers(session)
+            else:
+                test_plan.run(session, parse_all=parse_all)
+        elapsed = time.perf_counter() - start
+        if case != 'helpers':
+            estimate = test_plan.dry_run(session).seconds * 1000
+        rows.append((case, per_call / len(steps), elapsed / repeat * 1000, estimate))
+    return rows
+
+
+def main():
+    # Keep the per-response INFO logging out of the measurement
+    _lib.logger.setLevel('WARNING')
+
+    print('Frame encode (per frame)')
+    print('  argcnt   legacy us  legacy B   in-place us  in-place B')
+    for argcnt, legacy_us, legacy_bytes, inplace_us, inplace_bytes in bench_frame_encode():
+        print('  %6d   %9.3f  %8d   %11.3f  %10d' % (argcnt, legacy_us, legacy_bytes, inplace_us, inplace_bytes))
+
+    print('Command helpers through a loopback transport (per command)')
+    for name, us in bench_command_helpers():
+        print('  %-45s %8.2f us' % (name, us))
+
+    print('Response dispatch in parse_response (per response)')
+    for name, us in bench_response_dispatch():
+        print('  %-45s %8.2f us' % (name, us))
+
+    print('Commands through the emulator by log level (per command)')
+    for level, us, formatted in bench_emulator_logging():
+        print('  %-8s %8.2f us   %d log messages formatted per pass' % (level, us, formatted))
+
+    print('Memory dump and load through the emulator')
+    for name, rate in bench_memory_transfer():
+        print('  %-45s %8.0f kB/s' % (name, rate / 1000))
+
+    print('ADC counts to current (per sample)')
+    for name, ns in bench_current_conversion():
+        print('  %-45s %8.1f ns' % (name, ns))
+
+    print('Patch upload, 16 kB container, 0.5 ms response latency')
+    for depth, rate in bench_patch_upload():
+        print('  depth %-3d %8.1f kB/s' % (depth, rate))
+
+    print('Updating 3 bytes of a 64 kB region, 0.5 ms response latency')
+    for name, seconds, written, commands in bench_memory_sync():
+        print('  %-20s %8.1f ms  %6d bytes written  %5d commands' % (name, seconds * 1000, written, commands))
+
+    print('Patch provisioning, two 16 kB containers')
+    for case, seconds in bench_patch_provisioning():
+        print('  %-45s %8.1f ms' % (case, seconds * 1000))
+
+    print('Identification queries, 10 passes, 0.5 ms response latency')
+    for case, seconds, commands in bench_query_cache():
+        print('  %-20s %8.1f ms  %5d commands' % (case, seconds * 1000, commands))
+
+    print('Setup and measurement, 10 passes, 0.5 ms response latency')
+    for case, seconds, commands in bench_shadow_config():
+        print('  %-20s %8.1f ms  %5d commands' % (case, seconds * 1000, commands))
+
+    print('Lost response, 0.5 ms response latency')
+    seconds, timeout, retries = bench_lost_response()
+    print('  READ_ADC             %8.1f ms  (timeout %d ms, %d retry)' % (seconds * 1000, timeout, retries))
+
+    print('READ_ADC every 3 ms, an HCI event every 2 ms, 1 ms per packet (per command)')
+    for case, ms, events in bench_event_flood():
+        print('  %-30s %8.2f ms' % (case, ms) + ('' if events is None else '   %d events routed' % events))
+
+    print('Radio test setup, 6 commands: helpers and compiled plan')
+    print('  case             loopback us/cmd   emulator ms/pass   estimated ms/pass')
+    for case, us, ms, estimate in bench_compiled_plan():
+        print('  %-15s %16.2f %18.2f' % (case, us, ms) + ('' if estimate is None else ' %19.2f' % estimate))
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    calibration.py
+# @brief   Persistent current calibration of the Production Test DVK Boards
+#
+# EXEC_CALIBRATION measures the 5 mA, 100 uA and 1 uA references of a
+# board.  A CalibrationStore keeps the result of every board, by serial
+# number, so a session that connects again within the TTL loads it
+# instead of calibrating:
+#
+#     serial_number = session.connect_to_device(None)
+#     result = load_calibration(session, CalibrationStore())
+#     result.source                   # 'store' or 'board'
+#
+# A board is calibrated again once its entry is older than the TTL, when
+# force is set (e.g. a reference measurement is out of tolerance) or after
+# invalidate().  A calibration that moved more than drift_limit from the
+# previous one of the board is reported as drift, and the board is then
+# calibrated at every load until two calibrations in a row agree within
+# drift_limit again.
+#
+# Every board has its own file in the store directory, so the worker
+# processes of a ProDVKStation can share one store.
+#
+############################################################################
+
+import json
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+
+from . import CalibrationResult, define_result
+
+_lib = sys.modules[__package__]
+
+# Default store directory and how long a calibration stays valid (seconds)
+CALIBRATION_STORE_DIR   = os.path.join(os.path.expanduser('~'), '.prodvk', 'calibration')
+CALIBRATION_TTL         = 24 * 3600.0
+# Largest relative change of a reference between two calibrations of a
+# board that is not reported as drift
+CALIBRATION_DRIFT_LIMIT = 0.02
+
+# drift is the one measured when the entry was stored (None if the board
+# had no previous calibration, or for entries stored before it was kept)
+CalibrationEntry = namedtuple('CalibrationEntry', 'current_5mA current_100uA current_1uA timestamp drift',
+                              defaults=(None,))
+
+CalibrationLoadResult = define_result('CalibrationLoadResult', 'serial_number calibration source age drift',
+                                      lambda record: 'Board=%s  Source=%s  Age=%.0f s  %s'
+                                                     % (record.serial_number, record.source, record.age, record.calibration) +
+                                                     ('' if record.drift is None else '  Drift=%.2f%%' % (record.drift * 100)))
+
+
+# Largest relative change of a reference between two calibrations
+def calibration_drift(previous, current):
+    return max(abs(new - old) / abs(old) if old else (0.0 if new == old else float('inf'))
+               for old, new in zip(previous[:3], current[:3]))
+
+
+# ==========================================================================
+#   The calibrations of the boards, one JSON file per serial number in
+#   'directory'
+#
+#   get() returns a calibration younger than 'ttl' seconds (and that had
+#   not drifted more than drift_limit, if given), or None.
+#   put() writes the file of the board at once (atomically).
+# ==========================================================================
+class CalibrationStore(object):
+
+    def __init__(self, directory = CALIBRATION_STORE_DIR, ttl = CALIBRATION_TTL):
+        self.directory = directory
+        self.ttl       = ttl
+        self.hits      = 0
+        self.misses    = 0
+
+    def path(self, serial_number):
+        return os.path.join(self.directory, re.sub(r'[^0-9A-Za-z_.-]', '_', serial_number) + '.json')
+
+    # The latest calibration of the board whatever its age, or None
+    def load(self, serial_number):
+        try:
+            with open(self.path(serial_number)) as f:
+                return CalibrationEntry(*json.load(f))
+        except (IOError, OSError, ValueError, TypeError):
+            # Missing or unreadable entry: the board has to be calibrated
+            return None
+
+    def get(self, serial_number, now = None, drift_limit = None):
+        entry = self.load(serial_number)
+        if now is None:
+            now = time.time()
+        if (entry is not None and 0 <= now - entry.timestamp < self.ttl and
+                (drift_limit is None or entry.drift is None or entry.drift <= drift_limit)):
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def put(self, serial_number, calibration, timestamp = None, drift = None):
+        if timestamp is None:
+            timestamp = time.time()
+        entry = CalibrationEntry(calibration[0], calibration[1], calibration[2], timestamp, drift)
+        path = self.path(serial_number)
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = path + '.' + str(os.getpid()) + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(list(entry), f)
+        os.replace(temp_path, path)
+        return entry
+
+    def invalidate(self, serial_number):
+        try:
+            os.remove(self.path(serial_number))
+        except OSError:
+            pass
+        return
+
+
+# ==========================================================================
+#   Set the calibration of the session from the store, or run
+#   EXEC_CALIBRATION (and store the result) if the board has no calibration
+#   younger than the TTL of the store, its last calibration drifted more
+#   than drift_limit, or 'force' is set.
+#
+#   serial_number defaults to the one of the connected board.
+#
+#   Returns a CalibrationLoadResult: where the calibration came from, its
+#   age, and its drift from the previous calibration of the board (None if
+#   it was loaded or the board was never calibrated before).  Raises
+#   ProDVKCommandError if the calibration fails.
+# ==========================================================================
+def load_calibration(session = None, store = None, serial_number = None, force = False,
+                     drift_limit = CALIBRATION_DRIFT_LIMIT, code = 0):
+    if session is None:
+        session = _lib._default_session
+    if store is None:
+        store = CalibrationStore()
+    if serial_number is None:
+        serial_number = session.transport.serial_number
+
+    now = time.time()
+    entry = None if force else store.get(serial_number, now, drift_limit)
+    if entry is not None:
+        session.last_5mA_calibration   = entry.current_5mA
+        session.last_100uA_calibration = entry.current_100uA
+        session.last_1uA_calibration   = entry.current_1uA
+        return CalibrationLoadResult(serial_number, CalibrationResult(*entry[:3]), 'store', now - entry.timestamp, None)
+
+    previous = store.load(serial_number)
+    calibration = session.query('execute_current_calibration', code)
+
+    drift = None
+    if previous is not None:
+        drift = calibration_drift(previous, calibration)
+    store.put(serial_number, calibration, now, drift)
+
+    if drift is not None and drift > drift_limit:
+        _lib.logger.warning('Board ' + serial_number + ': calibration drifted ' + format(drift * 100, '.2f') +
+                            '% since ' + time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(previous.timestamp)))
+    return CalibrationLoadResult(serial_number, calibration, 'board', 0.0, drift)
@@ -0,0 +1,98 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    conversion.py
+# @brief   ADC count to current conversion of the Production Test DVK Board
+#
+# The DUT current is measured across one of three shunt resistors (the
+# current range, reported as the channel of a measurement) by an amplifier
+# and a 21 bit ADC.  Currents are in uA, as everywhere in the library:
+#
+#     current  = counts_to_current(channel, counts)
+#     currents = convert_counts(block_of_counts, channels)
+#
+# convert_counts() converts whole blocks in one call: with numpy if it is
+# installed, element by element into an array('d') otherwise.
+#
+############################################################################
+
+import array
+import operator
+import sys
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# ==========================================================================
+#   Front-end model
+# ==========================================================================
+ADC_VREF          = 1.25
+ADC_COUNT_DIV     = float((2 ** 21) - 1)
+# Shunt (ohms) of each current range, by channel
+SHUNT_OHMS        = (47.0, 4.7, 0.47)
+# Amplifier gain of the measurements and of the calibration of each range
+AMPLIFIER_GAIN    = 100
+CALIBRATION_GAINS = (100, 1000, 1000)
+MICROAMPS_PER_AMP = 1000000.0
+
+
+# uA per ADC count of a current range
+def range_scale(current_range, gain = AMPLIFIER_GAIN):
+    return (ADC_VREF / ADC_COUNT_DIV) / (SHUNT_OHMS[current_range] * gain) * MICROAMPS_PER_AMP
+
+
+RANGE_SCALE       = tuple(range_scale(current_range) for current_range in range(len(SHUNT_OHMS)))
+CALIBRATION_SCALE = tuple(range_scale(current_range, gain) for current_range, gain in enumerate(CALIBRATION_GAINS))
+
+# Channels above the last range use the last range
+def _range_of(channel):
+    return channel if channel < len(RANGE_SCALE) else len(RANGE_SCALE) - 1
+
+# Scale by channel byte, for the conversion without numpy
+_CHANNEL_SCALE = [RANGE_SCALE[_range_of(channel)] for channel in range(256)]
+
+
+# ==========================================================================
+#   One measurement: ADC counts on 'channel' to uA
+# ==========================================================================
+def counts_to_current(channel, counts):
+    return counts * RANGE_SCALE[_range_of(channel)]
+
+
+# ==========================================================================
+#   A block of measurements to uA
+#
+#   counts    a sequence or array of counts, or a buffer of raw signed 32
+#             bit little endian counts (bytes, bytearray, memoryview)
+#   channels  the channel of every count, or one channel for all of them
+#
+#   Returns a numpy float64 array if numpy is installed (and use_numpy is
+#   not False), an array('d') otherwise.
+# ==========================================================================
+def convert_counts(counts, channels, use_numpy = None):
+    raw = isinstance(counts, (bytes, bytearray, memoryview))
+    single_channel = isinstance(channels, int)
+
+    if numpy is not None and use_numpy is not False:
+        if raw:
+            counts = numpy.frombuffer(counts, dtype='<i4')
+        counts = numpy.asarray(counts, dtype=numpy.float64)
+        if single_channel:
+            return counts * RANGE_SCALE[_range_of(channels)]
+        ranges = numpy.minimum(numpy.asarray(channels), len(RANGE_SCALE) - 1)
+        return counts * numpy.asarray(RANGE_SCALE)[ranges]
+
+    if raw:
+        # Raw counts are signed 32 bit little endian words
+        raw_counts = array.array('i')
+        raw_counts.frombytes(counts)
+        if sys.byteorder == 'big':
+            raw_counts.byteswap()
+        counts = raw_counts
+    if single_channel:
+        return array.array('d', map(RANGE_SCALE[_range_of(channels)].__mul__, counts))
+    return array.array('d', map(operator.mul, counts, map(_CHANNEL_SCALE.__getitem__, channels)))
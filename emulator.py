@@ -0,0 +1,617 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    emulator.py
+# @brief   In-process emulator of the Production Test DVK Board
+#
+# ProDVKEmulator is a loopback transport that speaks the TESTOP framing of
+# the "prodvk" FW application.  It lets the library be exercised, soak-tested
+# and benchmarked without a physical board:
+#
+#     board = ProDVKEmulator(serial_number='EMU0001', latency=0.002)
+#     prodvk.connect_to_device(None, board_transport=board)
+#
+# Every command is answered with the same sequence number and with a detail
+# payload laid out the way the parse_* functions expect it.
+#
+############################################################################
+
+import array
+import random
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+
+from . import (ProDVKTransport, ProDVKTransportError, ProDVKTimeoutError, FUNCTEST_BUSY,
+               COMMAND_TESTOP, DVK_USB_EP_SIZE, DVK_USB_TIMEOUT,
+               SLOT_REF, SLOT_DUT,
+               TESTOP_RESP_IDX_DETAIL, TESTOP_RESP_MAX_DETAIL,
+               TESTOP_ERRCODE_SUCCESS, TESTOP_ERRCODE_UNK_CMD, TESTOP_ERRCODE_BAD_PARAMS,
+               TESTOP_SUBCMD_READ_PRODVK_FW_VER, TESTOP_SUBCMD_READ_PRODVK_SN,
+               TESTOP_SUBCMD_READ_DUT_VER, TESTOP_SUBCMD_READ_REF_VER,
+               TESTOP_SUBCMD_READ_CURRENT, TESTOP_SUBCMD_READ_ADC, TESTOP_SUBCMD_READ_STATUS,
+               TESTOP_SUBCMD_SET_CURRENT_RANGE_1, TESTOP_SUBCMD_SET_CURRENT_RANGE_2,
+               TESTOP_SUBCMD_SET_CURRENT_RANGE_3, TESTOP_SUBCMD_RESET_9304,
+               TESTOP_SUBCMD_EXEC_XTALVALIDATION, TESTOP_SUBCMD_EXEC_CALIBRATION,
+               TESTOP_SUBCMD_HCI_READ_9304_VER, TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST,
+               TESTOP_SUBCMD_HCI_LE_TRANSMITTER_TEST, TESTOP_SUBCMD_HCI_LE_TEST_END,
+               TESTOP_SUBCMD_HCI_RESET, TESTOP_SUBCMD_HCI_READ_BD_ADDR,
+               TESTOP_SUBCMD_HCI_LE_GET_ADVERTISING_REPORT,
+               TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP, TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE,
+               TESTOP_SUBCMD_FUNCTEST_CURRENT_RX, TESTOP_SUBCMD_FUNCTEST_CURRENT_TX,
+               TESTOP_SUBCMD_FUNCTEST_PER_TX, TESTOP_SUBCMD_FUNCTEST_PER_RX,
+               TESTOP_SUBCMD_FUNCTEST_ADVERTISE, TESTOP_SUBCMD_FUNCTEST_RSSI,
+               TESTOP_SUBCMD_FUNCTEST_XTAL, TESTOP_SUBCMD_FUNCTEST_PWR_MODE,
+               TESTOP_SUBCMD_FUNCTEST_SVLD, TESTOP_SUBCMD_FUNCTEST_READ_RESULTS,
+               TESTOP_SUBCMD_GPIO_READ_DIGITAL_IO, TESTOP_SUBCMD_GPIO_READ_ANALOG_IO,
+               TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT, TESTOP_SUBCMD_WRITE_DAC_LTC2633,
+               TESTOP_SUBCMD_READ_ADC_MAX11614EEE, TESTOP_SUBCMD_UPLOAD_TO_9304,
+               TESTOP_SUBCMD_READ_CRC,
+               TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST, TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST_END,
+               TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS, TESTOP_SUBCMD_HCI_EM_READ_CONTINUE,
+               TESTOP_SUBCMD_HCI_EM_WRITE_AT_ADDRESS, TESTOP_SUBCMD_HCI_EM_WRITE_CONTINUE,
+               TESTOP_SUBCMD_HCI_EM_SET_POWER_MODE_EX, TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL_EX,
+               TESTOP_SUBCMD_HCI_EM_GET_MEMORY_USAGE, TESTOP_SUBCMD_HCI_EM_SVLD_MEASUREMENT,
+               TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK, TESTOP_SUBCMD_HCI_EM_CPU_RESET,
+               TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX, TESTOP_SUBCMD_HCI_EM_PATCH_QUERY,
+               TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_START, TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_CONTINUE,
+               TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_ABORT,
+               TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD)
+from .conversion import RANGE_SCALE, CALIBRATION_SCALE
+from .patch import PATCH_CONTAINER_HEADER, parse_patch_header
+
+# Every TESTOP subcommand the library knows about.  Anything else is
+# answered with TESTOP_ERRCODE_UNK_CMD, like the FW does.
+_KNOWN_SUBCMDS = frozenset(value for name, value in vars(sys.modules[__package__]).items()
+                           if name.startswith('TESTOP_SUBCMD_'))
+
+# LE test packets are sent every 625us
+_LE_TEST_PACKET_RATE = 1600.0
+
+_FUNCTEST_CURRENT_SUBCMDS = (TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP, TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE,
+                             TESTOP_SUBCMD_FUNCTEST_CURRENT_RX, TESTOP_SUBCMD_FUNCTEST_CURRENT_TX)
+
+
+# ==========================================================================
+#   State of one emulated EM9304 (the DUT or the REF)
+# ==========================================================================
+class EmulatedEM9304(object):
+
+    def __init__(self, slot, memory_size):
+        self.slot = slot
+        # HCI_Read_Local_Version_Information style version array
+        self.version = bytes([0x09, 0x03, 0x04, 0x00, 0x0A, 0x00, 0x0B, 0x01])
+        self.bd_address = bytes([0x01 + slot, 0x00, 0x00, 0xEE, 0xF3, 0x0C])
+        self.memory = bytearray(memory_size)
+        self.patches = []
+        self.cmd_count = 0
+        self.reset()
+
+    # Volatile state lost on a hard/soft/CPU reset
+    def reset(self):
+        self.power_mode = 0
+        self.svld = 0x1C
+        self.rf_power_level = 0
+        self.max_power_level = 10
+        self.event_mask = 0
+        self.test_start = None
+        # Where the next READ_CONTINUE reads from and WRITE_CONTINUE writes
+        # to (None: no read/write started)
+        self.read_address  = None
+        self.write_address = None
+        # Patch container being received with WRITE_PATCH_START/CONTINUE
+        self.patch_upload = None
+
+
+# ==========================================================================
+#   Loopback transport emulating a Production Test Board with a DUT and
+#   a REF EM9304.
+#
+#   latency       transit time of every response (seconds)
+#   service_time  time the board spends executing each command (seconds);
+#                 commands are executed one after another
+#   jitter        additional random response delay, 0..jitter seconds
+#
+#   report_interval (attribute) is the least time between two packets
+#   read by the host, like the polling interval of the HID interrupt
+#   endpoint (0: no limit).
+# ==========================================================================
+class ProDVKEmulator(ProDVKTransport):
+
+    def __init__(self, serial_number = 'EMU00000000000000000000000000001', product_name = 'proDVK Emulator',
+                 latency = 0.0, service_time = 0.0, jitter = 0.0, memory_size = 0x20000):
+        self.serial_number = serial_number
+        self.product_name  = product_name
+        self.latency       = latency
+        self.service_time  = service_time
+        self.jitter        = jitter
+
+        self.board_fw_version = b'1.2.0'
+        self.devices = {SLOT_REF: EmulatedEM9304(SLOT_REF, memory_size),
+                        SLOT_DUT: EmulatedEM9304(SLOT_DUT, memory_size)}
+
+        # Analog front-end model.  Currents are in the same units the
+        # library reports (ADC counts * range scale factor).
+        self.current_range    = 0
+        self.currents         = {TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP:  1.6,
+                                 TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE: 160.0,
+                                 TESTOP_SUBCMD_FUNCTEST_CURRENT_RX:     5200.0,
+                                 TESTOP_SUBCMD_FUNCTEST_CURRENT_TX:     4700.0}
+        self.read_current_value = 160.0
+        self.xtal_ppm         = 12.5
+        self.packet_loss      = 0.002
+        self.rssi             = -48
+        self.advertising_reports = 37
+        self.svld_string      = b'3.012V'
+        self.gpio_digital     = b'1'
+        self.gpio_analog      = b'1650'
+        self.adc_millivolts   = 1800
+        # Relative error of the calibration references (calibration drift)
+        self.calibration_error = 0.0
+
+        # The last functional test started with a FUNCTEST_* command
+        self.functest_subcmd  = None
+        self.functest_args    = b''
+        self.functest_start   = 0.0
+        # Seconds each functional test stays busy, by subcmd
+        # (functest_duration for the ones not listed)
+        self.functest_duration  = 0.0
+        self.functest_durations = {}
+        self.commands_received = 0
+        # Faults: the next 'drop_responses' responses are lost, the next
+        # 'late_responses' ones arrive 'late_delay' seconds late
+        self.drop_responses = 0
+        self.late_responses = 0
+        self.late_delay     = 0.1
+
+        self._pending    = deque()
+        self._busy_until = 0.0
+        self._last_due   = 0.0
+        self.report_interval = 0.0
+        self._last_report    = 0.0
+        self._cond       = threading.Condition()
+        self._closed     = False
+
+        self._handlers = {
+            TESTOP_SUBCMD_READ_PRODVK_FW_VER:       self._cmd_read_board_ver,
+            TESTOP_SUBCMD_READ_PRODVK_SN:           self._cmd_read_board_sn,
+            TESTOP_SUBCMD_READ_DUT_VER:             self._cmd_read_dut_ver,
+            TESTOP_SUBCMD_READ_REF_VER:             self._cmd_read_ref_ver,
+            TESTOP_SUBCMD_READ_CURRENT:             self._cmd_read_current,
+            TESTOP_SUBCMD_READ_ADC:                 self._cmd_read_adc,
+            TESTOP_SUBCMD_READ_STATUS:              self._cmd_read_status,
+            TESTOP_SUBCMD_SET_CURRENT_RANGE_1:      self._cmd_set_current_range,
+            TESTOP_SUBCMD_SET_CURRENT_RANGE_2:      self._cmd_set_current_range,
+            TESTOP_SUBCMD_SET_CURRENT_RANGE_3:      self._cmd_set_current_range,
+            TESTOP_SUBCMD_RESET_9304:               self._cmd_reset,
+            TESTOP_SUBCMD_HCI_RESET:                self._cmd_reset,
+            TESTOP_SUBCMD_HCI_EM_CPU_RESET:         self._cmd_reset,
+            TESTOP_SUBCMD_EXEC_XTALVALIDATION:      self._cmd_xtal_validation,
+            TESTOP_SUBCMD_EXEC_CALIBRATION:         self._cmd_calibration,
+            TESTOP_SUBCMD_HCI_READ_9304_VER:        self._cmd_read_9304_ver,
+            TESTOP_SUBCMD_HCI_LE_RECEIVER_TEST:     self._cmd_start_le_test,
+            TESTOP_SUBCMD_HCI_LE_TRANSMITTER_TEST:  self._cmd_start_le_test,
+            TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST:  self._cmd_start_le_test,
+            TESTOP_SUBCMD_HCI_LE_TEST_END:          self._cmd_end_le_test,
+            TESTOP_SUBCMD_HCI_EM_TRANSMITTER_TEST_END: self._cmd_end_le_test,
+            TESTOP_SUBCMD_HCI_READ_BD_ADDR:         self._cmd_read_bd_addr,
+            TESTOP_SUBCMD_HCI_LE_GET_ADVERTISING_REPORT: self._cmd_advertising_report,
+            TESTOP_SUBCMD_HCI_EM_SET_POWER_MODE_EX: self._cmd_set_power_mode,
+            TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL_EX: self._cmd_set_rf_power_level,
+            TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK:    self._cmd_set_event_mask,
+            TESTOP_SUBCMD_HCI_EM_GET_MEMORY_USAGE:  self._cmd_memory_usage,
+            TESTOP_SUBCMD_HCI_EM_SVLD_MEASUREMENT:  self._cmd_svld,
+            TESTOP_SUBCMD_HCI_PROTEST_GET_SVLD:     self._cmd_protest_svld,
+            TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX: self._cmd_calculate_crc32,
+            TESTOP_SUBCMD_HCI_EM_PATCH_QUERY:       self._cmd_patch_query,
+            TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_START: self._cmd_write_patch_start,
+            TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_CONTINUE: self._cmd_write_patch_continue,
+            TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_ABORT: self._cmd_write_patch_abort,
+            TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS:   self._cmd_read_at_address,
+            TESTOP_SUBCMD_HCI_EM_READ_CONTINUE:     self._cmd_read_continue,
+            TESTOP_SUBCMD_HCI_EM_WRITE_AT_ADDRESS:  self._cmd_write_at_address,
+            TESTOP_SUBCMD_HCI_EM_WRITE_CONTINUE:    self._cmd_write_continue,
+            TESTOP_SUBCMD_FUNCTEST_READ_RESULTS:    self._cmd_read_results,
+            TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT: self._cmd_start_functest,
+            TESTOP_SUBCMD_GPIO_READ_DIGITAL_IO:     self._cmd_gpio_read_digital,
+            TESTOP_SUBCMD_GPIO_READ_ANALOG_IO:      self._cmd_gpio_read_analog,
+            TESTOP_SUBCMD_READ_ADC_MAX11614EEE:     self._cmd_read_adc_max11614eee,
+            TESTOP_SUBCMD_WRITE_DAC_LTC2633:        self._cmd_ascii_ack,
+            TESTOP_SUBCMD_UPLOAD_TO_9304:           self._cmd_ascii_ack,
+            TESTOP_SUBCMD_READ_CRC:                 self._cmd_ascii_ack,
+        }
+        for subcmd in range(TESTOP_SUBCMD_FUNCTEST_CURRENT_SLEEP, TESTOP_SUBCMD_FUNCTEST_SVLD + 1):
+            self._handlers[subcmd] = self._cmd_start_functest
+
+    # ======================================================================
+    #   Transport interface
+    # ======================================================================
+    def write(self, data):
+        frame = bytes(data)
+        if self._closed:
+            raise ProDVKTransportError('Emulator is closed')
+
+        # Anything that is not a TESTOP frame would go to the bridge; ignore it
+        if len(frame) < TESTOP_RESP_IDX_DETAIL or frame[0] != COMMAND_TESTOP:
+            return len(frame)
+
+        param_length = frame[1]
+        subcmd       = frame[2]
+        seq_num      = frame[3]
+        slot         = frame[4]
+        args         = frame[5:2 + param_length]
+
+        self.commands_received += 1
+        errcode, detail = self._execute(subcmd, slot, args)
+        self._queue_response(subcmd, seq_num, errcode, detail)
+        return len(frame)
+
+    def read(self, size = DVK_USB_EP_SIZE, timeout = DVK_USB_TIMEOUT):
+        # As with libusb, a timeout of 0 (or None) waits forever
+        deadline = None
+        if timeout:
+            deadline = time.monotonic() + timeout / 1000.0
+
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait_time = None
+                if self._pending:
+                    due = max(self._pending[0][0], self._last_report + self.report_interval)
+                    if due <= now:
+                        self._last_report = now
+                        return self._pending.popleft()[1][:size]
+                    wait_time = due - now
+                if self._closed:
+                    raise ProDVKTransportError('Emulator is closed')
+                if deadline is not None:
+                    if now >= deadline:
+                        raise ProDVKTimeoutError('Operation timed out')
+                    if wait_time is None or deadline - now < wait_time:
+                        wait_time = deadline - now
+                self._cond.wait(wait_time)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        return
+
+    # Number of responses queued but not yet read by the host
+    def pending_responses(self):
+        with self._cond:
+            return len(self._pending)
+
+    # ======================================================================
+    #   Command execution
+    # ======================================================================
+    def _execute(self, subcmd, slot, args):
+        if subcmd not in _KNOWN_SUBCMDS:
+            return TESTOP_ERRCODE_UNK_CMD, b''
+
+        device = self.devices.get(slot)
+        if device is not None:
+            device.cmd_count += 1
+
+        handler = self._handlers.get(subcmd)
+        if handler is None:
+            # Plain set/config commands are simply acknowledged
+            return TESTOP_ERRCODE_SUCCESS, b''
+
+        try:
+            return handler(subcmd, slot, args)
+        except (struct.error, IndexError, KeyError, ValueError):
+            return TESTOP_ERRCODE_BAD_PARAMS, b''
+
+    # ======================================================================
+    #   Send a packet that does not answer a command (e.g. an HCI event,
+    #   b'\x04\x0e...') to the host, after the responses already queued
+    # ======================================================================
+    def inject_event(self, data):
+        packet = array.array('B', bytes(data))
+        packet.frombytes(bytes(DVK_USB_EP_SIZE - len(packet)))
+        with self._cond:
+            due = max(time.monotonic() + self.latency, self._last_due)
+            self._last_due = due
+            self._pending.append((due, packet))
+            self._cond.notify_all()
+        return
+
+    def _queue_response(self, subcmd, seq_num, errcode, detail):
+        if self.drop_responses > 0:
+            self.drop_responses -= 1
+            return
+        packet = array.array('B', bytes([COMMAND_TESTOP, 3 + len(detail), subcmd, seq_num, errcode]))
+        packet.frombytes(detail)
+        # HID reports always arrive as full-size packets
+        packet.frombytes(bytes(DVK_USB_EP_SIZE - len(packet)))
+
+        with self._cond:
+            now = time.monotonic()
+            # The board executes commands one at a time, the responses then
+            # take 'latency' to reach the host.  Responses are never reordered.
+            done = max(now, self._busy_until) + self.service_time
+            self._busy_until = done
+            due = done + self.latency
+            if self.jitter:
+                due += random.uniform(0, self.jitter)
+            if self.late_responses > 0:
+                self.late_responses -= 1
+                due += self.late_delay
+            due = max(due, self._last_due)
+            self._last_due = due
+            self._pending.append((due, packet))
+            self._cond.notify_all()
+        return
+
+    def _device(self, slot):
+        return self.devices[slot]
+
+    def _counts_for_current(self, current, adc_range):
+        return int(round(current / RANGE_SCALE[adc_range]))
+
+    # ----------------------------------------------------------------------
+    #   Board commands
+    # ----------------------------------------------------------------------
+    def _cmd_read_board_ver(self, subcmd, slot, args):
+        return TESTOP_ERRCODE_SUCCESS, self.board_fw_version.ljust(8, b'\0')[:8]
+
+    def _cmd_read_board_sn(self, subcmd, slot, args):
+        return TESTOP_ERRCODE_SUCCESS, self.serial_number.encode().ljust(32, b'\0')[:32]
+
+    def _cmd_read_dut_ver(self, subcmd, slot, args):
+        return TESTOP_ERRCODE_SUCCESS, self.devices[SLOT_DUT].version
+
+    def _cmd_read_ref_ver(self, subcmd, slot, args):
+        return TESTOP_ERRCODE_SUCCESS, self.devices[SLOT_REF].version
+
+    def _cmd_read_status(self, subcmd, slot, args):
+        return TESTOP_ERRCODE_SUCCESS, struct.pack('<BBHH', 0, 0,
+                                                   self.devices[SLOT_DUT].cmd_count & 0xFFFF,
+                                                   self.devices[SLOT_REF].cmd_count & 0xFFFF)
+
+    def _cmd_read_current(self, subcmd, slot, args):
+        counts = self._counts_for_current(self.read_current_value, self.current_range)
+        return TESTOP_ERRCODE_SUCCESS, struct.pack('<Ll', self.current_range, counts)
+
+    def _cmd_read_adc(self, subcmd, slot, args):
+        channel = args[0] if args else 0
+        counts = self._counts_for_current(self.read_current_value, min(channel, 2))
+        return TESTOP_ERRCODE_SUCCESS, struct.pack('<Ll', channel, counts)
+
+    def _cmd_set_current_range(self, subcmd, slot, args):
+        self.current_range = subcmd - TESTOP_SUBCMD_SET_CURRENT_RANGE_1
+        return TESTOP_ERRCODE_SUCCESS, b''
+
+    def _cmd_xtal_validation(self, subcmd, slot, args):
+        max_dut_clocks = struct.unpack_from('<L', args)[0]
+        ref_tics = int(round(max_dut_clocks * (1.0 + self.xtal_ppm * 1e-6)))
+        return TESTOP_ERRCODE_SUCCESS, struct.pack('<LL', ref_tics, max_dut_clocks)
+
+    def _cmd_calibration(self, subcmd, slot, args):
+        counts = [int(round(nominal * (1.0 + self.calibration_error) / scale))
+                  for nominal, scale in zip((5000.0, 100.0, 1.0), CALIBRATION_SCALE)]
+        return TESTOP_ERRCODE_SUCCESS, struct.pack('<lll', *counts)
+
+    def _cmd_read_adc_max11614eee(self, subcmd, slot, args):
+        channel = args[0] if args else 0
+        return TESTOP_ERRCODE_SUCCESS, struct.pack('>BH', channel, self.adc_millivolts)
+
+    def _cmd_gpio_read_digital(self, subcmd, slot, args):
+        return TESTOP_ERRCODE_SUCCESS, self.gpio_digital
+
+    def _cmd_gpio_read_analog(self, subcmd, slot, args):
+        return TESTOP_ERRCODE_SUCCESS, self.gpio_analog
+
+    def _cmd_ascii_ack(self, subcmd, slot, args):
+        return TESTOP_ERRCODE_SUCCESS, b'OK'
+
+    # ----------------------------------------------------------------------
+    #   EM9304 commands
+    # ----------------------------------------------------------------------
+    def _cmd_reset(self, subcmd, slot, args):
+        self._device(slot).reset()
+        return TESTOP_ERRCODE_SUCCESS, b''
+
+    def _cmd_read_9304_ver(self, subcmd, slot, args):
+        return TESTOP_ERRCODE_SUCCESS, self._device(slot).version
+
+    def _cmd_read_bd_addr(self, subcmd, slot, args):
+        return TESTOP_ERRCODE_SUCCESS, self._device(slot).bd_address
+
+    def _cmd_start_le_test(self, subcmd, slot, args):
+        self._device(slot).test_start = time.monotonic()
+        return TESTOP_ERRCODE_SUCCESS, b''
+
+    def _cmd_end_le_test(self, subcmd, slot, args):
+        device = self._device(slot)
+        packets = 0
+        if device.test_start is not None:
+            packets = int((time.monotonic() - device.test_start) * _LE_TEST_PACKET_RATE)
+            device.test_start = None
+        return TESTOP_ERRCODE_SUCCESS, struct.pack('<H', min(packets, 0xFFFF))
+
+    def _cmd_advertising_report(self, subcmd, slot, args):
+        return TESTOP_ERRCODE_SUCCESS, struct.pack('<Lllll', self.advertising_reports,
+                                                   self.rssi - 3, self.rssi + 2, self.rssi, self.rssi + 1)
+
+    def _cmd_set_power_mode(self, subcmd, slot, args):
+        self._device(slot).power_mode = args[0]
+        return TESTOP_ERRCODE_SUCCESS, b''
+
+    def _cmd_set_rf_power_level(self, subcmd, slot, args):
+        device = self._device(slot)
+        device.rf_power_level = min(args[0], device.max_power_level)
+        return TESTOP_ERRCODE_SUCCESS, bytes([device.max_power_level])
+
+    def _cmd_set_event_mask(self, subcmd, slot, args):
+        self._device(slot).event_mask = struct.unpack_from('<L', args)[0]
+        return TESTOP_ERRCODE_SUCCESS, b''
+
+    def _cmd_memory_usage(self, subcmd, slot, args):
+        used = sum(len(patch['data']) for patch in self._device(slot).patches)
+        return TESTOP_ERRCODE_SUCCESS, struct.pack('<LLLL', 0x2800, 0x0400 + used, 0x0200, 0x0800)
+
+    def _cmd_svld(self, subcmd, slot, args):
+        device = self._device(slot)
+        return TESTOP_ERRCODE_SUCCESS, bytes([device.power_mode, device.svld])
+
+    def _cmd_protest_svld(self, subcmd, slot, args):
+        return TESTOP_ERRCODE_SUCCESS, bytes([self._device(slot).svld])
+
+    def _cmd_calculate_crc32(self, subcmd, slot, args):
+        start_address, end_address = struct.unpack_from('<LL', args)
+        memory = self._device(slot).memory
+        if start_address > end_address or end_address > len(memory):
+            return TESTOP_ERRCODE_BAD_PARAMS, b''
+        crc = zlib.crc32(memoryview(memory)[start_address:end_address]) & 0xFFFFFFFF
+        return TESTOP_ERRCODE_SUCCESS, struct.pack('<L', crc)
+
+    def _cmd_patch_query(self, subcmd, slot, args):
+        patch_index = struct.unpack_from('<H', args)[0]
+        patches = self._device(slot).patches
+        if patch_index >= len(patches):
+            if patch_index == 0:
+                # No patches loaded: only the counts are meaningful
+                return TESTOP_ERRCODE_SUCCESS, bytes(28)
+            return TESTOP_ERRCODE_BAD_PARAMS, b''
+        patch = patches[patch_index]
+        return TESTOP_ERRCODE_SUCCESS, struct.pack('<HHLLLLHHBBBB',
+                                                   len(patches), len(patches), 0,
+                                                   patch['address'], len(patch['data']),
+                                                   zlib.crc32(patch['data']) & 0xFFFFFFFF,
+                                                   patch['build_num'], patch['user_build_num'],
+                                                   patch['flags'], patch['version'],
+                                                   patch['type'], patch['id'])
+
+    # The container header comes first; the patch is loaded at its address
+    # once 'size' bytes have been received
+    def _cmd_write_patch_start(self, subcmd, slot, args):
+        device = self._device(slot)
+        device.patch_upload = None
+        try:
+            header = parse_patch_header(args)
+        except ValueError:
+            return TESTOP_ERRCODE_BAD_PARAMS, b''
+        if header.size < PATCH_CONTAINER_HEADER.size or header.address + header.size > len(device.memory):
+            return TESTOP_ERRCODE_BAD_PARAMS, b''
+        device.patch_upload = (header, bytearray())
+        return self._receive_patch(device, args)
+
+    def _cmd_write_patch_continue(self, subcmd, slot, args):
+        device = self._device(slot)
+        if device.patch_upload is None:
+            return TESTOP_ERRCODE_BAD_PARAMS, b''
+        return self._receive_patch(device, args)
+
+    def _cmd_write_patch_abort(self, subcmd, slot, args):
+        self._device(slot).patch_upload = None
+        return TESTOP_ERRCODE_SUCCESS, b''
+
+    def _receive_patch(self, device, data):
+        header, received = device.patch_upload
+        if len(received) + len(data) > header.size:
+            device.patch_upload = None
+            return TESTOP_ERRCODE_BAD_PARAMS, b''
+        received += data
+        if len(received) == header.size:
+            device.memory[header.address:header.address + header.size] = received
+            device.patches.append({'address': header.address, 'data': bytes(received),
+                                   'build_num': header.build_num, 'user_build_num': header.user_build_num,
+                                   'flags': header.flags, 'version': header.version,
+                                   'type': header.type, 'id': header.id})
+            device.patch_upload = None
+        return TESTOP_ERRCODE_SUCCESS, b''
+
+    def _cmd_read_at_address(self, subcmd, slot, args):
+        start_address, bytes_to_read = struct.unpack_from('<LB', args)
+        return self._read_memory(self._device(slot), start_address, bytes_to_read)
+
+    def _cmd_read_continue(self, subcmd, slot, args):
+        device = self._device(slot)
+        if device.read_address is None:
+            return TESTOP_ERRCODE_BAD_PARAMS, b''
+        return self._read_memory(device, device.read_address, args[0])
+
+    def _read_memory(self, device, start_address, bytes_to_read):
+        memory = device.memory
+        if bytes_to_read > TESTOP_RESP_MAX_DETAIL or start_address + bytes_to_read > len(memory):
+            device.read_address = None
+            return TESTOP_ERRCODE_BAD_PARAMS, b''
+        device.read_address = start_address + bytes_to_read
+        return TESTOP_ERRCODE_SUCCESS, bytes(memory[start_address:start_address + bytes_to_read])
+
+    def _cmd_write_at_address(self, subcmd, slot, args):
+        start_address = struct.unpack_from('<L', args)[0]
+        return self._write_memory(self._device(slot), start_address, args[4:])
+
+    def _cmd_write_continue(self, subcmd, slot, args):
+        device = self._device(slot)
+        if device.write_address is None:
+            return TESTOP_ERRCODE_BAD_PARAMS, b''
+        return self._write_memory(device, device.write_address, args)
+
+    def _write_memory(self, device, start_address, data):
+        memory = device.memory
+        if start_address + len(data) > len(memory):
+            device.write_address = None
+            return TESTOP_ERRCODE_BAD_PARAMS, b''
+        memory[start_address:start_address + len(data)] = data
+        device.write_address = start_address + len(data)
+        return TESTOP_ERRCODE_SUCCESS, b''
+
+    # ----------------------------------------------------------------------
+    #   High level functional tests
+    # ----------------------------------------------------------------------
+    def _cmd_start_functest(self, subcmd, slot, args):
+        self.functest_subcmd = subcmd
+        self.functest_args   = bytes(args)
+        self.functest_start  = time.monotonic()
+        return TESTOP_ERRCODE_SUCCESS, b'Started'
+
+    def _cmd_read_results(self, subcmd, slot, args):
+        test = self.functest_subcmd
+        if test is None:
+            return TESTOP_ERRCODE_SUCCESS, bytes([0])
+
+        duration = self.functest_durations.get(test, self.functest_duration)
+        if time.monotonic() - self.functest_start < duration:
+            return TESTOP_ERRCODE_SUCCESS, bytes([FUNCTEST_BUSY | test])
+
+        if test in _FUNCTEST_CURRENT_SUBCMDS:
+            counts = self._counts_for_current(self.currents[test], self.current_range)
+            detail = struct.pack('<BxxxLl', test, self.current_range, counts)
+
+        elif test in (TESTOP_SUBCMD_FUNCTEST_PER_TX, TESTOP_SUBCMD_FUNCTEST_PER_RX):
+            sent = 1500
+            received = int(round(sent * (1.0 - self.packet_loss)))
+            # Packet counts are reported most significant byte first
+            detail = struct.pack('>BLL', test, sent, received)
+
+        elif test in (TESTOP_SUBCMD_FUNCTEST_ADVERTISE, TESTOP_SUBCMD_FUNCTEST_RSSI):
+            # The report count shares its first word with the test id
+            detail = struct.pack('<Lllll', (self.advertising_reports << 8) | test,
+                                 self.rssi - 3, self.rssi + 2, self.rssi, self.rssi + 1)
+
+        elif test == TESTOP_SUBCMD_FUNCTEST_XTAL:
+            dut_count = 32768000
+            ref_count = int(round(dut_count * (1.0 + self.xtal_ppm * 1e-6)))
+            detail = struct.pack('<BxxxLL', test, ref_count, dut_count)
+
+        elif test in (TESTOP_SUBCMD_FUNCTEST_PWR_MODE, TESTOP_SUBCMD_FUNCTEST_SVLD):
+            detail = struct.pack('<BB8s', test, self.devices[SLOT_DUT].power_mode, self.svld_string)
+
+        elif test == TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT:
+            samples = 4
+            counts = self._counts_for_current(self.read_current_value, self.current_range)
+            detail = (struct.pack('<BB10B', test, samples, *([self.current_range] * samples + [0] * (10 - samples))) +
+                      struct.pack('<%dl' % samples, *([counts] * samples)))
+
+        else:
+            detail = bytes([test])
+
+        return TESTOP_ERRCODE_SUCCESS, detail
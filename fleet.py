@@ -0,0 +1,249 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    fleet.py
+# @brief   Drive a rack of Production Test DVK Boards from one process
+#
+# ProDVKFleet enumerates every proDVK board on the USB bus in one pass,
+# opens them all in parallel and runs a test plan for each DUT on whichever
+# board is free:
+#
+#     fleet = ProDVKFleet.discover()
+#     fleet.open()
+#     results = fleet.run(dut_list, plan)     # plan(session, dut) -> result
+#     fleet.log_report()
+#     fleet.close()
+#
+# The DUTs are dealt out to per-board queues.  A board that runs out of
+# work steals from the back of the longest queue, so a slow board never
+# holds up the rest of the rack.
+#
+# report() shows per-board utilization and queue depth, and which part of
+# the busy time was spent waiting on the transport (USB) as opposed to
+# parsing and test logic on the host.
+#
+############################################################################
+
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from . import (ProDVKSession, ProDVKTransport, UsbTransport,
+               DVK_USB_EP_SIZE, DVK_USB_TIMEOUT)
+
+_lib = sys.modules[__package__]
+
+
+# Outcome of the plan for one DUT (error is the exception raised, if any)
+FleetResult = namedtuple('FleetResult', 'dut serial_number result error')
+
+# Per-board figures returned by ProDVKFleet.report()
+#   utilization  busy time / wall time of all run() calls
+#   io_share     part of the busy time spent blocked in transport read/write
+FleetBoardReport = namedtuple('FleetBoardReport',
+                              'serial_number jobs_done jobs_stolen jobs_failed '
+                              'queue_depth max_queue_depth utilization io_share commands')
+
+
+# ==========================================================================
+#   Transport wrapper accumulating the time spent blocked in write()/read()
+# ==========================================================================
+class TimedTransport(ProDVKTransport):
+
+    def __init__(self, transport):
+        self.transport     = transport
+        self.device        = getattr(transport, 'device', None)
+        self.product_name  = transport.product_name
+        self.serial_number = transport.serial_number
+        self.io_time  = 0.0
+        self.commands = 0
+
+    def write(self, data):
+        start = time.perf_counter()
+        try:
+            return self.transport.write(data)
+        finally:
+            self.io_time += time.perf_counter() - start
+            self.commands += 1
+
+    def read(self, size = DVK_USB_EP_SIZE, timeout = DVK_USB_TIMEOUT):
+        start = time.perf_counter()
+        try:
+            return self.transport.read(size, timeout)
+        finally:
+            self.io_time += time.perf_counter() - start
+
+    def close(self):
+        return self.transport.close()
+
+
+# ==========================================================================
+#   One board of the fleet: its session, its DUT queue and its counters
+# ==========================================================================
+class FleetBoard(object):
+
+    def __init__(self, transport):
+        self.serial_number   = transport.serial_number
+        self.transport       = TimedTransport(transport)
+        self.session         = ProDVKSession()
+        # (index, dut) tuples waiting to be tested on this board
+        self.queue           = deque()
+        self.max_queue_depth = 0
+        self.jobs_done       = 0
+        self.jobs_stolen     = 0
+        self.jobs_failed     = 0
+        self.busy_time       = 0.0
+
+
+# ==========================================================================
+#   A set of boards, indexed by serial number
+#   transports can be any ProDVKTransport objects (e.g. emulators);
+#   discover() builds the fleet from the boards on the USB bus.
+# ==========================================================================
+class ProDVKFleet(object):
+
+    def __init__(self, transports = (), max_workers = 16):
+        self.max_workers = max_workers
+        self.boards = {}
+        for transport in transports:
+            self.boards[transport.serial_number] = FleetBoard(transport)
+        self.wall_time = 0.0
+        self._lock = threading.Lock()
+
+    # Enumerate all the boards in one pass of the bus and read their
+    # descriptors in parallel
+    @classmethod
+    def discover(cls, max_workers = 16):
+        devices = UsbTransport.find_all_devices()
+        with ThreadPoolExecutor(max_workers = max_workers) as pool:
+            transports = list(pool.map(UsbTransport, devices))
+        _lib.logger.info('Found ' + str(len(transports)) + ' proDVK boards')
+        return cls(transports, max_workers)
+
+    def __len__(self):
+        return len(self.boards)
+
+    def __iter__(self):
+        return iter(self.boards)
+
+    # The session of the board with the given serial number
+    def __getitem__(self, serial_number):
+        return self.boards[serial_number].session
+
+    # Connect to all the boards in parallel.  Boards that fail to connect
+    # are logged and dropped from the fleet.  Returns the serial numbers of
+    # the boards that are ready.
+    def open(self):
+        def connect(board):
+            board.session.connect_to_device(None, board.transport)
+
+        with ThreadPoolExecutor(max_workers = self.max_workers) as pool:
+            futures = [(board, pool.submit(connect, board)) for board in self.boards.values()]
+
+        for board, future in futures:
+            try:
+                future.result()
+            except Exception as ex:
+                _lib.logger.error('Board ' + board.serial_number + ' failed to connect: ' + str(ex))
+                del self.boards[board.serial_number]
+
+        return list(self.boards)
+
+    def close(self):
+        for board in self.boards.values():
+            if board.session.transport is not None:
+                board.session.disconnect_proDVK()
+        return
+
+    # Run plan(session, dut) for every DUT and wait for all of them.
+    # Returns a FleetResult per DUT, in the order of 'duts'.  An exception
+    # raised by the plan is logged and stored in the result; the board
+    # carries on with the next DUT.
+    def run(self, duts, plan):
+        boards = list(self.boards.values())
+        if not boards:
+            raise ValueError('No boards in the fleet')
+
+        jobs = list(enumerate(duts))
+        results = [None] * len(jobs)
+
+        with self._lock:
+            for index, job in enumerate(jobs):
+                boards[index % len(boards)].queue.append(job)
+            for board in boards:
+                board.max_queue_depth = max(board.max_queue_depth, len(board.queue))
+
+        workers = [threading.Thread(target=self._worker, args=(board, plan, results),
+                                    name='prodvk-' + board.serial_number)
+                   for board in boards]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.wall_time += time.perf_counter() - start
+
+        return results
+
+    def _worker(self, board, plan, results):
+        while True:
+            job = self._next_job(board)
+            if job is None:
+                return
+            index, dut = job
+
+            result = None
+            error  = None
+            start  = time.perf_counter()
+            try:
+                result = plan(board.session, dut)
+            except Exception as ex:
+                _lib.logger.error('Board ' + board.serial_number + ': test plan failed for ' + str(dut) + ': ' + str(ex))
+                board.jobs_failed += 1
+                error = ex
+            board.busy_time += time.perf_counter() - start
+            board.jobs_done += 1
+
+            results[index] = FleetResult(dut, board.serial_number, result, error)
+
+    # Take the next DUT from the board's own queue, or steal the last one
+    # of the longest queue once it is empty
+    def _next_job(self, board):
+        with self._lock:
+            if board.queue:
+                return board.queue.popleft()
+
+            victim = max(self.boards.values(), key=lambda other: len(other.queue))
+            if victim.queue:
+                board.jobs_stolen += 1
+                return victim.queue.pop()
+        return None
+
+    # Per-board utilization and queue depth.
+    # A high io_share means the boards/USB are the bottleneck; a low one
+    # with high utilization means the host is.
+    def report(self):
+        report = []
+        with self._lock:
+            for board in self.boards.values():
+                utilization = board.busy_time / self.wall_time if self.wall_time else 0.0
+                io_share    = board.transport.io_time / board.busy_time if board.busy_time else 0.0
+                report.append(FleetBoardReport(board.serial_number, board.jobs_done, board.jobs_stolen,
+                                               board.jobs_failed, len(board.queue), board.max_queue_depth,
+                                               utilization, min(io_share, 1.0), board.transport.commands))
+        return report
+
+    def log_report(self):
+        for entry in self.report():
+            _lib.log_string('Board ' + entry.serial_number +
+                            ':  DUTs=' + str(entry.jobs_done) +
+                            ' Stolen=' + str(entry.jobs_stolen) +
+                            ' Failed=' + str(entry.jobs_failed) +
+                            ' QueueDepth=' + str(entry.queue_depth) + '/' + str(entry.max_queue_depth) +
+                            ' Utilization=' + format(entry.utilization * 100, '.1f') + '%' +
+                            ' USB=' + format(entry.io_share * 100, '.1f') + '%' +
+                            ' Commands=' + str(entry.commands))
+        return
@@ -0,0 +1,358 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    patch.py
+# @brief   Patch container upload to the EM9304 of a Production Test DVK Board
+#
+# upload_patch() streams a patch container to a DUT with
+# WRITE_PATCH_START/WRITE_PATCH_CONTINUE, keeping the frames pipelined,
+# and checks the result with PATCH_QUERY and CALCULATE_CRC32_EX:
+#
+#     with PatchImage.open('patch.emp') as image:
+#         result = upload_patch(image, SLOT_DUT, session=session)
+#     result.bytes_per_second, result.verified
+#
+# A container file is memory-mapped and sent straight from the mapping;
+# the image is never copied as a whole.
+#
+# provision_patches() uploads only the containers a device does not
+# already carry, comparing its PATCH_QUERY inventory with the CRC32s of
+# the images (cached next to the images, see PatchCrcCache):
+#
+#     result = provision_patches(['app.emp', 'rf.emp'], SLOT_DUT, session=session)
+#     result.uploaded, result.skipped
+#
+############################################################################
+
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import deque, namedtuple
+
+from . import (CommandPipeline, ProDVKCommandError, define_result,
+               SLOT_DUT, TESTOP_CMD_MAX_ARGS, TESTOP_ERRCODE_SUCCESS,
+               TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_START, TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_CONTINUE)
+
+_lib = sys.modules[__package__]
+
+
+# ==========================================================================
+#   Patch container header
+#
+#   sync word, container size (header included), load address,
+#   build number, user build number, flags, version, type, id
+#
+#   These are the fields the EM9304 reports back in PATCH_QUERY.
+# ==========================================================================
+PATCH_CONTAINER_SYNC   = b'EMPC'
+PATCH_CONTAINER_HEADER = struct.Struct('<4sLLHHBBBB')
+
+PatchHeader = namedtuple('PatchHeader', 'size address build_num user_build_num flags version type id')
+
+PatchUploadResult = define_result('PatchUploadResult', 'address size frames seconds bytes_per_second crc32 verified',
+                                  lambda record: 'Address=%#x  Size=%s  Frames=%s  Time=%.3f s  Rate=%.1f kB/s  CRC32=%#x'
+                                                 % (record.address, record.size, record.frames, record.seconds,
+                                                    record.bytes_per_second / 1000, record.crc32) +
+                                                 ('' if record.verified is None else '  Verified=%s' % record.verified))
+
+
+PatchProvisionResult = define_result('PatchProvisionResult', 'uploaded skipped uploads',
+                                     lambda record: 'Uploaded=%s  Skipped=%s' % (len(record.uploaded), len(record.skipped)))
+
+# Name of the CRC cache file kept next to the images
+PATCH_CRC_INDEX = '.patch_crc32.json'
+
+
+# Parse the container header at the start of 'data'.
+# Raises ValueError if it is not a patch container.
+def parse_patch_header(data):
+    if len(data) < PATCH_CONTAINER_HEADER.size:
+        raise ValueError('Patch container too short: ' + str(len(data)) + ' bytes')
+    fields = PATCH_CONTAINER_HEADER.unpack_from(data)
+    if fields[0] != PATCH_CONTAINER_SYNC:
+        raise ValueError('Not a patch container (sync word ' + fields[0].hex() + ')')
+    return PatchHeader._make(fields[1:])
+
+
+# Build a container from its payload (emulator, tests and benchmarks)
+def build_patch_container(payload, address, build_num = 0, user_build_num = 0,
+                          flags = 0, version = 1, container_type = 1, container_id = 0):
+    size = PATCH_CONTAINER_HEADER.size + len(payload)
+    return PATCH_CONTAINER_HEADER.pack(PATCH_CONTAINER_SYNC, size, address, build_num, user_build_num,
+                                       flags, version, container_type, container_id) + bytes(payload)
+
+
+# ==========================================================================
+#   A patch container held in memory or mapped from a file
+#
+#   data is a read-only memoryview of the whole container.  The CRC32 is
+#   computed once, on first use.
+# ==========================================================================
+class PatchImage(object):
+
+    def __init__(self, data, path = None):
+        self.path   = path
+        self._view  = memoryview(data)
+        self.data   = self._view.cast('B')
+        self.header = parse_patch_header(self.data)
+        if self.header.size != len(self.data):
+            raise ValueError('Patch container size ' + str(self.header.size) +
+                             ' does not match the image size ' + str(len(self.data)))
+        self._crc32 = None
+        self._map   = None
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            image = cls(mapping, path)
+        except Exception:
+            mapping.close()
+            raise
+        image._map = mapping
+        return image
+
+    def __len__(self):
+        return len(self.data)
+
+    def crc32(self):
+        if self._crc32 is None:
+            self._crc32 = zlib.crc32(self.data) & 0xFFFFFFFF
+        return self._crc32
+
+    def close(self):
+        self.data.release()
+        self._view.release()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+
+# ==========================================================================
+#   Upload a patch container to the device in 'dev_slot'
+#
+#   image is a PatchImage, the path of a container file or a buffer
+#   holding a container.  Up to 'depth' frames are in flight at a time,
+#   each carrying as many container bytes as fit in a command frame.
+#
+#   If a frame fails the upload is stopped with WRITE_PATCH_ABORT and
+#   ProDVKCommandError is raised.  With 'verify' the last patch reported
+#   by PATCH_QUERY must have the address, size and CRC32 of the image, and
+#   CALCULATE_CRC32_EX over the loaded range must match too; a mismatch
+#   is logged and counted as a test error.
+#
+#   Returns a PatchUploadResult.  The time and rate cover the transfer,
+#   not the verification.
+# ==========================================================================
+def upload_patch(image, dev_slot = SLOT_DUT, depth = 8, verify = True, session = None):
+    if session is None:
+        session = _lib._default_session
+    if not isinstance(image, PatchImage):
+        if isinstance(image, str):
+            image = PatchImage.open(image)
+        else:
+            image = PatchImage(image)
+        with image:
+            return upload_patch(image, dev_slot, depth, verify, session)
+    if session.command_pipeline is not None:
+        raise RuntimeError('upload_patch() cannot be used while commands are pipelined or recorded')
+
+    data = image.data
+    header = image.header
+    frames = 0
+
+    with session._lock:
+        start = time.perf_counter()
+        failed = None
+        try:
+            with CommandPipeline(depth, session):
+                # Frames sent but not yet known to have succeeded
+                pending = deque()
+                for offset in range(0, len(data), TESTOP_CMD_MAX_ARGS):
+                    subcmd = TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_START if offset == 0 else TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_CONTINUE
+                    pending.append(session.send_command_values(subcmd, dev_slot,
+                                                               payload=data[offset:offset + TESTOP_CMD_MAX_ARGS]))
+                    frames = frames + 1
+                    failed = _first_failed(pending)
+                    if failed is not None:
+                        break
+            if failed is None:
+                failed = _first_failed(pending, True)
+        except Exception:
+            _abort(session, dev_slot)
+            raise
+        seconds = time.perf_counter() - start
+
+        if failed is not None:
+            _abort(session, dev_slot)
+            raise ProDVKCommandError(failed.subcmd, failed.errcode)
+
+        verified = None
+        if verify:
+            verified = _verify(session, dev_slot, image)
+
+    result = PatchUploadResult(header.address, len(data), frames, seconds,
+                               len(data) / seconds if seconds else 0.0, image.crc32(), verified)
+    _lib.logger.info('Patch upload:             %s', result)
+    return result
+
+
+# Drop the completed frames from the front of 'pending' and return the
+# first one that failed, if any.  With 'wait' every frame is completed.
+def _first_failed(pending, wait = False):
+    while pending and (wait or pending[0].done()):
+        command = pending.popleft()
+        if command.result() != TESTOP_ERRCODE_SUCCESS:
+            return command
+    return None
+
+
+def _abort(session, dev_slot):
+    try:
+        session.send_command_em_write_patch_abort(dev_slot)
+    except Exception as ex:
+        _lib.logger.warning('WRITE_PATCH_ABORT failed: ' + str(ex))
+    return
+
+
+def _verify(session, dev_slot, image):
+    header = image.header
+    count = session.query('send_command_em_patch_query', dev_slot, 0).container_count
+    if count == 0:
+        _lib.logger.warning('Patch verify failed.  No patch reported by PATCH_QUERY')
+        session.test_error_count = session.test_error_count + 1
+        return False
+
+    patch = session.query('send_command_em_patch_query', dev_slot, count - 1)
+    crc32 = session.query('send_command_em_calculate_crc32', dev_slot, header.address, header.address + len(image)).crc32
+    if (patch.address, patch.size, patch.crc32, crc32) != (header.address, len(image), image.crc32(), image.crc32()):
+        _lib.logger.warning('Patch verify failed.  Addr=' + hex(patch.address) + '  Size=' + str(patch.size) +
+                            '  CRC32=' + hex(patch.crc32) + '  Loaded CRC32=' + hex(crc32) +
+                            '  Expected Addr=' + hex(header.address) + '  Size=' + str(len(image)) +
+                            '  CRC32=' + hex(image.crc32()))
+        session.test_error_count = session.test_error_count + 1
+        return False
+    return True
+
+
+# ==========================================================================
+#   Host side CRC32s of patch container files
+#
+#   The index is a JSON file mapping the absolute path of each image to
+#   its size, modification time (ns), load address and CRC32.  An entry
+#   is only trusted while the size and mtime of the file are unchanged;
+#   otherwise the image is read once more and the entry replaced.
+#   save() writes the index only if it changed.
+# ==========================================================================
+PatchCrcEntry = namedtuple('PatchCrcEntry', 'size mtime_ns address crc32')
+
+
+class PatchCrcCache(object):
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.entries = {}
+        self.hits    = 0
+        self.misses  = 0
+        self._dirty  = False
+        try:
+            with open(index_path) as f:
+                for path, fields in json.load(f).items():
+                    self.entries[path] = PatchCrcEntry._make(fields)
+        except (IOError, OSError, ValueError, TypeError):
+            # Missing or unreadable index: start again
+            self.entries = {}
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self.entries.get(path)
+        if entry is not None and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        with PatchImage.open(path) as image:
+            entry = PatchCrcEntry(stat.st_size, stat.st_mtime_ns, image.header.address, image.crc32())
+        self.entries[path] = entry
+        self._dirty = True
+        return entry
+
+    def save(self):
+        if not self._dirty:
+            return
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(dict((path, list(entry)) for path, entry in self.entries.items()), f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.index_path)
+        self._dirty = False
+        return
+
+
+# ==========================================================================
+#   The patch containers loaded in the device in 'dev_slot', as a list of
+#   PatchQueryResult (one per patch_index)
+# ==========================================================================
+def read_patch_inventory(dev_slot = SLOT_DUT, session = None):
+    if session is None:
+        session = _lib._default_session
+    first = session.query('send_command_em_patch_query', dev_slot, 0)
+    if first.container_count == 0:
+        return []
+    return [first] + [session.query('send_command_em_patch_query', dev_slot, patch_index)
+                      for patch_index in range(1, first.container_count)]
+
+
+# ==========================================================================
+#   Make sure the device in 'dev_slot' carries the patch containers in
+#   'paths', uploading only those not found in its inventory (same load
+#   address, size and CRC32), in the order given.
+#
+#   crc_cache defaults to a PatchCrcCache in the directory of the first
+#   image.  depth and verify are passed on to upload_patch().
+#
+#   Returns a PatchProvisionResult: the paths uploaded and skipped, and
+#   the PatchUploadResult of each upload.
+# ==========================================================================
+def provision_patches(paths, dev_slot = SLOT_DUT, depth = 8, verify = True, session = None, crc_cache = None):
+    if session is None:
+        session = _lib._default_session
+    paths = list(paths)
+    if crc_cache is None and paths:
+        crc_cache = PatchCrcCache(os.path.join(os.path.dirname(os.path.abspath(paths[0])), PATCH_CRC_INDEX))
+
+    uploaded = []
+    skipped  = []
+    uploads  = []
+    with session._lock:
+        loaded = set((patch.address, patch.size, patch.crc32) for patch in read_patch_inventory(dev_slot, session))
+        for path in paths:
+            entry = crc_cache.get(path)
+            if (entry.address, entry.size, entry.crc32) in loaded:
+                _lib.logger.info('Patch already loaded:     ' + path)
+                skipped.append(path)
+                continue
+            upload = upload_patch(path, dev_slot, depth, verify, session)
+            loaded.add((entry.address, entry.size, entry.crc32))
+            uploaded.append(path)
+            uploads.append(upload)
+
+    if crc_cache is not None:
+        crc_cache.save()
+    result = PatchProvisionResult(tuple(uploaded), tuple(skipped), tuple(uploads))
+    _lib.logger.info('Patch provisioning:       %s', result)
+    return result
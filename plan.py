@@ -0,0 +1,282 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    plan.py
+# @brief   Precompiled test plans of the Production Test DVK Board
+#
+# A test plan is a fixed sequence of send_command_* helper calls and the
+# outcome expected from each of them.  compile_plan() runs the helpers once
+# (recording their commands, see CommandRecorder), checks every command and
+# encodes all the frames back to back into one buffer.  Running the plan
+# then only patches the sequence number of each frame before writing it:
+#
+#     test_plan = compile_plan([
+#         plan_step('send_command_em_set_rf_power_level', SLOT_DUT, 4),
+#         plan_step('send_command_le_receiver_test', SLOT_DUT, 19),
+#         plan_step('send_command_le_test_end', SLOT_DUT,
+#                   check=lambda record: record.number_of_packets > 0),
+#         plan_step('send_command_read_ADC', SLOT_DUT, 1,
+#                   check=lambda record: record.current < 10.0),
+#     ])
+#     test_plan.dry_run()             # estimated USB time, nothing is sent
+#     result = test_plan.run(session)
+#     result.passed, result.failures
+#
+# The responses are parsed as usual, so the last_* values of the session,
+# the logging and test_error_count are the same as with the helpers.  The
+# plan bypasses the query cache and the shadow configuration: every frame
+# is sent.
+#
+# run(session, parse_all = False) only parses the responses of the steps
+# with a check and the responses with an error code other than SUCCESS.
+# The other responses are checked for their sequence number and error
+# code only: no record, no last_* value, no measurement_sink call and no
+# logging.
+#
+# What a plan saves is host time.  benchmarks.py (radio test setup, six
+# commands through a loopback transport) measured about 8.5 us per command
+# with the helpers, 5.3 us with the plan and 3.9 us with parse_all=False.
+# Through a board answering in 0.5 ms the pass takes about 4 ms in all
+# three cases: the USB round trip dominates, so a plan helps where the
+# host is the bottleneck (many boards, one process).
+#
+# Only the send_command_* and execute_* session helpers can be compiled:
+# they send a fixed sequence of commands.  The other helpers look at the
+# responses (to log them, to poll, to read a length returned by the
+# board, ...), so compile_plan() rejects them.
+#
+############################################################################
+
+import struct
+import sys
+import time
+from collections import namedtuple
+
+from . import (CommandRecorder, ProDVKSession, COMMAND_SPECS, define_result,
+               TESTOP_CMD_IDX_SEQNUM, TESTOP_RESP_IDX_ERRORCODE, TESTOP_ERRCODE_SUCCESS, TESTOP_ERRCODE_BAD_PARAMS,
+               CACHE_INVALIDATING_COMMANDS, SHADOW_INVALIDATING_COMMANDS, SHADOWED_COMMANDS,
+               convert_subcmd_to_string, convert_errcode_to_string, encode_command_frame)
+
+_lib = sys.modules[__package__]
+
+# The session helpers that can be compiled
+PLAN_HELPER_PREFIXES = ('send_command', 'execute_')
+
+# Round trip of one command when none was timed on the session yet
+# (seconds): the command and the response are one full speed interrupt
+# transfer each, polled every millisecond
+PLAN_ROUND_TRIP = 0.002
+
+# One helper call of a plan: 'helper' is a session method or its name.
+# The step passes if its last command returns 'expect' (any error code if
+# None) and check(result record) is true.
+PlanStep = namedtuple('PlanStep', 'helper args kwargs expect check')
+
+PlanFailure = namedtuple('PlanFailure', 'step name subcmd errcode record')
+
+PlanResult = define_result('PlanResult', 'passed commands failures seconds records',
+                           lambda record: 'Passed=%s  Commands=%d  Failures=%d  Time=%.1f ms'
+                                          % (record.passed, record.commands, len(record.failures),
+                                             record.seconds * 1000))
+
+PlanEstimate = define_result('PlanEstimate', 'commands frame_bytes seconds timed',
+                             lambda record: 'Commands=%d  FrameBytes=%d  USB Time=%.1f ms  (%d of %d commands timed)'
+                                            % (record.commands, record.frame_bytes, record.seconds * 1000,
+                                               record.timed, record.commands))
+
+
+def plan_step(helper, *args, expect = TESTOP_ERRCODE_SUCCESS, check = None, **kwargs):
+    return PlanStep(helper, args, kwargs, expect, check)
+
+
+def _step_name(helper):
+    return helper if isinstance(helper, str) else getattr(helper, '__name__', repr(helper))
+
+
+# ==========================================================================
+#   A compiled plan
+#
+#   frames       every command frame, back to back
+#   commands     per frame: (start, end, subcmd, devSlot, step index,
+#                last frame of its step, forget_state() needed)
+# ==========================================================================
+class CommandPlan(object):
+
+    def __init__(self, steps, frames, commands):
+        self.steps    = steps
+        self.frames   = bytes(frames)
+        self.commands = commands
+
+    def __len__(self):
+        return len(self.commands)
+
+    # ==========================================================================
+    #   Send every frame of the plan on 'session' and check the outcome of
+    #   every step.  Stops at the first failing step if stop_on_failure is
+    #   set.  Returns a PlanResult; records holds the result record of every
+    #   step run (None for the steps whose response has no parser, or was
+    #   not parsed because parse_all is False and the step has no check).
+    #
+    #   Raises ProDVKTimeoutError / ProDVKTransportError like the helpers.
+    # ==========================================================================
+    def run(self, session = None, stop_on_failure = True, parse_all = True):
+        if session is None:
+            session = _lib._default_session
+        if session.command_pipeline is not None:
+            raise RuntimeError('A plan cannot be run while commands are pipelined or recorded')
+
+        # Every run patches its own copy, so a plan can run on several
+        # sessions at once
+        frames = memoryview(bytearray(self.frames))
+        steps = self.steps
+        records = []
+        failures = []
+        sent = 0
+
+        start = time.perf_counter()
+        with session._lock:
+            transport = session.transport
+            skip = None
+            for begin, end, subcmd, devSlot, index, last, forget in self.commands:
+                if index == skip:
+                    continue
+                seqNum = session.cmdSeqNum = (session.cmdSeqNum + 1) % 256
+                frames[begin + TESTOP_CMD_IDX_SEQNUM] = seqNum
+                if forget:
+                    session.forget_state(subcmd, devSlot)
+                session.last_subcmd = subcmd
+                session.last_result = None
+                frame = frames[begin:end]
+                step = steps[index]
+                sent += 1
+
+                if transport.write(frame) <= 0:
+                    errcode = TESTOP_ERRCODE_BAD_PARAMS
+                else:
+                    response = session._receive_response(subcmd, frame)
+                    if (parse_all or step.check is not None or
+                            response[TESTOP_RESP_IDX_ERRORCODE] != TESTOP_ERRCODE_SUCCESS):
+                        errcode = session.parse_response_checked(subcmd, response)
+                    else:
+                        # The sequence number was matched by _receive_response()
+                        session.test_verification_count = session.test_verification_count + 1
+                        errcode = TESTOP_ERRCODE_SUCCESS
+                record = session.last_result
+
+                if not last:
+                    if errcode == TESTOP_ERRCODE_SUCCESS:
+                        continue
+                    # The helper would have stopped here
+                    passed = False
+                elif step.expect is not None and errcode != step.expect:
+                    passed = False
+                else:
+                    passed = step.check is None or bool(step.check(record))
+
+                records.append(record)
+                if passed:
+                    continue
+
+                failures.append(PlanFailure(index, _step_name(step.helper), subcmd, errcode, record))
+                # The error codes other than SUCCESS are counted by parse_response()
+                if errcode == TESTOP_ERRCODE_SUCCESS:
+                    session.test_error_count = session.test_error_count + 1
+                _lib.logger.warning('Plan step ' + str(index) + ' (' + _step_name(step.helper) + ') failed: ' +
+                                    convert_subcmd_to_string(subcmd) + ' returned ' +
+                                    convert_errcode_to_string(errcode) +
+                                    ('' if record is None else '  ' + str(record)))
+                if stop_on_failure:
+                    break
+                skip = index
+
+        return PlanResult(not failures, sent, failures, time.perf_counter() - start, records)
+
+    # ==========================================================================
+    #   Estimated USB time of the plan on 'session', without sending
+    #   anything: the median round trip observed on the session for each
+    #   subcmd (see TimeoutPolicy), PLAN_ROUND_TRIP for the subcmds not
+    #   timed yet.  Returns a PlanEstimate.
+    # ==========================================================================
+    def dry_run(self, session = None):
+        if session is None:
+            session = _lib._default_session
+        latencies = session.timeout_policy.latencies
+
+        round_trips = {}
+        seconds = 0.0
+        timed = 0
+        for begin, end, subcmd, devSlot, index, last, forget in self.commands:
+            round_trip = round_trips.get(subcmd)
+            if round_trip is None:
+                observed = latencies.get(subcmd)
+                if observed:
+                    ordered = sorted(observed)
+                    round_trip = (ordered[len(ordered) // 2], True)
+                else:
+                    round_trip = (PLAN_ROUND_TRIP, False)
+                round_trips[subcmd] = round_trip
+            seconds += round_trip[0]
+            timed += round_trip[1]
+
+        return PlanEstimate(len(self.commands), len(self.frames), seconds, timed)
+
+
+# ==========================================================================
+#   Compile a sequence of PlanStep (see plan_step()) into a CommandPlan.
+#   The helpers named by a string are the methods of 'session' (the
+#   default session if None); the plan can run on any session.
+#
+#   Raises ValueError if a helper is unknown or not one of the
+#   send_command_* / execute_* helpers, fails, sends no command or sends a
+#   command with arguments the board would reject.
+# ==========================================================================
+def compile_plan(steps, session = None):
+    if session is None:
+        session = _lib._default_session
+    steps = [step if isinstance(step, PlanStep) else plan_step(*step) for step in steps]
+
+    frames = bytearray()
+    commands = []
+    for index, step in enumerate(steps):
+        helper = step.helper
+        name = _step_name(helper)
+        if not callable(helper):
+            helper = getattr(session, helper, None)
+            if not callable(helper):
+                raise ValueError('Plan step ' + str(index) + ': unknown helper ' + name)
+
+        # Record on the session the helper belongs to (the default session
+        # for the module level functions)
+        owner = getattr(helper, '__self__', None)
+        if not isinstance(owner, ProDVKSession) or not helper.__name__.startswith(PLAN_HELPER_PREFIXES):
+            raise ValueError('Plan step ' + str(index) + ' (' + name + '): only the send_command_* and '
+                             'execute_* session helpers can be compiled')
+        try:
+            with CommandRecorder(owner) as recorder:
+                helper(*step.args, **step.kwargs)
+        except (TypeError, ValueError, OverflowError, RuntimeError, struct.error) as ex:
+            raise ValueError('Plan step ' + str(index) + ' (' + name + '): ' + str(ex))
+        if not recorder.commands:
+            raise ValueError('Plan step ' + str(index) + ' (' + name + ') sends no command')
+
+        for position, (subcmd, devSlot, argcnt, argvect) in enumerate(recorder.commands):
+            spec = COMMAND_SPECS[subcmd]
+            if spec is None:
+                raise ValueError('Plan step ' + str(index) + ' (' + name + '): unknown subcmd ' + hex(subcmd))
+            if spec.request is not None and argcnt < spec.request.size:
+                raise ValueError('Plan step ' + str(index) + ' (' + name + '): ' + spec.name + ' takes ' +
+                                 str(spec.request.size) + ' argument bytes, got ' + str(argcnt))
+
+            begin = len(frames)
+            frame = encode_command_frame(subcmd, devSlot, 0, argcnt, argvect)
+            if frame is None:
+                raise ValueError('Plan step ' + str(index) + ' (' + name + '): ' + spec.name +
+                                 ' has an invalid number of arguments= ' + str(argcnt))
+            frames += frame
+            forget = (subcmd in CACHE_INVALIDATING_COMMANDS or subcmd in SHADOW_INVALIDATING_COMMANDS or
+                      subcmd in SHADOWED_COMMANDS)
+            commands.append((begin, len(frames), subcmd, devSlot, index,
+                             position == len(recorder.commands) - 1, forget))
+
+    return CommandPlan(steps, frames, commands)
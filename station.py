@@ -0,0 +1,306 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    station.py
+# @brief   Multi-process test station for many Production Test DVK Boards
+#
+# ProDVKStation runs every board in its own worker process, so parsing and
+# logging for one board never competes for the GIL with another:
+#
+#     station = ProDVKStation(serial_numbers, plan, cycles = 100)
+#     station.start()
+#     for measurement in station.measurements():
+#         ...                     # (serial_number, cycle, kind, value, time)
+#     station.join()
+#     station.log_summary()
+#
+# plan(session) is called once per cycle in the worker with the board's
+# ProDVKSession.  It (and transport_factory, if given) must be picklable,
+# i.e. module level functions, because workers are not forked by default.
+#
+# Every current, PER, ppm and RSSI value the session parses is written as a
+# fixed size record into a MeasurementRing in shared memory.  The parent
+# reads the rings directly; nothing is pickled on the way back.
+#
+# With a calibration_store (see calibration.py) every worker loads the
+# calibration of its board before the first cycle, calibrating the board
+# only if the stored one has expired.
+#
+############################################################################
+
+import multiprocessing
+import struct
+import sys
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+from . import (ProDVKSession, UsbTransport,
+               MEASUREMENT_CURRENT, MEASUREMENT_PER, MEASUREMENT_PPM, MEASUREMENT_RSSI)
+from .calibration import load_calibration
+
+_lib = sys.modules[__package__]
+
+MEASUREMENT_NAMES = {MEASUREMENT_CURRENT: 'Current',
+                     MEASUREMENT_PER:     'PER',
+                     MEASUREMENT_PPM:     'ppm',
+                     MEASUREMENT_RSSI:    'RSSI'}
+
+Measurement = namedtuple('Measurement', 'serial_number cycle kind value timestamp')
+
+
+# ==========================================================================
+#   Single producer / single consumer ring of measurement records in
+#   shared memory
+#
+#   Header:  records written, records read, records dropped (uint64 each)
+#   Record:  timestamp (double), cycle (uint32), kind (uint8), value (double)
+#
+#   The producer only writes 'written' and 'dropped', the consumer only
+#   writes 'read'.  A record is complete before 'written' is advanced past
+#   it.  When the ring is full new records are dropped (and counted) rather
+#   than stalling the worker.
+# ==========================================================================
+class MeasurementRing(object):
+
+    HEADER = struct.Struct('<QQQ')
+    RECORD = struct.Struct('<dIBxxxd')
+
+    def __init__(self, capacity = 4096, name = None):
+        self.capacity = capacity
+        size = self.HEADER.size + capacity * self.RECORD.size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.HEADER.pack_into(self.shm.buf, 0, 0, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self._records = self.shm.buf[self.HEADER.size:size]
+
+    def _counters(self):
+        return self.HEADER.unpack_from(self.shm.buf, 0)
+
+    # Producer side.  Returns False if the record was dropped.
+    def put(self, timestamp, cycle, kind, value):
+        written, read, dropped = self._counters()
+        if written - read >= self.capacity:
+            struct.pack_into('<Q', self.shm.buf, 16, dropped + 1)
+            return False
+        self.RECORD.pack_into(self._records, (written % self.capacity) * self.RECORD.size,
+                              timestamp, cycle, kind, value)
+        struct.pack_into('<Q', self.shm.buf, 0, written + 1)
+        return True
+
+    # Consumer side.  Returns the (timestamp, cycle, kind, value) records
+    # written since the last call.
+    def get_all(self):
+        written, read, dropped = self._counters()
+        if written == read:
+            return []
+
+        first = read % self.capacity
+        last  = first + (written - read)
+        size  = self.RECORD.size
+        if last <= self.capacity:
+            records = list(self.RECORD.iter_unpack(self._records[first * size:last * size]))
+        else:
+            records = (list(self.RECORD.iter_unpack(self._records[first * size:])) +
+                       list(self.RECORD.iter_unpack(self._records[:(last - self.capacity) * size])))
+
+        struct.pack_into('<Q', self.shm.buf, 8, written)
+        return records
+
+    def dropped(self):
+        return self._counters()[2]
+
+    def close(self):
+        self._records.release()
+        self.shm.close()
+        return
+
+    def unlink(self):
+        self.shm.unlink()
+        return
+
+
+# ==========================================================================
+#   Worker process: one board, one session, one ring
+# ==========================================================================
+def _station_worker(serial_number, ring_name, plan, cycles, stop_event, transport_factory, calibration_store,
+                    log_level):
+    _lib.logger.setLevel(log_level)
+    ring = MeasurementRing(name=ring_name)
+    session = ProDVKSession()
+    cycle = 0
+
+    def sink(kind, value):
+        ring.put(time.time(), cycle, kind, value)
+
+    try:
+        if transport_factory is not None:
+            board_transport = transport_factory(serial_number)
+        else:
+            board_transport = UsbTransport.find(serial_number)
+        session.connect_to_device(serial_number, board_transport)
+        if calibration_store is not None:
+            _lib.logger.info(str(load_calibration(session, calibration_store, serial_number)))
+        session.measurement_sink = sink
+
+        while not stop_event.is_set() and (cycles is None or cycle < cycles):
+            plan(session)
+            cycle = cycle + 1
+
+        session.disconnect_proDVK()
+    finally:
+        session.measurement_sink = None
+        ring.close()
+
+    sys.exit(1 if session.get_test_error_count() > 0 else 0)
+
+
+# ==========================================================================
+#   Statistics for one board and one kind of measurement
+# ==========================================================================
+class MeasurementStats(object):
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min   = None
+        self.max   = None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+# ==========================================================================
+#   A station of boards, one worker process per serial number
+#
+#   start_method is passed to multiprocessing.get_context(); 'spawn' is
+#   the default because a forked child would inherit the parent's USB
+#   handles and threads.  cycles=None runs until stop() is called.
+# ==========================================================================
+class ProDVKStation(object):
+
+    def __init__(self, serial_numbers, plan, cycles = None, start_method = 'spawn',
+                 transport_factory = None, ring_capacity = 4096, calibration_store = None):
+        self.serial_numbers    = list(serial_numbers)
+        self.plan              = plan
+        self.cycles            = cycles
+        self.transport_factory = transport_factory
+        self.ring_capacity     = ring_capacity
+        self.calibration_store = calibration_store
+        self.context           = multiprocessing.get_context(start_method)
+        self.stop_event        = self.context.Event()
+        self.rings     = {}
+        self.processes = {}
+        # serial number -> kind -> MeasurementStats
+        self.stats     = {}
+        self.start_time = None
+        self.end_time   = None
+
+    def start(self):
+        log_level = _lib.logger.getEffectiveLevel()
+        for serial_number in self.serial_numbers:
+            ring = MeasurementRing(self.ring_capacity)
+            process = self.context.Process(target=_station_worker, name='prodvk-' + serial_number,
+                                           args=(serial_number, ring.name, self.plan, self.cycles,
+                                                 self.stop_event, self.transport_factory, self.calibration_store,
+                                                 log_level))
+            self.rings[serial_number]     = ring
+            self.processes[serial_number] = process
+            self.stats[serial_number]     = {}
+        self.start_time = time.perf_counter()
+        for process in self.processes.values():
+            process.start()
+        return
+
+    # Ask the workers to finish their current cycle and exit
+    def stop(self):
+        self.stop_event.set()
+        return
+
+    def is_running(self):
+        return any(process.is_alive() for process in self.processes.values())
+
+    # Drain every ring once and return the new measurements
+    def poll(self):
+        measurements = []
+        for serial_number, ring in self.rings.items():
+            stats = self.stats[serial_number]
+            for timestamp, cycle, kind, value in ring.get_all():
+                kind_stats = stats.get(kind)
+                if kind_stats is None:
+                    kind_stats = stats[kind] = MeasurementStats()
+                kind_stats.add(value)
+                measurements.append(Measurement(serial_number, cycle, kind, value, timestamp))
+        return measurements
+
+    # Yield the measurements as they arrive until all the workers are done.
+    # poll_interval (seconds) is slept only when every ring is empty.
+    def measurements(self, poll_interval = 0.01):
+        while True:
+            running = self.is_running()
+            measurements = self.poll()
+            for measurement in measurements:
+                yield measurement
+            if not running:
+                # Workers are gone: what was read after they exited is all there is
+                break
+            if not measurements:
+                time.sleep(poll_interval)
+        return
+
+    # Wait for the workers, collect what is left in the rings and release
+    # the shared memory of the workers that have exited.  The rings of the
+    # workers still running after 'timeout' are kept (a worker may still
+    # write to its ring) and released by a later join().  Returns the exit
+    # code of each worker (0 = no test errors, None = still running).
+    def join(self, timeout = None):
+        for process in self.processes.values():
+            process.join(timeout)
+        self.end_time = time.perf_counter()
+        self.poll()
+
+        exit_codes = {}
+        for serial_number, ring in list(self.rings.items()):
+            exit_codes[serial_number] = self.processes[serial_number].exitcode
+            if exit_codes[serial_number] is None:
+                continue
+            if ring.dropped():
+                _lib.logger.warning('Board ' + serial_number + ': ' + str(ring.dropped()) + ' measurements dropped (ring full)')
+            ring.close()
+            ring.unlink()
+            del self.rings[serial_number]
+        return exit_codes
+
+    # Measurements per second for each board since start()
+    def throughput(self):
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        elapsed = end - self.start_time if self.start_time is not None else 0.0
+        rates = {}
+        for serial_number, stats in self.stats.items():
+            count = sum(kind_stats.count for kind_stats in stats.values())
+            rates[serial_number] = count / elapsed if elapsed else 0.0
+        return rates
+
+    def log_summary(self):
+        rates = self.throughput()
+        for serial_number, stats in self.stats.items():
+            _lib.log_string('Board ' + serial_number + ':  ' + format(rates[serial_number], '.1f') + ' measurements/s')
+            for kind, kind_stats in sorted(stats.items()):
+                _lib.log_string('    ' + MEASUREMENT_NAMES.get(kind, str(kind)) +
+                                ':  Count=' + str(kind_stats.count) +
+                                ' Mean=' + format(kind_stats.mean(), '.4f') +
+                                ' Min=' + format(kind_stats.min, '.4f') +
+                                ' Max=' + format(kind_stats.max, '.4f'))
+        return
@@ -0,0 +1,33 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    conftest.py
+# @brief   Fixtures of the tests: the library and sessions talking to a
+#          ProDVKEmulator
+#
+############################################################################
+
+import pytest
+
+from .. import ProDVKSession, connect_to_device, disconnect_proDVK
+from ..emulator import ProDVKEmulator
+
+
+@pytest.fixture
+def board():
+    board = ProDVKEmulator()
+    yield board
+    board.close()
+
+
+@pytest.fixture
+def connected(board):
+    connect_to_device(None, board)
+    yield board
+    disconnect_proDVK()
+
+
+@pytest.fixture
+def session(board):
+    return ProDVKSession(board)
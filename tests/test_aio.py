@@ -0,0 +1,108 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_aio.py
+# @brief   asyncio client (AsyncProDVK)
+#
+############################################################################
+
+import asyncio
+import sys
+
+import pytest
+
+from .. import ProDVKSession, ProDVKTransportError, SLOT_DUT, TESTOP_ERRCODE_SUCCESS, TESTOP_ERRCODE_BAD_PARAMS
+from ..aio import AsyncProDVK, ProDVKIOThread
+from ..emulator import ProDVKEmulator
+
+_lib = sys.modules[__package__.rpartition('.')[0]]
+
+
+@pytest.fixture
+def io_thread():
+    io_thread = ProDVKIOThread()
+    yield io_thread
+    io_thread.stop()
+
+
+def test_boards_driven_concurrently(io_thread):
+    boards = [ProDVKEmulator(latency=0.002 * (index + 1)) for index in range(4)]
+    clients = [AsyncProDVK(board, io_thread) for board in boards]
+
+    async def job(client):
+        errcodes = [await client.send_command_read_ADC(SLOT_DUT, 1) for _ in range(5)]
+        errcodes += await asyncio.gather(*[client.send_command_read_ADC(SLOT_DUT, 1) for _ in range(5)])
+        return errcodes
+
+    async def main():
+        return await asyncio.gather(*[job(client) for client in clients])
+
+    assert asyncio.run(main()) == [[TESTOP_ERRCODE_SUCCESS] * 10] * 4
+    assert [board.commands_received for board in boards] == [10] * 4
+
+
+def test_call_sends_every_command_of_the_helper(io_thread):
+    board = ProDVKEmulator()
+    client = AsyncProDVK(board, io_thread)
+
+    def helper():
+        client.session.send_command_read_board_ver()
+        client.session.send_command_read_ADC(SLOT_DUT, 1)
+
+    assert asyncio.run(client.call(helper)) == TESTOP_ERRCODE_SUCCESS
+    assert board.commands_received == 2
+
+
+def test_timeout(io_thread):
+    board = ProDVKEmulator(latency=0.5)
+    client = AsyncProDVK(board, io_thread)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(client.send_command_read_ADC(SLOT_DUT, 1, timeout=0.05))
+
+
+def test_call_stops_at_the_first_failure(io_thread):
+    board = ProDVKEmulator()
+    client = AsyncProDVK(board, io_thread)
+
+    # READ_CONTINUE without READ_AT_ADDRESS is rejected: the helper's
+    # second command is not sent
+    def helper():
+        client.session.send_command_em_read_continue(SLOT_DUT, 4)
+        client.session.send_command_read_ADC(SLOT_DUT, 1)
+
+    assert asyncio.run(client.call(helper)) == TESTOP_ERRCODE_BAD_PARAMS
+    assert board.commands_received == 1
+
+
+def test_sync_and_async_calls_share_the_session(io_thread):
+    board = ProDVKEmulator()
+    session = ProDVKSession(board)
+    client = AsyncProDVK(io_thread=io_thread, session=session)
+
+    first = session.cmdSeqNum
+    session.send_command_read_ADC(SLOT_DUT, 1)
+    assert asyncio.run(client.send_command_read_ADC(SLOT_DUT, 1)) == TESTOP_ERRCODE_SUCCESS
+    session.send_command_read_ADC(SLOT_DUT, 1)
+    assert session.cmdSeqNum == first + 3
+    assert session.stale_responses == 0
+
+
+def test_default_session_is_shared(connected, io_thread):
+    assert AsyncProDVK(io_thread=io_thread).session is _lib._default_session
+    assert AsyncProDVK(connected, io_thread).session is _lib._default_session
+
+
+def test_transport_error_fails_the_outstanding_requests(io_thread):
+    board = ProDVKEmulator(latency=0.5)
+    client = AsyncProDVK(board, io_thread)
+
+    async def main():
+        command = asyncio.ensure_future(client.send_command_read_ADC(SLOT_DUT, 1))
+        await asyncio.sleep(0.05)
+        board.close()
+        return await command
+
+    with pytest.raises(ProDVKTransportError):
+        asyncio.run(main())
@@ -0,0 +1,120 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_calibration.py
+# @brief   Persistent board calibrations (CalibrationStore)
+#
+############################################################################
+
+import json
+import time
+
+import pytest
+
+from .. import TESTOP_SUBCMD_EXEC_CALIBRATION
+from ..calibration import CalibrationStore, load_calibration
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CalibrationStore(str(tmp_path), ttl=3600.0)
+
+
+# Count the EXEC_CALIBRATIONs the board receives
+@pytest.fixture
+def calibrations(board):
+    calibrate = board._handlers[TESTOP_SUBCMD_EXEC_CALIBRATION]
+    calls = []
+
+    def counting(subcmd, slot, args):
+        calls.append(subcmd)
+        return calibrate(subcmd, slot, args)
+    board._handlers[TESTOP_SUBCMD_EXEC_CALIBRATION] = counting
+    return calls
+
+
+def test_board_calibrated_once_then_loaded(session, board, store, calibrations):
+    first = load_calibration(session, store)
+    assert first.source == 'board'
+    assert first.serial_number == board.serial_number
+    assert first.drift is None
+    assert first.calibration.current_5mA == pytest.approx(5000.0, rel=0.001)
+
+    session.last_5mA_calibration = 0.0
+    second = load_calibration(session, store)
+    assert second.source == 'store'
+    assert tuple(second.calibration) == pytest.approx(tuple(first.calibration))
+    assert session.last_5mA_calibration == first.calibration.current_5mA
+    assert len(calibrations) == 1
+    assert (store.hits, store.misses) == (1, 1)
+
+
+def test_expired_entry_is_calibrated_again(session, board, store, calibrations):
+    store.put(board.serial_number, (1.0, 2.0, 3.0), time.time() - 3601.0)
+    assert store.get(board.serial_number) is None
+
+    result = load_calibration(session, store)
+    assert result.source == 'board'
+    assert len(calibrations) == 1
+    assert store.get(board.serial_number).current_5mA == result.calibration.current_5mA
+
+
+def test_force_and_invalidate(session, board, store, calibrations):
+    load_calibration(session, store)
+    assert load_calibration(session, store, force=True).source == 'board'
+    store.invalidate(board.serial_number)
+    assert load_calibration(session, store).source == 'board'
+    assert len(calibrations) == 3
+
+
+def test_drift_is_reported(session, board, store):
+    load_calibration(session, store)
+    board.calibration_error = 0.05
+
+    result = load_calibration(session, store, force=True)
+    assert result.drift == pytest.approx(0.05, rel=0.01)
+
+
+def test_unreadable_entry(session, board, store):
+    with open(store.path(board.serial_number), 'w') as f:
+        f.write('{not json')
+    assert store.get(board.serial_number) is None
+    assert load_calibration(session, store).source == 'board'
+
+
+def test_drifted_board_is_calibrated_until_it_settles(session, board, store, calibrations):
+    load_calibration(session, store)
+    board.calibration_error = 0.05
+    assert load_calibration(session, store, force=True).drift > 0.02
+
+    # The stored calibration drifted: the next load calibrates again and,
+    # as the board agrees with itself now, the one after is a store hit
+    result = load_calibration(session, store)
+    assert result.source == 'board'
+    assert result.drift == pytest.approx(0.0, abs=0.001)
+    assert load_calibration(session, store).source == 'store'
+    assert len(calibrations) == 3
+
+
+def test_drift_within_the_limit_is_trusted(session, board, store, calibrations):
+    load_calibration(session, store)
+    board.calibration_error = 0.01
+    load_calibration(session, store, force=True)
+
+    assert load_calibration(session, store).source == 'store'
+    assert store.get(board.serial_number, drift_limit=0.005) is None
+    assert len(calibrations) == 2
+
+
+def test_entry_without_drift(session, board, store, calibrations):
+    # As written before the drift was stored
+    with open(store.path(board.serial_number), 'w') as f:
+        json.dump([5000.0, 100.0, 1.0, time.time()], f)
+
+    entry = store.get(board.serial_number, drift_limit=0.02)
+    assert entry.drift is None
+    result = load_calibration(session, store)
+    assert result.source == 'store'
+    assert tuple(result.calibration) == (5000.0, 100.0, 1.0)
+    assert calibrations == []
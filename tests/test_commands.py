@@ -0,0 +1,81 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_commands.py
+# @brief   Command schema table (COMMAND_SPECS) and its codecs
+#
+############################################################################
+
+import struct
+
+import pytest
+
+from .. import (COMMAND_SPECS, COMMAND_TESTOP, CommandRecorder, SLOT_DUT, SLOT_REF, TESTOP_ERRCODE_SUCCESS,
+                TESTOP_SUBCMD_READ_STATUS, convert_subcmd_to_string, decode_response, register_response_parser)
+
+
+def test_layouts_have_an_explicit_byte_order():
+    for spec in filter(None, COMMAND_SPECS):
+        for layout in (spec.request, spec.response):
+            if layout is not None and layout.format:
+                assert layout.format[0] in '<>', spec.name
+
+
+def test_decode_response():
+    detail = struct.pack('<BBHH', 1, 2, 0x1234, 0x5678) + b'\xff' * 4
+    assert decode_response(TESTOP_SUBCMD_READ_STATUS, detail) == (1, 2, 0x1234, 0x5678)
+
+
+def test_xtal_validation_round_trip(session, board):
+    board.xtal_ppm = 20.0
+    session.execute_xtal_validation(1000000)
+    assert session.get_last_xtal_dut_tics() == 1000000
+    assert session.get_last_xtal_ref_tics() == 1000020
+
+
+def test_advertising_report(session, board):
+    assert session.send_command_get_advertising_report_data(SLOT_REF) == TESTOP_ERRCODE_SUCCESS
+    assert session.get_last_AdvRpt_totalCount() == board.advertising_reports
+    assert session.get_last_AdvRpt_minRssi() == board.rssi - 3
+    assert session.get_last_AdvRpt_maxRssi() == board.rssi + 2
+
+
+def test_subcmd_names():
+    assert convert_subcmd_to_string(TESTOP_SUBCMD_READ_STATUS) == 'TESTOP_SUBCMD_READ_STATUS'
+    unused = next(subcmd for subcmd in range(255, 0, -1) if COMMAND_SPECS[subcmd] is None)
+    assert convert_subcmd_to_string(unused) == 'unknown'
+
+
+def test_parser_registered_for_a_new_subcmd(session):
+    subcmd = next(subcmd for subcmd in range(255, 0, -1) if COMMAND_SPECS[subcmd] is None)
+    parsed = []
+
+    def parser(session, response_detail):
+        parsed.append(bytes(response_detail))
+        return 'NewFirmwareValue'
+
+    register_response_parser(subcmd, parser, name='TESTOP_SUBCMD_NEW')
+    try:
+        response = bytes([COMMAND_TESTOP, 5, subcmd, session.cmdSeqNum, TESTOP_ERRCODE_SUCCESS, 0xAB, 0xCD])
+        assert session.parse_response(subcmd, response) == TESTOP_ERRCODE_SUCCESS
+        assert parsed == [b'\xab\xcd']
+        assert convert_subcmd_to_string(subcmd) == 'TESTOP_SUBCMD_NEW'
+    finally:
+        COMMAND_SPECS[subcmd] = None
+
+
+def test_single_byte_argument_is_masked(session):
+    with CommandRecorder(session) as recorder:
+        session.send_command_em_set_rf_power_level(SLOT_DUT, -4)
+        session.send_command_read_ADC(SLOT_DUT, 256)
+    assert [bytes(command[3]) for command in recorder.commands] == [b'\xfc', b'\x00']
+
+
+def test_value_too_large_does_not_use_a_sequence_number(session, board):
+    seqNum = session.cmdSeqNum
+    with pytest.raises(struct.error):
+        session.send_command_em_calculate_crc32(SLOT_DUT, 0, 2 ** 32)
+    assert session.cmdSeqNum == seqNum
+    assert board.commands_received == 0
+    assert session.send_command_read_ADC(SLOT_DUT, 1) == TESTOP_ERRCODE_SUCCESS
@@ -0,0 +1,87 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_conversion.py
+# @brief   ADC count to current conversion
+#
+############################################################################
+
+import array
+import struct
+
+import pytest
+
+from .. import (SLOT_DUT, TESTOP_ERRCODE_SUCCESS, TESTOP_SUBCMD_FUNCTEST_READ_RESULTS,
+                TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT, TriggeredCurrentRing, conversion)
+from ..conversion import CALIBRATION_SCALE, RANGE_SCALE, convert_counts, counts_to_current
+
+# The scales the parsers used before the front-end model, by channel
+BASELINE_SCALE = (0.00012681845361088004, 0.0012681845361088002, 0.012681845361088)
+BASELINE_CALIBRATION_SCALE = tuple((1.25 / float((2 ** 21) - 1)) / (shunt * gain) * 1000000.0
+                                   for shunt, gain in ((47, 100), (4.7, 1000), (0.47, 1000)))
+
+COUNTS   = [0, 1, -1, 1000, -250000, 2 ** 21 - 1, -2 ** 31, 2 ** 31 - 1]
+CHANNELS = [0, 1, 2, 0, 1, 2, 3, 255]
+
+
+def _expected(counts, channels):
+    return [count * BASELINE_SCALE[min(channel, 2)] for count, channel in zip(counts, channels)]
+
+
+def test_model_matches_the_baseline_scales():
+    assert RANGE_SCALE == pytest.approx(BASELINE_SCALE, rel=1e-15)
+    assert CALIBRATION_SCALE == pytest.approx(BASELINE_CALIBRATION_SCALE, rel=1e-15)
+    assert [counts_to_current(channel, 1000) for channel in CHANNELS] == \
+        pytest.approx(_expected([1000] * len(CHANNELS), CHANNELS), rel=1e-15)
+
+
+@pytest.fixture(params=[False, True], ids=['array', 'numpy'])
+def use_numpy(request):
+    if request.param:
+        pytest.importorskip('numpy')
+    return request.param
+
+
+@pytest.mark.parametrize('counts', [COUNTS, array.array('l', COUNTS), struct.pack('<%di' % len(COUNTS), *COUNTS)],
+                         ids=['list', 'array', 'raw'])
+def test_convert_counts_per_channel(counts, use_numpy):
+    currents = convert_counts(counts, CHANNELS, use_numpy=use_numpy)
+    assert list(currents) == pytest.approx(_expected(COUNTS, CHANNELS), rel=1e-15)
+
+
+@pytest.mark.parametrize('counts', [COUNTS, struct.pack('<%di' % len(COUNTS), *COUNTS)], ids=['list', 'raw'])
+@pytest.mark.parametrize('channel', [0, 1, 2, 7])
+def test_convert_counts_single_channel(counts, channel, use_numpy):
+    currents = convert_counts(counts, channel, use_numpy=use_numpy)
+    assert list(currents) == pytest.approx(_expected(COUNTS, [channel] * len(COUNTS)), rel=1e-15)
+
+
+def test_convert_nothing(use_numpy):
+    assert len(convert_counts(b'', 0, use_numpy=use_numpy)) == 0
+    assert len(convert_counts([], [], use_numpy=use_numpy)) == 0
+
+
+def test_paths_agree():
+    numpy = pytest.importorskip('numpy')
+    raw = struct.pack('<%di' % len(COUNTS), *COUNTS)
+    assert numpy.array_equal(convert_counts(raw, CHANNELS), numpy.asarray(convert_counts(raw, CHANNELS, use_numpy=False)))
+
+
+def test_triggered_capture(session, board, use_numpy, monkeypatch):
+    if not use_numpy:
+        monkeypatch.setattr(conversion, 'numpy', None)
+    detail = (struct.pack('<BB10B', TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT, len(COUNTS),
+                          *(CHANNELS + [0] * (10 - len(CHANNELS)))) +
+              struct.pack('<%dl' % len(COUNTS), *COUNTS))
+    board._handlers[TESTOP_SUBCMD_FUNCTEST_READ_RESULTS] = lambda subcmd, slot, args: (TESTOP_ERRCODE_SUCCESS, detail)
+    session.triggered_current_values = TriggeredCurrentRing(16, use_numpy=False)
+
+    session.send_command(TESTOP_SUBCMD_FUNCTEST_READ_RESULTS, SLOT_DUT)
+    record = session.last_result
+    assert [measurement.channel for measurement in record.measurements] == CHANNELS
+    assert [measurement.current for measurement in record.measurements] == \
+        pytest.approx(_expected(COUNTS, CHANNELS), rel=1e-15)
+    assert all(type(measurement.current) is float for measurement in record.measurements)
+    assert session.get_Triggered_Current_Values() == pytest.approx(_expected(COUNTS, CHANNELS), rel=1e-15)
+    assert session.last_adc_measurement == pytest.approx(_expected(COUNTS, CHANNELS)[-1], rel=1e-15)
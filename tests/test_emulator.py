@@ -0,0 +1,64 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_emulator.py
+# @brief   The library driving a ProDVKEmulator through its transport
+#
+############################################################################
+
+import sys
+import time
+
+from .. import (SLOT_DUT, SLOT_REF, TESTOP_ERRCODE_SUCCESS, connect_to_device, send_command_read_board_ver,
+                send_command_em_set_rf_power_level, send_command_le_receiver_test, send_command_le_test_end,
+                send_command_soft_reset)
+from ..emulator import ProDVKEmulator
+
+_lib = sys.modules[__package__.rpartition('.')[0]]
+
+
+def test_connect_reports_serial_number(board):
+    try:
+        assert connect_to_device(None, board) == board.serial_number
+    finally:
+        _lib.disconnect_proDVK()
+
+
+def test_board_version(connected):
+    assert send_command_read_board_ver() == TESTOP_ERRCODE_SUCCESS
+    assert _lib.last_board_ver_string == connected.board_fw_version.decode()
+
+
+def test_rf_power_level_is_clamped(connected):
+    device = connected.devices[SLOT_DUT]
+    assert send_command_em_set_rf_power_level(SLOT_DUT, device.max_power_level + 3) == TESTOP_ERRCODE_SUCCESS
+    assert device.rf_power_level == device.max_power_level
+    assert _lib.last_max_power_level == device.max_power_level
+    assert connected.devices[SLOT_REF].rf_power_level == 0
+
+
+def test_le_test_counts_packets(connected):
+    assert send_command_le_receiver_test(SLOT_DUT, 19) == TESTOP_ERRCODE_SUCCESS
+    time.sleep(0.02)
+    assert send_command_le_test_end(SLOT_DUT) == TESTOP_ERRCODE_SUCCESS
+    assert _lib.last_test_number_of_packets > 0
+
+
+def test_reset_restores_device_state(connected):
+    device = connected.devices[SLOT_DUT]
+    send_command_em_set_rf_power_level(SLOT_DUT, 4)
+    assert device.rf_power_level == 4
+    assert send_command_soft_reset(SLOT_DUT) == TESTOP_ERRCODE_SUCCESS
+    assert device.rf_power_level == 0
+
+
+def test_latency_is_simulated():
+    board = ProDVKEmulator(latency=0.05)
+    connect_to_device(None, board)
+    try:
+        start = time.monotonic()
+        assert send_command_read_board_ver() == TESTOP_ERRCODE_SUCCESS
+        assert time.monotonic() - start >= 0.05
+    finally:
+        _lib.disconnect_proDVK()
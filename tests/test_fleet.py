@@ -0,0 +1,86 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_fleet.py
+# @brief   Racks of boards (ProDVKFleet)
+#
+############################################################################
+
+import pytest
+
+from .. import SLOT_DUT, TESTOP_ERRCODE_SUCCESS
+from ..emulator import ProDVKEmulator
+from ..fleet import ProDVKFleet
+
+
+def _emulators(count, **kwargs):
+    return [ProDVKEmulator(serial_number='EMU%029d' % index, **kwargs) for index in range(count)]
+
+
+@pytest.fixture
+def fleet():
+    fleet = ProDVKFleet(_emulators(3))
+    fleet.open()
+    yield fleet
+    fleet.close()
+
+
+def _read_adc(session, dut):
+    return session.send_command_read_ADC(SLOT_DUT, 1)
+
+
+def test_results_in_dut_order(fleet):
+    duts = ['DUT%d' % index for index in range(10)]
+    results = fleet.run(duts, _read_adc)
+
+    assert [result.dut for result in results] == duts
+    assert all(result.result == TESTOP_ERRCODE_SUCCESS and result.error is None for result in results)
+    assert set(result.serial_number for result in results) <= set(fleet)
+    assert sum(entry.jobs_done for entry in fleet.report()) == 10
+
+
+def test_free_board_steals_from_slow_board():
+    slow, fast = _emulators(2)
+    slow.latency = 0.02
+    fleet = ProDVKFleet([slow, fast])
+    fleet.open()
+    try:
+        results = fleet.run(range(20), _read_adc)
+    finally:
+        fleet.close()
+
+    report = dict((entry.serial_number, entry) for entry in fleet.report())
+    assert [result.dut for result in results] == list(range(20))
+    assert report[fast.serial_number].jobs_stolen > 0
+    assert report[slow.serial_number].jobs_stolen == 0
+    assert report[fast.serial_number].jobs_done > report[slow.serial_number].jobs_done
+    assert report[slow.serial_number].jobs_done + report[fast.serial_number].jobs_done == 20
+
+
+def test_board_failing_to_open_is_dropped():
+    boards = _emulators(3)
+    boards[1].close()
+    fleet = ProDVKFleet(boards)
+
+    assert sorted(fleet.open()) == sorted([boards[0].serial_number, boards[2].serial_number])
+    try:
+        results = fleet.run(range(4), _read_adc)
+    finally:
+        fleet.close()
+    assert boards[1].serial_number not in set(result.serial_number for result in results)
+    assert all(result.error is None for result in results)
+
+
+def test_plan_exception_is_stored(fleet):
+    def plan(session, dut):
+        if dut == 3:
+            raise RuntimeError('DUT 3 is missing')
+        return _read_adc(session, dut)
+
+    results = fleet.run(range(6), plan)
+
+    assert isinstance(results[3].error, RuntimeError)
+    assert results[3].result is None
+    assert all(result.error is None for index, result in enumerate(results) if index != 3)
+    assert sum(entry.jobs_failed for entry in fleet.report()) == 1
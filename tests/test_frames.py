@@ -0,0 +1,33 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_frames.py
+# @brief   Command frame encoding (encode_command_frame, packed helpers)
+#
+############################################################################
+
+from .. import (COMMAND_TESTOP, SLOT_DUT, TESTOP_CMD_MAX_ARGS, TESTOP_ERRCODE_SUCCESS,
+                TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX, encode_command_frame)
+
+
+def test_frame_layout():
+    frame = encode_command_frame(TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX, SLOT_DUT, 7, 3, b'\x01\x02\x03')
+    assert bytes(frame) == bytes([COMMAND_TESTOP, 6, TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX, 7, SLOT_DUT,
+                                  1, 2, 3])
+
+
+def test_frame_argument_count_is_checked():
+    assert encode_command_frame(TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX, SLOT_DUT, 1, 3, b'\x01\x02') is None
+    assert encode_command_frame(TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX, SLOT_DUT, 1,
+                                TESTOP_CMD_MAX_ARGS + 1, bytes(TESTOP_CMD_MAX_ARGS + 1)) is None
+
+
+def test_write_and_read_at_address(session, board):
+    data = [0xDE, 0xAD, 0xBE, 0xEF, 0x55]
+    assert session.send_command_em_write_at_address(SLOT_DUT, 0x1234, data, 5) == TESTOP_ERRCODE_SUCCESS
+    assert board.devices[SLOT_DUT].memory[0x1234:0x1239] == bytes(data)
+
+    # The byte count follows the little endian address
+    assert session.send_command_em_read_at_address(SLOT_DUT, 0x1234, 5) == TESTOP_ERRCODE_SUCCESS
+    assert session.get_last_read_mem_string() == 'de ad be ef 55 '
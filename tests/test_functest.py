@@ -0,0 +1,99 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_functest.py
+# @brief   Functional tests run with adaptive READ_RESULTS polling
+#
+############################################################################
+
+import struct
+import time
+
+import pytest
+
+from .. import (ProDVKCommandError, ProDVKFunctestTimeout, ReadResultsStatus, SVLDResult, SLOT_DUT,
+                TESTOP_ERRCODE_BAD_PARAMS, TESTOP_ERRCODE_SUCCESS, TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE,
+                TESTOP_SUBCMD_FUNCTEST_READ_RESULTS, TESTOP_SUBCMD_FUNCTEST_SVLD)
+
+ACTIVE = TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE
+
+
+# Count the READ_RESULTS the board receives
+def _count_polls(board):
+    read_results = board._handlers[TESTOP_SUBCMD_FUNCTEST_READ_RESULTS]
+    polls = []
+
+    def counting(subcmd, slot, args):
+        polls.append(time.monotonic())
+        return read_results(subcmd, slot, args)
+    board._handlers[TESTOP_SUBCMD_FUNCTEST_READ_RESULTS] = counting
+    return polls
+
+
+def test_test_finishing_late_is_polled_again(session, board):
+    board.functest_durations[ACTIVE] = 0.1
+    session.functest_durations[ACTIVE] = 0.01
+    polls = _count_polls(board)
+
+    start = time.monotonic()
+    record = session.run_functest(ACTIVE)
+
+    assert len(polls) >= 3
+    assert polls[-1] - start >= 0.1
+    assert record.current == pytest.approx(board.currents[ACTIVE], rel=0.01)
+    assert not session.last_is_busy
+    # The duration is learned from the run
+    assert 0.1 <= session.functest_durations[ACTIVE] < 0.5
+
+
+def test_test_done_at_the_first_poll(session, board):
+    session.functest_durations[ACTIVE] = 0.02
+    polls = _count_polls(board)
+
+    session.run_functest(ACTIVE)
+
+    assert len(polls) == 1
+    # The estimate shrinks in case the test was done earlier
+    assert session.functest_durations[ACTIVE] == pytest.approx(0.015)
+
+
+def test_timeout(session, board):
+    board.functest_durations[ACTIVE] = 5.0
+    session.functest_durations[ACTIVE] = 0.01
+
+    start = time.monotonic()
+    with pytest.raises(ProDVKFunctestTimeout) as info:
+        session.run_functest(ACTIVE, timeout=0.1)
+    assert info.value.subcmd == ACTIVE
+    assert time.monotonic() - start < 1.0
+
+
+def test_failed_start(session, board):
+    board._handlers[ACTIVE] = lambda subcmd, slot, args: (TESTOP_ERRCODE_BAD_PARAMS, b'')
+    polls = _count_polls(board)
+
+    with pytest.raises(ProDVKCommandError) as info:
+        session.run_functest(ACTIVE, dev_slot=SLOT_DUT)
+    assert info.value.subcmd == ACTIVE
+    assert info.value.errcode == TESTOP_ERRCODE_BAD_PARAMS
+    assert polls == []
+
+
+# FUNCTEST_SVLD is parsed like READ_RESULTS
+def test_svld_started(session, board):
+    session.last_is_busy = 1
+
+    assert session.send_command(TESTOP_SUBCMD_FUNCTEST_SVLD, SLOT_DUT) == TESTOP_ERRCODE_SUCCESS
+    assert session.last_is_busy == 0
+    assert isinstance(session.last_result, ReadResultsStatus)
+
+
+def test_svld_measurement(session, board):
+    board._handlers[TESTOP_SUBCMD_FUNCTEST_SVLD] = lambda subcmd, slot, args: (
+        TESTOP_ERRCODE_SUCCESS, struct.pack('<BB8s', TESTOP_SUBCMD_FUNCTEST_SVLD, 1, b'3.012V'))
+
+    session.send_command(TESTOP_SUBCMD_FUNCTEST_SVLD, SLOT_DUT)
+    assert isinstance(session.last_result, SVLDResult)
+    assert session.last_SVLD_power_mode == 'DCDC Off Configuration'
+    assert session.last_SVLD_measurement.startswith('3.012V')
@@ -0,0 +1,47 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_logging.py
+# @brief   Lazy formatting of the response log messages
+#
+############################################################################
+
+import logging
+
+import pytest
+
+from .. import LazyLogMessage, SLOT_DUT, convert_array_to_hex, convert_array_to_hex_no_spaces, convert_bytes_to_string
+
+
+@pytest.fixture
+def formatted(monkeypatch):
+    formatted = []
+    render = LazyLogMessage.__str__
+
+    def counting_str(message):
+        formatted.append(message)
+        return render(message)
+
+    monkeypatch.setattr(LazyLogMessage, '__str__', counting_str)
+    return formatted
+
+
+def test_nothing_formatted_below_the_log_level(session, formatted, caplog):
+    caplog.set_level(logging.WARNING, logger='prodvktest')
+    session.send_command_read_board_ver()
+    session.send_command_read_ADC(SLOT_DUT, 1)
+    assert formatted == []
+
+
+def test_messages_formatted_when_emitted(session, board, caplog):
+    caplog.set_level(logging.INFO, logger='prodvktest')
+    session.send_command_read_board_ver()
+    assert 'Version=' + board.board_fw_version.decode() in caplog.text
+
+
+def test_conversions():
+    assert convert_array_to_hex(b'\xde\xad\xbe', 2) == 'de ad '
+    assert convert_array_to_hex(b'', 0) == ''
+    assert convert_array_to_hex_no_spaces([0x01, 0xab], 2) == '01ab'
+    assert convert_bytes_to_string(b'1.2.0\0\0\0') == '1.2.0'
@@ -0,0 +1,132 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_memory.py
+# @brief   Bulk device memory transfers
+#
+############################################################################
+
+import os
+from array import array
+
+import pytest
+
+from .. import (ProDVKCommandError, SLOT_DUT, SLOT_REF, TESTOP_CMD_MAX_ARGS, TESTOP_ERRCODE_BAD_PARAMS,
+                TESTOP_RESP_MAX_DETAIL, TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS, TESTOP_SUBCMD_HCI_EM_WRITE_CONTINUE)
+
+
+def test_read_across_several_frames(session, board):
+    data = os.urandom(3 * TESTOP_RESP_MAX_DETAIL + 10)
+    board.devices[SLOT_DUT].memory[0x2000:0x2000 + len(data)] = data
+
+    result = session.read_memory(SLOT_DUT, 0x2000, len(data))
+
+    assert result.data == data
+    assert (result.address, result.length) == (0x2000, len(data))
+    # One READ_AT_ADDRESS and three READ_CONTINUEs
+    assert board.commands_received == 4
+    assert session.get_test_error_count() == 0
+
+
+def test_read_into_caller_buffer(session, board):
+    board.devices[SLOT_REF].memory[0x100:0x180] = bytes(range(0x80))
+    buffer = bytearray(0x90)
+
+    result = session.read_memory(SLOT_REF, 0x100, 0x80, buffer)
+
+    assert result.data is buffer
+    assert buffer == bytes(range(0x80)) + bytes(0x10)
+
+
+def test_read_nothing(session, board):
+    assert session.read_memory(SLOT_DUT, 0x2000, 0).data == b''
+    assert board.commands_received == 0
+
+
+def test_read_into_too_small_buffer(session, board):
+    with pytest.raises(ValueError):
+        session.read_memory(SLOT_DUT, 0x2000, 100, bytearray(99))
+    assert board.commands_received == 0
+
+
+def test_read_past_the_end_of_memory(session, board):
+    with pytest.raises(ProDVKCommandError) as info:
+        session.read_memory(SLOT_DUT, len(board.devices[SLOT_DUT].memory) - 10, 20)
+    assert info.value.subcmd == TESTOP_SUBCMD_HCI_EM_READ_AT_ADDRESS
+    assert info.value.errcode == TESTOP_ERRCODE_BAD_PARAMS
+
+
+def test_write_across_several_frames(session, board):
+    data = os.urandom(4 + 3 * TESTOP_CMD_MAX_ARGS)
+
+    result = session.write_memory(SLOT_DUT, 0x3000, data)
+
+    assert board.devices[SLOT_DUT].memory[0x3000:0x3000 + len(data)] == data
+    assert result.verified is True
+    # One WRITE_AT_ADDRESS (55 data bytes), three WRITE_CONTINUEs and the CRC
+    assert board.commands_received == 5
+    assert session.read_memory(SLOT_DUT, 0x3000, len(data)).data == data
+    assert session.get_test_error_count() == 0
+
+
+def test_write_any_buffer(session, board):
+    data = array('H', range(100))
+    result = session.write_memory(SLOT_REF, 0x400, data)
+
+    assert result.length == 200
+    assert result.verified is True
+    assert board.devices[SLOT_REF].memory[0x400:0x400 + 200] == data.tobytes()
+
+
+def test_write_nothing(session, board):
+    result = session.write_memory(SLOT_DUT, 0x3000, b'')
+    assert result.length == 0
+    assert result.verified is None
+    assert board.commands_received == 0
+
+
+def test_write_verify_mismatch(session, board):
+    write_continue = board._handlers[TESTOP_SUBCMD_HCI_EM_WRITE_CONTINUE]
+
+    # The board drops a bit of every WRITE_CONTINUE
+    def corrupting_write_continue(subcmd, slot, args):
+        return write_continue(subcmd, slot, bytes([args[0] ^ 0x01]) + bytes(args[1:]))
+
+    board._handlers[TESTOP_SUBCMD_HCI_EM_WRITE_CONTINUE] = corrupting_write_continue
+    result = session.write_memory(SLOT_DUT, 0x3000, bytes(200))
+
+    assert result.verified is False
+    assert session.get_test_error_count() == 1
+
+
+def test_sync_rewrites_only_the_changed_blocks(session, board):
+    memory = board.devices[SLOT_DUT].memory
+    data = bytearray(os.urandom(16384))
+    session.write_memory(SLOT_DUT, 0x8000, data)
+
+    for offset in (100, 5000, 5001, 12000):
+        data[offset] ^= 0xff
+    result = session.sync_memory(SLOT_DUT, 0x8000, data)
+
+    assert result.ranges == ((0, 256), (4864, 256), (11776, 256))
+    assert result.bytes_written == 768
+    assert result.verified is True
+    assert memory[0x8000:0x8000 + len(data)] == data
+    assert session.get_test_error_count() == 0
+
+    result = session.sync_memory(SLOT_DUT, 0x8000, data)
+    assert result.ranges == ()
+    assert result.bytes_written == 0
+    assert result.crc_commands == 4
+
+
+def test_sync_merges_adjacent_blocks(session, board):
+    data = bytearray(8192)
+    session.write_memory(SLOT_DUT, 0x8000, data)
+
+    data[255:257] = b'\x01\x02'
+    result = session.sync_memory(SLOT_DUT, 0x8000, data)
+
+    assert result.ranges == ((0, 512),)
+    assert board.devices[SLOT_DUT].memory[0x8000:0x8000 + len(data)] == data
@@ -0,0 +1,129 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_patch.py
+# @brief   Patch container upload and provisioning
+#
+############################################################################
+
+import os
+
+import pytest
+
+from .. import (ProDVKCommandError, SLOT_DUT, TESTOP_ERRCODE_BAD_PARAMS,
+                TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_CONTINUE, TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_ABORT,
+                TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX)
+from ..patch import PatchCrcCache, PatchImage, build_patch_container, upload_patch, provision_patches
+
+ADDRESS = 0x4000
+
+
+def _container(size = 2048, seed = 1):
+    return build_patch_container(bytes((seed + i * 7) & 0xff for i in range(size)), ADDRESS)
+
+
+# Make the board answer the n-th command 'subcmd' with 'errcode'
+def _fail_nth(board, subcmd, n, errcode = TESTOP_ERRCODE_BAD_PARAMS):
+    handler = board._handlers[subcmd]
+    calls = []
+
+    def failing(subcmd, slot, args):
+        calls.append(subcmd)
+        if len(calls) == n:
+            return errcode, b''
+        return handler(subcmd, slot, args)
+    board._handlers[subcmd] = failing
+    return calls
+
+
+def test_upload_and_verify(session, board):
+    data = _container()
+    result = upload_patch(data, SLOT_DUT, session=session)
+
+    assert result.verified is True
+    assert result.size == len(data)
+    device = board.devices[SLOT_DUT]
+    assert len(device.patches) == 1
+    assert device.memory[ADDRESS:ADDRESS + len(data)] == data
+    assert session.test_error_count == 0
+
+
+def test_verify_detects_a_bad_load(session, board):
+    device = board.devices[SLOT_DUT]
+    calculate_crc32 = board._handlers[TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX]
+
+    def corrupted(subcmd, slot, args):
+        device.memory[ADDRESS + 100] ^= 0xff
+        return calculate_crc32(subcmd, slot, args)
+    board._handlers[TESTOP_SUBCMD_HCI_EM_CALCULATE_CRC32_EX] = corrupted
+
+    result = upload_patch(_container(), SLOT_DUT, session=session)
+    assert result.verified is False
+    assert session.test_error_count == 1
+
+
+def test_failed_frame_aborts_the_upload(session, board):
+    _fail_nth(board, TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_CONTINUE, 5)
+    aborts = _fail_nth(board, TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_ABORT, 0)
+
+    with pytest.raises(ProDVKCommandError) as failure:
+        upload_patch(_container(), SLOT_DUT, session=session)
+
+    assert failure.value.errcode == TESTOP_ERRCODE_BAD_PARAMS
+    assert len(aborts) == 1
+    assert board.devices[SLOT_DUT].patch_upload is None
+    assert board.devices[SLOT_DUT].patches == []
+
+
+def test_upload_from_a_mapped_file(session, board, tmp_path):
+    data = _container(4096, 3)
+    path = os.path.join(str(tmp_path), 'patch.emp')
+    with open(path, 'wb') as f:
+        f.write(data)
+
+    result = upload_patch(path, SLOT_DUT, session=session)
+    assert result.verified is True
+    assert board.devices[SLOT_DUT].memory[ADDRESS:ADDRESS + len(data)] == data
+
+
+def test_image_size_must_match_its_header():
+    with pytest.raises(ValueError):
+        PatchImage(_container()[:-1])
+
+
+def test_provision_uploads_only_missing_containers(session, board, tmp_path):
+    paths = []
+    for seed in (1, 2):
+        path = os.path.join(str(tmp_path), 'patch%d.emp' % seed)
+        with open(path, 'wb') as f:
+            f.write(_container(1024, seed))
+        paths.append(path)
+
+    upload_patch(paths[0], SLOT_DUT, session=session)
+    result = provision_patches(paths, SLOT_DUT, session=session)
+    assert result.skipped == (paths[0],)
+    assert result.uploaded == (paths[1],)
+
+    result = provision_patches(paths, SLOT_DUT, session=session)
+    assert result.uploaded == ()
+    assert len(board.devices[SLOT_DUT].patches) == 2
+
+
+def test_crc_cache_is_reused_until_the_file_changes(tmp_path):
+    path = os.path.join(str(tmp_path), 'patch.emp')
+    with open(path, 'wb') as f:
+        f.write(_container(512))
+    index_path = os.path.join(str(tmp_path), 'index.json')
+
+    cache = PatchCrcCache(index_path)
+    entry = cache.get(path)
+    cache.save()
+    cache = PatchCrcCache(index_path)
+    assert cache.get(path) == entry
+    assert (cache.hits, cache.misses) == (1, 0)
+
+    with open(path, 'wb') as f:
+        f.write(_container(600))
+    assert cache.get(path).size == os.path.getsize(path)
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,44 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_pipeline.py
+# @brief   Pipelined commands (CommandPipeline)
+#
+############################################################################
+
+import pytest
+
+from .. import CommandPipeline, SLOT_DUT, TESTOP_ERRCODE_SUCCESS
+
+
+def test_sequence_numbers_wrap_around(session, board):
+    session.cmdSeqNum = 250
+    with CommandPipeline(8, session):
+        commands = [session.send_command_read_ADC(SLOT_DUT, 1) for _ in range(20)]
+
+    assert [command.seqNum for command in commands] == [(251 + i) % 256 for i in range(20)]
+    assert all(command.result() == TESTOP_ERRCODE_SUCCESS for command in commands)
+    assert session.cmdSeqNum == (250 + 20) % 256
+    assert board.commands_received == 20
+    assert session.test_error_count == 0
+
+
+def test_window_is_limited_to_depth(session, board):
+    with CommandPipeline(4, session) as pipeline:
+        for _ in range(10):
+            session.send_command_read_ADC(SLOT_DUT, 1)
+            assert len(pipeline.in_flight) <= 4
+    assert not pipeline.in_flight
+
+
+def test_depth_is_checked(session):
+    with pytest.raises(ValueError):
+        CommandPipeline(0, session)
+
+
+def test_stop_and_wait_after_wraparound(session):
+    session.cmdSeqNum = 255
+    assert session.send_command_read_ADC(SLOT_DUT, 1) == TESTOP_ERRCODE_SUCCESS
+    assert session.cmdSeqNum == 0
+    assert session.send_command_read_ADC(SLOT_DUT, 1) == TESTOP_ERRCODE_SUCCESS
@@ -0,0 +1,128 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_plan.py
+# @brief   Compiled test plans
+#
+############################################################################
+
+import pytest
+
+from .. import (SLOT_DUT, TESTOP_ERRCODE_SUCCESS, TESTOP_ERRCODE_BAD_PARAMS,
+                TESTOP_SUBCMD_READ_ADC, TESTOP_SUBCMD_HCI_LE_TEST_END, TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE)
+from ..plan import compile_plan, plan_step, PLAN_ROUND_TRIP
+
+
+def _plan(session, check = None):
+    return compile_plan([
+        plan_step('send_command_em_set_rf_power_level', SLOT_DUT, 4),
+        plan_step('send_command_read_ADC', SLOT_DUT, 1, check=check),
+        plan_step('send_command_le_receiver_test', SLOT_DUT, 19),
+        plan_step('send_command_le_test_end', SLOT_DUT),
+    ], session)
+
+
+def test_run_sends_every_frame(session, board):
+    test_plan = _plan(session)
+    session.cmdSeqNum = 254
+
+    for _ in range(3):
+        result = test_plan.run(session)
+        assert result.passed
+        assert result.commands == 4
+        assert len(result.records) == 4
+    assert board.commands_received == 12
+    assert session.cmdSeqNum == (254 + 12) % 256
+    assert session.stale_responses == 0
+
+
+def test_check_failure_stops_the_plan(session, board):
+    test_plan = _plan(session, check=lambda record: record.current < 1.0)
+
+    result = test_plan.run(session)
+    assert not result.passed
+    assert result.commands == 2
+    assert [(failure.step, failure.subcmd, failure.errcode) for failure in result.failures] == \
+           [(1, TESTOP_SUBCMD_READ_ADC, TESTOP_ERRCODE_SUCCESS)]
+    assert session.test_error_count == 1
+
+
+def test_failures_collected_without_stop_on_failure(session, board):
+    test_plan = compile_plan([
+        plan_step('send_command_read_ADC', SLOT_DUT, 1, check=lambda record: False),
+        plan_step('send_command_le_test_end', SLOT_DUT, expect=TESTOP_ERRCODE_BAD_PARAMS),
+        plan_step('send_command_read_ADC', SLOT_DUT, 1),
+    ], session)
+
+    result = test_plan.run(session, stop_on_failure=False)
+    assert not result.passed
+    assert result.commands == 3
+    assert [failure.step for failure in result.failures] == [0, 1]
+    assert result.failures[1].subcmd == TESTOP_SUBCMD_HCI_LE_TEST_END
+    assert session.test_error_count == 2
+
+
+def test_board_error_is_a_failure(session, board):
+    # READ_CONTINUE without READ_AT_ADDRESS is rejected by the board
+    test_plan = compile_plan([plan_step('send_command_em_read_continue', SLOT_DUT, 4),
+                              plan_step('send_command_read_ADC', SLOT_DUT, 1)], session)
+    result = test_plan.run(session)
+    assert result.commands == 1
+    assert result.failures[0].errcode == TESTOP_ERRCODE_BAD_PARAMS
+
+
+def test_lean_run_parses_only_checked_steps(session, board):
+    test_plan = _plan(session, check=lambda record: record.current > 0.0)
+    session.last_adc_measurement = None
+    verifications = session.test_verification_count
+
+    result = test_plan.run(session, parse_all=False)
+    assert result.passed
+    assert result.commands == 4
+    assert [record is None for record in result.records] == [True, False, True, True]
+    assert session.last_adc_measurement == result.records[1].current
+    assert session.test_verification_count == verifications + 4
+
+    # Without a check READ_ADC is not parsed
+    session.last_adc_measurement = None
+    assert _plan(session).run(session, parse_all=False).passed
+    assert session.last_adc_measurement is None
+
+
+def test_lean_run_parses_errors(session, board):
+    # READ_CONTINUE without READ_AT_ADDRESS is rejected by the board
+    test_plan = compile_plan([plan_step('send_command_em_read_continue', SLOT_DUT, 4)], session)
+
+    result = test_plan.run(session, parse_all=False)
+    assert not result.passed
+    assert result.failures[0].errcode == TESTOP_ERRCODE_BAD_PARAMS
+    assert session.test_error_count == 1
+
+
+def test_compile_rejects_invalid_steps(session):
+    for steps in ([plan_step('no_such_helper')],
+                  [plan_step('send_command_le_transmitter_test', SLOT_DUT, 1, 300, 1)],
+                  [plan_step('send_command_em_write_at_address', SLOT_DUT, 0, bytes(200), 200)]):
+        with pytest.raises(ValueError):
+            compile_plan(steps, session)
+
+
+def test_dry_run_sends_nothing(session, board):
+    test_plan = _plan(session)
+    estimate = test_plan.dry_run(session)
+    assert board.commands_received == 0
+    assert (estimate.commands, estimate.timed) == (4, 0)
+    assert estimate.seconds == pytest.approx(4 * PLAN_ROUND_TRIP)
+
+    test_plan.run(session)
+    assert test_plan.dry_run(session).timed == 4
+
+
+def test_compile_rejects_helpers_that_read_responses(session, board):
+    for steps in ([plan_step('generate_test_fw_version_log')],
+                  [plan_step('read_memory', SLOT_DUT, 0, 16)],
+                  [plan_step(session.run_functest, TESTOP_SUBCMD_FUNCTEST_CURRENT_ACTIVE)]):
+        with pytest.raises(ValueError):
+            compile_plan(steps, session)
+    assert board.commands_received == 0
@@ -0,0 +1,83 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_reader.py
+# @brief   Routing of responses and events by the BackgroundReader
+#
+############################################################################
+
+import time
+
+import pytest
+
+from .. import (BackgroundReader, CommandPipeline, ProDVKTimeoutError,
+                SLOT_DUT, TESTOP_ERRCODE_SUCCESS, TESTOP_SUBCMD_READ_ADC, encode_command_frame)
+
+COMMAND_COMPLETE = b'\x04\x0e\x04\x01\x03\x0c\x00'
+LE_META          = b'\x04\x3e\x03\x01\x00\x00'
+ACL_DATA         = b'\x02\x01\x00\x00\x00'
+
+
+def test_responses_routed_between_events(session, board):
+    with BackgroundReader(session) as reader:
+        events = reader.subscribe()
+        for _ in range(20):
+            board.inject_event(COMMAND_COMPLETE)
+            assert session.send_command_read_ADC(SLOT_DUT, 1) == TESTOP_ERRCODE_SUCCESS
+
+    assert reader.events_received == 20
+    assert events.qsize() == 20
+    assert session.stale_responses == 0
+    assert session.test_error_count == 0
+
+
+def test_events_routed_by_packet_type(session, board):
+    with BackgroundReader(session) as reader:
+        hci_events = reader.subscribe(0x04)
+        acl_data   = reader.subscribe(0x02)
+        every      = reader.subscribe()
+        for packet in (COMMAND_COMPLETE, ACL_DATA, LE_META):
+            board.inject_event(packet)
+        session.send_command_read_ADC(SLOT_DUT, 1)
+
+        assert [bytes(hci_events.get(timeout=1)[:len(packet)]) for packet in (COMMAND_COMPLETE, LE_META)] == \
+               [COMMAND_COMPLETE, LE_META]
+        assert bytes(acl_data.get(timeout=1)[:len(ACL_DATA)]) == ACL_DATA
+        assert every.qsize() == 3
+
+        reader.unsubscribe(every)
+        board.inject_event(LE_META)
+        session.send_command_read_ADC(SLOT_DUT, 1)
+        assert every.qsize() == 3
+        assert hci_events.get(timeout=1)[1] == 0x3e
+
+
+def test_full_queue_drops_events(session, board):
+    with BackgroundReader(session) as reader:
+        events = reader.subscribe(maxsize=2)
+        for _ in range(5):
+            board.inject_event(COMMAND_COMPLETE)
+        session.send_command_read_ADC(SLOT_DUT, 1)
+    assert events.qsize() == 2
+    assert reader.events_dropped == 3
+
+
+def test_pipelined_responses_routed_by_sequence_number(session):
+    with BackgroundReader(session):
+        with CommandPipeline(8, session):
+            commands = [session.send_command_read_ADC(SLOT_DUT, 1) for _ in range(30)]
+    assert all(command.result() == TESTOP_ERRCODE_SUCCESS for command in commands)
+    assert session.reader is None
+
+
+def test_unclaimed_responses_are_dropped(session, board):
+    with BackgroundReader(session) as reader:
+        board.write(encode_command_frame(TESTOP_SUBCMD_READ_ADC, SLOT_DUT, 77, 1, [1]))
+        time.sleep(0.05)
+        assert session.resync() == 1
+        assert session.stale_responses == 1
+
+        board.drop_responses = 1
+        with pytest.raises(ProDVKTimeoutError):
+            session.read_response(50)
@@ -0,0 +1,46 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_records.py
+# @brief   Result records returned by the response parsers
+#
+############################################################################
+
+import pickle
+
+import pytest
+
+from .. import (CommandPipeline, PowerLevelResult, ProDVKCommandError, ResultRecord, SLOT_DUT,
+                TESTOP_ERRCODE_BAD_PARAMS, TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK)
+
+
+def test_query_returns_the_record(session, board):
+    record = session.query('send_command_em_set_rf_power_level', SLOT_DUT, 4)
+
+    assert record == PowerLevelResult(board.devices[SLOT_DUT].max_power_level)
+    assert isinstance(record, ResultRecord)
+    assert str(record) == 'MaxPowerLevel=%d' % board.devices[SLOT_DUT].max_power_level
+    assert session.last_result is record
+    assert session.get_last_max_power_level() == record.max_power_level
+
+
+def test_records_are_immutable_and_picklable(session):
+    record = session.query(session.send_command_em_set_rf_power_level, SLOT_DUT, 4)
+    with pytest.raises(AttributeError):
+        record.max_power_level = 1
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+def test_query_raises_on_error(session):
+    with pytest.raises(ProDVKCommandError) as info:
+        session.query('send_command_with_args', TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK, SLOT_DUT, 0, 0)
+    assert info.value.subcmd == TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK
+    assert info.value.errcode == TESTOP_ERRCODE_BAD_PARAMS
+
+
+def test_pipelined_command_carries_its_record(session, board):
+    with CommandPipeline(4, session):
+        commands = [session.send_command_em_set_rf_power_level(SLOT_DUT, level) for level in range(3)]
+    assert [command.record for command in commands] == \
+        [PowerLevelResult(board.devices[SLOT_DUT].max_power_level)] * 3
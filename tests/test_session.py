@@ -0,0 +1,49 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_session.py
+# @brief   Per-board sessions (ProDVKSession)
+#
+############################################################################
+
+import sys
+
+from .. import (ProDVKSession, SLOT_DUT, TESTOP_ERRCODE_SUCCESS, TESTOP_ERRCODE_BAD_PARAMS,
+                TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK)
+from ..emulator import ProDVKEmulator
+
+_lib = sys.modules[__package__.rpartition('.')[0]]
+
+
+def test_sessions_are_independent():
+    boards = [ProDVKEmulator(serial_number='EMU%029d' % index) for index in range(2)]
+    sessions = [ProDVKSession() for board in boards]
+    for session, board in zip(sessions, boards):
+        assert session.connect_to_device(None, board) == board.serial_number
+
+    boards[1].devices[SLOT_DUT].max_power_level = 6
+    for session in sessions:
+        assert session.send_command_em_set_rf_power_level(SLOT_DUT, 8) == TESTOP_ERRCODE_SUCCESS
+    sessions[0].send_command_read_ADC(SLOT_DUT, 1)
+
+    assert [session.get_last_max_power_level() for session in sessions] == [10, 6]
+    assert sessions[0].cmdSeqNum == sessions[1].cmdSeqNum + 1
+    for session in sessions:
+        session.disconnect_proDVK()
+
+
+def test_error_count_is_per_session(session):
+    other = ProDVKSession(ProDVKEmulator())
+    # SET_EVENT_MASK without its mask is rejected by the board
+    assert session.send_command_with_args(TESTOP_SUBCMD_HCI_EM_SET_EVENT_MASK, SLOT_DUT, 0, 0) == \
+        TESTOP_ERRCODE_BAD_PARAMS
+    assert session.get_test_error_count() == 1
+    assert other.get_test_error_count() == 0
+
+
+def test_module_functions_use_the_default_session(connected):
+    assert _lib._default_session.transport is connected
+    assert _lib.send_command_read_board_ver() == TESTOP_ERRCODE_SUCCESS
+    assert _lib.get_last_board_ver_string() == connected.board_fw_version.decode()
+    assert _lib._default_session.last_board_ver_string == connected.board_fw_version.decode()
@@ -0,0 +1,107 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_session_state.py
+# @brief   Query cache and shadow configuration of a session
+#
+############################################################################
+
+from .. import (SLOT_DUT, SLOT_REF, TESTOP_ERRCODE_SUCCESS, TESTOP_ERRCODE_BAD_PARAMS,
+                TESTOP_SUBCMD_HCI_EM_READ_CONTINUE, TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL_EX)
+
+
+# ==========================================================================
+#   Query cache
+# ==========================================================================
+def test_cached_query_is_not_sent_again(session, board):
+    assert session.send_command_read_BLE_address(SLOT_DUT) == TESTOP_ERRCODE_SUCCESS
+    address = session.last_result
+    sent = board.commands_received
+
+    assert session.send_command_read_BLE_address(SLOT_DUT) == TESTOP_ERRCODE_SUCCESS
+    assert board.commands_received == sent
+    assert session.last_result == address
+    assert (session.query_cache_hits, session.query_cache_misses) == (1, 1)
+
+
+def test_cache_is_per_slot(session, board):
+    session.send_command_read_BLE_address(SLOT_DUT)
+    session.send_command_read_BLE_address(SLOT_REF)
+    assert board.commands_received == 2
+
+
+def test_cache_invalidated_by_reset(session, board):
+    session.send_command_read_BLE_address(SLOT_DUT)
+    session.send_command_em_cpu_reset(SLOT_DUT)
+    sent = board.commands_received
+    session.send_command_read_BLE_address(SLOT_DUT)
+    assert board.commands_received == sent + 1
+
+
+def test_cache_invalidated_by_test_header(session, board):
+    session.send_command_read_BLE_address(SLOT_DUT)
+    session.generate_test_header('next DUT')
+    session.send_command_read_BLE_address(SLOT_DUT)
+    assert board.commands_received == 2
+
+
+def test_cache_invalidated_explicitly(session, board):
+    session.send_command_read_BLE_address(SLOT_DUT)
+    session.invalidate_query_cache()
+    session.send_command_read_BLE_address(SLOT_DUT)
+    assert board.commands_received == 2
+
+
+def test_cache_disabled(session, board):
+    session.query_cache_enabled = False
+    session.send_command_read_BLE_address(SLOT_DUT)
+    session.send_command_read_BLE_address(SLOT_DUT)
+    assert board.commands_received == 2
+
+
+# ==========================================================================
+#   Shadow configuration
+# ==========================================================================
+def test_unchanged_setter_is_skipped(session, board):
+    assert session.send_command_em_set_rf_power_level(SLOT_DUT, 4) == TESTOP_ERRCODE_SUCCESS
+    assert session.send_command_em_set_rf_power_level(SLOT_DUT, 4) == TESTOP_ERRCODE_SUCCESS
+    assert board.commands_received == 1
+    assert session.shadow_skipped_commands == {TESTOP_SUBCMD_HCI_EM_SET_RF_POWER_LEVEL_EX: 1}
+
+    # Another value, or the same value on the other device, is sent
+    session.send_command_em_set_rf_power_level(SLOT_DUT, 5)
+    session.send_command_em_set_rf_power_level(SLOT_REF, 5)
+    assert board.commands_received == 3
+    assert board.devices[SLOT_DUT].rf_power_level == 5
+
+
+def test_shadow_invalidated_by_reset(session, board):
+    session.send_command_em_set_rf_power_level(SLOT_DUT, 4)
+    session.send_command_em_cpu_reset(SLOT_DUT)
+    sent = board.commands_received
+    session.send_command_em_set_rf_power_level(SLOT_DUT, 4)
+    assert board.commands_received == sent + 1
+
+
+def test_shadow_invalidated_by_failure(session, board):
+    session.send_command_em_set_rf_power_level(SLOT_DUT, 4)
+    # READ_CONTINUE without READ_AT_ADDRESS is rejected
+    assert session.send_command_values(TESTOP_SUBCMD_HCI_EM_READ_CONTINUE, SLOT_DUT, 4) == TESTOP_ERRCODE_BAD_PARAMS
+    sent = board.commands_received
+    session.send_command_em_set_rf_power_level(SLOT_DUT, 4)
+    assert board.commands_received == sent + 1
+
+
+def test_shadow_invalidated_by_test_header(session, board):
+    session.send_command_em_set_rf_power_level(SLOT_DUT, 4)
+    session.generate_test_header('next DUT')
+    session.send_command_em_set_rf_power_level(SLOT_DUT, 4)
+    assert board.commands_received == 2
+
+
+def test_shadow_invalidated_explicitly(session, board):
+    session.send_command_em_set_rf_power_level(SLOT_DUT, 4)
+    session.invalidate_shadow_config()
+    session.send_command_em_set_rf_power_level(SLOT_DUT, 4)
+    assert board.commands_received == 2
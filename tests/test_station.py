@@ -0,0 +1,111 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_station.py
+# @brief   Multi-process station (ProDVKStation) and its MeasurementRing
+#
+############################################################################
+
+import time
+
+import pytest
+
+from .. import SLOT_DUT, MEASUREMENT_CURRENT, MEASUREMENT_PER
+from ..emulator import ProDVKEmulator
+from ..station import MeasurementRing, ProDVKStation
+
+
+@pytest.fixture
+def ring():
+    ring = MeasurementRing(4)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+
+def test_ring_wraps_around(ring):
+    for cycle in range(3):
+        assert ring.put(float(cycle), cycle, MEASUREMENT_CURRENT, cycle * 1.5)
+    assert [record[1] for record in ring.get_all()] == [0, 1, 2]
+
+    # The next records straddle the end of the buffer
+    for cycle in range(3, 7):
+        assert ring.put(float(cycle), cycle, MEASUREMENT_PER, cycle * 1.5)
+    assert ring.get_all() == [(float(cycle), cycle, MEASUREMENT_PER, cycle * 1.5) for cycle in range(3, 7)]
+    assert ring.get_all() == []
+    assert ring.dropped() == 0
+
+
+def test_ring_drops_when_full(ring):
+    assert all(ring.put(0.0, cycle, MEASUREMENT_CURRENT, 1.0) for cycle in range(4))
+    assert not ring.put(0.0, 4, MEASUREMENT_CURRENT, 1.0)
+    assert not ring.put(0.0, 5, MEASUREMENT_CURRENT, 1.0)
+    assert ring.dropped() == 2
+
+    assert [record[1] for record in ring.get_all()] == [0, 1, 2, 3]
+    assert ring.put(0.0, 6, MEASUREMENT_CURRENT, 1.0)
+    assert [record[1] for record in ring.get_all()] == [6]
+
+
+def test_ring_opened_by_name(ring):
+    producer = MeasurementRing(4, name=ring.name)
+    try:
+        producer.put(1.0, 7, MEASUREMENT_CURRENT, 2.5)
+    finally:
+        producer.close()
+    assert ring.get_all() == [(1.0, 7, MEASUREMENT_CURRENT, 2.5)]
+
+
+# Module level so the spawned workers can unpickle them
+def emulator_factory(serial_number):
+    return ProDVKEmulator(serial_number=serial_number)
+
+
+def read_current_plan(session):
+    session.send_command_read_current(SLOT_DUT)
+
+
+def test_station_collects_every_measurement():
+    serial_numbers = ['EMU%029d' % index for index in range(2)]
+    station = ProDVKStation(serial_numbers, read_current_plan, cycles=5, transport_factory=emulator_factory)
+    station.start()
+    measurements = list(station.measurements())
+    exit_codes = station.join(timeout=30)
+
+    assert exit_codes == dict((serial_number, 0) for serial_number in serial_numbers)
+    for serial_number in serial_numbers:
+        own = [measurement for measurement in measurements if measurement.serial_number == serial_number]
+        assert [measurement.cycle for measurement in own] == list(range(5))
+        assert all(measurement.kind == MEASUREMENT_CURRENT for measurement in own)
+        assert station.stats[serial_number][MEASUREMENT_CURRENT].count == 5
+    assert station.rings == {}
+
+
+def slow_plan(session):
+    session.send_command_read_current(SLOT_DUT)
+    time.sleep(0.01)
+
+
+def test_join_keeps_the_rings_of_running_workers():
+    serial_numbers = ['EMU%029d' % index for index in range(2)]
+    station = ProDVKStation(serial_numbers, slow_plan, transport_factory=emulator_factory)
+    station.start()
+    try:
+        # Wait for both workers to be running their plan
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            station.poll()
+            if all(station.stats[serial_number] for serial_number in serial_numbers):
+                break
+            time.sleep(0.01)
+        exit_codes = station.join(timeout=0.1)
+        assert exit_codes == dict((serial_number, None) for serial_number in serial_numbers)
+        assert sorted(station.rings) == serial_numbers
+    finally:
+        station.stop()
+        exit_codes = station.join(timeout=30)
+
+    assert exit_codes == dict((serial_number, 0) for serial_number in serial_numbers)
+    assert station.rings == {}
+    assert all(station.stats[serial_number][MEASUREMENT_CURRENT].count > 0 for serial_number in serial_numbers)
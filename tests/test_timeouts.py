@@ -0,0 +1,91 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_timeouts.py
+# @brief   Learned response timeouts, retries and resynchronization
+#
+############################################################################
+
+import sys
+import time
+
+import pytest
+
+from .. import (ProDVKTimeoutError, TimeoutPolicy, encode_command_frame,
+                SLOT_DUT, DVK_USB_TIMEOUT, TIMEOUT_FLOOR, TIMEOUT_MARGIN, TIMEOUT_MIN_SAMPLES,
+                TESTOP_ERRCODE_SUCCESS, TESTOP_SUBCMD_READ_ADC, TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_ABORT)
+
+_lib = sys.modules[__package__.rpartition('.')[0]]
+
+
+def _learn(session, helper, *args):
+    for _ in range(2 * TIMEOUT_MIN_SAMPLES):
+        assert helper(*args) == TESTOP_ERRCODE_SUCCESS
+
+
+def test_policy_learns_from_latencies():
+    policy = TimeoutPolicy()
+    assert policy.timeout(TESTOP_SUBCMD_READ_ADC) == DVK_USB_TIMEOUT
+
+    for _ in range(TIMEOUT_MIN_SAMPLES):
+        policy.observe(TESTOP_SUBCMD_READ_ADC, 0.010)
+    assert policy.timeout(TESTOP_SUBCMD_READ_ADC) == int(TIMEOUT_MARGIN * 10)
+
+    policy.reset()
+    for _ in range(TIMEOUT_MIN_SAMPLES):
+        policy.observe(TESTOP_SUBCMD_READ_ADC, 0.0001)
+    assert policy.timeout(TESTOP_SUBCMD_READ_ADC) == TIMEOUT_FLOOR
+
+
+def test_lost_response_is_retried(session, board):
+    _learn(session, session.send_command_read_ADC, SLOT_DUT, 1)
+    sent = board.commands_received
+
+    board.drop_responses = 1
+    start = time.perf_counter()
+    assert session.send_command_read_ADC(SLOT_DUT, 1) == TESTOP_ERRCODE_SUCCESS
+    assert time.perf_counter() - start < 1.0
+    assert session.command_retries == 1
+    assert board.commands_received == sent + 2
+
+
+def test_late_response_is_dropped(session, board):
+    _learn(session, session.send_command_read_ADC, SLOT_DUT, 1)
+
+    board.late_responses = 1
+    board.late_delay = 0.1
+    assert session.send_command_read_ADC(SLOT_DUT, 1) == TESTOP_ERRCODE_SUCCESS
+    assert session.command_retries >= 1
+
+    # Every response but one to the command and its retries is stale: none
+    # is taken for the response to the next command
+    time.sleep(0.15)
+    assert session.send_command_read_ADC(SLOT_DUT, 1) == TESTOP_ERRCODE_SUCCESS
+    assert session.stale_responses == session.command_retries
+
+
+def test_lost_response_to_a_command_not_retried(session, board, monkeypatch):
+    # Such a command is waited for until DVK_USB_TIMEOUT, whatever was learned
+    monkeypatch.setattr(_lib, 'DVK_USB_TIMEOUT', 200)
+    _learn(session, session.send_command_em_write_patch_abort, SLOT_DUT)
+    sent = board.commands_received
+
+    board.drop_responses = 1
+    with pytest.raises(ProDVKTimeoutError) as timeout:
+        session.send_command_em_write_patch_abort(SLOT_DUT)
+    assert timeout.value.subcmd == TESTOP_SUBCMD_HCI_EM_WRITE_PATCH_ABORT
+    assert timeout.value.timeout == 200
+    assert board.commands_received == sent + 1
+    assert session.command_retries == 0
+
+
+def test_resync_drops_waiting_packets(session, board):
+    for seqNum in (200, 201):
+        board.write(encode_command_frame(TESTOP_SUBCMD_READ_ADC, SLOT_DUT, seqNum, 1, [1]))
+    time.sleep(0.01)
+
+    assert session.resync() == 2
+    assert session.stale_responses == 2
+    assert session.send_command_read_ADC(SLOT_DUT, 1) == TESTOP_ERRCODE_SUCCESS
+    assert session.resync() == 0
@@ -0,0 +1,90 @@
+#
+# -*- coding: utf-8 -*-
+############################################################################
+#
+# @file    test_triggered.py
+# @brief   Triggered current samples (TriggeredCurrentRing)
+#
+############################################################################
+
+import array
+
+import pytest
+
+from .. import TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT, TriggeredCurrentRing
+
+
+@pytest.fixture
+def ring():
+    return TriggeredCurrentRing(4, use_numpy=False)
+
+
+def _fill(ring, count, first = 0):
+    for index in range(first, first + count):
+        ring.append(index % 3, index * 0.5)
+
+
+def _columns(segments):
+    return [tuple(list(column) for column in segment) for segment in segments]
+
+
+def test_empty_ring(ring):
+    assert len(ring) == 0
+    assert ring.segments() == []
+    assert ring.to_list() == []
+    assert ring.to_array() == array.array('d')
+
+
+def test_segments_before_wraparound(ring):
+    _fill(ring, 3)
+    assert _columns(ring.segments()) == [([0.0, 0.5, 1.0], [0, 1, 2], [0, 1, 2])]
+    assert ring.overwritten() == 0
+
+
+def test_segments_after_wraparound(ring):
+    _fill(ring, 6)
+    assert len(ring) == 4
+    assert ring.overwritten() == 2
+    assert _columns(ring.segments()) == [([1.0, 1.5], [2, 0], [2, 3]),
+                                         ([2.0, 2.5], [1, 2], [4, 5])]
+    assert ring.to_list() == [1.0, 1.5, 2.0, 2.5]
+
+
+def test_to_array(ring):
+    _fill(ring, 7)
+    values = ring.to_array()
+    assert isinstance(values, array.array)
+    assert values.typecode == 'd'
+    assert values == array.array('d', [1.5, 2.0, 2.5, 3.0])
+
+
+def test_clear(ring):
+    _fill(ring, 6)
+    ring.clear()
+    assert len(ring) == 0
+    assert ring.overwritten() == 0
+    assert ring.segments() == []
+
+    _fill(ring, 2, 10)
+    # Indices restart from the clear
+    assert _columns(ring.segments()) == [([5.0, 5.5], [1, 2], [0, 1])]
+
+
+def test_capacity_is_checked():
+    with pytest.raises(ValueError):
+        TriggeredCurrentRing(0)
+
+
+def test_triggered_values_in_capture_order(session, board):
+    session.triggered_current_values = TriggeredCurrentRing(6, use_numpy=False)
+    session.functest_durations[TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT] = 0.0
+    for current in (100.0, 200.0):
+        board.read_current_value = current
+        session.run_functest(TESTOP_SUBCMD_MEASURE_TRIGGERED_CURRENT)
+
+    # Four samples per capture: the first two were overwritten
+    assert session.get_Triggered_Current_Values() == pytest.approx([100.0] * 2 + [200.0] * 4, rel=0.01)
+    assert session.triggered_current_values.overwritten() == 2
+
+    session.clear_Triggered_Current_Values()
+    assert session.get_Triggered_Current_Values() == []